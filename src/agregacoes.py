@@ -0,0 +1,156 @@
+"""Métricas e resumos compartilhados entre o dashboard e os relatórios em lote."""
+import numpy as np
+import pandas as pd
+
+from particoes import chave_mes, converter_datas
+
+TIPOS_CLT = ['salário', 'salario', 'vale']
+
+
+def valores(df, coluna):
+    """Coluna numérica com NaN/texto tratados como zero"""
+    if coluna not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[coluna], errors='coerce').fillna(0.0)
+
+
+def mascara_clt(df_familia):
+    return df_familia['Tipo'].astype(str).str.lower().isin(TIPOS_CLT)
+
+
+def mascara_pago(df_horas):
+    if 'Pago' not in df_horas.columns:
+        return pd.Series(False, index=df_horas.index)
+    return df_horas['Pago'].astype(str).str.lower().isin(['true', '1'])
+
+
+def texto(serie):
+    """Rótulos como texto sem espaços nas pontas; vazios viram ''"""
+    return serie.astype(object).fillna('').astype(str).str.strip()
+
+
+def centavos(serie):
+    """Valores em centavos inteiros, com NaN/texto tratados como zero"""
+    return (pd.to_numeric(serie, errors='coerce').fillna(0) * 100).round().astype('int64')
+
+
+def _hash_despesas(df_despesas):
+    """Soma (módulo 2**64) dos hashes das linhas: muda com qualquer edição de Categoria, Membro, Data ou
+    Valor, não depende da ordem e acompanha inclusões e exclusões por soma e subtração"""
+    if df_despesas.empty:
+        return 0
+    chaves = pd.DataFrame({
+        'Categoria': texto(df_despesas['Categoria']),
+        'Membro': texto(df_despesas['Membro']),
+        # Resolução fixa: datas vindas de texto e de date geram o mesmo hash
+        'Data': converter_datas(df_despesas['Data']).dt.normalize().astype('datetime64[s]'),
+        'Valor': centavos(df_despesas['Valor']),
+    })
+    return int(pd.util.hash_pandas_object(chaves, index=False).to_numpy().sum())
+
+
+def assinatura_despesas(df_despesas):
+    """(linhas, soma em centavos, hash do conteúdo) das despesas, para estados mantidos incrementalmente"""
+    if df_despesas.empty:
+        return 0, 0, 0
+    return len(df_despesas), int(centavos(df_despesas['Valor']).sum()), _hash_despesas(df_despesas)
+
+
+def somar_assinatura(assinatura, linhas, sinal=1):
+    """Assinatura depois de incluir (sinal 1) ou excluir (sinal -1) as `linhas`, sem rever as demais"""
+    n, soma, conteudo = assinatura
+    incluidas = assinatura_despesas(linhas)
+    return (n + sinal * incluidas[0], soma + sinal * incluidas[1], (conteudo + sinal * incluidas[2]) % 2 ** 64)
+
+
+def resumo_renda(df_familia, df_horas):
+    """Renda CLT, outras rendas e freelancer (pago/pendente), como no topo da aba Renda"""
+    clt = mascara_clt(df_familia)
+    valor = valores(df_familia, 'Valor')
+    pago = mascara_pago(df_horas)
+    ajustado = valores(df_horas, 'Valor_Ajustado_BRL')
+    resumo = {
+        'clt': float(valor[clt].sum()),
+        'outros': float(valor[~clt].sum()),
+        'freela_pago': float(ajustado[pago].sum()),
+        'freela_pendente': float(ajustado[~pago].sum()),
+    }
+    resumo['efetiva'] = resumo['clt'] + resumo['outros'] + resumo['freela_pago']
+    resumo['projetada'] = resumo['efetiva'] + resumo['freela_pendente']
+    return resumo
+
+
+def resumo_mensal_ganhos(df_horas, df_familia):
+    """Freelancer pago/pendente e CLT por mês (MesAno), em uma tabela só"""
+    partes = []
+    if not df_horas.empty:
+        pago = mascara_pago(df_horas)
+        partes.append(pd.DataFrame({
+            'MesAno': chave_mes(df_horas['Data']),
+            'Tipo': np.where(pago, 'Freelancer_Pago', 'Freelancer_Pendente'),
+            'Valor': valores(df_horas, 'Valor_Ajustado_BRL'),
+        }))
+    if not df_familia.empty:
+        clt = mascara_clt(df_familia)
+        partes.append(pd.DataFrame({
+            'MesAno': chave_mes(df_familia.loc[clt, 'Data']),
+            'Tipo': 'CLT',
+            'Valor': valores(df_familia, 'Valor')[clt],
+        }))
+    colunas = ['Freelancer_Pago', 'Freelancer_Pendente', 'CLT']
+    if not partes:
+        return pd.DataFrame(columns=['MesAno'] + colunas)
+    longo = pd.concat(partes, ignore_index=True)
+    longo = longo[longo['MesAno'] != 'sem_data']
+    resumo = longo.pivot_table(index='MesAno', columns='Tipo', values='Valor', aggfunc='sum', fill_value=0)
+    return resumo.reindex(columns=colunas, fill_value=0).reset_index().sort_values('MesAno')
+
+
+def resumo_despesas(df_despesas):
+    """Total de despesas e soma por categoria (maior primeiro)"""
+    valor = valores(df_despesas, 'Valor')
+    por_categoria = (valor.groupby(df_despesas['Categoria']).sum()
+                     .rename('Valor').reset_index().sort_values('Valor', ascending=False))
+    return float(valor.sum()), por_categoria
+
+
+def resumo_investimentos(df_invest):
+    total = float(valores(df_invest, 'Valor').sum())
+    rendimento = float(valores(df_invest, 'Rendimento').sum())
+    return {'investido': total, 'rendimento': rendimento, 'saldo': total + rendimento}
+
+
+def resumo_emprestimos(df_emprestimos):
+    """Valores a receber/pagar dos empréstimos ativos (parcelas restantes x parcela)"""
+    if df_emprestimos.empty:
+        return {'a_receber': 0.0, 'a_pagar': 0.0, 'saldo': 0.0}
+    ativo = df_emprestimos['Status'] == 'Ativo'
+    restante = ((valores(df_emprestimos, 'Parcelas_Total') - valores(df_emprestimos, 'Parcelas_Pagas'))
+                * valores(df_emprestimos, 'Valor_Parcela_Mensal'))
+    emprestado = df_emprestimos['Tipo'] == 'Emprestado'
+    a_receber = float(restante[ativo & emprestado].sum())
+    a_pagar = float(restante[ativo & ~emprestado].sum())
+    return {'a_receber': a_receber, 'a_pagar': a_pagar, 'saldo': a_receber - a_pagar}
+
+
+def resumo_por_membro(dados):
+    """Renda, despesas e investimentos por mês e membro (freelancer não tem membro e fica de fora)"""
+    partes = []
+    for nome, coluna in (('familia', 'Renda'), ('despesas', 'Despesas'), ('investimentos', 'Investido')):
+        df = dados[nome]
+        if df.empty:
+            continue
+        partes.append(pd.DataFrame({
+            'Mes': chave_mes(df['Data']),
+            'Membro': df['Membro'].astype(str),
+            'Coluna': coluna,
+            'Valor': valores(df, 'Valor'),
+        }))
+    colunas = ['Renda', 'Despesas', 'Investido']
+    if not partes:
+        return pd.DataFrame(columns=['Mes', 'Membro'] + colunas)
+    longo = pd.concat(partes, ignore_index=True)
+    resumo = longo.pivot_table(index=['Mes', 'Membro'], columns='Coluna', values='Valor', aggfunc='sum', fill_value=0)
+    resumo = resumo.reindex(columns=colunas, fill_value=0).reset_index()
+    resumo['Saldo'] = resumo['Renda'] - resumo['Despesas']
+    return resumo
@@ -0,0 +1,193 @@
+"""Gastos fora do padrão por categoria e membro: z-score sobre médias móveis exponenciais (EWMA)."""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import assinatura_despesas, somar_assinatura, texto
+from particoes import chave_mes, converter_datas
+
+# Peso de cada observação nova (equivale a uma janela de ~12 observações)
+ALFA = 2 / (12 + 1)
+LIMITE_Z = 3.0
+# Observações anteriores exigidas antes de julgar uma linha (ou mês) do grupo
+MIN_HISTORICO = 4
+# Desvio mínimo, para séries quase constantes não acusarem centavos: 5% da média ou R$ 1
+PISO_RELATIVO = 0.05
+PISO_ABSOLUTO = 1.0
+
+COLUNAS_TRANSACOES = ['Data', 'Membro', 'Categoria', 'Valor', 'Media', 'Z']
+COLUNAS_MESES = ['Mes', 'Membro', 'Categoria', 'Total', 'Media', 'Z']
+
+
+def _base(df_despesas):
+    """Despesas com data válida: categoria, membro, valor, data e mês, na ordem do arquivo"""
+    base = pd.DataFrame({
+        'Categoria': texto(df_despesas['Categoria']),
+        'Membro': texto(df_despesas['Membro']),
+        'Valor': pd.to_numeric(df_despesas['Valor'], errors='coerce').fillna(0).astype('float64'),
+        'Data': converter_datas(df_despesas['Data']),
+    }).reset_index(drop=True)
+    base = base[base['Data'].notna()]
+    base['Mes'] = chave_mes(base['Data'])
+    return base
+
+
+def _z(valor, n, m1, m2):
+    """z-score de `valor` contra o estado EWMA (n, E[x], E[x²]) das observações anteriores"""
+    desvio = np.sqrt(np.maximum(m2 - m1 ** 2, 0))
+    piso = np.maximum(np.abs(m1) * PISO_RELATIVO, PISO_ABSOLUTO)
+    z = (valor - m1) / np.maximum(desvio, piso)
+    return np.where(n >= MIN_HISTORICO, z, np.nan)
+
+
+def _atualizar(estado, valor):
+    """Mesma recursão do ewm(adjust=False) do pandas: a primeira observação inicia a média"""
+    n, m1, m2 = estado
+    if n == 0:
+        return 1, valor, valor ** 2
+    return n + 1, (1 - ALFA) * m1 + ALFA * valor, (1 - ALFA) * m2 + ALFA * valor ** 2
+
+
+def _serie_ewma(valores, grupos):
+    """Para cada linha (já em ordem cronológica dentro do grupo): estado antes dela e estado final do grupo"""
+    agrupado = pd.DataFrame({'x': valores, 'x2': valores ** 2}).groupby(grupos, sort=False)
+    ewm = agrupado.ewm(alpha=ALFA, adjust=False).mean().reset_index(level=0, drop=True).sort_index()
+    anteriores = ewm.groupby(grupos, sort=False).shift()
+    n = pd.Series(grupos).groupby(grupos, sort=False).cumcount().to_numpy()
+    return n, anteriores['x'].to_numpy(), anteriores['x2'].to_numpy(), ewm
+
+
+def _avaliar(base):
+    """Z de cada despesa e de cada total mensal contra o histórico anterior do próprio grupo (vetorizado)"""
+    base = base.sort_values(['Categoria', 'Membro', 'Data'], kind='stable').reset_index(drop=True)
+    grupos = pd.MultiIndex.from_arrays([base['Categoria'], base['Membro']]).factorize()[0]
+    n, m1, m2, ewm = _serie_ewma(base['Valor'].to_numpy(), grupos)
+    transacoes = base.assign(Media=m1, Z=_z(base['Valor'].to_numpy(), n, m1, m2))
+    ultimas = base.assign(n=n + 1, m1=ewm['x'].to_numpy(), m2=ewm['x2'].to_numpy()).groupby(grupos).tail(1)
+    estados = {(r.Categoria, r.Membro): ((r.n, r.m1, r.m2), r.Data) for r in ultimas.itertuples()}
+
+    mensal = base.groupby(['Categoria', 'Membro', 'Mes'], sort=True)['Valor'].sum().reset_index()
+    grupos_mes = pd.MultiIndex.from_arrays([mensal['Categoria'], mensal['Membro']]).factorize()[0]
+    n, m1, m2, _ = _serie_ewma(mensal['Valor'].to_numpy(), grupos_mes)
+    meses = mensal.rename(columns={'Valor': 'Total'}).assign(Media=m1, Z=_z(mensal['Valor'].to_numpy(), n, m1, m2))
+    # Estado mensal: meses fechados (todos menos o último) + o mês em aberto, que ainda pode crescer
+    mensais = {}
+    for (categoria, membro), grupo in meses.groupby(['Categoria', 'Membro'], sort=False):
+        fechado = (0, 0.0, 0.0)
+        for total in grupo['Total'].to_numpy()[:-1]:
+            fechado = _atualizar(fechado, total)
+        mensais[(categoria, membro)] = (fechado, grupo['Mes'].iloc[-1], grupo['Total'].iloc[-1])
+    return transacoes, meses, estados, mensais
+
+
+class DetectorAnomalias:
+    """Despesas e meses fora do padrão de cada categoria/membro, mantidos incrementalmente.
+
+    A avaliação completa (groupby + ewm sobre todo o histórico) só roda quando o arquivo muda
+    por fora ou uma despesa chega com data anterior à última do grupo; inserções em ordem
+    atualizam o estado EWMA do grupo em O(1) por linha. Como nos totais de orçamento, a versão do
+    escritor evita conferir a assinatura de conteúdo enquanto o arquivo não muda.
+    """
+
+    def __init__(self):
+        self._assinatura = None
+        self._versao = None
+        self._estados = {}
+        self._mensais = {}
+        self._transacoes = pd.DataFrame(columns=COLUNAS_TRANSACOES)
+        self._meses = pd.DataFrame(columns=COLUNAS_MESES)
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        """Exclusões e edições não têm como ser desfeitas no EWMA: a próxima sincronização reavalia tudo"""
+        with self._lock:
+            self._assinatura = None
+            self._versao = None
+
+    def sincronizar(self, df_despesas, versao=None):
+        """Reavalia tudo somente se o estado em memória não corresponde ao DataFrame da `versao`"""
+        with self._lock:
+            if versao is not None and versao == self._versao:
+                return
+        assinatura = assinatura_despesas(df_despesas)
+        with self._lock:
+            if assinatura == self._assinatura:
+                self._versao = versao
+                return
+        transacoes, meses, estados, mensais = _avaliar(_base(df_despesas)) if not df_despesas.empty else (
+            pd.DataFrame(columns=COLUNAS_TRANSACOES + ['Mes']), pd.DataFrame(columns=COLUNAS_MESES), {}, {})
+        with self._lock:
+            self._transacoes = transacoes.loc[transacoes['Z'] >= LIMITE_Z, COLUNAS_TRANSACOES]
+            self._meses = meses.loc[meses['Z'] >= LIMITE_Z, COLUNAS_MESES]
+            self._estados, self._mensais = estados, mensais
+            self._assinatura = assinatura
+            self._versao = versao
+
+    def registrar(self, df_antes, novas, versao=None):
+        """Avalia as despesas novas contra `df_antes` (dados da `versao`); retorna as que estão fora do padrão"""
+        self.sincronizar(df_antes, versao)
+        base = _base(novas).sort_values('Data', kind='stable')
+        if any(data < self._estados.get((c, m), (None, pd.Timestamp.min))[1]
+               for c, m, data in zip(base['Categoria'], base['Membro'], base['Data'])):
+            # Lançamento retroativo muda a base das linhas posteriores do grupo
+            self.sincronizar(pd.concat([df_antes, novas], ignore_index=True))
+            return self._transacoes.merge(base[['Data', 'Membro', 'Categoria', 'Valor']])
+        anomalas, meses_afetados = [], {}
+        with self._lock:
+            for linha in base.itertuples():
+                chave = (linha.Categoria, linha.Membro)
+                estado, _ = self._estados.get(chave, ((0, 0.0, 0.0), None))
+                z = float(_z(linha.Valor, *estado))
+                if z >= LIMITE_Z:
+                    anomalas.append({'Data': linha.Data, 'Membro': linha.Membro, 'Categoria': linha.Categoria,
+                                     'Valor': linha.Valor, 'Media': estado[1], 'Z': z})
+                self._estados[chave] = (_atualizar(estado, linha.Valor), linha.Data)
+
+                fechado, mes, total = self._mensais.get(chave, ((0, 0.0, 0.0), linha.Mes, 0.0))
+                if linha.Mes != mes:
+                    fechado, mes, total = _atualizar(fechado, total), linha.Mes, 0.0
+                self._mensais[chave] = (fechado, mes, total + linha.Valor)
+                meses_afetados[chave + (mes,)] = (fechado, total + linha.Valor)
+
+            novas_transacoes = pd.DataFrame(anomalas, columns=COLUNAS_TRANSACOES)
+            if not novas_transacoes.empty:
+                self._transacoes = pd.concat([self._transacoes, novas_transacoes], ignore_index=True)
+            # O mês em aberto é reavaliado com o total atualizado
+            chaves_meses = list(zip(self._meses['Categoria'], self._meses['Membro'], self._meses['Mes']))
+            manter = [chave not in meses_afetados for chave in chaves_meses]
+            linhas_meses = []
+            for (categoria, membro, mes), (fechado, total) in meses_afetados.items():
+                z = float(_z(total, *fechado))
+                if z >= LIMITE_Z:
+                    linhas_meses.append({'Mes': mes, 'Membro': membro, 'Categoria': categoria, 'Total': total,
+                                         'Media': fechado[1], 'Z': z})
+            self._meses = pd.concat([self._meses[manter], pd.DataFrame(linhas_meses, columns=COLUNAS_MESES)],
+                                    ignore_index=True)
+            self._assinatura = somar_assinatura(self._assinatura, novas)
+            # O estado já não é o da versão lida: a próxima versão é conferida pela assinatura
+            self._versao = None
+        return novas_transacoes
+
+    def transacoes(self):
+        """Despesas fora do padrão, mais recentes primeiro"""
+        with self._lock:
+            return self._transacoes.sort_values('Data', ascending=False, kind='stable').reset_index(drop=True)
+
+    def meses(self):
+        """Meses com total fora do padrão por categoria/membro, mais recentes primeiro"""
+        with self._lock:
+            return self._meses.sort_values('Mes', ascending=False, kind='stable').reset_index(drop=True)
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def obter_detector():
+    """Detector compartilhado pelo processo (sobrevive aos reruns do Streamlit)"""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = DetectorAnomalias()
+        return _detector
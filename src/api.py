@@ -0,0 +1,229 @@
+"""API JSON local, só leitura, sobre os conjuntos de dados (para planilhas, atalhos do celular etc.).
+
+Uso:
+    python src/api.py --porta 8765 --dados data
+
+Rotas (GET):
+    /conjuntos                      conjuntos disponíveis, linhas, colunas e versão
+    /conjuntos/<nome>               registros paginados; filtros: inicio, fim, mes (YYYY-MM),
+                                    <Coluna>=valor; paginação: pagina, por_pagina
+    /resumos/mensal                 ganhos por mês e renda/despesas/investimentos por mês e membro
+
+Toda resposta leva um ETag derivado da versão dos arquivos (tamanho e mtime) e da consulta.
+Com If-None-Match igual, a resposta é 304 sem ler nenhum dado: consultas repetidas sem
+mudanças custam só alguns stat().
+"""
+import argparse
+import hashlib
+import json
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from agregacoes import resumo_mensal_ganhos, resumo_por_membro
+from dados import CONJUNTOS, DATA_DIR, caminho, carregar, processar_dados_emprestimos
+from particoes import COLUNA_DATA, assinatura_arquivo, chave_mes, converter_datas, fatia_intervalo
+
+POR_PAGINA_PADRAO = 100
+POR_PAGINA_MAXIMO = 1000
+_PARAMETROS = {'inicio', 'fim', 'mes', 'pagina', 'por_pagina'}
+
+
+class ErroConsulta(Exception):
+    """Consulta inválida: vira uma resposta 4xx com a mensagem"""
+
+    def __init__(self, mensagem, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class DadosAPI:
+    """Conjuntos lidos do disco, guardados enquanto a assinatura do arquivo não muda"""
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def versao(self, nomes):
+        """Versão dos conjuntos: só stat() dos arquivos (ou manifestos), sem ler conteúdo"""
+        return [str(assinatura_arquivo(caminho(nome, self.data_dir))) for nome in nomes]
+
+    def conjunto(self, nome):
+        assinatura = str(assinatura_arquivo(caminho(nome, self.data_dir)))
+        with self._lock:
+            guardado = self._cache.get(nome)
+        if guardado is not None and guardado[0] == assinatura:
+            return guardado[1]
+        df = carregar(caminho(nome, self.data_dir))
+        if nome == 'emprestimos':
+            df = processar_dados_emprestimos(df)
+        with self._lock:
+            self._cache[nome] = (assinatura, df)
+        return df
+
+
+def _unico(consulta, nome, padrao=None):
+    valores = consulta.get(nome)
+    return valores[-1] if valores else padrao
+
+
+def _inteiro(consulta, nome, padrao, minimo, maximo=None):
+    texto = _unico(consulta, nome)
+    if texto is None:
+        return padrao
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise ErroConsulta(f"'{nome}' deve ser um número inteiro")
+    if valor < minimo or (maximo is not None and valor > maximo):
+        raise ErroConsulta(f"'{nome}' deve estar entre {minimo} e {maximo or 'infinito'}")
+    return valor
+
+
+def _data(consulta, nome):
+    texto = _unico(consulta, nome)
+    if texto is None:
+        return None
+    data = pd.to_datetime(texto, errors='coerce')
+    if pd.isna(data):
+        raise ErroConsulta(f"'{nome}' deve ser uma data (YYYY-MM-DD)")
+    return data
+
+
+def _registros(df):
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+def filtrar(df, nome, consulta):
+    """Aplica os filtros de data (inicio/fim/mes) e de igualdade por coluna"""
+    inicio, fim, mes = _data(consulta, 'inicio'), _data(consulta, 'fim'), _unico(consulta, 'mes')
+    if inicio is not None or fim is not None:
+        datas = converter_datas(df[COLUNA_DATA[nome]])
+        # Conjunto ordenado por data (após a manutenção): busca binária em vez de máscara
+        fatia = fatia_intervalo(datas, inicio, fim)
+        if fatia is not None:
+            df = df.iloc[fatia]
+        else:
+            df = df[((datas >= inicio) if inicio is not None else True) & ((datas <= fim) if fim is not None else True)]
+    mascara = pd.Series(True, index=df.index)
+    if mes is not None:
+        mascara &= chave_mes(df[COLUNA_DATA[nome]]) == mes
+    for coluna, valores in consulta.items():
+        if coluna in _PARAMETROS:
+            continue
+        if coluna not in df.columns:
+            raise ErroConsulta(f"coluna desconhecida em {nome}: {coluna}")
+        mascara &= df[coluna].astype(str).isin(valores)
+    return df[mascara]
+
+
+def conjuntos(dados, consulta):
+    lista = []
+    for nome, versao in zip(CONJUNTOS, dados.versao(CONJUNTOS)):
+        df = dados.conjunto(nome)
+        lista.append({'nome': nome, 'linhas': len(df), 'colunas': list(df.columns), 'versao': versao})
+    return {'conjuntos': lista}
+
+
+def registros(dados, consulta, nome):
+    pagina = _inteiro(consulta, 'pagina', 1, 1)
+    por_pagina = _inteiro(consulta, 'por_pagina', POR_PAGINA_PADRAO, 1, POR_PAGINA_MAXIMO)
+    df = filtrar(dados.conjunto(nome), nome, consulta)
+    inicio = (pagina - 1) * por_pagina
+    return {'conjunto': nome, 'total': len(df), 'pagina': pagina, 'por_pagina': por_pagina,
+            'paginas': -(-len(df) // por_pagina), 'registros': _registros(df.iloc[inicio:inicio + por_pagina])}
+
+
+def resumo_mensal(dados, consulta):
+    filtrados = {nome: filtrar(dados.conjunto(nome), nome, {k: v for k, v in consulta.items() if k in ('inicio', 'fim')})
+                 for nome in ('horas', 'familia', 'despesas', 'investimentos')}
+    return {'ganhos': _registros(resumo_mensal_ganhos(filtrados['horas'], filtrados['familia'])),
+            'por_membro': _registros(resumo_por_membro(filtrados))}
+
+
+def rota(caminho_url):
+    """(função, conjuntos dos quais a resposta depende, argumentos extras) da rota"""
+    partes = [p for p in caminho_url.split('/') if p]
+    if partes in ([], ['conjuntos']):
+        return conjuntos, CONJUNTOS, ()
+    if len(partes) == 2 and partes[0] == 'conjuntos':
+        if partes[1] not in CONJUNTOS:
+            raise ErroConsulta(f"conjunto desconhecido: {partes[1]}", HTTPStatus.NOT_FOUND)
+        return registros, [partes[1]], (partes[1],)
+    if partes == ['resumos', 'mensal']:
+        return resumo_mensal, ['horas', 'familia', 'despesas', 'investimentos'], ()
+    raise ErroConsulta(f"rota desconhecida: {caminho_url}", HTTPStatus.NOT_FOUND)
+
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    dados = None  # DadosAPI, definido em criar_servidor
+    server_version = 'FinancasAPI/1.0'
+
+    def _responder(self, status, corpo=None, etag=None):
+        conteudo = b'' if corpo is None else json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if corpo is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(conteudo)))
+        self.end_headers()
+        if self.command != 'HEAD' and conteudo:
+            self.wfile.write(conteudo)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        consulta = parse_qs(url.query)
+        try:
+            funcao, dependencias, argumentos = rota(url.path)
+            # O ETag sai antes de qualquer leitura: só assinaturas dos arquivos e a consulta normalizada
+            chave = json.dumps([url.path, sorted(consulta.items()), self.dados.versao(dependencias)])
+            etag = f'"{hashlib.sha1(chave.encode()).hexdigest()}"'
+            if etag in [e.strip() for e in self.headers.get('If-None-Match', '').split(',')]:
+                self._responder(HTTPStatus.NOT_MODIFIED, etag=etag)
+                return
+            self._responder(HTTPStatus.OK, funcao(self.dados, consulta, *argumentos), etag)
+        except ErroConsulta as e:
+            self._responder(e.status, {'erro': str(e)})
+        except Exception as e:
+            self._responder(HTTPStatus.INTERNAL_SERVER_ERROR, {'erro': str(e)})
+
+    do_HEAD = do_GET
+
+    def _somente_leitura(self):
+        self._responder(HTTPStatus.METHOD_NOT_ALLOWED, {'erro': 'API somente leitura'})
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = _somente_leitura
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def criar_servidor(host='127.0.0.1', porta=8765, data_dir=DATA_DIR):
+    manipulador = type('Manipulador', (ManipuladorAPI,), {'dados': DadosAPI(data_dir)})
+    return ThreadingHTTPServer((host, porta), manipulador)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API JSON local (somente leitura) dos dados financeiros")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço de escuta (padrão: só esta máquina)")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--dados', default=DATA_DIR, help="Pasta dos arquivos de dados")
+    args = parser.parse_args(argv)
+    servidor = criar_servidor(args.host, args.porta, args.dados)
+    print(f"API em http://{args.host}:{args.porta}/conjuntos")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,80 @@
 import streamlit as st
+from pathlib import Path
+
+# ============================
+# Primeira pintura: configuração, estilo e cabeçalho saem antes dos imports pesados
+# (pandas, numpy e os módulos de dados); os botões são tratados mais abaixo
+# ============================
+st.set_page_config(page_title="Dashboard Financeiro", layout="wide")
+
+# Estilo Futurista Customizado: cores base no tema de .streamlit/config.toml (aplicadas antes
+# do primeiro desenho); o restante vem de assets/estilo.css, lido uma vez por processo
+@st.cache_resource
+def estilo_css():
+    return (Path(__file__).resolve().parent.parent / 'assets' / 'estilo.css').read_text(encoding='utf-8')
+
+st.markdown(f"<style>{estilo_css()}</style>", unsafe_allow_html=True)
+
+col_title, col_backup, col_refresh = st.columns([3, 1, 1])
+with col_title:
+    st.title("Registro Financeiro")
+with col_backup:
+    pediu_backup = st.button("💾 Backup", help="Criar backup dos dados")
+with col_refresh:
+    pediu_atualizar = st.button("🔄 Atualizar", help="Atualizar dados exibidos")
+
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import shutil
-from pathlib import Path
+import time
+from escrita import POLITICAS, gravar_csv_duravel, obter_escritor
+from compactacao import compactar
+from particoes import COLUNA_DATA, SEM_DATA, chave_mes, converter_datas, csv_texto, meses_disponiveis, particionado
+from duplicidade import CAMPOS_CHAVE, obter_indice, relatorio_duplicados, remover_duplicados
+from dados import CONJUNTOS, get_default_columns, processar_dados_emprestimos
+from emprestimos import pagar_parcelas, pagaveis, vencendo_ate
+from agregacoes import resumo_mensal_ganhos
+from recorrencias import RECORRENCIAS_PATH, materializar, separar_duplicados
+from razao import obter_razao
+from patrimonio import COMPONENTES as COMPONENTES_PATRIMONIO, obter_patrimonio
+from busca import obter_busca
+from historico import obter_historico
+from restauracao import PARTES as PARTES_RESTAURACAO, diferenca, listar_backups, restaurar
+from orcamentos import ORCAMENTOS_PATH, limites, obter_totais
+from anomalias import LIMITE_Z, obter_detector
+from freelancer import obter_analises
+from importacao import ErroImportacao, importar
+from manutencao import executar as executar_manutencao
+from trabalho import area_trabalho
+from observador import obter_observador
+from simulacao import melhores, simular, situacao
+from irpf import SECOES as SECOES_IRPF, obter_resumos, totais as totais_irpf
+from cotacoes import COTACOES_PATH, mesclar_cotacoes, normalizar_cotacoes, reavaliar_pendentes, sensibilidade
+
+def graficos():
+    """plotly.express, importado só quando algum gráfico é desenhado (o import pesa na primeira sessão)"""
+    import plotly.express as px
+    return px
 
 # Configurar pandas para evitar warnings de depreciação
 pd.set_option('future.no_silent_downcasting', True)
 
-# Inicializar session state
-if 'refresh_data' not in st.session_state:
-    st.session_state.refresh_data = False
+# Gravações vão para uma fila em segundo plano; alterações ficam no máximo esse tempo só em memória
+JANELA_ESCRITA_SEGUNDOS = 0.5
+escritor = obter_escritor(JANELA_ESCRITA_SEGUNDOS)
+
+# Intervalo em que cada sessão confere se outra sessão ou um editor externo alterou os dados
+INTERVALO_ATUALIZACAO_SEGUNDOS = 2
+
+# Conjuntos carregados ficam na sessão e só são relidos quando a versão no escritor/disco muda
+area = area_trabalho(st.session_state)
 
 # Função para criar backup antes de modificações
 def criar_backup():
     """Cria backup dos arquivos CSV antes de modificações"""
     try:
+        # Garantir que alterações ainda na fila estejam no disco antes da cópia
+        escritor.aguardar()
         backup_dir = Path("data/backups")
         backup_dir.mkdir(exist_ok=True)
         
@@ -24,8 +83,12 @@ def criar_backup():
         
         for arquivo in ["horas.csv", "familia.csv", "despesas.csv", "investimentos.csv", "emprestimos.csv"]:
             arquivo_path = Path(f"data/{arquivo}")
-            if arquivo_path.exists():
-                backup_path = backup_dir / f"{arquivo.replace('.csv', '')}_{timestamp}.csv"
+            backup_path = backup_dir / f"{arquivo.replace('.csv', '')}_{timestamp}.csv"
+            if particionado(arquivo_path):
+                # Conjuntos particionados viram um CSV plano no backup
+                backup_path.write_text(csv_texto(arquivo_path), encoding='utf-8')
+                arquivos_backup.append(arquivo)
+            elif arquivo_path.exists():
                 shutil.copy2(arquivo_path, backup_path)
                 arquivos_backup.append(arquivo)
         
@@ -39,14 +102,17 @@ def criar_backup():
 # Função para carregar dados sem cache agressivo
 def load_csv_data(file_path, default_columns=None):
     try:
-        if Path(file_path).exists():
-            df = pd.read_csv(file_path)
+        if escritor.existe(file_path):
+            df_guardado = area.obter(file_path, escritor.versao(file_path))
+            if df_guardado is not None:
+                return df_guardado
+            df = escritor.ler_csv(file_path)
             
             # Verificação de integridade
             if df.empty and default_columns:
                 st.warning(f"⚠️ Arquivo {file_path} estava vazio, recriando estrutura padrão.")
                 df = pd.DataFrame(columns=default_columns)
-                df.to_csv(file_path, index=False)
+                gravar_csv_duravel(df, file_path)
             
             # Verificar se as colunas estão corretas
             if default_columns and not df.empty:
@@ -55,8 +121,11 @@ def load_csv_data(file_path, default_columns=None):
                     st.warning(f"⚠️ Colunas faltantes em {file_path}: {colunas_faltantes}")
                     for col in colunas_faltantes:
                         df[col] = None
-                    df.to_csv(file_path, index=False)
+                    gravar_csv_duravel(df, file_path)
             
+            # Rótulos e datas em category, inteiros pequenos e dinheiro em centavos exatos
+            df = compactar(df, file_path)
+            area.guardar(file_path, escritor.versao(file_path), df)
             return df
         else:
             # Criar arquivo se não existir
@@ -72,21 +141,6 @@ def load_csv_data(file_path, default_columns=None):
         columns = default_columns or get_default_columns(file_path)
         return pd.DataFrame(columns=columns)
 
-def get_default_columns(file_path):
-    """Retorna colunas padrão baseadas no nome do arquivo"""
-    if 'horas' in file_path:
-        return ['Data', 'Horas', 'Cotacao', 'Semana', 'Nota', 'Valor_USD', 'Valor_BRL', 'Valor_Ajustado_USD', 'Valor_Ajustado_BRL', 'Pago']
-    elif 'familia' in file_path:
-        return ['Membro', 'Tipo', 'Valor', 'Data']
-    elif 'despesas' in file_path:
-        return ['Membro', 'Categoria', 'Valor', 'Data']
-    elif 'investimentos' in file_path:
-        return ['Membro', 'Tipo', 'Valor', 'Data', 'Rendimento']
-    elif 'emprestimos' in file_path:
-        return ['Nome', 'Tipo', 'Valor_Liquido_Recebido', 'Parcelas_Total', 'Total_A_Pagar', 'Valor_Parcela_Mensal', 'Parcelas_Pagas', 'Taxa_Juros_Calculada', 'Custo_Total_Juros', 'Data_Emprestimo', 'Status', 'Observacoes']
-    else:
-        return []
-
 def safe_concat(df1, df2):
     """Concatenação segura que evita warnings com DataFrames vazios"""
     if df1.empty and df2.empty:
@@ -98,38 +152,6 @@ def safe_concat(df1, df2):
     else:
         return pd.concat([df1, df2], ignore_index=True)
 
-def processar_dados_emprestimos(df_emprestimos):
-    """Processa dados de empréstimos preservando valores personalizados do CSV"""
-    if df_emprestimos.empty:
-        return df_emprestimos
-    
-    df_processed = df_emprestimos.copy()
-    
-    # Garantir que colunas numéricas sejam do tipo correto
-    colunas_numericas = ['Valor_Liquido_Recebido', 'Taxa_Juros_Calculada', 'Parcelas_Total', 'Parcelas_Pagas', 
-                        'Total_A_Pagar', 'Valor_Parcela_Mensal', 'Custo_Total_Juros']
-    
-    for col in colunas_numericas:
-        if col in df_processed.columns:
-            df_processed[col] = pd.to_numeric(df_processed[col], errors='coerce').fillna(0)
-    
-    # Adicionar colunas calculadas para exibição (sem sobrescrever dados do CSV)
-    df_processed['Parcelas_Restantes'] = df_processed['Parcelas_Total'] - df_processed['Parcelas_Pagas']
-    
-    # Proteção contra valores None/NaN na multiplicação
-    df_processed['Valor_Parcela_Mensal'] = df_processed['Valor_Parcela_Mensal'].fillna(0)
-    df_processed['Valor_Restante'] = df_processed['Parcelas_Restantes'] * df_processed['Valor_Parcela_Mensal']
-    
-    # Proteção contra divisão por zero
-    with np.errstate(divide='ignore', invalid='ignore'):
-        df_processed['Progresso'] = np.where(
-            df_processed['Parcelas_Total'] > 0,
-            (df_processed['Parcelas_Pagas'] / df_processed['Parcelas_Total'] * 100).round(1),
-            0
-        )
-    
-    return df_processed
-
 def safe_delete_record(df, index_to_delete, file_path, record_description="registro"):
     """Função auxiliar para exclusão robusta de registros"""
     try:
@@ -188,127 +210,139 @@ def validar_valores_emprestimo(valor_liquido, total_a_pagar, valor_parcela, parc
     
     return True, "Valores consistentes"
 
-# Função para salvar dados com verificação e backup
-def save_csv_data(df, file_path, success_message="Dados salvos com sucesso!"):
+# Função para salvar dados: a gravação com backup e verificação roda em segundo plano
+def save_csv_data(df, file_path, success_message="Dados salvos com sucesso!", duravel=False):
+    """Enfileira a gravação; com duravel=True só retorna depois que o arquivo estiver no disco"""
     try:
-        # Criar backup do arquivo atual se existir
-        file_path_obj = Path(file_path)
-        if file_path_obj.exists():
-            backup_temp = file_path.replace('.csv', '_temp_backup.csv')
-            shutil.copy2(file_path, backup_temp)
-        
-        # Salvar novos dados
-        df.to_csv(file_path, index=False)
-        
-        # Verificar se foi salvo corretamente
-        verificacao = pd.read_csv(file_path)
-        
-        # Verificação mais inteligente: comparar estrutura e conteúdo
-        colunas_ok = list(verificacao.columns) == list(df.columns)
-        conteudo_ok = len(verificacao) == len(df)
-        
-        # Se DataFrame está vazio, verificar se arquivo também está vazio (apenas cabeçalho)
-        if df.empty:
-            arquivo_ok = verificacao.empty or len(verificacao) == 0
-        else:
-            # Para DataFrames não vazios, verificar se dados foram salvos corretamente
-            arquivo_ok = not verificacao.empty and len(verificacao) > 0
-        
-        if colunas_ok and conteudo_ok and arquivo_ok:
-            # Remover backup temporário se salvamento foi bem-sucedido
-            backup_temp = file_path.replace('.csv', '_temp_backup.csv')
-            if Path(backup_temp).exists():
-                Path(backup_temp).unlink()
-            st.success(success_message)
-            return True
-        else:
-            raise Exception(f"Verificação falhou - Colunas: {colunas_ok}, Conteúdo: {conteudo_ok}, Arquivo: {arquivo_ok}")
-            
+        registrar_no_historico(file_path, df, success_message)
+        escritor.enfileirar(df, file_path)
+        if duravel and not escritor.aguardar(file_path, timeout=30):
+            raise Exception(escritor.falhas(file_path).get(str(Path(file_path)), "Tempo esgotado aguardando a gravação"))
+        st.success(success_message)
+        return True
     except Exception as e:
         st.error(f"❌ Erro ao salvar dados: {str(e)}")
-        
-        # Restaurar backup se algo deu errado
-        backup_temp = file_path.replace('.csv', '_temp_backup.csv')
-        if Path(backup_temp).exists():
-            shutil.copy2(backup_temp, file_path)
-            Path(backup_temp).unlink()
-            st.warning("⚠️ Dados restaurados do backup devido ao erro")
-        
         return False
 
-st.set_page_config(page_title="Dashboard Financeiro", layout="wide")
+def save_csv_lote(itens, success_message="Dados salvos com sucesso!", duravel=False):
+    """Grava vários arquivos {caminho: df} como uma transação: todos vão para o disco ou nenhum"""
+    try:
+        try:
+            historico.registrar_lote([(p, ler_ou_vazio(p), df) for p, df in itens.items()],
+                                     success_message.replace("✅", "").strip())
+        except Exception as e:
+            st.warning(f"⚠️ Alteração não registrada no histórico: {e}")
+        escritor.enfileirar_lote([(df, p) for p, df in itens.items()])
+        if duravel and not all(escritor.aguardar(p, timeout=30) for p in itens):
+            falhas = escritor.falhas()
+            raise Exception("; ".join(falhas[str(Path(p))] for p in itens if str(Path(p)) in falhas)
+                            or "Tempo esgotado aguardando a gravação")
+        st.success(success_message)
+        return True
+    except Exception as e:
+        st.error(f"❌ Erro ao salvar dados: {str(e)}")
+        return False
 
-# ============================
-# Estilo Futurista Customizado
-# ============================
-st.markdown(
-    """
-    <style>
-    html, body, .stApp {
-        background: linear-gradient(135deg, #181C2F 0%, #23272F 100%) !important;
-        color: #E0F7FA !important;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        background: #23272F !important;
-        border-radius: 12px !important;
-        border: 1.5px solid #1DE9B6 !important;
-        box-shadow: 0 2px 16px 0 #1de9b633 !important;
-    }
-    .stTabs [data-baseweb="tab"] {
-        color: #E0F7FA !important;
-        font-weight: bold !important;
-        font-size: 1.1rem !important;
-        border-radius: 8px 8px 0 0 !important;
-        margin-right: 2px !important;
-        background: #181C2F !important;
-        transition: background 0.3s, color 0.3s !important;
-    }
-    .stTabs [aria-selected="true"] {
-        background: linear-gradient(90deg, #1DE9B6 0%, #181C2F 100%) !important;
-        color: #181C2F !important;
-        box-shadow: 0 2px 8px 0 #1de9b655 !important;
-    }
-    .stButton>button, .stForm button {
-        background: linear-gradient(90deg, #1DE9B6 0%, #23272F 100%) !important;
-        color: #181C2F !important;
-        border: none !important;
-        border-radius: 8px !important;
-        font-weight: bold !important;
-        box-shadow: 0 2px 8px 0 #1de9b655 !important;
-        transition: background 0.3s, color 0.3s !important;
-    }
-    .stButton>button:hover, .stForm button:hover {
-        background: #1DE9B6 !important;
-        color: #23272F !important;
-    }
-    .stDataFrame, .stTable {
-        background: #23272F !important;
-        color: #E0F7FA !important;
-        border-radius: 8px !important;
-        border: 1.5px solid #1DE9B6 !important;
-    }
-    .stMetric {
-        background: #181C2F !important;
-        border-radius: 8px !important;
-        border: 1.5px solid #1DE9B6 !important;
-        color: #1DE9B6 !important;
-        box-shadow: 0 2px 8px 0 #1de9b655 !important;
-    }
-    .stPlotlyChart {
-        background: #23272F !important;
-        border-radius: 8px !important;
-        box-shadow: 0 2px 16px 0 #1de9b633 !important;
-    }
-    h1, h2, h3, h4, h5, h6 {
-        color: #1DE9B6 !important;
-        letter-spacing: 1px !important;
-        font-family: 'Segoe UI', 'Roboto', 'Arial', sans-serif !important;
-    }
-   
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+# Lançamentos idênticos a um já existente (cliques duplos, reruns, inserções automáticas
+# dos empréstimos): "rejeitar" bloqueia a inserção, "avisar" apenas alerta
+POLITICA_DUPLICADOS = "rejeitar"
+indice_duplicados = obter_indice(escritor)
+
+def ler_ou_vazio(file_path):
+    """Leitura sem mensagens nem reparos (índices e razão); arquivo ausente vira DataFrame vazio"""
+    return escritor.ler_csv(file_path) if escritor.existe(file_path) else pd.DataFrame(columns=get_default_columns(file_path))
+
+def meses_com_dados(file_path, df):
+    """Opções do filtro de mês: pelo manifesto quando particionado, sem abrir as partições"""
+    if particionado(file_path) and not escritor.pendente(file_path):
+        return meses_disponiveis(file_path)
+    coluna = COLUNA_DATA[Path(file_path).stem]
+    if df.empty or coluna not in df.columns:
+        return []
+    return sorted(m for m in chave_mes(df[coluna]).unique() if m != SEM_DATA)
+
+def ler_meses(file_path, meses, df):
+    """Linhas dos meses escolhidos: conjuntos particionados leem só essas partições"""
+    if particionado(file_path):
+        return compactar(escritor.ler_csv(file_path, meses=meses), file_path)
+    return df[chave_mes(df[COLUNA_DATA[Path(file_path).stem]]).isin(meses).to_numpy()]
+
+# Cada gravação vira um delta por linha no histórico (desfazer/refazer sem cópias completas)
+historico = obter_historico()
+
+def registrar_no_historico(file_path, df, descricao):
+    try:
+        historico.registrar(file_path, ler_ou_vazio(file_path), df, descricao.replace("✅", "").strip())
+    except Exception as e:
+        st.warning(f"⚠️ Alteração não registrada no histórico: {e}")
+
+def aplicar_historico(acao):
+    """Desfaz ou refaz a última operação gravando o resultado direto no escritor (sem nova entrada)"""
+    try:
+        estados = acao(ler_ou_vazio)
+        escritor.enfileirar_lote([(df, arquivo) for arquivo, df, _ in estados])
+        operacao = estados[0][2]
+        st.success(f"✅ {operacao['descricao'] or 'Operação'} ({', '.join(arquivo for arquivo, _, _ in estados)})")
+    except Exception as e:
+        st.error(f"❌ Não foi possível aplicar: {e}")
+
+indice_busca = obter_busca(escritor)
+
+# Livro razão com todos os conjuntos: métricas de destaque das abas em uma única passada
+razao = obter_razao(escritor, ler_ou_vazio)
+
+# Série do patrimônio líquido: cada gravação soma/estorna só as linhas alteradas
+patrimonio = obter_patrimonio(escritor, ler_ou_vazio)
+
+# Arquivos de dados e catálogo de backups alterados por fora do app ou por outra sessão
+observador = obter_observador(escritor, ao_alterar=[indice_busca.descartar, indice_duplicados.descartar])
+
+def verificar_duplicado(novo, file_path):
+    """Consulta o índice de duplicados antes de inserir; retorna False se a inserção deve ser bloqueada"""
+    try:
+        duplicado = indice_duplicados.contem(file_path, novo, ler_ou_vazio)
+    except Exception as e:
+        st.warning(f"⚠️ Não foi possível verificar duplicados: {e}")
+        return True
+    if not duplicado.any():
+        return True
+    if POLITICA_DUPLICADOS == "rejeitar":
+        st.warning(f"⚠️ Registro idêntico já existe em {file_path} - inserção ignorada.")
+        return False
+    st.warning(f"⚠️ Registro idêntico já existe em {file_path} - registrado mesmo assim.")
+    return True
+
+totais_orcamento = obter_totais()
+
+def alertar_orcamentos(df_antes, novas):
+    """Atualiza os totais do orçamento com as despesas novas e alerta os limites estourados"""
+    try:
+        afetadas = totais_orcamento.registrar(df_antes, novas, escritor.versao(despesas_path))
+        estouros = totais_orcamento.estouros(afetadas, limites(load_csv_data(ORCAMENTOS_PATH)))
+    except Exception as e:
+        st.warning(f"⚠️ Não foi possível atualizar os orçamentos: {e}")
+        return
+    for estouro in estouros:
+        st.warning(f"🚨 Orçamento de {estouro['Categoria']} ({estouro['Membro']}) estourado em {estouro['Mes']}: "
+                   f"R$ {estouro['Gasto']:,.2f} de R$ {estouro['Limite']:,.2f}")
+
+detector_anomalias = obter_detector()
+
+def alertar_anomalias(df_antes, novas):
+    """Avalia as despesas novas contra o padrão da categoria/membro e alerta as fora do padrão"""
+    try:
+        anomalas = detector_anomalias.registrar(df_antes, novas, escritor.versao(despesas_path))
+    except Exception as e:
+        st.warning(f"⚠️ Não foi possível avaliar o padrão de gastos: {e}")
+        return
+    for _, anomala in anomalas.iterrows():
+        st.warning(f"🚨 Gasto fora do padrão: {anomala['Categoria']} ({anomala['Membro']}) R$ {anomala['Valor']:,.2f}, "
+                   f"média recente R$ {anomala['Media']:,.2f}")
+
+# Erros de gravações feitas em segundo plano desde a última execução
+for caminho_erro, erro in escritor.consumir_erros():
+    st.error(f"❌ Erro ao salvar {caminho_erro}: {erro}")
+    st.warning("⚠️ O arquivo foi restaurado do backup; a alteração continua em memória e será gravada na próxima tentativa")
 
 # Caminhos dos arquivos
 renda_path = 'data/familia.csv'
@@ -318,26 +352,43 @@ emprestimos_path = 'data/emprestimos.csv'
 
 
 # ============================
-# Título e Controles
+# Controles do cabeçalho
 # ============================
-col_title, col_backup, col_refresh = st.columns([3, 1, 1])
-with col_title:
-    st.title("Registro Financeiro")
 with col_backup:
-    if st.button("💾 Backup", help="Criar backup dos dados"):
+    if pediu_backup:
         if criar_backup():
             st.balloons()
 with col_refresh:
-    if st.button("🔄 Atualizar", help="Atualizar dados exibidos"):
-        st.session_state.refresh_data = True
-        st.success("Dados atualizados! ✅")
+    if pediu_atualizar:
+        # Só os conjuntos alterados desde a última verificação são relidos
+        alterados = observador.verificar()
+        for caminho_alterado in alterados:
+            area.descartar(caminho_alterado)
+        st.success(f"Dados atualizados! ✅ ({len(alterados)} arquivo(s) alterado(s))" if alterados
+                   else "Dados atualizados! ✅ (nenhuma alteração)")
+
+# Busca global: índice invertido mantido a cada gravação, por prefixo e sem acentos
+consulta_busca = st.text_input("🔎 Buscar em todos os registros", placeholder="Ex.: sara alimentacao, renegoc, 2025-09",
+                               key="busca_global")
+if consulta_busca.strip():
+    inicio_busca = time.perf_counter()
+    resultados_busca = indice_busca.buscar(consulta_busca, ler_ou_vazio)
+    st.caption(f"{sum(qtd for qtd, _ in resultados_busca.values())} registros em "
+               f"{(time.perf_counter() - inicio_busca) * 1000:.1f} ms")
+    for conjunto_busca, (qtd_busca, df_busca) in resultados_busca.items():
+        st.write(f"**{conjunto_busca}.csv** - {qtd_busca} registros" + (f" (mostrando {len(df_busca)})" if qtd_busca > len(df_busca) else ""))
+        st.dataframe(df_busca, use_container_width=True)
+    if not resultados_busca:
+        st.info("Nenhum registro encontrado.")
 
 # Informações de backup e exportação
 backup_dir = Path("data/backups")
-if backup_dir.exists():
-    backups = list(backup_dir.glob("*.csv"))
-    if backups:
-        with st.expander("📋 Gerenciamento de Backup e Dados"):
+# Só verifica se existe algum backup; a listagem e o diff da restauração rodam com o expander aberto
+if backup_dir.exists() and next(backup_dir.glob("*.csv"), None) is not None:
+    expander_backup = st.expander("📋 Gerenciamento de Backup e Dados", key="expander_backup", on_change="rerun")
+    with expander_backup:
+        if expander_backup.open:
+            backups = list(backup_dir.glob("*.csv"))
             col_info, col_export = st.columns(2)
             
             with col_info:
@@ -357,13 +408,16 @@ if backup_dir.exists():
                     try:
                         # Criar ZIP com todos os dados
                         import zipfile
+                        escritor.aguardar()
                         timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
                         zip_name = f"dados_completos_{timestamp}.zip"
                         
                         with zipfile.ZipFile(zip_name, 'w') as zipf:
                             for arquivo in ["horas.csv", "familia.csv", "despesas.csv", "investimentos.csv", "emprestimos.csv"]:
                                 arquivo_path = f"data/{arquivo}"
-                                if Path(arquivo_path).exists():
+                                if particionado(arquivo_path):
+                                    zipf.writestr(arquivo, csv_texto(arquivo_path))
+                                elif Path(arquivo_path).exists():
                                     zipf.write(arquivo_path, arquivo)
                         
                         with open(zip_name, "rb") as file:
@@ -380,630 +434,949 @@ if backup_dir.exists():
                     except Exception as e:
                         st.error(f"❌ Erro ao exportar dados: {e}")
                 
-                st.write("**📥 Restaurar Dados**")
-                st.info("⚠️ Para restaurar dados, substitua manualmente os arquivos CSV na pasta `data/`")
+            # Restauração: diff por linha entre um snapshot e os dados atuais, aplicado pelo caminho normal de gravação
+            st.write("**📥 Restaurar Dados**")
+            df_backups = listar_backups()
+            if df_backups.empty:
+                st.info("Nenhum snapshot de conjunto encontrado em `data/backups/`.")
+            else:
+                opcoes_backup = [f"{row['Arquivo']} - {row['Momento'].strftime('%d/%m/%Y %H:%M')}" for _, row in df_backups.iterrows()]
+                backup_escolhido = df_backups.iloc[opcoes_backup.index(st.selectbox("Snapshot:", opcoes_backup, key="backup_restaurar"))]
+                destino_path = f"data/{backup_escolhido['Conjunto']}.csv"
+                # Os dois lados normalizados como o escritor grava (centavos exatos, mesmos tipos)
+                df_snapshot = compactar(pd.read_csv(backup_escolhido['Caminho']), destino_path)
+                df_destino = compactar(ler_ou_vazio(destino_path), destino_path)
+                diff_backup = diferenca(df_destino, df_snapshot, backup_escolhido['Conjunto'])
+                
+                col_add, col_rem, col_alt = st.columns(3)
+                col_add.metric("➕ Adicionadas desde o backup", len(diff_backup['adicionadas']))
+                col_rem.metric("➖ Removidas desde o backup", len(diff_backup['removidas']))
+                col_alt.metric("✏️ Alteradas", len(diff_backup['alteradas_atual']))
+                if diff_backup['colunas_adicionadas'] or diff_backup['colunas_removidas']:
+                    st.caption(f"Colunas novas: {diff_backup['colunas_adicionadas']} | colunas só no backup: {diff_backup['colunas_removidas']}")
+                
+                # Expanders não podem ser aninhados: a prévia fica atrás de um checkbox
+                if st.checkbox("👀 Mostrar prévia das diferenças", key="previa_restaurar"):
+                    st.write("Adicionadas (serão removidas ao restaurar):")
+                    st.dataframe(df_destino.iloc[diff_backup['adicionadas'][:200]])
+                    st.write("Removidas (voltarão ao restaurar):")
+                    st.dataframe(df_snapshot.iloc[diff_backup['removidas'][:200]])
+                    st.write("Alteradas - valores atuais e do backup:")
+                    st.dataframe(df_destino.iloc[diff_backup['alteradas_atual'][:200]])
+                    st.dataframe(df_snapshot.iloc[diff_backup['alteradas_backup'][:200]])
+                
+                partes_restaurar = st.multiselect("Restaurar:", list(PARTES_RESTAURACAO), default=list(PARTES_RESTAURACAO),
+                                                  key="partes_restaurar", help="Com todas as partes, o arquivo volta exatamente ao backup")
+                if st.button("♻️ Restaurar Selecionado", key="btn_restaurar_backup", disabled=not partes_restaurar):
+                    df_restaurado = restaurar(df_destino, df_snapshot, diff_backup, partes_restaurar)
+                    save_csv_data(df_restaurado, destino_path, f"✅ {destino_path} restaurado de {backup_escolhido['Arquivo']}!")
 else:
     with st.expander("📋 Gerenciamento de Backup"):
         st.info("💡 Crie seu primeiro backup clicando no botão 'Backup' acima.")
-    
+
+# Relatório de lançamentos repetidos já gravados (mesmos campos-chave normalizados)
+expander_duplicados = st.expander("🧹 Relatório de Duplicados", key="expander_duplicados", on_change="rerun")
+with expander_duplicados:
+    if expander_duplicados.open:
+        for nome_conjunto in CAMPOS_CHAVE:
+            conjunto_path = f"data/{nome_conjunto}.csv"
+            if not escritor.existe(conjunto_path):
+                continue
+            df_conjunto = load_csv_data(conjunto_path)
+            df_repetidos = relatorio_duplicados(df_conjunto, conjunto_path)
+            if df_repetidos.empty:
+                st.write(f"✅ **{nome_conjunto}.csv**: nenhum duplicado")
+                continue
+            st.write(f"⚠️ **{nome_conjunto}.csv**: {len(df_repetidos)} linhas em {df_repetidos['Grupo'].nunique()} grupos repetidos")
+            st.dataframe(df_repetidos, use_container_width=True, hide_index=True)
+            if st.button(f"🗑️ Manter só a primeira ocorrência em {nome_conjunto}.csv", key=f"dedup_{nome_conjunto}"):
+                df_limpo, n_removidos = remover_duplicados(df_conjunto, conjunto_path)
+                save_csv_data(df_limpo, conjunto_path, f"✅ {n_removidos} duplicados removidos de {nome_conjunto}.csv!")
+                st.rerun()
+
+# Histórico de alterações: desfazer/refazer e volta de um conjunto a um ponto anterior
+with st.expander("🕘 Histórico de Alterações"):
+    col_desfazer, col_refazer = st.columns(2)
+    with col_desfazer:
+        if st.button("↩️ Desfazer", key="btn_desfazer", disabled=not historico.pode_desfazer()):
+            aplicar_historico(historico.desfazer)
+    with col_refazer:
+        if st.button("↪️ Refazer", key="btn_refazer", disabled=not historico.pode_refazer()):
+            aplicar_historico(historico.refazer)
+    df_operacoes = historico.recentes()
+    if not df_operacoes.empty:
+        st.dataframe(df_operacoes, use_container_width=True, hide_index=True)
+        opcoes_operacoes = [f"#{row['Id']} - {row['Momento']} - {row['Arquivo']} - {row['Descricao']}" for _, row in df_operacoes.iterrows()]
+        operacao_escolhida = st.selectbox("Voltar o arquivo para antes da operação:", opcoes_operacoes, key="operacao_historico")
+        if st.button("⏪ Voltar para este ponto", key="btn_voltar_ponto"):
+            id_escolhido = int(df_operacoes['Id'].iloc[opcoes_operacoes.index(operacao_escolhida)])
+            try:
+                arquivo_ponto, df_ponto = historico.estado_antes(id_escolhido, ler_ou_vazio)
+                save_csv_data(df_ponto, arquivo_ponto, f"✅ {arquivo_ponto} restaurado para antes da operação #{id_escolhido}")
+            except Exception as e:
+                st.error(f"❌ Não foi possível voltar: {e}")
+    else:
+        st.info("Nenhuma alteração registrada ainda.")
+
+# Política de gravação (vale para o processo todo: o escritor é compartilhado entre as sessões)
+ROTULOS_POLITICA = {'imediata': "Imediata", 'adiada': f"Agrupada ({JANELA_ESCRITA_SEGUNDOS}s)", 'manual': "Manual"}
+sujos = escritor.sujos()
+# O widget reflete a política atual do processo (outra sessão pode tê-la mudado) e só a altera
+# quando o próprio usuário escolhe outra opção
+st.session_state.politica_gravacao = escritor.politica
+with st.expander(f"💾 Gravação{f' - {len(sujos)} arquivo(s) não gravado(s)' if sujos else ''}"):
+    st.radio("Quando gravar as alterações no disco:", POLITICAS, format_func=ROTULOS_POLITICA.get,
+             horizontal=True, key="politica_gravacao",
+             on_change=lambda: escritor.definir_politica(st.session_state.politica_gravacao))
+    if sujos:
+        st.write("Alterações só em memória: " + ", ".join(f"`{c}` (v{v})" for c, v in sujos.items()))
+        if st.button("💾 Gravar agora", key="btn_gravar_pendentes"):
+            if escritor.aguardar(timeout=30):
+                st.success("✅ Alterações gravadas no disco!")
+            elif escritor.falhas():
+                for caminho_falha, erro in escritor.falhas().items():
+                    st.error(f"❌ Erro ao salvar {caminho_falha}: {erro}")
+            else:
+                st.error("❌ Tempo esgotado aguardando a gravação")
+    else:
+        st.caption("Tudo gravado no disco.")
+    if st.button("🧹 Ordenar e limpar arquivos", key="btn_manutencao",
+                 help="Regrava os conjuntos ordenados por data, remove restos de gravações e reconstrói os índices"):
+        try:
+            mensagens_manutencao = executar_manutencao(escritor=escritor)
+        except Exception as e:
+            st.error(f"❌ Erro na manutenção: {e}")
+        else:
+            area.descartar()
+            st.success("✅ Manutenção concluída!")
+            st.caption(" · ".join(mensagens_manutencao))
+
+# Resumo anual para a declaração: todos os anos calculados de uma vez e guardados pela versão dos dados
+expander_irpf = st.expander("🧾 Resumo IRPF", key="expander_irpf", on_change="rerun")
+with expander_irpf:
+    if expander_irpf.open:
+        caminhos_irpf = {nome: f"data/{nome}.csv" for nome in ['familia', 'horas', 'investimentos', 'emprestimos']}
+        resumos_irpf = obter_resumos().obter(
+            tuple(escritor.versao(p) for p in caminhos_irpf.values()),
+            {nome: load_csv_data(p) if escritor.existe(p) else pd.DataFrame(columns=get_default_columns(p))
+             for nome, p in caminhos_irpf.items()})
+        if not resumos_irpf:
+            st.info("Nenhum lançamento com data para montar o resumo.")
+        else:
+            anos_irpf = sorted(resumos_irpf, reverse=True)
+            ano_irpf = st.selectbox("Ano-calendário:", anos_irpf, index=min(1, len(anos_irpf) - 1), key="ano_irpf")
+            resumo_irpf = resumos_irpf[ano_irpf]
+            st.dataframe(totais_irpf(resumo_irpf), use_container_width=True, hide_index=True)
+            for secao in SECOES_IRPF:
+                linhas_secao = resumo_irpf['linhas'][resumo_irpf['linhas']['Secao'] == secao]
+                if not linhas_secao.empty:
+                    st.write(f"**{secao}**")
+                    st.dataframe(linhas_secao.drop(columns='Secao'), use_container_width=True, hide_index=True)
+            if not resumo_irpf['exterior_mensal'].empty:
+                st.write("**Carnê-Leão mês a mês**")
+                st.dataframe(resumo_irpf['exterior_mensal'], use_container_width=True, hide_index=True)
+            st.download_button("⬇️ Baixar resumo (CSV)", resumo_irpf['linhas'].assign(Ano=ano_irpf).to_csv(index=False),
+                               file_name=f"irpf_{ano_irpf}.csv", mime="text/csv", key="baixar_irpf")
+            st.caption(f"Relatório completo (CSV, JSON e HTML): `python src/irpf.py --ano {ano_irpf}`")
+
+# Importação de históricos grandes: lida e gravada em blocos, acrescentando ao fim do conjunto
+with st.expander("📥 Importar Histórico"):
+    arquivo_historico = st.file_uploader("CSV do histórico (planilha antiga ou exportação de outro app)", type=["csv"],
+                                         key="upload_historico")
+    col_imp1, col_imp2 = st.columns(2)
+    with col_imp1:
+        conjunto_importacao = st.selectbox("Conjunto de destino:", CONJUNTOS, index=CONJUNTOS.index('despesas'),
+                                           key="conjunto_importacao")
+    with col_imp2:
+        sem_duplicados_importacao = st.checkbox("Ignorar lançamentos que já existem", value=True,
+                                                key="importacao_sem_duplicados")
+    st.caption("Para arquivos muito grandes, use `python src/importacao.py`.")
+    if arquivo_historico is not None and st.button("📥 Importar", key="btn_importar_historico"):
+        destino_importacao = f"data/{conjunto_importacao}.csv"
+        barra_importacao = st.progress(0.0, text="Importando...")
+        try:
+            # A importação acrescenta direto ao arquivo: o pendente vai para o disco antes e as
+            # outras sessões não gravam o conjunto até ela terminar
+            with escritor.exclusivo(destino_importacao, timeout=30):
+                resumo_importacao = importar(
+                    arquivo_historico, conjunto_importacao, pular_duplicados=sem_duplicados_importacao,
+                    historico=historico,
+                    progresso=lambda lidos, total, linhas: barra_importacao.progress(
+                        min(lidos / total, 1.0) if total else 1.0, text=f"{linhas} linhas importadas"))
+        except ErroImportacao as e:
+            st.error(f"❌ {e}")
+        except Exception as e:
+            st.error(f"❌ Erro na importação (nada foi gravado): {e}")
+        else:
+            area.descartar()
+            df_importado = load_csv_data(destino_importacao)
+            indice_duplicados.sincronizar(destino_importacao, df_importado)
+            indice_busca.atualizar(destino_importacao, df_importado)
+            st.success(f"✅ {resumo_importacao['importadas']} de {resumo_importacao['lidas']} linhas importadas em "
+                       f"{conjunto_importacao}.csv ({resumo_importacao['rejeitadas']} rejeitadas, "
+                       f"{resumo_importacao['duplicadas']} duplicadas)")
+            if resumo_importacao['ignoradas']:
+                st.caption(f"Colunas ignoradas: {', '.join(resumo_importacao['ignoradas'])}")
+            if 'aviso' in resumo_importacao:
+                st.warning(f"⚠️ {resumo_importacao['aviso'].capitalize()}")
+
 st.divider()
 
 # ============================
 # Abas do Dashboard
 # ============================
-abas = st.tabs(["Ganhos", "Renda", "Despesas", "Investimentos", "Empréstimos"])
+# Só a aba selecionada é executada (on_change="rerun"): gráficos e tabelas das outras não são montados
+abas = st.tabs(["Ganhos", "Renda", "Despesas", "Investimentos", "Empréstimos", "Patrimônio"], key="aba_principal", on_change="rerun")
 
 # ============================
 # Aba 1 – Ganhos Profissionais
 # ============================
 
 with abas[0]:
-    subabas = st.tabs(["Freelancer", "CLT"])
+    if abas[0].open:
+        subabas = st.tabs(["Freelancer", "CLT"], key="subaba_ganhos", on_change="rerun")
 
-    # --- Freelancer ---
-    with subabas[0]:
-        st.subheader(" Ganhos Freelancer")
+        # --- Freelancer ---
+        with subabas[0]:
+            if subabas[0].open:
+                st.subheader(" Ganhos Freelancer")
         
-        df_horas = load_csv_data('data/horas.csv')
-        # Garantir que a coluna 'Pago' existe
-        if 'Pago' not in df_horas.columns:
-            df_horas['Pago'] = False
-        def ajustar(valor, nota):
-            return valor * 1.2 if nota == 4 else valor if nota == 3 else valor * 0.5 if nota == 2 else 0
-        with st.form("form_freela"):
-            data = st.date_input("Data")
-            horas = st.number_input("Horas Trabalhadas", min_value=0.0, step=0.5)
-            cotacao = st.number_input("Cotação do Dólar", min_value=0.0, step=0.01)
-            semana = st.text_input("Semana")
-            nota = st.selectbox("Nota de Qualidade (1 a 4)", [4,3,2,1])
-            enviar = st.form_submit_button("Registrar ganho semanal")
-            if enviar:
-                valor_usd = horas * 30
-                valor_brl = valor_usd * cotacao
-                valor_ajustado_usd = ajustar(valor_usd, nota)
-                valor_ajustado_brl = valor_ajustado_usd * cotacao
-                novo = pd.DataFrame({
-                    "Data": [data],
-                    "Horas": [horas],
-                    "Valor_USD": [valor_usd],
-                    "Cotacao": [cotacao],
-                    "Valor_BRL": [valor_brl],
-                    "Semana": [semana],
-                    "Nota": [nota],
-                    "Valor_Ajustado_USD": [valor_ajustado_usd],
-                    "Valor_Ajustado_BRL": [valor_ajustado_brl],
-                    "Pago": [False]
-                })
-                df_horas = safe_concat(df_horas, novo)
-                save_csv_data(df_horas, 'data/horas.csv', "✅ Ganho registrado e salvo!")
+                df_horas = load_csv_data('data/horas.csv')
+                # Garantir que a coluna 'Pago' existe
+                if 'Pago' not in df_horas.columns:
+                    df_horas['Pago'] = False
+                # Série local de cotações (a última cotação vira o valor padrão do formulário)
+                df_cotacoes = normalizar_cotacoes(load_csv_data(COTACOES_PATH))
+                ultima_cotacao = float(df_cotacoes['Cotacao'].iloc[-1]) if not df_cotacoes.empty else 0.0
+                def ajustar(valor, nota):
+                    return valor * 1.2 if nota == 4 else valor if nota == 3 else valor * 0.5 if nota == 2 else 0
+                with st.form("form_freela"):
+                    data = st.date_input("Data")
+                    horas = st.number_input("Horas Trabalhadas", min_value=0.0, step=0.5)
+                    cotacao = st.number_input("Cotação do Dólar", min_value=0.0, step=0.01, value=ultima_cotacao)
+                    semana = st.text_input("Semana")
+                    nota = st.selectbox("Nota de Qualidade (1 a 4)", [4,3,2,1])
+                    enviar = st.form_submit_button("Registrar ganho semanal")
+                    if enviar:
+                        valor_usd = horas * 30
+                        valor_brl = valor_usd * cotacao
+                        valor_ajustado_usd = ajustar(valor_usd, nota)
+                        valor_ajustado_brl = valor_ajustado_usd * cotacao
+                        novo = pd.DataFrame({
+                            "Data": [data],
+                            "Horas": [horas],
+                            "Valor_USD": [valor_usd],
+                            "Cotacao": [cotacao],
+                            "Valor_BRL": [valor_brl],
+                            "Semana": [semana],
+                            "Nota": [nota],
+                            "Valor_Ajustado_USD": [valor_ajustado_usd],
+                            "Valor_Ajustado_BRL": [valor_ajustado_brl],
+                            "Pago": [False]
+                        })
+                        if verificar_duplicado(novo, 'data/horas.csv'):
+                            df_horas = safe_concat(df_horas, novo)
+                            save_csv_data(df_horas, 'data/horas.csv', "✅ Ganho registrado e salvo!")
         
-        if not df_horas.empty and 'Valor_Ajustado_BRL' in df_horas.columns:
-            # Métricas de Efetivo vs Projeção
-            st.subheader("📊 Resumo Financeiro")
-            total_recebido = df_horas[df_horas['Pago'] == True]['Valor_Ajustado_BRL'].sum()
-            total_projecao = df_horas[df_horas['Pago'] == False]['Valor_Ajustado_BRL'].sum()
-            total_geral = total_recebido + total_projecao
+                if not df_horas.empty and 'Valor_Ajustado_BRL' in df_horas.columns:
+                    # Métricas de Efetivo vs Projeção
+                    st.subheader("📊 Resumo Financeiro")
+                    metricas = razao.atual().metricas()
+                    total_recebido = metricas['freela_pago']
+                    total_projecao = metricas['freela_pendente']
+                    total_geral = total_recebido + total_projecao
             
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("💰 Total Recebido", f"R$ {total_recebido:,.2f}")
-            with col2:
-                st.metric("📈 Projeção Pendente", f"R$ {total_projecao:,.2f}")
-            with col3:
-                st.metric("🎯 Total Geral", f"R$ {total_geral:,.2f}")
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("💰 Total Recebido", f"R$ {total_recebido:,.2f}")
+                    with col2:
+                        st.metric("📈 Projeção Pendente", f"R$ {total_projecao:,.2f}")
+                    with col3:
+                        st.metric("🎯 Total Geral", f"R$ {total_geral:,.2f}")
             
-            # Resumo semanal
-            df_horas['Data'] = pd.to_datetime(df_horas['Data'], errors='coerce')
-            resumo = df_horas.groupby('Semana').agg(
-                Periodo=('Data', lambda x: f"{x.min().date()} a {x.max().date()}"),
-                Total_Horas=('Horas', 'sum'),
-                Total_USD=('Valor_USD', 'sum'),
-                Total_Ajustado_USD=('Valor_Ajustado_USD', 'sum'),
-                Total_BRL=('Valor_BRL', 'sum'),
-                Total_Ajustado_BRL=('Valor_Ajustado_BRL', 'sum')
-            ).reset_index()
-            # Gráfico de barras: ganhos semanais em BRL (considerando nota)
-            st.subheader(" Ganhos Semanais Ajustados por Qualidade")
-            fig_barras = px.bar(resumo, x='Semana', y='Total_Ajustado_BRL', color='Total_Ajustado_BRL',
-                               color_continuous_scale='turbo',
-                               title='Ganhos Semanais Ajustados por Qualidade (BRL)', text_auto=True)
-            st.plotly_chart(fig_barras, use_container_width=True)
-            # Gráfico de linha: evolução da qualidade
-            st.subheader(" Evolução da Qualidade (Nota Média)")
-            media_nota = df_horas.groupby('Semana')['Nota'].mean().reset_index()
-            fig_qualidade = px.line(media_nota, x='Semana', y='Nota', markers=True,
-                                    title='Média das Notas por Semana')
-            fig_qualidade.update_traces(line_color='#1DE9B6', marker_color='#1DE9B6')
-            st.plotly_chart(fig_qualidade, use_container_width=True)
-            # Formatação condicional
-            st.subheader("Resumo Semanal")
-            # Formatação condicional - usar valor ajustado para destacar maior ganho
-            semana_maior_ganho = resumo.loc[resumo['Total_Ajustado_BRL'].idxmax(), 'Semana'] if not resumo.empty else None
-            def highlight_maior_ganho(row):
-                color = 'background-color: #1DE9B6; color: #181C2F; font-weight: bold;' if row['Semana'] == semana_maior_ganho else ''
-                return [color]*len(row)
-            st.dataframe(resumo.style.apply(highlight_maior_ganho, axis=1).format({
-                'Total_Horas': '{:.1f}h',
-                'Total_USD': 'US$ {:.2f}',
-                'Total_Ajustado_USD': 'US$ {:.2f}',
-                'Total_BRL': 'R$ {:.2f}',
-                'Total_Ajustado_BRL': 'R$ {:.2f}'
-            }))
-            st.subheader("Detalhamento dos Lançamentos")
-            def highlight_nota_4(row):
-                return ['background-color: #1DE9B6; color: #181C2F; font-weight: bold;' if row.get('Nota',0)==4 else '' for _ in row]
-            st.dataframe(df_horas.style.apply(highlight_nota_4, axis=1).format({
-                'Horas': '{:.1f}h',
-                'Cotacao': 'R$ {:.2f}',
-                'Valor_USD': 'US$ {:.2f}',
-                'Valor_BRL': 'R$ {:.2f}',
-                'Valor_Ajustado_USD': 'US$ {:.2f}',
-                'Valor_Ajustado_BRL': 'R$ {:.2f}',
-                'Pago': lambda x: '💰 Recebido' if x else '📈 Projeção'
-            }))
+                    # Análises (semanas, meses, R$/hora, atraso, previsão) guardadas pela versão do arquivo
+                    analise_freela = obter_analises().obter(escritor.versao('data/horas.csv'), df_horas)
+                    resumo = analise_freela['semanal']
+                    atraso_freela = analise_freela['atraso']
+                    col_ind1, col_ind2, col_ind3 = st.columns(3)
+                    with col_ind1:
+                        st.metric("⏱️ R$/hora efetivo", f"R$ {analise_freela['brl_hora']:,.2f}",
+                                  help="Ganho ajustado pela nota dividido pelas horas trabalhadas")
+                    with col_ind2:
+                        st.metric("⌛ Atraso médio de pagamento",
+                                  f"{atraso_freela['atraso_medio']:.0f} dias" if atraso_freela['atraso_medio'] is not None else "-",
+                                  help=f"{atraso_freela['pagos_com_data']} recebimentos com data registrada")
+                    with col_ind3:
+                        previsao_freela = analise_freela['previsao']
+                        st.metric(f"🔮 Previsão próximas {len(previsao_freela)} semanas",
+                                  f"R$ {previsao_freela['Previsao_BRL'].sum():,.2f}",
+                                  help="Média das últimas semanas; semanas sem registro contam como zero")
+                    if atraso_freela['pendente_mais_antigo'] is not None:
+                        st.caption(f"{atraso_freela['pendentes']} pendentes - o mais antigo há {atraso_freela['pendente_mais_antigo']} dias")
+                    df_horas['Data'] = pd.to_datetime(df_horas['Data'], errors='coerce')
+                    # Gráfico de barras: ganhos semanais em BRL (considerando nota)
+                    st.subheader(" Ganhos Semanais Ajustados por Qualidade")
+                    fig_barras = graficos().bar(resumo, x='Semana', y='Total_Ajustado_BRL', color='Total_Ajustado_BRL',
+                                       color_continuous_scale='turbo',
+                                       title='Ganhos Semanais Ajustados por Qualidade (BRL)', text_auto=True)
+                    st.plotly_chart(fig_barras, use_container_width=True)
+                    # Gráfico de linha: evolução da qualidade
+                    st.subheader(" Evolução da Qualidade (Nota Média)")
+                    fig_qualidade = graficos().line(resumo, x='Semana', y=['Nota_Media', 'Qualidade_Movel'], markers=True,
+                                            title='Média das Notas por Semana',
+                                            color_discrete_sequence=['#1DE9B6', '#FFA726'])
+                    st.plotly_chart(fig_qualidade, use_container_width=True)
+                    # Formatação condicional
+                    st.subheader("Resumo Semanal")
+                    # Formatação condicional - usar valor ajustado para destacar maior ganho
+                    semana_maior_ganho = resumo.loc[resumo['Total_Ajustado_BRL'].idxmax(), 'Semana'] if not resumo.empty else None
+                    def highlight_maior_ganho(row):
+                        color = 'background-color: #1DE9B6; color: #181C2F; font-weight: bold;' if row['Semana'] == semana_maior_ganho else ''
+                        return [color]*len(row)
+                    st.dataframe(resumo.style.apply(highlight_maior_ganho, axis=1).format({
+                        'Total_Horas': '{:.1f}h',
+                        'Total_USD': 'US$ {:.2f}',
+                        'Total_Ajustado_USD': 'US$ {:.2f}',
+                        'Total_BRL': 'R$ {:.2f}',
+                        'Total_Ajustado_BRL': 'R$ {:.2f}',
+                        'Nota_Media': '{:.2f}',
+                        'BRL_Hora': 'R$ {:.2f}/h',
+                        'Qualidade_Movel': '{:.2f}'
+                    }))
+                    st.subheader("Detalhamento dos Lançamentos")
+                    def highlight_nota_4(row):
+                        return ['background-color: #1DE9B6; color: #181C2F; font-weight: bold;' if row.get('Nota',0)==4 else '' for _ in row]
+                    st.dataframe(df_horas.style.apply(highlight_nota_4, axis=1).format({
+                        'Horas': '{:.1f}h',
+                        'Cotacao': 'R$ {:.2f}',
+                        'Valor_USD': 'US$ {:.2f}',
+                        'Valor_BRL': 'R$ {:.2f}',
+                        'Valor_Ajustado_USD': 'US$ {:.2f}',
+                        'Valor_Ajustado_BRL': 'R$ {:.2f}',
+                        'Pago': lambda x: '💰 Recebido' if x else '📈 Projeção'
+                    }))
             
-            # Controles de pagamento e exclusão
-            st.subheader("🔧 Gerenciar Registros")
-            col1, col2 = st.columns(2)
+                    # Controles de pagamento e exclusão
+                    st.subheader("🔧 Gerenciar Registros")
+                    col1, col2 = st.columns(2)
             
-            with col1:
-                st.write("**💰 Marcar como Recebido com Nota Real:**")
-                if not df_horas.empty:
-                    opcoes_pagamento = []
-                    indices_pagamento = []
-                    for idx, row in df_horas.iterrows():
-                        status = "💰 Recebido" if row.get('Pago', False) else "📈 Projeção"
-                        opcoes_pagamento.append(f"Semana {row['Semana']} - {row['Data']} - Nota: {row['Nota']} ({status})")
-                        indices_pagamento.append(idx)
+                    with col1:
+                        st.write("**💰 Marcar como Recebido com Nota Real:**")
+                        if not df_horas.empty:
+                            opcoes_pagamento = []
+                            indices_pagamento = []
+                            for idx, row in df_horas.iterrows():
+                                status = "💰 Recebido" if row.get('Pago', False) else "📈 Projeção"
+                                opcoes_pagamento.append(f"Semana {row['Semana']} - {row['Data']} - Nota: {row['Nota']} ({status})")
+                                indices_pagamento.append(idx)
                     
-                    registro_pagamento = st.selectbox("Selecione o registro:", opcoes_pagamento, key="select_pagamento")
-                    idx_selecionado = indices_pagamento[opcoes_pagamento.index(registro_pagamento)]
-                    registro_atual = df_horas.loc[idx_selecionado]
+                            registro_pagamento = st.selectbox("Selecione o registro:", opcoes_pagamento, key="select_pagamento")
+                            idx_selecionado = indices_pagamento[opcoes_pagamento.index(registro_pagamento)]
+                            registro_atual = df_horas.loc[idx_selecionado]
                     
-                    # Mostrar informações atuais
-                    col_info1, col_info2 = st.columns(2)
-                    with col_info1:
-                        st.info(f"Nota atual: **{registro_atual['Nota']}**")
-                    with col_info2:
-                        valor_atual = registro_atual.get('Valor_Ajustado_BRL', 0)
-                        st.info(f"Valor atual: **R$ {valor_atual:.2f}**")
+                            # Mostrar informações atuais
+                            col_info1, col_info2 = st.columns(2)
+                            with col_info1:
+                                st.info(f"Nota atual: **{registro_atual['Nota']}**")
+                            with col_info2:
+                                valor_atual = registro_atual.get('Valor_Ajustado_BRL', 0)
+                                st.info(f"Valor atual: **R$ {valor_atual:.2f}**")
                     
-                    # Interface para ajustar
-                    if not registro_atual.get('Pago', False):  # Só mostrar se for projeção
-                        st.write("**Ajustar nota real recebida:**")
-                        nova_nota = st.selectbox("Nota real recebida:", [4, 3, 2, 1], 
-                                                index=[4, 3, 2, 1].index(int(registro_atual['Nota'])), 
-                                                key="nova_nota",
-                                                help="4=Excelente (+20%), 3=Bom (normal), 2=Regular (-50%), 1=Ruim (R$0)")
+                            # Interface para ajustar
+                            if not registro_atual.get('Pago', False):  # Só mostrar se for projeção
+                                st.write("**Ajustar nota real recebida:**")
+                                nova_nota = st.selectbox("Nota real recebida:", [4, 3, 2, 1], 
+                                                        index=[4, 3, 2, 1].index(int(registro_atual['Nota'])), 
+                                                        key="nova_nota",
+                                                        help="4=Excelente (+20%), 3=Bom (normal), 2=Regular (-50%), 1=Ruim (R$0)")
                         
-                        # Calcular novo valor
-                        def ajustar_nota(valor_base, nota):
-                            return valor_base * 1.2 if nota == 4 else valor_base if nota == 3 else valor_base * 0.5 if nota == 2 else 0
+                                # Calcular novo valor
+                                def ajustar_nota(valor_base, nota):
+                                    return valor_base * 1.2 if nota == 4 else valor_base if nota == 3 else valor_base * 0.5 if nota == 2 else 0
                         
-                        valor_base_usd = registro_atual['Valor_USD']
-                        cotacao = registro_atual['Cotacao']
-                        novo_valor_usd = ajustar_nota(valor_base_usd, nova_nota)
-                        novo_valor_brl = novo_valor_usd * cotacao
+                                valor_base_usd = registro_atual['Valor_USD']
+                                cotacao = registro_atual['Cotacao']
+                                novo_valor_usd = ajustar_nota(valor_base_usd, nova_nota)
+                                novo_valor_brl = novo_valor_usd * cotacao
                         
-                        # Mostrar preview do novo valor
-                        if nova_nota != registro_atual['Nota']:
-                            diferenca = novo_valor_brl - valor_atual
-                            if diferenca > 0:
-                                st.success(f"💰 Novo valor: R$ {novo_valor_brl:.2f} (+R$ {diferenca:.2f})")
-                            else:
-                                st.warning(f"📉 Novo valor: R$ {novo_valor_brl:.2f} ({diferenca:.2f})")
+                                # Mostrar preview do novo valor
+                                if nova_nota != registro_atual['Nota']:
+                                    diferenca = novo_valor_brl - valor_atual
+                                    if diferenca > 0:
+                                        st.success(f"💰 Novo valor: R$ {novo_valor_brl:.2f} (+R$ {diferenca:.2f})")
+                                    else:
+                                        st.warning(f"📉 Novo valor: R$ {novo_valor_brl:.2f} ({diferenca:.2f})")
                         
-                        if st.button("✅ Confirmar Recebimento", key="btn_confirmar_recebimento"):
-                            # Atualizar nota e valores
-                            df_horas.loc[idx_selecionado, 'Nota'] = nova_nota
-                            df_horas.loc[idx_selecionado, 'Valor_Ajustado_USD'] = novo_valor_usd
-                            df_horas.loc[idx_selecionado, 'Valor_Ajustado_BRL'] = novo_valor_brl
-                            df_horas.loc[idx_selecionado, 'Pago'] = True
-                            save_csv_data(df_horas, 'data/horas.csv', f"✅ Marcado como recebido com nota {nova_nota} e salvo!")
+                                if st.button("✅ Confirmar Recebimento", key="btn_confirmar_recebimento"):
+                                    # Atualizar nota e valores
+                                    df_horas.loc[idx_selecionado, 'Nota'] = nova_nota
+                                    df_horas.loc[idx_selecionado, 'Valor_Ajustado_USD'] = novo_valor_usd
+                                    df_horas.loc[idx_selecionado, 'Valor_Ajustado_BRL'] = novo_valor_brl
+                                    df_horas.loc[idx_selecionado, 'Pago'] = True
+                                    df_horas.loc[idx_selecionado, 'Data_Pagamento'] = pd.Timestamp.now().strftime('%Y-%m-%d')
+                                    save_csv_data(df_horas, 'data/horas.csv', f"✅ Marcado como recebido com nota {nova_nota} e salvo!")
                     
-                    else:  # Se já está pago
-                        col_btn1, col_btn2 = st.columns(2)
-                        with col_btn1:
-                            if st.button("📈 Voltar para Projeção", key="btn_voltar_projecao"):
-                                df_horas.loc[idx_selecionado, 'Pago'] = False
-                                save_csv_data(df_horas, 'data/horas.csv', "✅ Voltou para projeção e salvo!")
+                            else:  # Se já está pago
+                                col_btn1, col_btn2 = st.columns(2)
+                                with col_btn1:
+                                    if st.button("📈 Voltar para Projeção", key="btn_voltar_projecao"):
+                                        df_horas.loc[idx_selecionado, 'Pago'] = False
+                                        if 'Data_Pagamento' in df_horas.columns:
+                                            df_horas.loc[idx_selecionado, 'Data_Pagamento'] = None
+                                        save_csv_data(df_horas, 'data/horas.csv', "✅ Voltou para projeção e salvo!")
                         
-                        with col_btn2:
-                            st.write("*Já recebido*")
+                                with col_btn2:
+                                    st.write("*Já recebido*")
             
-            with col2:
-                st.write("**🔧 Outras Opções:**")
+                    with col2:
+                        st.write("**🔧 Outras Opções:**")
                 
-                # Seção para editar notas de registros já pagos
-                st.write("*Editar Nota de Registro Recebido:*")
-                if not df_horas.empty:
-                    registros_pagos = df_horas[df_horas['Pago'] == True]
-                    if not registros_pagos.empty:
-                        opcoes_edicao = []
-                        indices_edicao = []
-                        for idx, row in registros_pagos.iterrows():
-                            opcoes_edicao.append(f"Semana {row['Semana']} - Nota: {row['Nota']}")
-                            indices_edicao.append(idx)
+                        # Seção para editar notas de registros já pagos
+                        st.write("*Editar Nota de Registro Recebido:*")
+                        if not df_horas.empty:
+                            registros_pagos = df_horas[df_horas['Pago'] == True]
+                            if not registros_pagos.empty:
+                                opcoes_edicao = []
+                                indices_edicao = []
+                                for idx, row in registros_pagos.iterrows():
+                                    opcoes_edicao.append(f"Semana {row['Semana']} - Nota: {row['Nota']}")
+                                    indices_edicao.append(idx)
                         
-                        if opcoes_edicao:
-                            registro_edicao = st.selectbox("Editar nota:", opcoes_edicao, key="select_edicao")
-                            idx_edicao = indices_edicao[opcoes_edicao.index(registro_edicao)]
+                                if opcoes_edicao:
+                                    registro_edicao = st.selectbox("Editar nota:", opcoes_edicao, key="select_edicao")
+                                    idx_edicao = indices_edicao[opcoes_edicao.index(registro_edicao)]
                             
-                            nova_nota_edicao = st.selectbox("Nova nota:", [4, 3, 2, 1], 
-                                                          index=[4, 3, 2, 1].index(int(df_horas.loc[idx_edicao, 'Nota'])), 
-                                                          key="nova_nota_edicao")
+                                    nova_nota_edicao = st.selectbox("Nova nota:", [4, 3, 2, 1], 
+                                                                  index=[4, 3, 2, 1].index(int(df_horas.loc[idx_edicao, 'Nota'])), 
+                                                                  key="nova_nota_edicao")
                             
-                            if st.button("✏️ Atualizar Nota", key="btn_editar_nota"):
-                                # Recalcular valores com nova nota
-                                valor_base_usd = df_horas.loc[idx_edicao, 'Valor_USD']
-                                cotacao = df_horas.loc[idx_edicao, 'Cotacao']
-                                novo_valor_usd = ajustar(valor_base_usd, nova_nota_edicao)
-                                novo_valor_brl = novo_valor_usd * cotacao
+                                    if st.button("✏️ Atualizar Nota", key="btn_editar_nota"):
+                                        # Recalcular valores com nova nota
+                                        valor_base_usd = df_horas.loc[idx_edicao, 'Valor_USD']
+                                        cotacao = df_horas.loc[idx_edicao, 'Cotacao']
+                                        novo_valor_usd = ajustar(valor_base_usd, nova_nota_edicao)
+                                        novo_valor_brl = novo_valor_usd * cotacao
                                 
-                                df_horas.loc[idx_edicao, 'Nota'] = nova_nota_edicao
-                                df_horas.loc[idx_edicao, 'Valor_Ajustado_USD'] = novo_valor_usd
-                                df_horas.loc[idx_edicao, 'Valor_Ajustado_BRL'] = novo_valor_brl
-                                save_csv_data(df_horas, 'data/horas.csv', f"✏️ Nota atualizada para {nova_nota_edicao} e salvo!")
-                    else:
-                        st.info("Nenhum registro recebido para editar")
+                                        df_horas.loc[idx_edicao, 'Nota'] = nova_nota_edicao
+                                        df_horas.loc[idx_edicao, 'Valor_Ajustado_USD'] = novo_valor_usd
+                                        df_horas.loc[idx_edicao, 'Valor_Ajustado_BRL'] = novo_valor_brl
+                                        save_csv_data(df_horas, 'data/horas.csv', f"✏️ Nota atualizada para {nova_nota_edicao} e salvo!")
+                            else:
+                                st.info("Nenhum registro recebido para editar")
                 
-                st.divider()
+                        st.divider()
                 
-                # Seção de exclusão
-                st.write("*Excluir Registro:*")
-                if not df_horas.empty:
-                    opcoes_exclusao = []
-                    for idx, row in df_horas.iterrows():
-                        opcoes_exclusao.append(f"Semana {row['Semana']} - {row['Data']} - {row['Horas']}h")
+                        # Seção de exclusão
+                        st.write("*Excluir Registro:*")
+                        if not df_horas.empty:
+                            opcoes_exclusao = []
+                            for idx, row in df_horas.iterrows():
+                                opcoes_exclusao.append(f"Semana {row['Semana']} - {row['Data']} - {row['Horas']}h")
                     
-                    registro_exclusao = st.selectbox("Selecione para excluir:", opcoes_exclusao, key="exclusao_horas")
+                            registro_exclusao = st.selectbox("Selecione para excluir:", opcoes_exclusao, key="exclusao_horas")
                     
-                    if st.button("🗑️ Excluir Registro", type="secondary", key="btn_excluir_horas"):
-                        idx_excluir = opcoes_exclusao.index(registro_exclusao)
-                        df_horas = df_horas.drop(df_horas.index[idx_excluir]).reset_index(drop=True)
-                        save_csv_data(df_horas, 'data/horas.csv', "✅ Registro excluído e salvo!")
-        elif not df_horas.empty:
-            st.info("Ainda não há dados completos para exibir o gráfico. Registre um ganho para visualizar.")
-
-    # --- CLT ---
-    with subabas[1]:
-        st.subheader("Ganhos CLT")
-        salario = st.number_input("Salário Mensal (R$)", min_value=0.0, step=100.0, value=3000.0)
-        vale = st.number_input("Vale Mensal (R$)", min_value=0.0, step=50.0, value=800.0)
-        mes = st.selectbox("Mês", ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"])
-        ano = st.number_input("Ano", min_value=2000, max_value=2100, value=2025)
-        st.write(f"Salário será pago dia 05/{mes}/{ano} e vale dia 20/{mes}/{ano}.")
-        ganhos_clt = pd.DataFrame({
-            "Tipo": ["Salário", "Vale"],
-            "Data": [f"05/{mes}/{ano}", f"20/{mes}/{ano}"],
-            "Valor": [salario, vale]
-        })
-        st.dataframe(ganhos_clt)
+                            if st.button("🗑️ Excluir Registro", type="secondary", key="btn_excluir_horas"):
+                                idx_excluir = opcoes_exclusao.index(registro_exclusao)
+                                df_horas = df_horas.drop(df_horas.index[idx_excluir]).reset_index(drop=True)
+                                save_csv_data(df_horas, 'data/horas.csv', "✅ Registro excluído e salvo!")
+                elif not df_horas.empty:
+                    st.info("Ainda não há dados completos para exibir o gráfico. Registre um ganho para visualizar.")
+
+                # Cotações do dólar e reavaliação em lote dos pendentes
+                with st.expander("💱 Cotações do Dólar e Reavaliação de Pendentes"):
+                    col_cot1, col_cot2 = st.columns(2)
+                    with col_cot1:
+                        st.write("**📥 Importar Cotações (CSV com Data e Cotacao):**")
+                        arquivo_cotacoes = st.file_uploader("Arquivo de cotações", type=["csv"], key="upload_cotacoes")
+                        if arquivo_cotacoes is not None and st.button("📥 Importar Cotações", key="btn_importar_cotacoes"):
+                            try:
+                                df_cotacoes = mesclar_cotacoes(df_cotacoes, pd.read_csv(arquivo_cotacoes, sep=None, engine="python"))
+                                df_salvar = df_cotacoes.assign(Data=df_cotacoes['Data'].dt.strftime('%Y-%m-%d'))
+                                save_csv_data(df_salvar, COTACOES_PATH, f"✅ {len(df_cotacoes)} cotações na série local!")
+                            except Exception as e:
+                                st.error(f"❌ Erro ao importar cotações: {e}")
+                    with col_cot2:
+                        if not df_cotacoes.empty:
+                            st.metric("💵 Última Cotação", f"R$ {df_cotacoes['Cotacao'].iloc[-1]:.4f}",
+                                      help=f"{df_cotacoes['Data'].iloc[-1].strftime('%d/%m/%Y')} - {len(df_cotacoes)} cotações na série")
+                        else:
+                            st.info("Nenhuma cotação importada ainda.")
+
+                    pendentes_horas = df_horas[df_horas['Pago'] != True] if 'Valor_Ajustado_USD' in df_horas.columns else df_horas.iloc[0:0]
+                    if not pendentes_horas.empty:
+                        st.write(f"**🔁 Reavaliar {len(pendentes_horas)} registros pendentes:**")
+                        modo_reavaliacao = st.radio("Cotação a aplicar:", ["Cotação fixa", "Cotação da série na data do registro"],
+                                                    horizontal=True, key="modo_reavaliacao")
+                        if modo_reavaliacao == "Cotação fixa":
+                            nova_cotacao = st.number_input("Nova cotação (R$):", min_value=0.01, step=0.01,
+                                                           value=ultima_cotacao or 5.0, key="nova_cotacao")
+                            df_reavaliado, qtd_reavaliados = reavaliar_pendentes(df_horas, cotacao=nova_cotacao)
+                        elif not df_cotacoes.empty:
+                            df_reavaliado, qtd_reavaliados = reavaliar_pendentes(df_horas, cotacoes=df_cotacoes)
+                        else:
+                            df_reavaliado, qtd_reavaliados = df_horas, 0
+                            st.warning("⚠️ Importe uma série de cotações para usar esta opção.")
+
+                        projecao_atual = pendentes_horas['Valor_Ajustado_BRL'].sum()
+                        projecao_nova = df_reavaliado[df_reavaliado['Pago'] != True]['Valor_Ajustado_BRL'].sum()
+                        st.caption(f"{qtd_reavaliados} registros alterados - Projeção: R$ {projecao_atual:,.2f} → R$ {projecao_nova:,.2f}")
+                        if st.button("🔁 Reavaliar Pendentes", key="btn_reavaliar_pendentes", disabled=qtd_reavaliados == 0):
+                            df_horas = df_reavaliado
+                            save_csv_data(df_horas, 'data/horas.csv', f"✅ {qtd_reavaliados} registros pendentes reavaliados e salvos!")
+
+                        # Sensibilidade da projeção à cotação
+                        st.write("**📉 Sensibilidade da Projeção à Cotação:**")
+                        base_sens = ultima_cotacao or float(pd.to_numeric(pendentes_horas['Cotacao'], errors='coerce').mean() or 5.0)
+                        faixa = st.slider("Faixa de cotação (R$):", 0.5, 15.0, (round(base_sens * 0.8, 2), round(base_sens * 1.2, 2)),
+                                          step=0.05, key="faixa_sensibilidade")
+                        df_sens = sensibilidade(df_horas, np.linspace(faixa[0], faixa[1], 25))
+                        fig_sens = graficos().line(df_sens, x='Cotacao', y='Projecao_BRL', markers=True,
+                                           title='Projeção Freelancer Pendente por Cotação (BRL)')
+                        fig_sens.update_traces(line_color='#FFA726', marker_color='#FFA726')
+                        st.plotly_chart(fig_sens, use_container_width=True)
+                        st.dataframe(df_sens.iloc[::4].style.format({
+                            'Cotacao': 'R$ {:.2f}',
+                            'Projecao_BRL': 'R$ {:,.2f}',
+                            'Diferenca_BRL': 'R$ {:+,.2f}'
+                        }))
+                    else:
+                        st.info("Nenhum registro pendente para reavaliar.")
+
+        # --- CLT ---
+        with subabas[1]:
+            if subabas[1].open:
+                st.subheader("Ganhos CLT")
+                membro_clt = st.selectbox("Membro", ["Breno", "Sara", "Adhara"], key="membro_clt")
+                salario = st.number_input("Salário Mensal (R$)", min_value=0.0, step=100.0, value=3000.0)
+                vale = st.number_input("Vale Mensal (R$)", min_value=0.0, step=50.0, value=800.0)
+                meses_nomes = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+                mes = st.selectbox("Mês", meses_nomes)
+                ano = st.number_input("Ano", min_value=2000, max_value=2100, value=2025)
+                st.write(f"Salário será pago dia 05/{mes}/{ano} e vale dia 20/{mes}/{ano}.")
+                ganhos_clt = pd.DataFrame({
+                    "Tipo": ["Salário", "Vale"],
+                    "Data": [f"05/{mes}/{ano}", f"20/{mes}/{ano}"],
+                    "Valor": [salario, vale]
+                })
+                st.dataframe(ganhos_clt)
         
-        # Botão para registrar os ganhos CLT na renda familiar
-        if st.button("💼 Registrar Ganhos CLT na Renda Familiar", key="btn_registrar_clt"):
-            df_familia = load_csv_data(renda_path)
+                # Botão para registrar os ganhos CLT na renda familiar
+                if st.button("💼 Registrar Ganhos CLT na Renda Familiar", key="btn_registrar_clt"):
+                    df_familia = load_csv_data(renda_path)
+            
+                    # O mês escolhido é materializado como duas regras de um mês só
+                    mes_ref = pd.Timestamp(year=int(ano), month=meses_nomes.index(mes) + 1, day=1)
+                    regras_mes = pd.DataFrame({
+                        "Membro": [membro_clt, membro_clt],
+                        "Tipo": ["Salário", "Vale"],
+                        "Valor": [salario, vale],
+                        "Dia": [5, 20],
+                        "Inicio": [mes_ref.strftime('%Y-%m')] * 2,
+                        "Fim": [mes_ref.strftime('%Y-%m')] * 2,
+                        "Reajuste_Pct": [0, 0],
+                        "Mes_Reajuste": [1, 1]
+                    })
+                    novos_registros, duplicados = separar_duplicados(df_familia, materializar(regras_mes, mes_ref, mes_ref))
             
-            # Mapeamento de mês
-            meses_map = {
-                "Janeiro": "01", "Fevereiro": "02", "Março": "03", "Abril": "04",
-                "Maio": "05", "Junho": "06", "Julho": "07", "Agosto": "08", 
-                "Setembro": "09", "Outubro": "10", "Novembro": "11", "Dezembro": "12"
-            }
+                    if not duplicados.empty:
+                        st.warning(f"⚠️ Já existem registros CLT de {membro_clt} para {mes}/{ano}. Verifique na aba Renda.")
+                    else:
+                        df_familia = safe_concat(df_familia, novos_registros)
+                        save_csv_data(df_familia, renda_path, f"✅ Ganhos CLT de {mes}/{ano} registrados na renda familiar e salvos!")
             
-            mes_num = meses_map[mes]
-            data_salario = f"{ano}-{mes_num}-05"
-            data_vale = f"{ano}-{mes_num}-20"
+                st.info("💡 **Dica**: Clique no botão acima para incluir automaticamente o salário e vale na Renda Familiar.")
+        
+                # Lançamentos recorrentes: regras materializadas em lote para vários meses
+                st.divider()
+                st.subheader("🔁 Lançamentos Recorrentes")
+                df_regras = load_csv_data(RECORRENCIAS_PATH)
+        
+                with st.form("form_recorrencia"):
+                    col_rec1, col_rec2, col_rec3 = st.columns(3)
+                    with col_rec1:
+                        membro_rec = st.selectbox("Membro", ["Breno", "Sara", "Adhara"], key="membro_recorrencia")
+                        tipo_rec = st.selectbox("Tipo de renda", ["Salário", "Vale", "Freelance", "Investimento", "Outro"], key="tipo_recorrencia")
+                        valor_rec = st.number_input("Valor mensal (R$)", min_value=0.0, step=100.0, key="valor_recorrencia")
+                    with col_rec2:
+                        dia_rec = st.number_input("Dia do pagamento", min_value=1, max_value=31, value=5, key="dia_recorrencia")
+                        inicio_rec = st.date_input("Início", key="inicio_recorrencia")
+                        sem_fim_rec = st.checkbox("Sem data de término", value=True, key="sem_fim_recorrencia")
+                        fim_rec = st.date_input("Término", key="fim_recorrencia")
+                    with col_rec3:
+                        reajuste_rec = st.number_input("Reajuste anual (%)", min_value=0.0, step=0.5, key="reajuste_recorrencia")
+                        mes_reajuste_rec = st.selectbox("Mês do reajuste", meses_nomes, key="mes_reajuste_recorrencia")
+                    if st.form_submit_button("➕ Adicionar Regra"):
+                        nova_regra = pd.DataFrame({
+                            "Membro": [membro_rec],
+                            "Tipo": [tipo_rec],
+                            "Valor": [valor_rec],
+                            "Dia": [int(dia_rec)],
+                            "Inicio": [inicio_rec.strftime('%Y-%m')],
+                            "Fim": ["" if sem_fim_rec else fim_rec.strftime('%Y-%m')],
+                            "Reajuste_Pct": [reajuste_rec],
+                            "Mes_Reajuste": [meses_nomes.index(mes_reajuste_rec) + 1]
+                        })
+                        df_regras = safe_concat(df_regras, nova_regra)
+                        save_csv_data(df_regras, RECORRENCIAS_PATH, f"✅ Regra de {tipo_rec} para {membro_rec} adicionada!")
+        
+                if not df_regras.empty:
+                    st.dataframe(df_regras)
             
-            # Verificar se já existem registros CLT para este mês/ano
-            df_familia['Data'] = pd.to_datetime(df_familia['Data'], errors='coerce')
-            ja_existe_salario = any(
-                (df_familia['Data'].dt.year == ano) & 
-                (df_familia['Data'].dt.month == int(mes_num)) & 
-                (df_familia['Tipo'].str.lower() == 'salário')
-            )
-            ja_existe_vale = any(
-                (df_familia['Data'].dt.year == ano) & 
-                (df_familia['Data'].dt.month == int(mes_num)) & 
-                (df_familia['Tipo'].str.lower() == 'vale')
-            )
+                    col_gerar1, col_gerar2 = st.columns(2)
+                    with col_gerar1:
+                        gerar_de = st.date_input("Gerar a partir de", key="gerar_de")
+                    with col_gerar2:
+                        gerar_ate = st.date_input("Gerar até", key="gerar_ate")
             
-            if ja_existe_salario or ja_existe_vale:
-                st.warning(f"⚠️ Já existem registros CLT para {mes}/{ano}. Verifique na aba Renda.")
-            else:
-                # Adicionar registros CLT
-                novos_registros = pd.DataFrame({
-                    "Membro": ["Breno", "Breno"],
-                    "Tipo": ["Salário", "Vale"],
-                    "Valor": [salario, vale],
-                    "Data": [data_salario, data_vale]
-                })
-                
-                df_familia = safe_concat(df_familia, novos_registros)
-                save_csv_data(df_familia, renda_path, f"✅ Ganhos CLT de {mes}/{ano} registrados na renda familiar e salvos!")
+                    if gerar_ate >= gerar_de:
+                        df_familia_rec = load_csv_data(renda_path)
+                        gerados = materializar(df_regras, gerar_de, gerar_ate)
+                        novos_rec, duplicados_rec = separar_duplicados(df_familia_rec, gerados)
+                        st.caption(f"{len(novos_rec)} lançamentos novos, {len(duplicados_rec)} já existentes (ignorados)")
+                        if not novos_rec.empty:
+                            with st.expander("👀 Prévia dos lançamentos"):
+                                st.dataframe(novos_rec)
+                        if st.button("🔁 Registrar Lançamentos Recorrentes", key="btn_materializar", disabled=novos_rec.empty):
+                            # Lote inteiro em uma única gravação
+                            df_familia_rec = safe_concat(df_familia_rec, novos_rec)
+                            save_csv_data(df_familia_rec, renda_path, f"✅ {len(novos_rec)} lançamentos recorrentes registrados e salvos!")
+                    else:
+                        st.warning("⚠️ A data final deve ser posterior à inicial.")
             
-        st.info("💡 **Dica**: Clique no botão acima para incluir automaticamente o salário e vale na Renda Familiar.")
+                    opcoes_regras = [f"{row['Membro']} - {row['Tipo']} - R$ {row['Valor']:.2f} - desde {row['Inicio']}" for _, row in df_regras.iterrows()]
+                    regra_exclusao = st.selectbox("Selecione a regra para excluir:", opcoes_regras, key="exclusao_regra")
+                    if st.button("🗑️ Excluir Regra", type="secondary", key="btn_excluir_regra"):
+                        df_regras, _ = safe_delete_record(df_regras, opcoes_regras.index(regra_exclusao), RECORRENCIAS_PATH, "regra recorrente")
+                else:
+                    st.info("Nenhuma regra recorrente cadastrada.")
         
-        # Seção para excluir ganhos CLT
-        st.divider()
-        st.subheader("🗑️ Excluir Ganhos CLT")
+                # Seção para excluir ganhos CLT
+                st.divider()
+                st.subheader("🗑️ Excluir Ganhos CLT")
         
-        # Filtrar registros CLT existentes na renda familiar
-        df_familia_temp = load_csv_data(renda_path)
-        if not df_familia_temp.empty:
-            df_familia_temp['Data'] = pd.to_datetime(df_familia_temp['Data'], errors='coerce')
-            registros_clt = df_familia_temp[
-                (df_familia_temp['Membro'] == 'Breno') & 
-                (df_familia_temp['Tipo'].isin(['Salário', 'Vale']))
-            ].copy()
+                # Filtrar registros CLT existentes na renda familiar
+                df_familia_temp = load_csv_data(renda_path)
+                if not df_familia_temp.empty:
+                    df_familia_temp['Data'] = pd.to_datetime(df_familia_temp['Data'], errors='coerce')
+                    registros_clt = df_familia_temp[df_familia_temp['Tipo'].isin(['Salário', 'Vale'])].copy()
             
-            if not registros_clt.empty:
-                st.write("**Registros CLT existentes:**")
-                opcoes_clt = []
-                for idx, row in registros_clt.iterrows():
-                    data_formatada = row['Data'].strftime('%m/%Y') if pd.notna(row['Data']) else 'Data inválida'
-                    opcoes_clt.append(f"{row['Tipo']} - R$ {row['Valor']:.2f} - {data_formatada}")
+                    if not registros_clt.empty:
+                        st.write("**Registros CLT existentes:**")
+                        opcoes_clt = []
+                        for idx, row in registros_clt.iterrows():
+                            data_formatada = row['Data'].strftime('%m/%Y') if pd.notna(row['Data']) else 'Data inválida'
+                            opcoes_clt.append(f"{row['Membro']} - {row['Tipo']} - R$ {row['Valor']:.2f} - {data_formatada}")
                 
-                if opcoes_clt:
-                    registro_clt_exclusao = st.selectbox("Selecione o registro CLT para excluir:", opcoes_clt, key="exclusao_clt")
+                        if opcoes_clt:
+                            registro_clt_exclusao = st.selectbox("Selecione o registro CLT para excluir:", opcoes_clt, key="exclusao_clt")
                     
-                    if st.button("🗑️ Excluir Registro CLT", type="secondary", key="btn_excluir_clt"):
-                        idx_excluir = opcoes_clt.index(registro_clt_exclusao)
-                        idx_real = registros_clt.index[idx_excluir]
-                        df_familia_temp = df_familia_temp.drop(idx_real).reset_index(drop=True)
-                        save_csv_data(df_familia_temp, renda_path, "✅ Registro CLT excluído e salvo!")
-            else:
-                st.info("Nenhum registro CLT encontrado para excluir.")
-        else:
-            st.info("Nenhum dado de renda familiar encontrado.")
+                            if st.button("🗑️ Excluir Registro CLT", type="secondary", key="btn_excluir_clt"):
+                                idx_excluir = opcoes_clt.index(registro_clt_exclusao)
+                                idx_real = registros_clt.index[idx_excluir]
+                                df_familia_temp = df_familia_temp.drop(idx_real).reset_index(drop=True)
+                                save_csv_data(df_familia_temp, renda_path, "✅ Registro CLT excluído e salvo!")
+                    else:
+                        st.info("Nenhum registro CLT encontrado para excluir.")
+                else:
+                    st.info("Nenhum dado de renda familiar encontrado.")
 
  # ============================
  # Aba 2 – Renda Familiar
  # ============================
 with abas[1]:
-    st.header(" Renda Familiar")
-    df_familia = load_csv_data(renda_path)
+    if abas[1].open:
+        st.header(" Renda Familiar")
+        df_familia = load_csv_data(renda_path)
     
-    # Separar valores CLT (já recebidos) dos outros
-    valores_clt = df_familia[df_familia['Tipo'].str.lower().isin(['salário', 'salario', 'vale'])]['Valor'].sum()
-    valores_outros = df_familia[~df_familia['Tipo'].str.lower().isin(['salário', 'salario', 'vale'])]['Valor'].sum()
-    
-    # Ganhos freelancer automatizados
-    try:
-        df_horas = load_csv_data('data/horas.csv')
-        # Garantir que a coluna 'Pago' existe
-        if 'Pago' not in df_horas.columns:
-            df_horas['Pago'] = False
-        
-        # Calcular totais
-        total_freela_pendente = 0
-        total_freela_pago = 0
-        if 'Valor_Ajustado_BRL' in df_horas.columns:
-            total_freela_pago = df_horas[df_horas['Pago'] == True]['Valor_Ajustado_BRL'].sum()
-            total_freela_pendente = df_horas[df_horas['Pago'] == False]['Valor_Ajustado_BRL'].sum()
-        
-        total_freela = total_freela_pago + total_freela_pendente
-    except Exception:
-        total_freela_pago = 0
-        total_freela_pendente = 0
-        total_freela = 0
-    
-    # Calcular renda total (CLT + Outros + Freelancer)
-    renda_total_efetiva = valores_clt + valores_outros + total_freela_pago  # CLT sempre efetivo + outros + freelancer pago
-    renda_total_projetada = renda_total_efetiva + total_freela_pendente  # Incluindo projeções freelancer
+        # Ganhos freelancer automatizados
+        try:
+            df_horas = load_csv_data('data/horas.csv')
+        except Exception:
+            df_horas = pd.DataFrame(columns=get_default_columns('data/horas.csv'))
+
+        # CLT (já recebido), outras rendas e freelancer pago/pendente
+        renda = razao.atual().metricas()
+        valores_clt = renda['clt']
+        valores_outros = renda['outros']
+        total_freela_pago = renda['freela_pago']
+        total_freela_pendente = renda['freela_pendente']
+        renda_total_efetiva = renda['efetiva']  # CLT sempre efetivo + outros + freelancer pago
+        renda_total_projetada = renda['projetada']  # Incluindo projeções freelancer
     
-    st.metric("💰 Renda Familiar Efetiva", f"R$ {renda_total_efetiva:,.2f}")
-    st.metric("📈 Renda Familiar Projetada", f"R$ {renda_total_projetada:,.2f}", 
-              delta=f"+R$ {total_freela_pendente:,.2f} (pendente)")
+        st.metric("💰 Renda Familiar Efetiva", f"R$ {renda_total_efetiva:,.2f}")
+        st.metric("📈 Renda Familiar Projetada", f"R$ {renda_total_projetada:,.2f}", 
+                  delta=f"+R$ {total_freela_pendente:,.2f} (pendente)")
     
-    # Breakdown detalhado
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric("💼 CLT (Efetivo)", f"R$ {valores_clt:,.2f}")
-    with col2:
-        st.metric("🏠 Outras Rendas", f"R$ {valores_outros:,.2f}")
-    with col3:
-        st.metric("✅ Freelancer Recebido", f"R$ {total_freela_pago:,.2f}")
-    with col4:
-        st.metric("📊 Freelancer Projeção", f"R$ {total_freela_pendente:,.2f}")
-
-    st.subheader("🔍 Filtros")
-    membros = st.multiselect("Filtrar por membro", options=df_familia['Membro'].unique())
-    tipos = st.multiselect("Filtrar por tipo de renda", options=df_familia['Tipo'].unique())
-    meses = st.multiselect(
-        "Filtrar por mês",
-        options=df_familia['Data']
-            .dropna()
-            .apply(lambda x: pd.to_datetime(x, errors='coerce').strftime('%Y-%m') if pd.notnull(x) and str(x).strip() != '' else None)
-            .dropna()
-            .unique(),
-        key="meses_renda"
-    )
-    df_filtrado = df_familia.copy()
-    if membros:
-        df_filtrado = df_filtrado[df_filtrado['Membro'].isin(membros)]
-    if tipos:
-        df_filtrado = df_filtrado[df_filtrado['Tipo'].isin(tipos)]
-    if meses:
-        df_filtrado['Mes'] = df_filtrado['Data'].apply(lambda x: pd.to_datetime(x, errors='coerce').strftime('%Y-%m'))
-        df_filtrado = df_filtrado[df_filtrado['Mes'].isin(meses)]
+        # Breakdown detalhado
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("💼 CLT (Efetivo)", f"R$ {valores_clt:,.2f}")
+        with col2:
+            st.metric("🏠 Outras Rendas", f"R$ {valores_outros:,.2f}")
+        with col3:
+            st.metric("✅ Freelancer Recebido", f"R$ {total_freela_pago:,.2f}")
+        with col4:
+            st.metric("📊 Freelancer Projeção", f"R$ {total_freela_pendente:,.2f}")
+
+        st.subheader("🔍 Filtros")
+        membros = st.multiselect("Filtrar por membro", options=df_familia['Membro'].unique())
+        tipos = st.multiselect("Filtrar por tipo de renda", options=df_familia['Tipo'].unique())
+        meses = st.multiselect("Filtrar por mês", options=meses_com_dados(renda_path, df_familia), key="meses_renda")
+        df_filtrado = ler_meses(renda_path, meses, df_familia) if meses else df_familia.copy()
+        if membros:
+            df_filtrado = df_filtrado[df_filtrado['Membro'].isin(membros)]
+        if tipos:
+            df_filtrado = df_filtrado[df_filtrado['Tipo'].isin(tipos)]
     
-    # Separar valores filtrados
-    valores_clt_filtrados = df_filtrado[df_filtrado['Tipo'].str.lower().isin(['salário', 'salario', 'vale'])]['Valor'].sum()
-    valores_outros_filtrados = df_filtrado[~df_filtrado['Tipo'].str.lower().isin(['salário', 'salario', 'vale'])]['Valor'].sum()
-    renda_total_filtrada = valores_clt_filtrados + valores_outros_filtrados + total_freela_pago
+        # Separar valores filtrados
+        valores_clt_filtrados = df_filtrado[df_filtrado['Tipo'].str.lower().isin(['salário', 'salario', 'vale'])]['Valor'].sum()
+        valores_outros_filtrados = df_filtrado[~df_filtrado['Tipo'].str.lower().isin(['salário', 'salario', 'vale'])]['Valor'].sum()
+        renda_total_filtrada = valores_clt_filtrados + valores_outros_filtrados + total_freela_pago
 
-    st.metric("💰 Renda Família Filtrada (Efetiva)", f"R$ {renda_total_filtrada:,.2f}")
+        st.metric("💰 Renda Família Filtrada (Efetiva)", f"R$ {renda_total_filtrada:,.2f}")
     
-    # Breakdown do filtro
-    col_f1, col_f2, col_f3 = st.columns(3)
-    with col_f1:
-        st.caption(f"💼 CLT Filtrado: R$ {valores_clt_filtrados:,.2f}")
-    with col_f2:
-        st.caption(f"🏠 Outras Rendas: R$ {valores_outros_filtrados:,.2f}")
-    with col_f3:
-        st.caption(f"✅ Freelancer Pago: R$ {total_freela_pago:,.2f}")
-
-    # Gráfico resumo mensal Freelancer e CLT
-    try:
-        # Freelancer
-        df_horas = pd.read_csv('data/horas.csv')
-        if 'Data' in df_horas.columns and 'Valor_Ajustado_BRL' in df_horas.columns:
-            # Garantir que a coluna 'Pago' existe
-            if 'Pago' not in df_horas.columns:
-                df_horas['Pago'] = False
-            
-            df_horas['Data'] = pd.to_datetime(df_horas['Data'], errors='coerce')
-            df_horas['MesAno'] = df_horas['Data'].dt.strftime('%Y-%m')
-            
-            # Separar pagos e pendentes
-            resumo_freela_pago = df_horas[df_horas['Pago'] == True].groupby('MesAno')['Valor_Ajustado_BRL'].sum().reset_index()
-            resumo_freela_pago = resumo_freela_pago.rename(columns={'Valor_Ajustado_BRL': 'Freelancer_Pago'})
-            
-            resumo_freela_pendente = df_horas[df_horas['Pago'] == False].groupby('MesAno')['Valor_Ajustado_BRL'].sum().reset_index()
-            resumo_freela_pendente = resumo_freela_pendente.rename(columns={'Valor_Ajustado_BRL': 'Freelancer_Pendente'})
-        else:
-            resumo_freela_pago = pd.DataFrame(columns=['MesAno', 'Freelancer_Pago'])
-            resumo_freela_pendente = pd.DataFrame(columns=['MesAno', 'Freelancer_Pendente'])
-        # CLT
-        df_fam = pd.read_csv(renda_path)
-        if 'Data' in df_fam.columns and 'Tipo' in df_fam.columns and 'Valor' in df_fam.columns:
-            df_fam['Data'] = pd.to_datetime(df_fam['Data'], errors='coerce')
-            df_fam['MesAno'] = df_fam['Data'].dt.strftime('%Y-%m')
-            clt_mask = df_fam['Tipo'].str.lower().isin(['salário', 'salario', 'vale'])
-            resumo_clt = df_fam[clt_mask].groupby('MesAno')['Valor'].sum().reset_index()
-            resumo_clt = resumo_clt.rename(columns={'Valor': 'CLT'})
-        else:
-            resumo_clt = pd.DataFrame(columns=['MesAno', 'CLT'])
-        # Merge
-        # Primeiro merge dos dados de freelancer
-        resumo_freelancer = pd.merge(resumo_freela_pago, resumo_freela_pendente, on='MesAno', how='outer').fillna(0).infer_objects(copy=False)
-        
-        # Depois merge com CLT
-        resumo = pd.merge(resumo_freelancer, resumo_clt, on='MesAno', how='outer').fillna(0).infer_objects(copy=False)
-        resumo = resumo.sort_values('MesAno')
-        if not resumo.empty:
-            fig_mensal = px.bar(resumo, x='MesAno', y=['Freelancer_Pago', 'Freelancer_Pendente', 'CLT'], barmode='group',
-                               title='💰 Ganhos Efetivos vs 📈 Projeções Mensais',
-                               labels={'value':'Total (R$)','MesAno':'Mês/Ano','variable':'Tipo'},
-                               color_discrete_map={
-                                   'Freelancer_Pago': '#1DE9B6',
-                                   'Freelancer_Pendente': '#FFA726', 
-                                   'CLT': '#42A5F5'
-                               })
+        # Breakdown do filtro
+        col_f1, col_f2, col_f3 = st.columns(3)
+        with col_f1:
+            st.caption(f"💼 CLT Filtrado: R$ {valores_clt_filtrados:,.2f}")
+        with col_f2:
+            st.caption(f"🏠 Outras Rendas: R$ {valores_outros_filtrados:,.2f}")
+        with col_f3:
+            st.caption(f"✅ Freelancer Pago: R$ {total_freela_pago:,.2f}")
+
+        # Gráfico resumo mensal Freelancer e CLT
+        try:
+            # Freelancer (pago/pendente) e CLT por mês
+            resumo = resumo_mensal_ganhos(df_horas, df_familia)
+            if not resumo.empty:
+                fig_mensal = graficos().bar(resumo, x='MesAno', y=['Freelancer_Pago', 'Freelancer_Pendente', 'CLT'], barmode='group',
+                                   title='💰 Ganhos Efetivos vs 📈 Projeções Mensais',
+                                   labels={'value':'Total (R$)','MesAno':'Mês/Ano','variable':'Tipo'},
+                                   color_discrete_map={
+                                       'Freelancer_Pago': '#1DE9B6',
+                                       'Freelancer_Pendente': '#FFA726', 
+                                       'CLT': '#42A5F5'
+                                   })
             
-            # Personalizar legendas
-            fig_mensal.for_each_trace(lambda t: t.update(name={
-                'Freelancer_Pago': '✅ Freelancer Recebido',
-                'Freelancer_Pendente': '📊 Freelancer Projeção',
-                'CLT': '💼 CLT'
-            }[t.name]))
+                # Personalizar legendas
+                fig_mensal.for_each_trace(lambda t: t.update(name={
+                    'Freelancer_Pago': '✅ Freelancer Recebido',
+                    'Freelancer_Pendente': '📊 Freelancer Projeção',
+                    'CLT': '💼 CLT'
+                }[t.name]))
             
-            st.plotly_chart(fig_mensal, use_container_width=True)
-    except Exception as e:
-        st.info(f"Não foi possível gerar o gráfico mensal: {e}")
-
-    fig2 = px.pie(df_filtrado, names='Tipo', values='Valor', title='Distribuição da Renda Filtrada')
-    st.plotly_chart(fig2, use_container_width=True)
-    st.dataframe(df_filtrado)
-
-    # Funcionalidade de exclusão para renda
-    st.subheader("🗑️ Excluir Registro de Renda")
-    if not df_familia.empty:
-        opcoes_exclusao_renda = []
-        for idx, row in df_familia.iterrows():
-            opcoes_exclusao_renda.append(f"{row['Membro']} - {row['Tipo']} - R$ {row['Valor']:.2f} - {row['Data']}")
+                st.plotly_chart(fig_mensal, use_container_width=True)
+        except Exception as e:
+            st.info(f"Não foi possível gerar o gráfico mensal: {e}")
+
+        fig2 = graficos().pie(df_filtrado, names='Tipo', values='Valor', title='Distribuição da Renda Filtrada')
+        st.plotly_chart(fig2, use_container_width=True)
+        st.dataframe(df_filtrado)
+
+        # Funcionalidade de exclusão para renda
+        st.subheader("🗑️ Excluir Registro de Renda")
+        if not df_familia.empty:
+            opcoes_exclusao_renda = []
+            for idx, row in df_familia.iterrows():
+                opcoes_exclusao_renda.append(f"{row['Membro']} - {row['Tipo']} - R$ {row['Valor']:.2f} - {row['Data']}")
         
-        registro_exclusao_renda = st.selectbox("Selecione para excluir:", opcoes_exclusao_renda, key="exclusao_renda")
+            registro_exclusao_renda = st.selectbox("Selecione para excluir:", opcoes_exclusao_renda, key="exclusao_renda")
         
-        if st.button("🗑️ Excluir Registro de Renda", type="secondary", key="btn_excluir_renda"):
-            idx_excluir = opcoes_exclusao_renda.index(registro_exclusao_renda)
-            df_familia = df_familia.drop(df_familia.index[idx_excluir]).reset_index(drop=True)
-            save_csv_data(df_familia, renda_path, "✅ Registro de renda excluído e salvo!")
-
-    st.subheader("➕ Adicionar nova renda familiar")
-    with st.form("form_renda"):
-        membro = st.selectbox("Nome do membro", ["Breno", "Sara", "Adhara", "Outro"], key="membro_renda")
-        if membro == "Outro":
-            membro = st.text_input("Digite o nome do membro")
-        tipo = st.selectbox("Tipo de renda", ["Salário", "Freelance", "Investimento", "Vale", "Outro"])
-        valor = st.number_input("Valor (R$)", min_value=0.0, step=100.0)
-        data = st.date_input("Data")
-        enviar = st.form_submit_button("Adicionar")
-        if enviar:
-            novo_dado = pd.DataFrame({
-                "Membro": [membro],
-                "Tipo": [tipo],
-                "Valor": [valor],
-                "Data": [data]
-            })
-            df_familia = safe_concat(df_familia, novo_dado)
-            save_csv_data(df_familia, renda_path, f"✅ Renda de {membro} adicionada e salva com sucesso!")
+            if st.button("🗑️ Excluir Registro de Renda", type="secondary", key="btn_excluir_renda"):
+                idx_excluir = opcoes_exclusao_renda.index(registro_exclusao_renda)
+                df_familia = df_familia.drop(df_familia.index[idx_excluir]).reset_index(drop=True)
+                save_csv_data(df_familia, renda_path, "✅ Registro de renda excluído e salvo!")
+
+        st.subheader("➕ Adicionar nova renda familiar")
+        with st.form("form_renda"):
+            membro = st.selectbox("Nome do membro", ["Breno", "Sara", "Adhara", "Outro"], key="membro_renda")
+            if membro == "Outro":
+                membro = st.text_input("Digite o nome do membro")
+            tipo = st.selectbox("Tipo de renda", ["Salário", "Freelance", "Investimento", "Vale", "Outro"])
+            valor = st.number_input("Valor (R$)", min_value=0.0, step=100.0)
+            data = st.date_input("Data")
+            enviar = st.form_submit_button("Adicionar")
+            if enviar:
+                novo_dado = pd.DataFrame({
+                    "Membro": [membro],
+                    "Tipo": [tipo],
+                    "Valor": [valor],
+                    "Data": [data]
+                })
+                if verificar_duplicado(novo_dado, renda_path):
+                    df_familia = safe_concat(df_familia, novo_dado)
+                    save_csv_data(df_familia, renda_path, f"✅ Renda de {membro} adicionada e salva com sucesso!")
 
 
 
  # ============================
  # Aba 3 – Despesas
  # ============================
+def preparar_despesas(df_despesas):
+    """Descarta linhas sem data válida, converte a data e acrescenta a coluna 'Mes' (YYYY-MM)"""
+    if df_despesas.empty or 'Data' not in df_despesas.columns:
+        return pd.DataFrame(columns=["Membro", "Categoria", "Valor", "Data", "Mes"])
+    # Remover linhas com datas vazias ou inválidas antes da conversão
+    df_despesas = df_despesas.dropna(subset=['Data'])
+    df_despesas = df_despesas[df_despesas['Data'].str.strip() != '']
+    df_despesas['Data'] = converter_datas(df_despesas['Data'])
+    # Remover linhas onde a conversão falhou
+    df_despesas = df_despesas.dropna(subset=['Data'])
+    df_despesas['Mes'] = df_despesas['Data'].dt.strftime('%Y-%m')
+    return df_despesas
+
 with abas[2]:
-    st.header("Despesas Familiares")
-    try:
-        df_despesas = pd.read_csv(despesas_path)
-        if not df_despesas.empty and 'Data' in df_despesas.columns:
-            # Remover linhas com datas vazias ou inválidas antes da conversão
-            df_despesas = df_despesas.dropna(subset=['Data'])
-            df_despesas = df_despesas[df_despesas['Data'].str.strip() != '']
-            
-            if not df_despesas.empty:
-                df_despesas['Data'] = pd.to_datetime(df_despesas['Data'], errors='coerce')
-                # Remover linhas onde a conversão falhou
-                df_despesas = df_despesas.dropna(subset=['Data'])
-                
-                if not df_despesas.empty:
-                    df_despesas['Mes'] = df_despesas['Data'].dt.strftime('%Y-%m')
-                else:
-                    df_despesas['Mes'] = []
-            else:
-                df_despesas['Mes'] = []
-        else:
+    if abas[2].open:
+        st.header("Despesas Familiares")
+        try:
+            df_despesas = preparar_despesas(escritor.ler_csv(despesas_path))
+        except FileNotFoundError:
+            df_despesas = pd.DataFrame(columns=["Membro", "Categoria", "Valor", "Data", "Mes"])
+        except Exception as e:
+            st.error(f"Erro ao processar arquivo de despesas: {e}")
             df_despesas = pd.DataFrame(columns=["Membro", "Categoria", "Valor", "Data", "Mes"])
-    except FileNotFoundError:
-        df_despesas = pd.DataFrame(columns=["Membro", "Categoria", "Valor", "Data", "Mes"])
-    except Exception as e:
-        st.error(f"Erro ao processar arquivo de despesas: {e}")
-        df_despesas = pd.DataFrame(columns=["Membro", "Categoria", "Valor", "Data", "Mes"])
     
-    # Filtros apenas se há dados
-    if not df_despesas.empty and 'Mes' in df_despesas.columns and len(df_despesas['Mes']) > 0:
-        meses_d = st.multiselect("Filtrar por mês", options=sorted(df_despesas['Mes'].dropna().unique()), key="meses_despesa")
-        categorias_d = st.multiselect("Filtrar por categoria", options=df_despesas['Categoria'].unique())
-    else:
-        meses_d = []
-        categorias_d = []
-    df_despesas_filtrado = df_despesas.copy()
-    if meses_d:
-        df_despesas_filtrado = df_despesas_filtrado[df_despesas_filtrado['Mes'].isin(meses_d)]
-    if categorias_d:
-        df_despesas_filtrado = df_despesas_filtrado[df_despesas_filtrado['Categoria'].isin(categorias_d)]
-    total_despesas_filtrado = df_despesas_filtrado['Valor'].sum() if not df_despesas_filtrado.empty else 0
-    st.metric("Total de Despesas Filtradas", f"R$ {total_despesas_filtrado:,.2f}")
-
-    # Resumo geral por categoria
-    st.subheader("Resumo Geral por Categoria")
-    if not df_despesas_filtrado.empty:
-        resumo_cat = df_despesas_filtrado.groupby('Categoria')['Valor'].sum().reset_index().sort_values('Valor', ascending=False)
-        if not resumo_cat.empty:
-            fig_cat = px.pie(resumo_cat, names='Categoria', values='Valor', title='Despesas por Categoria')
-            st.plotly_chart(fig_cat, use_container_width=True)
-            st.dataframe(resumo_cat)
+        # Filtros apenas se há dados
+        if not df_despesas.empty and 'Mes' in df_despesas.columns and len(df_despesas['Mes']) > 0:
+            meses_d = st.multiselect("Filtrar por mês", options=meses_com_dados(despesas_path, df_despesas), key="meses_despesa")
+            categorias_d = st.multiselect("Filtrar por categoria", options=df_despesas['Categoria'].unique())
         else:
-            st.info("Nenhuma despesa para exibir.")
-    else:
-        st.info("Nenhuma despesa registrada.")
-
-    # Detalhamento por membro
-    st.subheader("Detalhamento por Membro")
-    membros = ['Adhara', 'Breno', 'Sara']
-    resumo_membro = df_despesas_filtrado[df_despesas_filtrado['Membro'].isin(membros)]
-    if not resumo_membro.empty:
-        pivot = resumo_membro.pivot_table(index='Categoria', columns='Membro', values='Valor', aggfunc='sum', fill_value=0)
-        st.dataframe(pivot.style.format("R$ {:.2f}"))
-        fig_membro = px.bar(resumo_membro, x='Categoria', y='Valor', color='Membro', barmode='group',
-                            title='Despesas por Categoria e Membro')
-        st.plotly_chart(fig_membro, use_container_width=True)
-    else:
-        st.info("Nenhuma despesa registrada para Adhara, Breno ou Sara.")
-
-    st.subheader("➕ Adicionar nova despesa")
-    with st.form("form_despesa"):
-        membro_d = st.text_input("Nome do membro")
-        categoria = st.selectbox("Categoria", ["Alimentação", "Transporte", "Saúde", "Educação", "Lazer", "Outro"])
-        valor_d = st.number_input("Valor (R$)", min_value=0.0, step=50.0)
-        data_d = st.date_input("Data da despesa")
-        enviar_d = st.form_submit_button("Adicionar")
-        if enviar_d:
-            nova_despesa = pd.DataFrame({
-                "Membro": [membro_d],
-                "Categoria": [categoria],
-                "Valor": [valor_d],
-                "Data": [data_d]
-            })
-            df_despesas = safe_concat(df_despesas, nova_despesa)
-            save_csv_data(df_despesas, despesas_path, f"✅ Despesa de {membro_d} adicionada e salva com sucesso!")
-
-    # Funcionalidade de exclusão para despesas
-    st.subheader("🗑️ Excluir Registro de Despesa")
-    if not df_despesas.empty:
-        opcoes_exclusao_despesa = []
-        for idx, row in df_despesas.iterrows():
-            opcoes_exclusao_despesa.append(f"{row['Membro']} - {row['Categoria']} - R$ {row['Valor']:.2f} - {row['Data']}")
+            meses_d = []
+            categorias_d = []
+        df_despesas_filtrado = df_despesas.copy()
+        if meses_d and particionado(despesas_path):
+            # Só as partições dos meses escolhidos
+            df_despesas_filtrado = preparar_despesas(escritor.ler_csv(despesas_path, meses=meses_d))
+        elif meses_d:
+            df_despesas_filtrado = df_despesas_filtrado[df_despesas_filtrado['Mes'].isin(meses_d)]
+        if categorias_d:
+            df_despesas_filtrado = df_despesas_filtrado[df_despesas_filtrado['Categoria'].isin(categorias_d)]
+        total_despesas_filtrado = df_despesas_filtrado['Valor'].sum() if not df_despesas_filtrado.empty else 0
+        st.metric("Total de Despesas Filtradas", f"R$ {total_despesas_filtrado:,.2f}")
+
+        # Resumo geral por categoria
+        st.subheader("Resumo Geral por Categoria")
+        if not df_despesas_filtrado.empty:
+            resumo_cat = df_despesas_filtrado.groupby('Categoria')['Valor'].sum().reset_index().sort_values('Valor', ascending=False)
+            if not resumo_cat.empty:
+                fig_cat = graficos().pie(resumo_cat, names='Categoria', values='Valor', title='Despesas por Categoria')
+                st.plotly_chart(fig_cat, use_container_width=True)
+                st.dataframe(resumo_cat)
+            else:
+                st.info("Nenhuma despesa para exibir.")
+        else:
+            st.info("Nenhuma despesa registrada.")
+
+        # Detalhamento por membro
+        st.subheader("Detalhamento por Membro")
+        membros = ['Adhara', 'Breno', 'Sara']
+        resumo_membro = df_despesas_filtrado[df_despesas_filtrado['Membro'].isin(membros)]
+        if not resumo_membro.empty:
+            pivot = resumo_membro.pivot_table(index='Categoria', columns='Membro', values='Valor', aggfunc='sum', fill_value=0)
+            st.dataframe(pivot.style.format("R$ {:.2f}"))
+            fig_membro = graficos().bar(resumo_membro, x='Categoria', y='Valor', color='Membro', barmode='group',
+                                title='Despesas por Categoria e Membro')
+            st.plotly_chart(fig_membro, use_container_width=True)
+        else:
+            st.info("Nenhuma despesa registrada para Adhara, Breno ou Sara.")
+
+        # Orçamentos: limites mensais por categoria (e por membro) e consumo do mês corrente
+        st.subheader("🎯 Orçamentos do Mês")
+        df_orcamentos = load_csv_data(ORCAMENTOS_PATH)
+        tabela_limites = limites(df_orcamentos)
+        if tabela_limites:
+            totais_orcamento.sincronizar(df_despesas, escritor.versao(despesas_path))
+            burndown = totais_orcamento.burndown(tabela_limites)
+            for _, linha in burndown.iterrows():
+                uso = linha['Uso_Pct']
+                icone = "🚨" if uso > 100 else "⚠️" if uso > linha['Ritmo_Esperado_Pct'] else "✅"
+                st.progress(min(uso / 100, 1.0),
+                            text=f"{icone} {linha['Categoria']} ({linha['Membro']}): R$ {linha['Gasto']:,.2f} de R$ {linha['Limite']:,.2f} "
+                                 f"- projeção do mês R$ {linha['Projecao_Mes']:,.2f}")
+            st.caption(f"Ritmo esperado hoje: {burndown['Ritmo_Esperado_Pct'].iloc[0]:.0f}% do limite")
+        else:
+            st.info("Nenhum orçamento definido.")
+
+        with st.expander("✏️ Definir Orçamentos"):
+            with st.form("form_orcamento"):
+                col_orc1, col_orc2, col_orc3 = st.columns(3)
+                with col_orc1:
+                    categoria_orc = st.selectbox("Categoria", ["Alimentação", "Transporte", "Saúde", "Educação", "Lazer", "Outro", "Pagamento Empréstimo"], key="categoria_orcamento")
+                with col_orc2:
+                    membro_orc = st.selectbox("Membro", ["Todos", "Adhara", "Breno", "Sara"], key="membro_orcamento")
+                with col_orc3:
+                    limite_orc = st.number_input("Limite mensal (R$)", min_value=0.0, step=50.0, key="limite_orcamento")
+                if st.form_submit_button("💾 Salvar Orçamento"):
+                    membro_chave = "" if membro_orc == "Todos" else membro_orc
+                    # Um limite por categoria/membro: substitui o anterior
+                    if not df_orcamentos.empty:
+                        mesmo = ((df_orcamentos['Categoria'] == categoria_orc)
+                                 & (df_orcamentos['Membro'].fillna('').astype(str) == membro_chave))
+                        df_orcamentos = df_orcamentos[~mesmo]
+                    novo_orcamento = pd.DataFrame({"Categoria": [categoria_orc], "Membro": [membro_chave], "Limite": [limite_orc]})
+                    df_orcamentos = safe_concat(df_orcamentos, novo_orcamento).reset_index(drop=True)
+                    save_csv_data(df_orcamentos, ORCAMENTOS_PATH, f"✅ Orçamento de {categoria_orc} ({membro_orc}) salvo!")
+            if not df_orcamentos.empty:
+                st.dataframe(df_orcamentos)
+                opcoes_orcamentos = [f"{row['Categoria']} - {row['Membro'] if isinstance(row['Membro'], str) and row['Membro'] else 'Todos'} - R$ {row['Limite']:.2f}"
+                                     for _, row in df_orcamentos.iterrows()]
+                orcamento_exclusao = st.selectbox("Selecione o orçamento para excluir:", opcoes_orcamentos, key="exclusao_orcamento")
+                if st.button("🗑️ Excluir Orçamento", type="secondary", key="btn_excluir_orcamento"):
+                    df_orcamentos, _ = safe_delete_record(df_orcamentos, opcoes_orcamentos.index(orcamento_exclusao), ORCAMENTOS_PATH, "orçamento")
+
+        # Gastos fora do padrão: z-score de cada despesa e de cada mês contra a média móvel (EWMA) do grupo
+        st.subheader("🚨 Gastos Fora do Padrão")
+        detector_anomalias.sincronizar(df_despesas, escritor.versao(despesas_path))
+        transacoes_anomalas, meses_anomalos = detector_anomalias.transacoes(), detector_anomalias.meses()
+        if transacoes_anomalas.empty and meses_anomalos.empty:
+            st.success("✅ Nenhum gasto fora do padrão.")
+        else:
+            col_anom1, col_anom2 = st.columns(2)
+            with col_anom1:
+                st.markdown("**Despesas**")
+                st.dataframe(transacoes_anomalas.style.format({'Data': '{:%d/%m/%Y}', 'Valor': 'R$ {:,.2f}',
+                                                               'Media': 'R$ {:,.2f}', 'Z': '{:.1f}'}), hide_index=True)
+            with col_anom2:
+                st.markdown("**Meses**")
+                st.dataframe(meses_anomalos.style.format({'Total': 'R$ {:,.2f}', 'Media': 'R$ {:,.2f}', 'Z': '{:.1f}'}),
+                             hide_index=True)
+        st.caption(f"Fora do padrão: mais de {LIMITE_Z:.0f} desvios acima da média móvel da categoria/membro.")
+
+        st.subheader("➕ Adicionar nova despesa")
+        with st.form("form_despesa"):
+            membro_d = st.text_input("Nome do membro")
+            categoria = st.selectbox("Categoria", ["Alimentação", "Transporte", "Saúde", "Educação", "Lazer", "Outro"])
+            valor_d = st.number_input("Valor (R$)", min_value=0.0, step=50.0)
+            data_d = st.date_input("Data da despesa")
+            enviar_d = st.form_submit_button("Adicionar")
+            if enviar_d:
+                nova_despesa = pd.DataFrame({
+                    "Membro": [membro_d],
+                    "Categoria": [categoria],
+                    "Valor": [valor_d],
+                    "Data": [data_d]
+                })
+                if verificar_duplicado(nova_despesa, despesas_path):
+                    alertar_orcamentos(df_despesas, nova_despesa)
+                    alertar_anomalias(df_despesas, nova_despesa)
+                    df_despesas = safe_concat(df_despesas, nova_despesa)
+                    save_csv_data(df_despesas, despesas_path, f"✅ Despesa de {membro_d} adicionada e salva com sucesso!")
+
+        # Funcionalidade de exclusão para despesas
+        st.subheader("🗑️ Excluir Registro de Despesa")
+        if not df_despesas.empty:
+            opcoes_exclusao_despesa = []
+            for idx, row in df_despesas.iterrows():
+                opcoes_exclusao_despesa.append(f"{row['Membro']} - {row['Categoria']} - R$ {row['Valor']:.2f} - {row['Data']}")
         
-        registro_exclusao_despesa = st.selectbox("Selecione para excluir:", opcoes_exclusao_despesa, key="exclusao_despesa")
+            registro_exclusao_despesa = st.selectbox("Selecione para excluir:", opcoes_exclusao_despesa, key="exclusao_despesa")
         
-        if st.button("🗑️ Excluir Registro de Despesa", type="secondary", key="btn_excluir_despesa"):
-            idx_excluir = opcoes_exclusao_despesa.index(registro_exclusao_despesa)
-            df_despesas = df_despesas.drop(df_despesas.index[idx_excluir]).reset_index(drop=True)
-            save_csv_data(df_despesas, despesas_path, "✅ Registro de despesa excluído e salvo!")
+            if st.button("🗑️ Excluir Registro de Despesa", type="secondary", key="btn_excluir_despesa"):
+                idx_excluir = opcoes_exclusao_despesa.index(registro_exclusao_despesa)
+                totais_orcamento.estornar(df_despesas, df_despesas.iloc[[idx_excluir]], escritor.versao(despesas_path))
+                detector_anomalias.invalidar()
+                df_despesas = df_despesas.drop(df_despesas.index[idx_excluir]).reset_index(drop=True)
+                save_csv_data(df_despesas, despesas_path, "✅ Registro de despesa excluído e salvo!")
 
 
 
@@ -1011,502 +1384,642 @@ with abas[2]:
 # Aba 4 – Investimentos
 # ============================
 with abas[3]:
-    st.header("Investimentos Familiares")
-    try:
-        df_invest = pd.read_csv(invest_path)
-        if not df_invest.empty and 'Data' in df_invest.columns:
-            df_invest['Data'] = pd.to_datetime(df_invest['Data'], errors='coerce')
-            df_invest['Mes'] = df_invest['Data'].dt.strftime('%Y-%m')
-        else:
-            df_invest['Mes'] = []
-    except FileNotFoundError:
-        df_invest = pd.DataFrame(columns=["Membro", "Tipo", "Valor", "Data", "Rendimento", "Mes"])
-    df_invest_filtrado = df_invest.copy() if not df_invest.empty else pd.DataFrame(columns=df_invest.columns)
-    total_investido = df_invest_filtrado['Valor'].sum() if not df_invest_filtrado.empty else 0
-    total_rendimento = df_invest_filtrado['Rendimento'].sum() if not df_invest_filtrado.empty else 0
-    saldo_invest = total_investido + total_rendimento
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Total Investido", f"R$ {total_investido:,.2f}")
-    col2.metric("Rendimento Acumulado", f"R$ {total_rendimento:,.2f}")
-    col3.metric("Saldo Atual", f"R$ {saldo_invest:,.2f}", delta=float(total_rendimento))
-    if not df_invest_filtrado.empty:
-        fig4 = px.bar(df_invest_filtrado, x='Tipo', y='Valor', color='Membro',
-                      title='Investimentos por Tipo e Membro', text_auto=True)
-        st.plotly_chart(fig4, use_container_width=True)
-    st.subheader(" Detalhamento dos Investimentos")
-    st.dataframe(df_invest_filtrado)
-    st.subheader("➕ Adicionar novo investimento")
-    with st.form("form_invest"):
-        membro_i = st.text_input("Nome do membro")
-        tipo_i = st.selectbox("Tipo de investimento", ["Ações", "Fundos", "Cripto", "Tesouro", "Outro"])
-        valor_i = st.number_input("Valor investido (R$)", min_value=0.0, step=100.0)
-        rendimento_i = st.number_input("Rendimento acumulado (R$)", step=50.0)
-        data_i = st.date_input("Data do investimento")
-        enviar_i = st.form_submit_button("Adicionar")
-        if enviar_i:
-            novo_invest = pd.DataFrame({
-                "Membro": [membro_i],
-                "Tipo": [tipo_i],
-                "Valor": [valor_i],
-                "Data": [data_i],
-                "Rendimento": [rendimento_i]
-            })
-            df_invest = safe_concat(df_invest, novo_invest)
-            save_csv_data(df_invest, invest_path, f"✅ Investimento de {membro_i} adicionado e salvo com sucesso!")
-
-    # Funcionalidade de exclusão para investimentos
-    st.subheader("🗑️ Excluir Registro de Investimento")
-    if not df_invest.empty:
-        opcoes_exclusao_invest = []
-        for idx, row in df_invest.iterrows():
-            opcoes_exclusao_invest.append(f"{row['Membro']} - {row['Tipo']} - R$ {row['Valor']:.2f} - {row['Data']}")
+    if abas[3].open:
+        st.header("Investimentos Familiares")
+        try:
+            df_invest = escritor.ler_csv(invest_path)
+            if not df_invest.empty and 'Data' in df_invest.columns:
+                df_invest['Data'] = pd.to_datetime(df_invest['Data'], errors='coerce')
+                df_invest['Mes'] = df_invest['Data'].dt.strftime('%Y-%m')
+            else:
+                df_invest['Mes'] = []
+        except FileNotFoundError:
+            df_invest = pd.DataFrame(columns=["Membro", "Tipo", "Valor", "Data", "Rendimento", "Mes"])
+        df_invest_filtrado = df_invest.copy() if not df_invest.empty else pd.DataFrame(columns=df_invest.columns)
+        metricas = razao.atual().metricas()
+        total_investido = metricas['investido']
+        total_rendimento = metricas['rendimento']
+        saldo_invest = metricas['saldo_investimentos']
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Investido", f"R$ {total_investido:,.2f}")
+        col2.metric("Rendimento Acumulado", f"R$ {total_rendimento:,.2f}")
+        col3.metric("Saldo Atual", f"R$ {saldo_invest:,.2f}", delta=float(total_rendimento))
+        if not df_invest_filtrado.empty:
+            fig4 = graficos().bar(df_invest_filtrado, x='Tipo', y='Valor', color='Membro',
+                          title='Investimentos por Tipo e Membro', text_auto=True)
+            st.plotly_chart(fig4, use_container_width=True)
+        st.subheader(" Detalhamento dos Investimentos")
+        st.dataframe(df_invest_filtrado)
+        st.subheader("➕ Adicionar novo investimento")
+        with st.form("form_invest"):
+            membro_i = st.text_input("Nome do membro")
+            tipo_i = st.selectbox("Tipo de investimento", ["Ações", "Fundos", "Cripto", "Tesouro", "Outro"])
+            valor_i = st.number_input("Valor investido (R$)", min_value=0.0, step=100.0)
+            rendimento_i = st.number_input("Rendimento acumulado (R$)", step=50.0)
+            data_i = st.date_input("Data do investimento")
+            enviar_i = st.form_submit_button("Adicionar")
+            if enviar_i:
+                novo_invest = pd.DataFrame({
+                    "Membro": [membro_i],
+                    "Tipo": [tipo_i],
+                    "Valor": [valor_i],
+                    "Data": [data_i],
+                    "Rendimento": [rendimento_i]
+                })
+                if verificar_duplicado(novo_invest, invest_path):
+                    df_invest = safe_concat(df_invest, novo_invest)
+                    save_csv_data(df_invest, invest_path, f"✅ Investimento de {membro_i} adicionado e salvo com sucesso!")
+
+        # Funcionalidade de exclusão para investimentos
+        st.subheader("🗑️ Excluir Registro de Investimento")
+        if not df_invest.empty:
+            opcoes_exclusao_invest = []
+            for idx, row in df_invest.iterrows():
+                opcoes_exclusao_invest.append(f"{row['Membro']} - {row['Tipo']} - R$ {row['Valor']:.2f} - {row['Data']}")
         
-        registro_exclusao_invest = st.selectbox("Selecione para excluir:", opcoes_exclusao_invest, key="exclusao_invest")
+            registro_exclusao_invest = st.selectbox("Selecione para excluir:", opcoes_exclusao_invest, key="exclusao_invest")
         
-        if st.button("🗑️ Excluir Registro de Investimento", type="secondary", key="btn_excluir_invest"):
-            idx_excluir = opcoes_exclusao_invest.index(registro_exclusao_invest)
-            df_invest = df_invest.drop(df_invest.index[idx_excluir]).reset_index(drop=True)
-            save_csv_data(df_invest, invest_path, "✅ Registro de investimento excluído e salvo!")
+            if st.button("🗑️ Excluir Registro de Investimento", type="secondary", key="btn_excluir_invest"):
+                idx_excluir = opcoes_exclusao_invest.index(registro_exclusao_invest)
+                df_invest = df_invest.drop(df_invest.index[idx_excluir]).reset_index(drop=True)
+                save_csv_data(df_invest, invest_path, "✅ Registro de investimento excluído e salvo!")
 
 
 # ============================
 # Aba 5 – Empréstimos
 # ============================
 with abas[4]:
-    st.header("💳 Controle de Empréstimos")
+    if abas[4].open:
+        st.header("💳 Controle de Empréstimos")
     
-    df_emprestimos = load_csv_data(emprestimos_path, ['Nome', 'Tipo', 'Valor_Liquido_Recebido', 'Parcelas_Total', 'Total_A_Pagar', 'Valor_Parcela_Mensal', 'Parcelas_Pagas', 'Taxa_Juros_Calculada', 'Custo_Total_Juros', 'Data_Emprestimo', 'Status', 'Observacoes'])
+        df_emprestimos = load_csv_data(emprestimos_path, ['Nome', 'Tipo', 'Valor_Liquido_Recebido', 'Parcelas_Total', 'Total_A_Pagar', 'Valor_Parcela_Mensal', 'Parcelas_Pagas', 'Taxa_Juros_Calculada', 'Custo_Total_Juros', 'Data_Emprestimo', 'Status', 'Observacoes'])
     
-    # Processar dados preservando valores personalizados
-    df_emprestimos = processar_dados_emprestimos(df_emprestimos)
+        # Processar dados preservando valores personalizados
+        df_emprestimos = processar_dados_emprestimos(df_emprestimos)
     
-    # Função auxiliar para integrar com renda familiar
-    def registrar_emprestimo_na_renda(nome, valor, tipo_transacao, data):
-        """Registra empréstimo recebido na renda ou parcela paga como despesa"""
-        renda_path = 'data/familia.csv'
-        df_familia = load_csv_data(renda_path, ['Membro', 'Tipo', 'Valor', 'Data'])
+        # Função auxiliar para integrar com renda familiar
+        def registrar_emprestimo_na_renda(nome, valor, tipo_transacao, data):
+            """Registra empréstimo recebido na renda ou parcela paga como despesa"""
+            renda_path = 'data/familia.csv'
+            df_familia = load_csv_data(renda_path, ['Membro', 'Tipo', 'Valor', 'Data'])
         
-        novo_registro = pd.DataFrame({
-            'Membro': [nome],
-            'Tipo': [tipo_transacao],
-            'Valor': [valor],
-            'Data': [data]
-        })
+            novo_registro = pd.DataFrame({
+                'Membro': [nome],
+                'Tipo': [tipo_transacao],
+                'Valor': [valor],
+                'Data': [data]
+            })
         
-        df_familia = safe_concat(df_familia, novo_registro)
-        save_csv_data(df_familia, renda_path, f"✅ {tipo_transacao} registrado na renda familiar!")
+            if verificar_duplicado(novo_registro, renda_path):
+                df_familia = safe_concat(df_familia, novo_registro)
+                save_csv_data(df_familia, renda_path, f"✅ {tipo_transacao} registrado na renda familiar!")
 
-    def registrar_pagamento_emprestimo_despesa(nome, valor, data):
-        """Registra o pagamento de parcela de empréstimo como despesa"""
-        despesas_path = 'data/despesas.csv'
-        df_despesas = load_csv_data(despesas_path, ['Membro', 'Categoria', 'Valor', 'Data'])
+        def registrar_pagamento_emprestimo_despesa(nome, valor, data):
+            """Registra o pagamento de parcela de empréstimo como despesa"""
+            despesas_path = 'data/despesas.csv'
+            df_despesas = load_csv_data(despesas_path, ['Membro', 'Categoria', 'Valor', 'Data'])
         
-        novo_registro = pd.DataFrame({
-            'Membro': [nome],
-            'Categoria': ['Pagamento Empréstimo'],
-            'Valor': [valor],
-            'Data': [data]
-        })
+            novo_registro = pd.DataFrame({
+                'Membro': [nome],
+                'Categoria': ['Pagamento Empréstimo'],
+                'Valor': [valor],
+                'Data': [data]
+            })
         
-        df_despesas = safe_concat(df_despesas, novo_registro)
-        save_csv_data(df_despesas, despesas_path, f"✅ Pagamento de empréstimo registrado como despesa!")
+            if verificar_duplicado(novo_registro, despesas_path):
+                # Orçamentos e padrão de gastos partem do mesmo DataFrame usado na aba Despesas
+                despesas_antes = preparar_despesas(df_despesas)
+                alertar_orcamentos(despesas_antes, novo_registro)
+                alertar_anomalias(despesas_antes, novo_registro)
+                df_despesas = safe_concat(df_despesas, novo_registro)
+                save_csv_data(df_despesas, despesas_path, f"✅ Pagamento de empréstimo registrado como despesa!")
     
-    # Métricas gerais - usando nova estrutura
-    if not df_emprestimos.empty:
-        # Calcular valores totais por tipo
-        emprestimos_feitos_valor = df_emprestimos[df_emprestimos['Tipo'] == 'Emprestado']['Valor_Liquido_Recebido'].sum()
-        emprestimos_recebidos_valor = df_emprestimos[df_emprestimos['Tipo'] == 'Recebido']['Valor_Liquido_Recebido'].sum()
-        
-        # Valores pendentes - calcular o que ainda resta pagar/receber
-        pendentes_receber = 0
-        pendentes_pagar = 0
+        # Métricas gerais - usando nova estrutura
+        if not df_emprestimos.empty:
+            # Calcular valores totais por tipo
+            metricas = razao.atual().metricas()
+            emprestimos_feitos_valor = metricas['emprestado']
+            emprestimos_recebidos_valor = metricas['recebido']
         
-        for _, row in df_emprestimos.iterrows():
-            if row['Status'] == 'Ativo':
-                parcelas_restantes = row['Parcelas_Total'] - row['Parcelas_Pagas']
-                # Proteção contra valores None/NaN
-                valor_parcela = row['Valor_Parcela_Mensal'] if pd.notna(row['Valor_Parcela_Mensal']) else 0
-                valor_restante = parcelas_restantes * valor_parcela
-                
-                if row['Tipo'] == 'Emprestado':
-                    pendentes_receber += valor_restante
-                else:  # Recebido
-                    pendentes_pagar += valor_restante
+            # Valores pendentes - calcular o que ainda resta pagar/receber
+            pendentes_receber = metricas['a_receber']
+            pendentes_pagar = metricas['a_pagar']
         
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("💸 Total Emprestado", f"R$ {emprestimos_feitos_valor:,.2f}")
-        with col2:
-            st.metric("💰 Total Recebido", f"R$ {emprestimos_recebidos_valor:,.2f}")
-        with col3:
-            st.metric("⏳ A Receber", f"R$ {pendentes_receber:,.2f}")
-        with col4:
-            st.metric("📋 A Pagar", f"R$ {pendentes_pagar:,.2f}")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("💸 Total Emprestado", f"R$ {emprestimos_feitos_valor:,.2f}")
+            with col2:
+                st.metric("💰 Total Recebido", f"R$ {emprestimos_recebidos_valor:,.2f}")
+            with col3:
+                st.metric("⏳ A Receber", f"R$ {pendentes_receber:,.2f}")
+            with col4:
+                st.metric("📋 A Pagar", f"R$ {pendentes_pagar:,.2f}")
         
-        # Saldo líquido
-        saldo_liquido = pendentes_receber - pendentes_pagar
-        if saldo_liquido > 0:
-            st.metric("📊 Saldo Líquido", f"R$ {saldo_liquido:,.2f}", delta="Saldo positivo")
-        elif saldo_liquido < 0:
-            st.metric("📊 Saldo Líquido", f"R$ {abs(saldo_liquido):,.2f}", delta="Saldo negativo")
-        else:
-            st.metric("📊 Saldo Líquido", "R$ 0,00", delta="Equilibrado")
+            # Saldo líquido
+            saldo_liquido = pendentes_receber - pendentes_pagar
+            if saldo_liquido > 0:
+                st.metric("📊 Saldo Líquido", f"R$ {saldo_liquido:,.2f}", delta="Saldo positivo")
+            elif saldo_liquido < 0:
+                st.metric("📊 Saldo Líquido", f"R$ {abs(saldo_liquido):,.2f}", delta="Saldo negativo")
+            else:
+                st.metric("📊 Saldo Líquido", "R$ 0,00", delta="Equilibrado")
     
-    # Exibir dados dos empréstimos
-    if not df_emprestimos.empty:
-        st.subheader("📋 Registros de Empréstimos")
+        # Exibir dados dos empréstimos
+        if not df_emprestimos.empty:
+            st.subheader("📋 Registros de Empréstimos")
         
-        # Preparar dados para exibição (dados já processados pela função)
-        df_display = df_emprestimos.copy()
-        df_display['Data_Emprestimo'] = pd.to_datetime(df_display['Data_Emprestimo'], errors='coerce').dt.strftime('%d/%m/%Y')
+            # Preparar dados para exibição (dados já processados pela função)
+            df_display = df_emprestimos.copy()
+            df_display['Data_Emprestimo'] = pd.to_datetime(df_display['Data_Emprestimo'], errors='coerce').dt.strftime('%d/%m/%Y')
         
-        # Função para destacar por status
-        def highlight_status_emp(row):
-            if row['Status'] == 'Ativo':
-                return ['background-color: #FFA726; color: #000000;' for _ in row]
-            elif row['Status'] == 'Quitado':
-                return ['background-color: #1DE9B6; color: #181C2F;' for _ in row]
-            return ['' for _ in row]
+            # Função para destacar por status
+            def highlight_status_emp(row):
+                if row['Status'] == 'Ativo':
+                    return ['background-color: #FFA726; color: #000000;' for _ in row]
+                elif row['Status'] == 'Quitado':
+                    return ['background-color: #1DE9B6; color: #181C2F;' for _ in row]
+                return ['' for _ in row]
         
-        # Selecionar colunas para exibir (novas colunas)
-        colunas_exibir = ['Nome', 'Tipo', 'Valor_Liquido_Recebido', 'Total_A_Pagar', 'Valor_Parcela_Mensal', 
-                         'Parcelas_Total', 'Parcelas_Pagas', 'Parcelas_Restantes', 'Valor_Restante', 
-                         'Taxa_Juros_Mensal', 'Taxa_Juros_Total', 'Progresso', 'Status', 'Data_Emprestimo']
+            # Selecionar colunas para exibir (novas colunas)
+            colunas_exibir = ['Nome', 'Tipo', 'Valor_Liquido_Recebido', 'Total_A_Pagar', 'Valor_Parcela_Mensal', 
+                             'Parcelas_Total', 'Parcelas_Pagas', 'Parcelas_Restantes', 'Valor_Restante', 
+                             'Taxa_Juros_Mensal', 'Taxa_Juros_Total', 'Progresso', 'Status', 'Data_Emprestimo']
         
-        # Verificar se as colunas existem no DataFrame
-        colunas_disponiveis = [col for col in colunas_exibir if col in df_display.columns]
+            # Verificar se as colunas existem no DataFrame
+            colunas_disponiveis = [col for col in colunas_exibir if col in df_display.columns]
         
-        df_show = df_display[colunas_disponiveis]
+            df_show = df_display[colunas_disponiveis]
         
-        st.dataframe(df_show.style.apply(highlight_status_emp, axis=1).format({
-            'Valor_Liquido_Recebido': 'R$ {:.2f}',
-            'Total_A_Pagar': 'R$ {:.2f}',
-            'Valor_Parcela_Mensal': 'R$ {:.2f}',
-            'Valor_Restante': 'R$ {:.2f}',
-            'Taxa_Juros_Mensal': '{:.2f}%',
-            'Taxa_Juros_Total': '{:.2f}%',
-            'Progresso': '{:.1f}%'
-        }), use_container_width=True)
+            st.dataframe(df_show.style.apply(highlight_status_emp, axis=1).format({
+                'Valor_Liquido_Recebido': 'R$ {:.2f}',
+                'Total_A_Pagar': 'R$ {:.2f}',
+                'Valor_Parcela_Mensal': 'R$ {:.2f}',
+                'Valor_Restante': 'R$ {:.2f}',
+                'Taxa_Juros_Mensal': '{:.2f}%',
+                'Taxa_Juros_Total': '{:.2f}%',
+                'Progresso': '{:.1f}%'
+            }), use_container_width=True)
         
-        # Gráficos de acompanhamento
-        col_g1, col_g2 = st.columns(2)
+            # Gráficos de acompanhamento
+            col_g1, col_g2 = st.columns(2)
         
-        with col_g1:
-            # Gráfico de progresso dos empréstimos
-            if not df_emprestimos.empty:
-                fig_progresso = px.bar(
-                    df_display, 
-                    x='Nome', 
-                    y=['Parcelas_Pagas', 'Parcelas_Restantes'],
-                    title='Progresso dos Empréstimos',
-                    labels={'value': 'Parcelas', 'variable': 'Status'},
-                    color_discrete_map={'Parcelas_Pagas': '#1DE9B6', 'Parcelas_Restantes': '#FFA726'}
-                )
-                st.plotly_chart(fig_progresso, use_container_width=True)
+            with col_g1:
+                # Gráfico de progresso dos empréstimos
+                if not df_emprestimos.empty:
+                    fig_progresso = graficos().bar(
+                        df_display, 
+                        x='Nome', 
+                        y=['Parcelas_Pagas', 'Parcelas_Restantes'],
+                        title='Progresso dos Empréstimos',
+                        labels={'value': 'Parcelas', 'variable': 'Status'},
+                        color_discrete_map={'Parcelas_Pagas': '#1DE9B6', 'Parcelas_Restantes': '#FFA726'}
+                    )
+                    st.plotly_chart(fig_progresso, use_container_width=True)
         
-        with col_g2:
-            # Gráfico de valores por tipo
-            if not df_emprestimos.empty:
-                resumo_tipo = df_emprestimos.groupby('Tipo').agg({
-                    'Valor_Liquido_Recebido': 'sum',
-                    'Custo_Total_Juros': 'sum'
-                }).reset_index()
+            with col_g2:
+                # Gráfico de valores por tipo
+                if not df_emprestimos.empty:
+                    resumo_tipo = df_emprestimos.groupby('Tipo').agg({
+                        'Valor_Liquido_Recebido': 'sum',
+                        'Custo_Total_Juros': 'sum'
+                    }).reset_index()
                 
-                fig_valores = px.bar(
-                    resumo_tipo, 
-                    x='Tipo', 
-                    y=['Valor_Liquido_Recebido', 'Custo_Total_Juros'],
-                    title='Valores por Tipo (Líquido vs Custo dos Juros)',
-                    labels={'value': 'Valor (R$)', 'variable': 'Tipo de Valor'},
-                    color_discrete_map={'Valor_Liquido_Recebido': '#2196F3', 'Custo_Total_Juros': '#FF5722'}
-                )
-                st.plotly_chart(fig_valores, use_container_width=True)
+                    fig_valores = graficos().bar(
+                        resumo_tipo, 
+                        x='Tipo', 
+                        y=['Valor_Liquido_Recebido', 'Custo_Total_Juros'],
+                        title='Valores por Tipo (Líquido vs Custo dos Juros)',
+                        labels={'value': 'Valor (R$)', 'variable': 'Tipo de Valor'},
+                        color_discrete_map={'Valor_Liquido_Recebido': '#2196F3', 'Custo_Total_Juros': '#FF5722'}
+                    )
+                    st.plotly_chart(fig_valores, use_container_width=True)
                 
-        # Gráfico adicional de Taxa de Juros
-        if not df_emprestimos.empty and 'Taxa_Juros_Calculada' in df_emprestimos.columns:
-            col_g3, col_g4 = st.columns(2)
+            # Gráfico adicional de Taxa de Juros
+            if not df_emprestimos.empty and 'Taxa_Juros_Calculada' in df_emprestimos.columns:
+                col_g3, col_g4 = st.columns(2)
             
-            with col_g3:
-                # Gráfico de Taxa de Juros por empréstimo
-                fig_juros = px.bar(
-                    df_emprestimos, 
-                    x='Nome', 
-                    y='Taxa_Juros_Calculada',
-                    title='Taxa de Juros por Empréstimo (%)',
-                    labels={'Taxa_Juros_Calculada': 'Taxa de Juros (%)', 'Nome': 'Pessoa'},
-                    color='Tipo',
-                    color_discrete_map={'Emprestado': '#1DE9B6', 'Recebido': '#FFA726'}
-                )
-                st.plotly_chart(fig_juros, use_container_width=True)
+                with col_g3:
+                    # Gráfico de Taxa de Juros por empréstimo
+                    fig_juros = graficos().bar(
+                        df_emprestimos, 
+                        x='Nome', 
+                        y='Taxa_Juros_Calculada',
+                        title='Taxa de Juros por Empréstimo (%)',
+                        labels={'Taxa_Juros_Calculada': 'Taxa de Juros (%)', 'Nome': 'Pessoa'},
+                        color='Tipo',
+                        color_discrete_map={'Emprestado': '#1DE9B6', 'Recebido': '#FFA726'}
+                    )
+                    st.plotly_chart(fig_juros, use_container_width=True)
             
-            with col_g4:
-                # Métricas de Taxa de Juros
-                juros_medio = df_emprestimos['Taxa_Juros_Calculada'].mean()
-                juros_max = df_emprestimos['Taxa_Juros_Calculada'].max()
-                juros_min = df_emprestimos['Taxa_Juros_Calculada'].min()
+                with col_g4:
+                    # Métricas de Taxa de Juros
+                    juros_medio = df_emprestimos['Taxa_Juros_Calculada'].mean()
+                    juros_max = df_emprestimos['Taxa_Juros_Calculada'].max()
+                    juros_min = df_emprestimos['Taxa_Juros_Calculada'].min()
                 
-                st.write("**📊 Estatísticas de Taxa de Juros:**")
-                st.metric("📈 Taxa Média", f"{juros_medio:.2f}%")
-                st.metric("🔴 Taxa Máxima", f"{juros_max:.2f}%")
-                st.metric("🟢 Taxa Mínima", f"{juros_min:.2f}%")
+                    st.write("**📊 Estatísticas de Taxa de Juros:**")
+                    st.metric("📈 Taxa Média", f"{juros_medio:.2f}%")
+                    st.metric("🔴 Taxa Máxima", f"{juros_max:.2f}%")
+                    st.metric("🟢 Taxa Mínima", f"{juros_min:.2f}%")
         
     
-    # Formulário para adicionar empréstimo
-    st.subheader("➕ Adicionar Novo Empréstimo")
-    st.info("💡 **Nova abordagem:** Informe os valores reais do empréstimo e o sistema calculará automaticamente os juros!")
+        # Formulário para adicionar empréstimo
+        st.subheader("➕ Adicionar Novo Empréstimo")
+        st.info("💡 **Nova abordagem:** Informe os valores reais do empréstimo e o sistema calculará automaticamente os juros!")
     
-    with st.form("form_emprestimo"):
-        col_form1, col_form2, col_form3 = st.columns(3)
+        with st.form("form_emprestimo"):
+            col_form1, col_form2, col_form3 = st.columns(3)
         
-        with col_form1:
-            nome_emp = st.text_input("Nome da Pessoa:")
-            tipo_emp = st.selectbox("Tipo:", ["Emprestado", "Recebido"], 
-                                   help="Emprestado = Você emprestou para alguém | Recebido = Você pegou emprestado")
-            data_emprestimo = st.date_input("Data do Empréstimo:")
+            with col_form1:
+                nome_emp = st.text_input("Nome da Pessoa:")
+                tipo_emp = st.selectbox("Tipo:", ["Emprestado", "Recebido"], 
+                                       help="Emprestado = Você emprestou para alguém | Recebido = Você pegou emprestado")
+                data_emprestimo = st.date_input("Data do Empréstimo:")
         
-        with col_form2:
-            st.write("**💰 Valores do Empréstimo:**")
-            valor_liquido = st.number_input("Valor Líquido Recebido (R$):", 
-                                           min_value=0.0, step=10.0,
-                                           help="Valor que realmente chegou na sua conta")
-            total_a_pagar = st.number_input("Total a Pagar (R$):", 
-                                           min_value=0.0, step=10.0,
-                                           help="Soma de todas as parcelas que serão pagas")
+            with col_form2:
+                st.write("**💰 Valores do Empréstimo:**")
+                valor_liquido = st.number_input("Valor Líquido Recebido (R$):", 
+                                               min_value=0.0, step=10.0,
+                                               help="Valor que realmente chegou na sua conta")
+                total_a_pagar = st.number_input("Total a Pagar (R$):", 
+                                               min_value=0.0, step=10.0,
+                                               help="Soma de todas as parcelas que serão pagas")
         
-        with col_form3:
-            st.write("**📅 Parcelamento:**")
-            parcelas_total = st.number_input("Quantidade de Parcelas:", 
-                                            min_value=1, step=1, value=1)
-            valor_parcela = st.number_input("Valor da Parcela Mensal (R$):", 
-                                           min_value=0.0, step=10.0,
-                                           help="Valor de cada parcela mensal")
+            with col_form3:
+                st.write("**📅 Parcelamento:**")
+                parcelas_total = st.number_input("Quantidade de Parcelas:", 
+                                                min_value=1, step=1, value=1)
+                valor_parcela = st.number_input("Valor da Parcela Mensal (R$):", 
+                                               min_value=0.0, step=10.0,
+                                               help="Valor de cada parcela mensal")
             
-            observacoes_emp = st.text_area("Observações:", placeholder="Ex: banco, condições especiais, etc.")
+                observacoes_emp = st.text_area("Observações:", placeholder="Ex: banco, condições especiais, etc.")
         
-        # Validação e cálculos em tempo real
-        if valor_liquido > 0 and total_a_pagar > 0 and valor_parcela > 0 and parcelas_total > 0:
-            # Validar consistência
-            valido, mensagem = validar_valores_emprestimo(valor_liquido, total_a_pagar, valor_parcela, parcelas_total)
+            # Validação e cálculos em tempo real
+            if valor_liquido > 0 and total_a_pagar > 0 and valor_parcela > 0 and parcelas_total > 0:
+                # Validar consistência
+                valido, mensagem = validar_valores_emprestimo(valor_liquido, total_a_pagar, valor_parcela, parcelas_total)
             
-            if valido:
-                # Calcular juros
-                taxa_mensal, custo_juros = calcular_juros_emprestimo(valor_liquido, total_a_pagar, parcelas_total)
+                if valido:
+                    # Calcular juros
+                    taxa_mensal, custo_juros = calcular_juros_emprestimo(valor_liquido, total_a_pagar, parcelas_total)
                 
-                st.success("✅ Valores validados!")
+                    st.success("✅ Valores validados!")
                 
-                col_calc1, col_calc2 = st.columns(2)
-                with col_calc1:
-                    st.metric("💸 Custo Total dos Juros", f"R$ {custo_juros:,.2f}")
-                    st.metric("� Taxa Mensal Efetiva", f"{taxa_mensal:.2f}%")
+                    col_calc1, col_calc2 = st.columns(2)
+                    with col_calc1:
+                        st.metric("💸 Custo Total dos Juros", f"R$ {custo_juros:,.2f}")
+                        st.metric("� Taxa Mensal Efetiva", f"{taxa_mensal:.2f}%")
                 
-                with col_calc2:
-                    taxa_total = ((total_a_pagar / valor_liquido) - 1) * 100
-                    st.metric("🎯 Taxa Total", f"{taxa_total:.2f}%")
-                    relacao = (custo_juros / valor_liquido) * 100
-                    st.metric("� Custo vs Valor", f"{relacao:.1f}%")
+                    with col_calc2:
+                        taxa_total = ((total_a_pagar / valor_liquido) - 1) * 100
+                        st.metric("🎯 Taxa Total", f"{taxa_total:.2f}%")
+                        relacao = (custo_juros / valor_liquido) * 100
+                        st.metric("� Custo vs Valor", f"{relacao:.1f}%")
+                else:
+                    st.error(f"❌ {mensagem}")
+                    taxa_mensal = 0
+                    custo_juros = 0
             else:
-                st.error(f"❌ {mensagem}")
                 taxa_mensal = 0
                 custo_juros = 0
-        else:
-            taxa_mensal = 0
-            custo_juros = 0
         
-        enviar_emp = st.form_submit_button("💳 Registrar Empréstimo")
+            enviar_emp = st.form_submit_button("💳 Registrar Empréstimo")
         
-        if enviar_emp and nome_emp and valor_liquido > 0:
-            # Validar novamente antes de salvar
-            valido, mensagem = validar_valores_emprestimo(valor_liquido, total_a_pagar, valor_parcela, parcelas_total)
+            if enviar_emp and nome_emp and valor_liquido > 0:
+                # Validar novamente antes de salvar
+                valido, mensagem = validar_valores_emprestimo(valor_liquido, total_a_pagar, valor_parcela, parcelas_total)
             
-            if valido:
-                novo_emprestimo = pd.DataFrame({
-                    "Nome": [nome_emp],
-                    "Tipo": [tipo_emp],
-                    "Valor_Liquido_Recebido": [valor_liquido],
-                    "Parcelas_Total": [parcelas_total],
-                    "Total_A_Pagar": [total_a_pagar],
-                    "Valor_Parcela_Mensal": [valor_parcela],
-                    "Parcelas_Pagas": [0],
-                    "Taxa_Juros_Calculada": [taxa_mensal],
-                    "Custo_Total_Juros": [custo_juros],
-                    "Data_Emprestimo": [data_emprestimo],
-                    "Status": ["Ativo"],
-                    "Observacoes": [observacoes_emp]
-                })
+                if valido:
+                    novo_emprestimo = pd.DataFrame({
+                        "Nome": [nome_emp],
+                        "Tipo": [tipo_emp],
+                        "Valor_Liquido_Recebido": [valor_liquido],
+                        "Parcelas_Total": [parcelas_total],
+                        "Total_A_Pagar": [total_a_pagar],
+                        "Valor_Parcela_Mensal": [valor_parcela],
+                        "Parcelas_Pagas": [0],
+                        "Taxa_Juros_Calculada": [taxa_mensal],
+                        "Custo_Total_Juros": [custo_juros],
+                        "Data_Emprestimo": [data_emprestimo],
+                        "Status": ["Ativo"],
+                        "Observacoes": [observacoes_emp]
+                    })
                 
-                df_emprestimos = safe_concat(df_emprestimos, novo_emprestimo)
-                save_csv_data(df_emprestimos, emprestimos_path, f"✅ Empréstimo {tipo_emp.lower()} para/de {nome_emp} registrado e salvo!")
-                
-                # Se é empréstimo recebido, adicionar na renda familiar
-                if tipo_emp == "Recebido":
-                    registrar_emprestimo_na_renda(nome_emp, valor_liquido, "Empréstimo Recebido", data_emprestimo)
-            else:
-                st.error(f"❌ {mensagem}")
+                    if verificar_duplicado(novo_emprestimo, emprestimos_path):
+                        df_emprestimos = safe_concat(df_emprestimos, novo_emprestimo)
+                        save_csv_data(df_emprestimos, emprestimos_path, f"✅ Empréstimo {tipo_emp.lower()} para/de {nome_emp} registrado e salvo!")
+                    
+                        # Se é empréstimo recebido, adicionar na renda familiar
+                        if tipo_emp == "Recebido":
+                            registrar_emprestimo_na_renda(nome_emp, valor_liquido, "Empréstimo Recebido", data_emprestimo)
+                else:
+                    st.error(f"❌ {mensagem}")
                 
-        elif enviar_emp:
-            st.error("❌ Por favor, preencha todos os campos obrigatórios.")
+            elif enviar_emp:
+                st.error("❌ Por favor, preencha todos os campos obrigatórios.")
     
-    # Seção para editar CET de empréstimos existentes
-    if not df_emprestimos.empty:
-        st.subheader("✏️ Ajustar CET de Empréstimos Existentes")
+        # Seção para editar CET de empréstimos existentes
+        if not df_emprestimos.empty:
+            st.subheader("✏️ Ajustar CET de Empréstimos Existentes")
         
-        with st.expander("🎯 Editar CET de Empréstimos"):
-            opcoes_edicao_cet = []
-            indices_edicao_cet = []
+            with st.expander("🎯 Editar CET de Empréstimos"):
+                opcoes_edicao_cet = []
+                indices_edicao_cet = []
             
-            for idx, row in df_emprestimos.iterrows():
-                opcoes_edicao_cet.append(f"{row['Nome']} - {row['Tipo']} - R$ {row['Valor_Liquido_Recebido']:,.2f} - Taxa: {row['Taxa_Juros_Calculada']:.2f}%")
-                indices_edicao_cet.append(idx)
+                for idx, row in df_emprestimos.iterrows():
+                    opcoes_edicao_cet.append(f"{row['Nome']} - {row['Tipo']} - R$ {row['Valor_Liquido_Recebido']:,.2f} - Taxa: {row['Taxa_Juros_Calculada']:.2f}%")
+                    indices_edicao_cet.append(idx)
             
-            if opcoes_edicao_cet:
-                emprestimo_editar = st.selectbox("Selecione o empréstimo para ajustar CET:", opcoes_edicao_cet, key="edicao_cet")
-                idx_edicao = indices_edicao_cet[opcoes_edicao_cet.index(emprestimo_editar)]
-                emprestimo_atual = df_emprestimos.iloc[idx_edicao]
+                if opcoes_edicao_cet:
+                    emprestimo_editar = st.selectbox("Selecione o empréstimo para ajustar CET:", opcoes_edicao_cet, key="edicao_cet")
+                    idx_edicao = indices_edicao_cet[opcoes_edicao_cet.index(emprestimo_editar)]
+                    emprestimo_atual = df_emprestimos.iloc[idx_edicao]
                 
-                col_edit1, col_edit2, col_edit3 = st.columns(3)
+                    col_edit1, col_edit2, col_edit3 = st.columns(3)
                 
-                with col_edit1:
-                    st.write("**📊 Dados Atuais:**")
-                    st.write(f"💰 Valor Líquido Recebido: R$ {emprestimo_atual['Valor_Liquido_Recebido']:,.2f}")
-                    st.write(f"📅 Parcelas: {emprestimo_atual['Parcelas_Pagas']}/{emprestimo_atual['Parcelas_Total']}")
-                    st.write(f"💸 Total a Pagar: R$ {emprestimo_atual['Total_A_Pagar']:,.2f}")
+                    with col_edit1:
+                        st.write("**📊 Dados Atuais:**")
+                        st.write(f"💰 Valor Líquido Recebido: R$ {emprestimo_atual['Valor_Liquido_Recebido']:,.2f}")
+                        st.write(f"📅 Parcelas: {emprestimo_atual['Parcelas_Pagas']}/{emprestimo_atual['Parcelas_Total']}")
+                        st.write(f"💸 Total a Pagar: R$ {emprestimo_atual['Total_A_Pagar']:,.2f}")
                 
-                with col_edit2:
-                    st.write("**🎯 Taxa Atual:**")
-                    st.write(f"📊 Taxa de Juros: {emprestimo_atual['Taxa_Juros_Calculada']:.2f}%")
-                    st.write(f"💰 Custo dos Juros: R$ {emprestimo_atual['Custo_Total_Juros']:,.2f}")
+                    with col_edit2:
+                        st.write("**🎯 Taxa Atual:**")
+                        st.write(f"📊 Taxa de Juros: {emprestimo_atual['Taxa_Juros_Calculada']:.2f}%")
+                        st.write(f"💰 Custo dos Juros: R$ {emprestimo_atual['Custo_Total_Juros']:,.2f}")
                     
-                with col_edit3:
-                    st.write("**✏️ Novos Valores:**")
-                    novo_total_pagar = st.number_input("Novo Total a Pagar (R$):", 
-                                                     min_value=0.0, step=10.0, 
-                                                     value=float(emprestimo_atual['Total_A_Pagar']),
-                                                     key="novo_total_pagar")
-                    nova_parcela = st.number_input("Nova Parcela Mensal (R$):", 
-                                                 min_value=0.0, step=1.0, 
-                                                 value=float(emprestimo_atual['Valor_Parcela_Mensal']),
-                                                 key="nova_parcela")
+                    with col_edit3:
+                        st.write("**✏️ Novos Valores:**")
+                        novo_total_pagar = st.number_input("Novo Total a Pagar (R$):", 
+                                                         min_value=0.0, step=10.0, 
+                                                         value=float(emprestimo_atual['Total_A_Pagar']),
+                                                         key="novo_total_pagar")
+                        nova_parcela = st.number_input("Nova Parcela Mensal (R$):", 
+                                                     min_value=0.0, step=1.0, 
+                                                     value=float(emprestimo_atual['Valor_Parcela_Mensal']),
+                                                     key="nova_parcela")
                 
-                motivo_edicao = st.text_area("Motivo da alteração:", 
-                                           placeholder="Ex: Renegociação, erro no cálculo inicial, condições especiais...",
-                                           key="motivo_edicao")
+                    motivo_edicao = st.text_area("Motivo da alteração:", 
+                                               placeholder="Ex: Renegociação, erro no cálculo inicial, condições especiais...",
+                                               key="motivo_edicao")
                 
-                if st.button("💾 Salvar Alterações", key="btn_salvar_edicao"):
-                    if motivo_edicao.strip():
-                        # Recalcular juros com novos valores
-                        novo_custo_juros = novo_total_pagar - emprestimo_atual['Valor_Liquido_Recebido']
-                        nova_taxa_juros = calcular_juros_emprestimo(
-                            emprestimo_atual['Valor_Liquido_Recebido'],
-                            novo_total_pagar,
-                            emprestimo_atual['Parcelas_Total']
-                        )['taxa_juros']
+                    if st.button("💾 Salvar Alterações", key="btn_salvar_edicao"):
+                        if motivo_edicao.strip():
+                            # Recalcular juros com novos valores
+                            novo_custo_juros = novo_total_pagar - emprestimo_atual['Valor_Liquido_Recebido']
+                            nova_taxa_juros = calcular_juros_emprestimo(
+                                emprestimo_atual['Valor_Liquido_Recebido'],
+                                novo_total_pagar,
+                                emprestimo_atual['Parcelas_Total']
+                            )['taxa_juros']
                         
-                        # Atualizar os valores
-                        df_emprestimos.loc[idx_edicao, 'Total_A_Pagar'] = novo_total_pagar
-                        df_emprestimos.loc[idx_edicao, 'Valor_Parcela_Mensal'] = nova_parcela
-                        df_emprestimos.loc[idx_edicao, 'Custo_Total_Juros'] = novo_custo_juros
-                        df_emprestimos.loc[idx_edicao, 'Taxa_Juros_Calculada'] = nova_taxa_juros
+                            # Atualizar os valores
+                            df_emprestimos.loc[idx_edicao, 'Total_A_Pagar'] = novo_total_pagar
+                            df_emprestimos.loc[idx_edicao, 'Valor_Parcela_Mensal'] = nova_parcela
+                            df_emprestimos.loc[idx_edicao, 'Custo_Total_Juros'] = novo_custo_juros
+                            df_emprestimos.loc[idx_edicao, 'Taxa_Juros_Calculada'] = nova_taxa_juros
                         
-                        # Atualizar observações com histórico
-                        obs_atual = str(emprestimo_atual['Observacoes']) if pd.notna(emprestimo_atual['Observacoes']) else ""
-                        nova_obs = f"{obs_atual}\n[{pd.Timestamp.now().strftime('%d/%m/%Y %H:%M')}] CET alterado - {motivo_edicao}"
-                        df_emprestimos.loc[idx_edicao, 'Observacoes'] = nova_obs
+                            # Atualizar observações com histórico
+                            obs_atual = str(emprestimo_atual['Observacoes']) if pd.notna(emprestimo_atual['Observacoes']) else ""
+                            nova_obs = f"{obs_atual}\n[{pd.Timestamp.now().strftime('%d/%m/%Y %H:%M')}] CET alterado - {motivo_edicao}"
+                            df_emprestimos.loc[idx_edicao, 'Observacoes'] = nova_obs
                         
-                        # Salvar
-                        save_csv_data(df_emprestimos, emprestimos_path, 
-                                    f"✅ CET do empréstimo de {emprestimo_atual['Nome']} atualizado!")
-                        st.rerun()
-                    else:
-                        st.warning("⚠️ Por favor, informe o motivo da alteração.")
+                            # Salvar
+                            save_csv_data(df_emprestimos, emprestimos_path, 
+                                        f"✅ CET do empréstimo de {emprestimo_atual['Nome']} atualizado!")
+                            st.rerun()
+                        else:
+                            st.warning("⚠️ Por favor, informe o motivo da alteração.")
+
+        # Simulador: grade antecipação x extra mensal x taxa avaliada de uma vez para todos os ativos
+        if pagaveis(df_emprestimos).any():
+            with st.expander("🧮 Simular Antecipação, Pagamento Extra e Refinanciamento"):
+                col_sim1, col_sim2, col_sim3 = st.columns(3)
+                with col_sim1:
+                    antecipacao_max = st.number_input("Antecipação máxima agora (R$):", min_value=0.0, step=100.0,
+                                                      value=1000.0, key="sim_antecipacao")
+                with col_sim2:
+                    extra_max = st.number_input("Extra mensal máximo (R$):", min_value=0.0, step=50.0,
+                                                value=200.0, key="sim_extra")
+                with col_sim3:
+                    passos_sim = st.slider("Valores por eixo:", 2, 200, 21, key="sim_passos")
+                taxas_texto = st.text_input("Taxas de refinanciamento (% a.m., separadas por vírgula):",
+                                            placeholder="Ex.: 1.8, 2.5", key="sim_taxas")
+                try:
+                    taxas_refin = [float(t.replace('%', '').strip().replace(',', '.')) / 100
+                                   for t in taxas_texto.split(';' if ';' in taxas_texto else ',') if t.strip()]
+                except ValueError:
+                    st.warning("⚠️ Taxas inválidas - simulando só com a taxa do contrato.")
+                    taxas_refin = []
+
+                inicio_sim = time.perf_counter()
+                cenarios = simular(df_emprestimos, np.linspace(0, antecipacao_max, passos_sim),
+                                   np.linspace(0, extra_max, passos_sim), [np.nan] + taxas_refin)
+                st.caption(f"{len(cenarios):,} cenários em {(time.perf_counter() - inicio_sim) * 1000:.0f} ms "
+                           f"(taxa do contrato calculada pela tabela Price)")
+
+                st.write("**Situação atual:**")
+                st.dataframe(situacao(df_emprestimos).drop(columns='Indice').assign(
+                    Taxa_Mensal=lambda t: t['Taxa_Mensal'] * 100), use_container_width=True, hide_index=True)
+                st.write("**Cenário de maior economia por empréstimo:**")
+                st.dataframe(melhores(cenarios).drop(columns='Indice'), use_container_width=True, hide_index=True)
+
+                nomes_sim = cenarios[['Indice', 'Nome', 'Tipo']].drop_duplicates()
+                opcoes_sim = [f"{row.Nome} - {row.Tipo}" for row in nomes_sim.itertuples()]
+                escolhido_sim = nomes_sim['Indice'].iloc[opcoes_sim.index(
+                    st.selectbox("Empréstimo:", opcoes_sim, key="sim_emprestimo"))]
+                taxas_disponiveis = sorted(cenarios.loc[cenarios['Indice'] == escolhido_sim, 'Taxa_Mensal'].unique())
+                taxa_sim = st.selectbox("Taxa (% a.m.):", taxas_disponiveis, format_func=lambda t: f"{t:.2f}%",
+                                        key="sim_taxa")
+                grade_sim = cenarios[(cenarios['Indice'] == escolhido_sim) & (cenarios['Taxa_Mensal'] == taxa_sim)]
+                fig_sim = graficos().density_heatmap(grade_sim, x='Extra_Mensal', y='Antecipacao', z='Juros_Economizados',
+                                                     histfunc='avg', nbinsx=passos_sim, nbinsy=passos_sim,
+                                                     title='Juros economizados (R$) por antecipação e extra mensal')
+                st.plotly_chart(fig_sim, use_container_width=True)
     
     
-    # Controles de gerenciamento
-    if not df_emprestimos.empty:
-        st.subheader("🔧 Gerenciar Empréstimos")
+        # Controles de gerenciamento
+        if not df_emprestimos.empty:
+            st.subheader("🔧 Gerenciar Empréstimos")
         
-        # Seção de pagamento de parcelas
-        st.write("**💳 Registrar Pagamento de Parcela:**")
-        emprestimos_ativos = df_emprestimos[df_emprestimos['Status'] == 'Ativo']
+            # Seção de pagamento de parcelas
+            st.write("**💳 Registrar Pagamento de Parcela:**")
+            emprestimos_ativos = df_emprestimos[df_emprestimos['Status'] == 'Ativo']
         
-        if not emprestimos_ativos.empty:
-            opcoes_pagamento = []
-            indices_pagamento = []
+            if not emprestimos_ativos.empty:
+                opcoes_pagamento = []
+                indices_pagamento = []
             
-            for idx, row in emprestimos_ativos.iterrows():
-                parcelas_restantes = row['Parcelas_Total'] - row['Parcelas_Pagas']
-                if parcelas_restantes > 0:
-                    opcoes_pagamento.append(f"{row['Nome']} - {row['Tipo']} - Parcela {row['Parcelas_Pagas']+1}/{row['Parcelas_Total']} - R$ {row['Valor_Parcela_Mensal']:.2f}")
-                    indices_pagamento.append(idx)
+                for idx, row in emprestimos_ativos.iterrows():
+                    parcelas_restantes = row['Parcelas_Total'] - row['Parcelas_Pagas']
+                    if parcelas_restantes > 0:
+                        opcoes_pagamento.append(f"{row['Nome']} - {row['Tipo']} - Parcela {row['Parcelas_Pagas']+1}/{row['Parcelas_Total']} - R$ {row['Valor_Parcela_Mensal']:.2f}")
+                        indices_pagamento.append(idx)
             
-            if opcoes_pagamento:
-                parcela_pagar = st.selectbox("Selecione a parcela:", opcoes_pagamento, key="pagar_parcela")
-                data_pagamento = st.date_input("Data do Pagamento:", key="data_pagamento")
+                if opcoes_pagamento:
+                    parcela_pagar = st.selectbox("Selecione a parcela:", opcoes_pagamento, key="pagar_parcela")
+                    data_pagamento = st.date_input("Data do Pagamento:", key="data_pagamento")
                 
-                col_btn1, col_btn2 = st.columns(2)
-                with col_btn1:
-                    if st.button("💰 Registrar Pagamento", key="btn_pagar_parcela"):
-                        idx_pagar = indices_pagamento[opcoes_pagamento.index(parcela_pagar)]
-                        row_atual = df_emprestimos.loc[idx_pagar]
+                    col_btn1, col_btn2 = st.columns(2)
+                    with col_btn1:
+                        if st.button("💰 Registrar Pagamento", key="btn_pagar_parcela"):
+                            idx_pagar = indices_pagamento[opcoes_pagamento.index(parcela_pagar)]
+                            row_atual = df_emprestimos.loc[idx_pagar]
                         
-                        # Atualizar parcelas pagas
-                        df_emprestimos.loc[idx_pagar, 'Parcelas_Pagas'] += 1
+                            # Atualizar parcelas pagas
+                            df_emprestimos.loc[idx_pagar, 'Parcelas_Pagas'] += 1
                         
-                        # Verificar se foi quitado
-                        if df_emprestimos.loc[idx_pagar, 'Parcelas_Pagas'] >= df_emprestimos.loc[idx_pagar, 'Parcelas_Total']:
-                            df_emprestimos.loc[idx_pagar, 'Status'] = 'Quitado'
-                            status_msg = "e empréstimo quitado"
-                        else:
-                            status_msg = ""
+                            # Verificar se foi quitado
+                            if df_emprestimos.loc[idx_pagar, 'Parcelas_Pagas'] >= df_emprestimos.loc[idx_pagar, 'Parcelas_Total']:
+                                df_emprestimos.loc[idx_pagar, 'Status'] = 'Quitado'
+                                status_msg = "e empréstimo quitado"
+                            else:
+                                status_msg = ""
                         
-                        # Registrar como despesa se for empréstimo recebido
-                        if row_atual['Tipo'] == 'Recebido':
-                            registrar_pagamento_emprestimo_despesa(row_atual['Nome'], row_atual['Valor_Parcela_Mensal'], data_pagamento)
+                            # Registrar como despesa se for empréstimo recebido
+                            if row_atual['Tipo'] == 'Recebido':
+                                registrar_pagamento_emprestimo_despesa(row_atual['Nome'], row_atual['Valor_Parcela_Mensal'], data_pagamento)
                         
-                        save_csv_data(df_emprestimos, emprestimos_path, f"✅ Parcela registrada {status_msg} e salvo!")
+                            save_csv_data(df_emprestimos, emprestimos_path, f"✅ Parcela registrada {status_msg} e salvo!")
                 
-                with col_btn2:
-                    if st.button("📋 Quitar Totalmente", key="btn_quitar_total"):
-                        idx_quitar = indices_pagamento[opcoes_pagamento.index(parcela_pagar)]
-                        row_atual = df_emprestimos.loc[idx_quitar]
+                    with col_btn2:
+                        if st.button("📋 Quitar Totalmente", key="btn_quitar_total"):
+                            idx_quitar = indices_pagamento[opcoes_pagamento.index(parcela_pagar)]
+                            row_atual = df_emprestimos.loc[idx_quitar]
                         
-                        # Calcular parcelas restantes
-                        parcelas_restantes = row_atual['Parcelas_Total'] - row_atual['Parcelas_Pagas']
-                        # Proteção contra valores None/NaN
-                        valor_parcela = row_atual['Valor_Parcela_Mensal'] if pd.notna(row_atual['Valor_Parcela_Mensal']) else 0
-                        valor_restante = parcelas_restantes * valor_parcela
+                            # Calcular parcelas restantes
+                            parcelas_restantes = row_atual['Parcelas_Total'] - row_atual['Parcelas_Pagas']
+                            # Proteção contra valores None/NaN
+                            valor_parcela = row_atual['Valor_Parcela_Mensal'] if pd.notna(row_atual['Valor_Parcela_Mensal']) else 0
+                            valor_restante = parcelas_restantes * valor_parcela
                         
-                        # Quitar totalmente
-                        df_emprestimos.loc[idx_quitar, 'Parcelas_Pagas'] = row_atual['Parcelas_Total']
-                        df_emprestimos.loc[idx_quitar, 'Status'] = 'Quitado'
+                            # Quitar totalmente
+                            df_emprestimos.loc[idx_quitar, 'Parcelas_Pagas'] = row_atual['Parcelas_Total']
+                            df_emprestimos.loc[idx_quitar, 'Status'] = 'Quitado'
                         
-                        # Registrar valor restante como despesa se for empréstimo recebido
-                        if row_atual['Tipo'] == 'Recebido':
-                            registrar_pagamento_emprestimo_despesa(row_atual['Nome'], valor_restante, data_pagamento)
+                            # Registrar valor restante como despesa se for empréstimo recebido
+                            if row_atual['Tipo'] == 'Recebido':
+                                registrar_pagamento_emprestimo_despesa(row_atual['Nome'], valor_restante, data_pagamento)
                         
-                        save_csv_data(df_emprestimos, emprestimos_path, f"✅ Empréstimo quitado totalmente (R$ {valor_restante:.2f}) e salvo!")
+                            save_csv_data(df_emprestimos, emprestimos_path, f"✅ Empréstimo quitado totalmente (R$ {valor_restante:.2f}) e salvo!")
+                else:
+                    st.info("Nenhuma parcela pendente para pagamento")
+            else:
+                st.info("Nenhum empréstimo ativo")
+
+            # Pagamento em lote: parcelas de vários empréstimos, despesas e status gravados numa única transação
+            st.write("**📦 Pagamento em Lote:**")
+            mascara_pagaveis = pagaveis(df_emprestimos)
+            if mascara_pagaveis.any():
+                pagaveis_lote = df_emprestimos[mascara_pagaveis]
+                rotulos_lote = {idx: f"{row['Nome']} - {row['Tipo']} - Parcela {int(row['Parcelas_Pagas'])+1}/{int(row['Parcelas_Total'])} - R$ {row['Valor_Parcela_Mensal']:.2f}"
+                                for idx, row in pagaveis_lote.iterrows()}
+                vencendo = df_emprestimos.index[vencendo_ate(df_emprestimos, pd.Timestamp.now())]
+                selecionados_lote = st.multiselect("Empréstimos (padrão: parcelas vencendo até este mês):",
+                                                   list(rotulos_lote), default=list(vencendo),
+                                                   format_func=rotulos_lote.get, key="lote_emprestimos")
+                col_lote1, col_lote2 = st.columns(2)
+                with col_lote1:
+                    data_lote = st.date_input("Data do Pagamento:", key="data_pagamento_lote")
+                with col_lote2:
+                    quitar_lote = st.checkbox("Quitar totalmente os selecionados", key="quitar_lote")
+
+                if st.button("💰 Pagar Selecionados", key="btn_pagar_lote", disabled=not selecionados_lote):
+                    df_emprestimos_lote, despesas_lote, resumo_lote = pagar_parcelas(df_emprestimos, selecionados_lote,
+                                                                                     data_lote, quitar_lote)
+                    despesas_path = 'data/despesas.csv'
+                    df_despesas_lote = load_csv_data(despesas_path, ['Membro', 'Categoria', 'Valor', 'Data'])
+                    itens_lote = {emprestimos_path: df_emprestimos_lote}
+                    if not despesas_lote.empty:
+                        try:
+                            duplicadas = indice_duplicados.contem(despesas_path, despesas_lote, ler_ou_vazio)
+                        except Exception as e:
+                            st.warning(f"⚠️ Não foi possível verificar duplicados: {e}")
+                            duplicadas = np.zeros(len(despesas_lote), dtype=bool)
+                        if duplicadas.any():
+                            st.warning(f"⚠️ {int(duplicadas.sum())} pagamento(s) idêntico(s) já existem em {despesas_path}"
+                                       + (" - não lançados como despesa." if POLITICA_DUPLICADOS == "rejeitar" else "."))
+                            if POLITICA_DUPLICADOS == "rejeitar":
+                                despesas_lote = despesas_lote[~np.asarray(duplicadas)]
+                        if not despesas_lote.empty:
+                            alertar_orcamentos(df_despesas_lote, despesas_lote)
+                            alertar_anomalias(df_despesas_lote, despesas_lote)
+                            itens_lote[despesas_path] = safe_concat(df_despesas_lote, despesas_lote)
+                    quitados_lote = int(resumo_lote['Quitado'].sum())
+                    if save_csv_lote(itens_lote, f"✅ {len(resumo_lote)} parcela(s) registrada(s), R$ {resumo_lote['Valor'].sum():,.2f}"
+                                                 f"{f', {quitados_lote} empréstimo(s) quitado(s)' if quitados_lote else ''}"):
+                        st.dataframe(resumo_lote, use_container_width=True)
             else:
                 st.info("Nenhuma parcela pendente para pagamento")
-        else:
-            st.info("Nenhum empréstimo ativo")
             
-        st.divider()
+            st.divider()
         
-        # Seção de exclusão
-        st.write("**🗑️ Excluir Registro:**")
-        opcoes_exclusao_emp = []
-        for idx, row in df_emprestimos.iterrows():
-            opcoes_exclusao_emp.append(f"{row['Nome']} - {row['Tipo']} - R$ {row['Valor_Liquido_Recebido']:.2f} - {row['Status']}")
+            # Seção de exclusão
+            st.write("**🗑️ Excluir Registro:**")
+            opcoes_exclusao_emp = []
+            for idx, row in df_emprestimos.iterrows():
+                opcoes_exclusao_emp.append(f"{row['Nome']} - {row['Tipo']} - R$ {row['Valor_Liquido_Recebido']:.2f} - {row['Status']}")
         
-        registro_exclusao_emp = st.selectbox("Selecione para excluir:", opcoes_exclusao_emp, key="exclusao_emprestimo")
+            registro_exclusao_emp = st.selectbox("Selecione para excluir:", opcoes_exclusao_emp, key="exclusao_emprestimo")
         
-        if st.button("🗑️ Excluir Registro de Empréstimo", type="secondary", key="btn_excluir_emprestimo"):
-            if opcoes_exclusao_emp:  # Verificar se há opções para excluir
-                idx_excluir = opcoes_exclusao_emp.index(registro_exclusao_emp)
-                df_emprestimos, sucesso = safe_delete_record(
-                    df_emprestimos, 
-                    idx_excluir, 
-                    emprestimos_path, 
-                    f"empréstimo de {df_emprestimos.iloc[idx_excluir]['Nome']}"
-                )
-            else:
-                st.warning("⚠️ Nenhum registro disponível para exclusão")
\ No newline at end of file
+            if st.button("🗑️ Excluir Registro de Empréstimo", type="secondary", key="btn_excluir_emprestimo"):
+                if opcoes_exclusao_emp:  # Verificar se há opções para excluir
+                    idx_excluir = opcoes_exclusao_emp.index(registro_exclusao_emp)
+                    df_emprestimos, sucesso = safe_delete_record(
+                        df_emprestimos, 
+                        idx_excluir, 
+                        emprestimos_path, 
+                        f"empréstimo de {df_emprestimos.iloc[idx_excluir]['Nome']}"
+                    )
+                else:
+                    st.warning("⚠️ Nenhum registro disponível para exclusão")
+
+
+# ============================
+# Aba 6 – Patrimônio
+# ============================
+with abas[5]:
+    if abas[5].open:
+        st.header("📈 Patrimônio Líquido")
+        st.caption("Renda efetiva - despesas + rendimentos + saldo de empréstimos (a receber - a pagar - valor emprestado), "
+                   "acumulados pela data de cada lançamento.")
+        frequencia_patrimonio = st.radio("Agrupar por:", ["Mês", "Dia"], horizontal=True, key="frequencia_patrimonio")
+        serie_patrimonio = patrimonio.serie('M' if frequencia_patrimonio == "Mês" else 'D')
+        if serie_patrimonio.empty:
+            st.info("Nenhum lançamento com data para montar a série.")
+        else:
+            ultimo = serie_patrimonio.iloc[-1]
+            colunas_patrimonio = st.columns(len(COMPONENTES_PATRIMONIO) + 1)
+            colunas_patrimonio[0].metric("💎 Patrimônio Líquido", f"R$ {ultimo['Patrimonio']:,.2f}",
+                                         delta=float(ultimo['Patrimonio'] - serie_patrimonio['Patrimonio'].iloc[-2])
+                                         if len(serie_patrimonio) > 1 else None)
+            for coluna, componente in zip(colunas_patrimonio[1:], COMPONENTES_PATRIMONIO):
+                coluna.metric(componente, f"R$ {ultimo[componente]:,.2f}")
+            tabela_patrimonio = serie_patrimonio.reset_index()
+            fig_patrimonio = graficos().line(tabela_patrimonio, x='Data', y='Patrimonio',
+                                             title='Evolução do Patrimônio Líquido')
+            st.plotly_chart(fig_patrimonio, use_container_width=True)
+            fig_componentes = graficos().area(tabela_patrimonio, x='Data', y=COMPONENTES_PATRIMONIO,
+                                              title='Componentes Acumulados')
+            st.plotly_chart(fig_componentes, use_container_width=True)
+
+
+# ============================
+# Atualização automática
+# ============================
+# O que esta execução gravou ou criou (backups, importação, manutenção) já está na tela: a
+# verificação aqui evita que volte como alteração e provoque um rerun a mais nesta sessão
+observador.verificar()
+st.session_state.geracao_vista = observador.geracao()
+
+@st.fragment(run_every=INTERVALO_ATUALIZACAO_SEGUNDOS)
+def acompanhar_alteracoes():
+    """Roda sozinho a cada intervalo: se algum arquivo mudou, descarta só esses conjuntos e refaz a página"""
+    alterados = observador.alterados_desde(st.session_state.geracao_vista)
+    if alterados:
+        for caminho_alterado in alterados:
+            area.descartar(caminho_alterado)
+        st.rerun()
+
+acompanhar_alteracoes()
@@ -0,0 +1,88 @@
+"""Tempo até a primeira renderização do app, medido com o AppTest do Streamlit.
+
+Uso:
+    python src/benchmark_inicio.py --repeticoes 5 --dados data
+
+Cada repetição abre um processo novo (como um servidor recém-iniciado) e mede, na primeira
+sessão, o tempo até o cabeçalho ser enviado (primeira pintura) e até o fim da execução, e
+depois uma segunda sessão no mesmo processo (imports já em cache). Os tempos são da execução
+do script, sem o custo fixo do próprio AppTest. Os dados são copiados
+para uma pasta temporária: o app cria e corrige arquivos ao carregar.
+"""
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+_MEDIR = """
+import json, sys, time
+import streamlit
+import streamlit.runtime.scriptrunner.script_runner as script_runner
+from streamlit.testing.v1 import AppTest
+
+# Marca o início da execução do script (sem o custo fixo do AppTest) e o envio do título
+executar = script_runner.exec_func_with_error_handling
+titulo = streamlit.title
+marcas = {}
+
+def executar_medindo(funcao, contexto):
+    marcas['inicio'] = time.perf_counter()
+    try:
+        return executar(funcao, contexto)
+    finally:
+        marcas['fim'] = time.perf_counter()
+
+def titulo_medindo(*args, **kwargs):
+    marcas.setdefault('titulo', time.perf_counter())
+    return titulo(*args, **kwargs)
+
+script_runner.exec_func_with_error_handling = executar_medindo
+streamlit.title = titulo_medindo
+tempos = []
+for _ in range(2):
+    at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+    if at.exception:
+        raise SystemExit(at.exception[0].value)
+    if not tempos:
+        tempos.append(marcas['titulo'] - marcas['inicio'])
+    tempos.append(marcas['fim'] - marcas['inicio'])
+print(json.dumps(tempos))
+"""
+
+
+def medir(dados, repeticoes=5):
+    """Medianas (s): cabeçalho e execução completa da primeira sessão, e uma nova sessão aquecida"""
+    cabecalhos, primeiras, seguintes = [], [], []
+    for _ in range(repeticoes):
+        with tempfile.TemporaryDirectory() as pasta:
+            shutil.copytree(dados, Path(pasta) / 'data')
+            if (RAIZ / '.streamlit').exists():
+                shutil.copytree(RAIZ / '.streamlit', Path(pasta) / '.streamlit')
+            saida = subprocess.run([sys.executable, '-c', _MEDIR, str(RAIZ / 'src' / 'app.py')], cwd=pasta,
+                                   capture_output=True, text=True, check=True)
+            cabecalho, primeira, seguinte = json.loads(saida.stdout.strip().splitlines()[-1])
+            cabecalhos.append(cabecalho)
+            primeiras.append(primeira)
+            seguintes.append(seguinte)
+    return statistics.median(cabecalhos), statistics.median(primeiras), statistics.median(seguintes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo até a primeira renderização do app")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--dados', default=str(RAIZ / 'data'), help="Pasta dos arquivos de dados")
+    args = parser.parse_args(argv)
+    cabecalho, primeira, seguinte = medir(args.dados, args.repeticoes)
+    print(f"Primeira sessão, até o cabeçalho: {cabecalho * 1000:.0f} ms")
+    print(f"Primeira sessão (processo novo): {primeira * 1000:.0f} ms")
+    print(f"Nova sessão (processo aquecido): {seguinte * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Índice invertido dos campos de texto de todos os conjuntos, com busca por prefixo e sem acentos."""
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from duplicidade import normalizar_texto
+
+# Campos pesquisáveis de cada conjunto
+CAMPOS_BUSCA = {
+    'horas': ['Data', 'Semana', 'Nota'],
+    'familia': ['Membro', 'Tipo', 'Data'],
+    'despesas': ['Membro', 'Categoria', 'Data'],
+    'investimentos': ['Membro', 'Tipo', 'Data'],
+    'emprestimos': ['Nome', 'Tipo', 'Status', 'Observacoes', 'Data_Emprestimo'],
+}
+_TOKEN = r'[0-9a-z]+(?:[-/.][0-9a-z]+)*'
+
+
+def termos(texto):
+    """Termos normalizados de uma consulta (minúsculas, sem acentos)"""
+    return re.findall(_TOKEN, normalizar_texto(pd.Series([texto])).iloc[0])
+
+
+class IndiceConjunto:
+    """Índice invertido no nível dos valores distintos de cada coluna.
+
+    Cada coluna é fatorada (código por linha); só os valores distintos são tokenizados, e o
+    vocabulário ordenado aponta para pares (coluna, código). Rótulos e datas repetem muito, então
+    o custo de montar o índice depende da quantidade de valores distintos, não de linhas.
+    """
+
+    def __init__(self, df, campos):
+        self.df = df
+        self.colunas = [c for c in campos if c in df.columns]
+        self.codigos = []
+        termos_vocab, colunas_vocab, codigos_vocab = [], [], []
+        for posicao, coluna in enumerate(self.colunas):
+            codigos, unicos = pd.factorize(df[coluna])
+            self.codigos.append(codigos)
+            tokens = normalizar_texto(pd.Series(unicos, dtype=object).astype(str)).str.findall(_TOKEN).explode().dropna()
+            termos_vocab.append(tokens.to_numpy(dtype=object))
+            colunas_vocab.append(np.full(len(tokens), posicao, dtype='int16'))
+            codigos_vocab.append(tokens.index.to_numpy(dtype='int64'))
+        if termos_vocab:
+            vocabulario = np.concatenate(termos_vocab)
+            ordem = np.argsort(vocabulario, kind='stable')
+            self.vocabulario = vocabulario[ordem]
+            self.coluna_vocab = np.concatenate(colunas_vocab)[ordem]
+            self.codigo_vocab = np.concatenate(codigos_vocab)[ordem]
+        else:
+            self.vocabulario = np.empty(0, dtype=object)
+            self.coluna_vocab = np.empty(0, dtype='int16')
+            self.codigo_vocab = np.empty(0, dtype='int64')
+
+    def _prefixo(self, termo):
+        """Máscara das linhas com algum valor que tenha um termo começando com `termo`"""
+        ini = np.searchsorted(self.vocabulario, termo, side='left')
+        fim = np.searchsorted(self.vocabulario, termo + '\uffff', side='left')
+        mascara = np.zeros(len(self.df), dtype=bool)
+        if len(self.df) == 0:
+            return mascara
+        for posicao in np.unique(self.coluna_vocab[ini:fim]):
+            # Tabela código -> encontrado: uma indexação por linha, sem ordenar nada
+            alvo = np.zeros(self.codigos[posicao].max() + 2, dtype=bool)
+            alvo[self.codigo_vocab[ini:fim][self.coluna_vocab[ini:fim] == posicao]] = True
+            mascara |= alvo[self.codigos[posicao]]
+        return mascara
+
+    def buscar(self, consulta_termos):
+        """Linhas que contêm todos os termos (cada um como prefixo)"""
+        mascara = np.ones(len(self.df), dtype=bool)
+        for termo in consulta_termos:
+            mascara &= self._prefixo(termo)
+            if not mascara.any():
+                break
+        return np.flatnonzero(mascara)
+
+
+class IndiceBusca:
+    """Índices por conjunto, remontados na primeira busca depois de cada gravação enfileirada do conjunto"""
+
+    def __init__(self):
+        self._indices = {}
+        # Versão enfileirada mais recente de cada conjunto cujo índice ainda não foi remontado
+        self._pendentes = {}
+        self._lock = threading.Lock()
+
+    def atualizar(self, file_path, df):
+        """Nova versão do conjunto: só guarda o DataFrame, sem montar nada na thread de quem grava"""
+        nome = Path(file_path).stem
+        if nome in CAMPOS_BUSCA:
+            with self._lock:
+                self._indices.pop(nome, None)
+                self._pendentes[nome] = df
+
+    def descartar(self, file_path):
+        """Esquece o índice do conjunto (arquivo alterado por fora): reconstruído na próxima busca"""
+        with self._lock:
+            self._indices.pop(Path(file_path).stem, None)
+            self._pendentes.pop(Path(file_path).stem, None)
+
+    def _indice(self, nome, carregar_df, data_dir):
+        with self._lock:
+            indice = self._indices.get(nome)
+            pendente = self._pendentes.get(nome)
+        if indice is not None:
+            return indice
+        df = pendente if pendente is not None else carregar_df(str(Path(data_dir) / f"{nome}.csv"))
+        indice = IndiceConjunto(df.reset_index(drop=True), CAMPOS_BUSCA[nome])
+        with self._lock:
+            # Uma versão enfileirada durante a montagem fica para a próxima busca
+            if self._pendentes.get(nome) is pendente:
+                self._pendentes.pop(nome, None)
+                self._indices[nome] = indice
+        return indice
+
+    def buscar(self, consulta, carregar_df, limite=200, data_dir='data'):
+        """{conjunto: (quantidade, DataFrame com até `limite` linhas)}; conjuntos sem resultado ficam de fora"""
+        consulta_termos = termos(consulta)
+        if not consulta_termos:
+            return {}
+        resultados = {}
+        for nome in CAMPOS_BUSCA:
+            indice = self._indice(nome, carregar_df, data_dir)
+            linhas = indice.buscar(consulta_termos)
+            if len(linhas):
+                resultados[nome] = (len(linhas), indice.df.iloc[linhas[:limite]])
+        return resultados
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def obter_busca(escritor):
+    """Índice de busca do processo, avisado a cada gravação enfileirada no escritor"""
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            _indice = IndiceBusca()
+            escritor.observar(ao_enfileirar=_indice.atualizar)
+        return _indice
@@ -0,0 +1,323 @@
+"""Teste de carga do dashboard: várias sessões simuladas com o AppTest do Streamlit (sem navegador nem rede).
+
+Uso:
+    python src/carga.py --sessoes 4 --passos 20 --linhas 5000 --semente 0
+
+Gera conjuntos sintéticos do tamanho pedido numa pasta temporária e abre as sessões no mesmo
+processo, cada uma em sua thread: como um servidor com várias pessoas da família conectadas,
+elas compartilham o escritor, os índices e os caches. Cada sessão segue um roteiro sorteado de
+passos (trocar de aba, buscar, adicionar despesa, pagar parcela, excluir despesa). No fim, espera
+as gravações e confere os arquivos: latência de cada rerun (p50/p95/p99), gravações por segundo e
+violações de integridade (linhas perdidas, parcelas que não bateram, duplicados, campos inválidos,
+importação que não se desfaz).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+APP = RAIZ / 'src' / 'app.py'
+
+MEMBROS = ['Adhara', 'Breno', 'Sara']
+CATEGORIAS = ['Alimentação', 'Transporte', 'Saúde', 'Educação', 'Lazer', 'Outro']
+ABAS = ['Ganhos', 'Renda', 'Despesas', 'Investimentos', 'Empréstimos']
+# Peso de cada passo no roteiro (navegar e buscar são bem mais comuns que gravar)
+ROTEIRO = {'aba': 40, 'busca': 15, 'despesa': 20, 'pagamento': 10, 'exclusao': 15}
+# Parcelas suficientes para nenhum empréstimo ser quitado durante o teste
+PARCELAS_EMPRESTIMO = 600
+
+
+def _datas(rng, n, inicio='2021-01-01', dias=3 * 365):
+    return (pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, n), unit='D')).strftime('%Y-%m-%d')
+
+
+def gerar_dados(pasta, linhas, semente=0):
+    """Conjuntos sintéticos em pasta/data: `linhas` despesas e os demais proporcionais"""
+    rng = np.random.default_rng(semente)
+    data_dir = Path(pasta) / 'data'
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    pd.DataFrame({
+        'Membro': rng.choice(MEMBROS, linhas), 'Categoria': rng.choice(CATEGORIAS, linhas),
+        'Valor': rng.uniform(5, 800, linhas).round(2), 'Data': _datas(rng, linhas),
+    }).to_csv(data_dir / 'despesas.csv', index=False)
+
+    n = linhas // 10 + 1
+    pd.DataFrame({
+        'Membro': rng.choice(MEMBROS, n), 'Tipo': rng.choice(['Salário', 'Vale', 'Outro'], n),
+        'Valor': rng.uniform(200, 6000, n).round(2), 'Data': _datas(rng, n),
+    }).to_csv(data_dir / 'familia.csv', index=False)
+
+    horas = rng.uniform(1, 9, n).round(2)
+    nota = rng.integers(1, 5, n)
+    usd = horas * 30
+    ajustado = usd * np.select([nota == 4, nota == 3, nota == 2], [1.2, 1.0, 0.5], 0.0)
+    pd.DataFrame({
+        'Data': _datas(rng, n), 'Horas': horas, 'Cotacao': 5.3, 'Semana': rng.integers(1, 53, n), 'Nota': nota,
+        'Valor_USD': usd.round(2), 'Valor_BRL': (usd * 5.3).round(2), 'Valor_Ajustado_USD': ajustado.round(2),
+        'Valor_Ajustado_BRL': (ajustado * 5.3).round(2), 'Pago': rng.random(n) < 0.7,
+    }).to_csv(data_dir / 'horas.csv', index=False)
+
+    n = linhas // 20 + 1
+    pd.DataFrame({
+        'Membro': rng.choice(MEMBROS, n), 'Tipo': rng.choice(['CDB', 'Tesouro', 'Ações'], n),
+        'Valor': rng.uniform(100, 5000, n).round(2), 'Data': _datas(rng, n),
+        'Rendimento': rng.uniform(0, 300, n).round(2),
+    }).to_csv(data_dir / 'investimentos.csv', index=False)
+
+    n = max(3, linhas // 1000)
+    liquido = rng.uniform(1000, 20000, n).round(2)
+    parcela = (liquido * 0.03).round(2)
+    pd.DataFrame({
+        'Nome': [f"{MEMBROS[i % 3]} {i}" for i in range(n)], 'Tipo': np.where(np.arange(n) % 2 == 0, 'Recebido', 'Emprestado'),
+        'Valor_Liquido_Recebido': liquido, 'Parcelas_Total': PARCELAS_EMPRESTIMO,
+        'Total_A_Pagar': (parcela * PARCELAS_EMPRESTIMO).round(2), 'Valor_Parcela_Mensal': parcela,
+        'Parcelas_Pagas': rng.integers(0, 10, n), 'Taxa_Juros_Calculada': 2.5,
+        'Custo_Total_Juros': (parcela * PARCELAS_EMPRESTIMO - liquido).round(2),
+        'Data_Emprestimo': _datas(rng, n, '2020-01-01', 365), 'Status': 'Ativo', 'Observacoes': '',
+    }).to_csv(data_dir / 'emprestimos.csv', index=False)
+    return data_dir
+
+
+class Contagem:
+    """Efeitos esperados das operações bem-sucedidas de todas as sessões"""
+
+    def __init__(self):
+        self.despesas = 0
+        self.parcelas = 0
+        self.erros = []
+        self.latencias = []
+        self._lock = threading.Lock()
+
+    def somar(self, despesas=0, parcelas=0):
+        with self._lock:
+            self.despesas += despesas
+            self.parcelas += parcelas
+
+    def medir(self, sessao, acao, at):
+        inicio = time.perf_counter()
+        at.run()
+        duracao = time.perf_counter() - inicio
+        with self._lock:
+            self.latencias.append((acao, duracao))
+            self.erros.extend(f"sessão {sessao}, {acao}: {e.value}" for e in list(at.exception) + list(at.error))
+        return at
+
+
+def _sucesso(at, trecho):
+    return any(trecho in s.value for s in at.success)
+
+
+def _abrir_aba(sessao, at, aba, contagem):
+    if 'aba_principal' not in at.session_state or at.session_state['aba_principal'] != aba:
+        at.session_state['aba_principal'] = aba
+        contagem.medir(sessao, 'aba', at)
+
+
+def passo_aba(sessao, at, rng, contagem):
+    at.session_state['aba_principal'] = rng.choice(ABAS)
+    contagem.medir(sessao, 'aba', at)
+
+
+def passo_busca(sessao, at, rng, contagem):
+    at.text_input(key='busca_global').set_value(rng.choice(MEMBROS + CATEGORIAS + ['2022', '2023-0']))
+    contagem.medir(sessao, 'busca', at)
+    at.text_input(key='busca_global').set_value('')
+
+
+def passo_despesa(sessao, at, rng, contagem):
+    _abrir_aba(sessao, at, 'Despesas', contagem)
+    [w for w in at.text_input if w.label == 'Nome do membro'][0].set_value(rng.choice(MEMBROS))
+    [w for w in at.number_input if w.label == 'Valor (R$)'][0].set_value(round(rng.uniform(5, 800), 2))
+    [w for w in at.date_input if w.label == 'Data da despesa'][0].set_value(
+        (pd.Timestamp('2021-01-01') + pd.Timedelta(days=rng.randrange(3 * 365))).date())
+    at.button(key='FormSubmitter:form_despesa-Adicionar').click()
+    contagem.medir(sessao, 'despesa', at)
+    if _sucesso(at, 'adicionada'):
+        contagem.somar(despesas=1)
+
+
+def passo_pagamento(sessao, at, rng, contagem):
+    _abrir_aba(sessao, at, 'Empréstimos', contagem)
+    selecao = at.multiselect(key='lote_emprestimos')
+    if not selecao.options:
+        return
+    # Os empréstimos gerados nunca são quitados: as opções são todos eles, na ordem do arquivo
+    escolhido = rng.randrange(len(selecao.options))
+    selecao.set_value([escolhido])
+    at.date_input(key='data_pagamento_lote').set_value(
+        (pd.Timestamp('1990-01-01') + pd.Timedelta(days=rng.randrange(20000))).date())
+    at.button(key='btn_pagar_lote').click()
+    contagem.medir(sessao, 'pagamento', at)
+    if _sucesso(at, 'parcela(s) registrada(s)'):
+        recebido = ' - Recebido - ' in selecao.options[escolhido]
+        repetido = any('idêntico' in w.value for w in at.warning)
+        contagem.somar(despesas=int(recebido and not repetido), parcelas=1)
+
+
+def passo_exclusao(sessao, at, rng, contagem):
+    _abrir_aba(sessao, at, 'Despesas', contagem)
+    opcoes = at.selectbox(key='exclusao_despesa')
+    if not opcoes.options:
+        return
+    opcoes.set_value(rng.choice(opcoes.options))
+    at.button(key='btn_excluir_despesa').click()
+    contagem.medir(sessao, 'exclusao', at)
+    if _sucesso(at, 'excluído'):
+        contagem.somar(despesas=-1)
+
+
+PASSOS = {'aba': passo_aba, 'busca': passo_busca, 'despesa': passo_despesa,
+          'pagamento': passo_pagamento, 'exclusao': passo_exclusao}
+
+
+def sessao(numero, passos, semente, contagem, pausa=0.0):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(semente * 1000 + numero)
+    at = AppTest.from_file(str(APP), default_timeout=300)
+    contagem.medir(numero, 'inicial', at)
+    for _ in range(passos):
+        acao = rng.choices(list(ROTEIRO), weights=list(ROTEIRO.values()))[0]
+        try:
+            PASSOS[acao](numero, at, rng, contagem)
+        except Exception as e:
+            with contagem._lock:
+                contagem.erros.append(f"sessão {numero}, {acao}: {type(e).__name__}: {e}")
+        if pausa:
+            time.sleep(pausa)
+
+
+def verificar(data_dir, inicial, contagem):
+    """Violações de integridade nos arquivos depois de todas as gravações"""
+    from duplicidade import impressoes
+    from particoes import converter_datas, ler_conjunto
+
+    violacoes = []
+    despesas = ler_conjunto(Path(data_dir) / 'despesas.csv')
+    esperadas = inicial['despesas'] + contagem.despesas
+    if len(despesas) != esperadas:
+        violacoes.append(f"despesas: {len(despesas)} linhas no disco, {esperadas} esperadas "
+                         f"({esperadas - len(despesas):+d} perdidas)")
+    emprestimos = ler_conjunto(Path(data_dir) / 'emprestimos.csv')
+    pagas = int(pd.to_numeric(emprestimos['Parcelas_Pagas'], errors='coerce').sum())
+    if pagas != inicial['parcelas'] + contagem.parcelas:
+        violacoes.append(f"emprestimos: {pagas} parcelas pagas no disco, {inicial['parcelas'] + contagem.parcelas} esperadas")
+    acima = (pd.to_numeric(emprestimos['Parcelas_Pagas'], errors='coerce')
+             > pd.to_numeric(emprestimos['Parcelas_Total'], errors='coerce'))
+    if acima.any():
+        violacoes.append(f"emprestimos: {int(acima.sum())} com mais parcelas pagas que o total")
+    repetidas = int(pd.Series(impressoes(despesas, 'despesas.csv')).duplicated().sum())
+    if repetidas > inicial['repetidas']:
+        violacoes.append(f"despesas: {repetidas - inicial['repetidas']} lançamentos duplicados novos")
+    for coluna in ['Membro', 'Categoria', 'Valor', 'Data']:
+        vazias = int(despesas[coluna].isna().sum())
+        if vazias:
+            violacoes.append(f"despesas: {vazias} linhas sem {coluna}")
+    invalidas = int(converter_datas(despesas['Data']).isna().sum() - despesas['Data'].isna().sum())
+    if invalidas:
+        violacoes.append(f"despesas: {invalidas} datas inválidas")
+    return violacoes
+
+
+def verificar_importacao(data_dir):
+    """Importa despesas com valores inteiros (como vêm de planilhas) e desfaz: o arquivo tem de voltar igual"""
+    from historico import HistoricoOperacoes, linhas_csv
+    from importacao import importar
+    from particoes import ler_conjunto
+
+    destino = Path(data_dir) / 'despesas.csv'
+    antes = ler_conjunto(destino)
+    origem = Path(data_dir).parent / 'importacao.csv'
+    pd.DataFrame({'Membro': MEMBROS, 'Categoria': CATEGORIAS[:3], 'Valor': ['10', '20', '30'],
+                  'Data': ['2030-01-01', '2030-01-02', '2030-01-03']}).to_csv(origem, index=False)
+    historico = HistoricoOperacoes(Path(data_dir).parent / 'historico_importacao.jsonl')
+    try:
+        importar(origem, 'despesas', data_dir, pular_duplicados=True, historico=historico)
+        [(_, desfeito, _)] = historico.desfazer(ler_conjunto)
+    except Exception as e:
+        return [f"importação: desfazer falhou ({e})"]
+    if sorted(linhas_csv(desfeito, destino)[1]) != sorted(linhas_csv(antes, destino)[1]):
+        return ["importação: desfazer não devolveu as despesas de antes"]
+    return []
+
+
+def executar(sessoes=4, passos=20, linhas=5000, semente=0, pausa=0.0):
+    """Roda o teste de carga numa pasta temporária; retorna latências, gravações e violações"""
+    from duplicidade import impressoes
+
+    with tempfile.TemporaryDirectory() as pasta:
+        data_dir = gerar_dados(pasta, linhas, semente)
+        despesas = pd.read_csv(data_dir / 'despesas.csv')
+        inicial = {'despesas': len(despesas),
+                   'parcelas': int(pd.read_csv(data_dir / 'emprestimos.csv')['Parcelas_Pagas'].sum()),
+                   'repetidas': int(pd.Series(impressoes(despesas, 'despesas.csv')).duplicated().sum())}
+        # O app usa caminhos relativos (data/...)
+        anterior = os.getcwd()
+        os.chdir(pasta)
+        try:
+            contagem = Contagem()
+            # Primeira execução sozinha: cria os singletons do processo (escritor, índices) como um servidor recém-iniciado
+            sessao(0, 0, semente, contagem)
+            from escrita import obter_escritor
+            escritor = obter_escritor()
+            gravacoes = []
+            escritor.observar(ao_gravar=lambda caminho, df: gravacoes.append(time.perf_counter()))
+
+            inicio = time.perf_counter()
+            threads = [threading.Thread(target=sessao, args=(numero, passos, semente, contagem, pausa))
+                       for numero in range(1, sessoes + 1)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            escritor.aguardar(timeout=60)
+            duracao = time.perf_counter() - inicio
+            violacoes = verificar(data_dir, inicial, contagem) + verificar_importacao(data_dir)
+        finally:
+            os.chdir(anterior)
+
+    latencias = pd.DataFrame(contagem.latencias, columns=['Acao', 'Segundos'])
+    return {'latencias': latencias, 'gravacoes': len(gravacoes), 'duracao': duracao,
+            'violacoes': violacoes, 'erros': contagem.erros}
+
+
+def percentis(latencias):
+    """p50/p95/p99 (ms) por ação e no total"""
+    linhas = []
+    for acao, grupo in list(latencias.groupby('Acao')) + [('total', latencias)]:
+        p50, p95, p99 = np.percentile(grupo['Segundos'], [50, 95, 99]) * 1000
+        linhas.append({'Acao': acao, 'Reruns': len(grupo), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99})
+    return pd.DataFrame(linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do dashboard com sessões simuladas")
+    parser.add_argument('--sessoes', type=int, default=4)
+    parser.add_argument('--passos', type=int, default=20, help="Passos do roteiro por sessão")
+    parser.add_argument('--linhas', type=int, default=5000, help="Despesas geradas (os demais conjuntos são proporcionais)")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--pausa', type=float, default=0.0, help="Segundos entre os passos de cada sessão")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.sessoes, args.passos, args.linhas, args.semente, args.pausa)
+    print(percentis(resultado['latencias']).to_string(index=False, float_format='{:.0f}'.format))
+    print(f"\nGravações: {resultado['gravacoes']} em {resultado['duracao']:.1f} s "
+          f"({resultado['gravacoes'] / resultado['duracao']:.2f}/s)")
+    for titulo, itens in (("Erros", resultado['erros']), ("Violações de integridade", resultado['violacoes'])):
+        print(f"\n{titulo}: {len(itens)}")
+        for item in itens:
+            print(f"  - {item}")
+    return 1 if resultado['violacoes'] or resultado['erros'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
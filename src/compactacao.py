@@ -0,0 +1,102 @@
+"""Representação compacta dos conjuntos carregados: categorias, inteiros pequenos, bool e centavos exatos."""
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+# Colunas de rótulo (viram category), com os valores conhecidos que podem ser atribuídos depois do
+# carregamento. As datas também: repetem-se muito e continuam aceitando .str e pd.to_datetime
+ROTULOS = {
+    'horas': {'Data': []},
+    'familia': {'Membro': [], 'Tipo': [], 'Data': []},
+    'despesas': {'Membro': [], 'Categoria': [], 'Data': []},
+    'investimentos': {'Membro': [], 'Tipo': [], 'Data': []},
+    'emprestimos': {'Nome': [], 'Tipo': ['Emprestado', 'Recebido'], 'Status': ['Ativo', 'Quitado'], 'Data_Emprestimo': []},
+}
+DINHEIRO = {
+    'horas': ['Valor_USD', 'Valor_BRL', 'Valor_Ajustado_USD', 'Valor_Ajustado_BRL'],
+    'familia': ['Valor'],
+    'despesas': ['Valor'],
+    'investimentos': ['Valor', 'Rendimento'],
+    'emprestimos': ['Valor_Liquido_Recebido', 'Total_A_Pagar', 'Valor_Parcela_Mensal', 'Custo_Total_Juros'],
+}
+INTEIROS = {
+    'horas': ['Nota'],
+    'emprestimos': ['Parcelas_Total', 'Parcelas_Pagas'],
+}
+BOOLEANOS = {
+    'horas': ['Pago'],
+}
+
+
+def _conjunto(file_path):
+    return Path(file_path).stem
+
+
+def memoria(df):
+    """Bytes ocupados pelo DataFrame, incluindo o conteúdo das strings"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _inteiro_pequeno(serie):
+    """Menor inteiro que comporta os valores (nullable se houver vazios); não inteiros ficam como estão"""
+    numeros = pd.to_numeric(serie, errors='coerce')
+    validos = numeros.dropna()
+    if not (validos == validos.round()).all():
+        return serie
+    maximo = validos.abs().max() if not validos.empty else 0
+    bits = 8 if maximo < 2**7 else 16 if maximo < 2**15 else 32 if maximo < 2**31 else 64
+    return numeros.astype(f"Int{bits}" if numeros.isna().any() else f"int{bits}")
+
+
+def compactar(df, file_path):
+    """Converte os tipos do conjunto: rótulos em category, Nota/Parcelas em inteiros pequenos,
+    Pago em bool e dinheiro arredondado a centavos (sem resíduos como 137.10000000000002).
+
+    O dinheiro continua float64: int64 em centavos ocuparia o mesmo espaço e obrigaria todo o
+    app a converter na exibição. Sempre devolve uma cópia; conjuntos desconhecidos só são copiados.
+    """
+    df = df.copy()
+    nome = _conjunto(file_path)
+    if nome not in ROTULOS or df.empty:
+        return df
+    for coluna, conhecidos in ROTULOS[nome].items():
+        if coluna in df.columns and not pd.api.types.is_datetime64_any_dtype(df[coluna]):
+            texto = df[coluna].astype(object)
+            texto = texto.where(texto.isna(), texto.astype(str))
+            categorias = pd.unique(pd.concat([pd.Series(conhecidos, dtype=object), texto.dropna()]))
+            df[coluna] = pd.Categorical(texto, categories=categorias)
+    for coluna in DINHEIRO.get(nome, []):
+        if coluna in df.columns:
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').round(2)
+    for coluna in INTEIROS.get(nome, []):
+        if coluna in df.columns:
+            df[coluna] = _inteiro_pequeno(df[coluna])
+    for coluna in BOOLEANOS.get(nome, []):
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(str).str.lower().isin(['true', '1']).astype(bool)
+    return df
+
+
+def relatorio_memoria(dados):
+    """Memória por conjunto antes e depois da compactação"""
+    linhas = []
+    for nome, df in dados.items():
+        antes = memoria(df)
+        depois = memoria(compactar(df, f"{nome}.csv"))
+        linhas.append({'Conjunto': nome, 'Linhas': len(df), 'Antes_KB': antes / 1024, 'Depois_KB': depois / 1024,
+                       'Reducao': antes / depois if depois else 1.0})
+    return pd.DataFrame(linhas, columns=['Conjunto', 'Linhas', 'Antes_KB', 'Depois_KB', 'Reducao'])
+
+
+def main(argv=None):
+    from dados import DATA_DIR, carregar_todos
+
+    parser = argparse.ArgumentParser(description="Memória dos conjuntos antes e depois da compactação")
+    parser.add_argument('--dados', default=DATA_DIR, help="Pasta dos arquivos de dados")
+    args = parser.parse_args(argv)
+    print(relatorio_memoria(carregar_todos(args.dados)).to_string(index=False, float_format='{:.1f}'.format))
+
+
+if __name__ == '__main__':
+    main()
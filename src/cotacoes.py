@@ -0,0 +1,93 @@
+"""Série local de cotações USD/BRL e reavaliação em lote dos ganhos freelancer pendentes."""
+import numpy as np
+import pandas as pd
+
+COTACOES_PATH = 'data/cotacoes.csv'
+COLUNAS_COTACOES = ['Data', 'Cotacao']
+
+# Nomes aceitos na importação, além de Data/Cotacao
+_ALIASES = {
+    'data': 'Data', 'date': 'Data', 'dia': 'Data',
+    'cotacao': 'Cotacao', 'cotação': 'Cotacao', 'usd_brl': 'Cotacao', 'usdbrl': 'Cotacao',
+    'rate': 'Cotacao', 'close': 'Cotacao', 'fechamento': 'Cotacao', 'valor': 'Cotacao',
+}
+
+
+def normalizar_cotacoes(df):
+    """Padroniza colunas, descarta linhas inválidas e ordena por data (uma cotação por dia)"""
+    df = df.rename(columns=lambda c: _ALIASES.get(str(c).strip().lower(), c))
+    if not set(COLUNAS_COTACOES) <= set(df.columns):
+        raise ValueError("O arquivo precisa ter colunas de data e cotação (ex.: Data, Cotacao)")
+    df = df[COLUNAS_COTACOES].copy()
+    df['Data'] = pd.to_datetime(df['Data'], errors='coerce', dayfirst=False, format='mixed')
+    cotacao = df['Cotacao']
+    if not pd.api.types.is_numeric_dtype(cotacao):
+        # Aceitar vírgula decimal (5,31)
+        cotacao = cotacao.astype(str).str.replace(',', '.', regex=False)
+    df['Cotacao'] = pd.to_numeric(cotacao, errors='coerce')
+    df = df.dropna()
+    df = df[df['Cotacao'] > 0]
+    df['Data'] = df['Data'].dt.normalize()
+    return df.drop_duplicates('Data', keep='last').sort_values('Data').reset_index(drop=True)
+
+
+def mesclar_cotacoes(existentes, novas):
+    """Junta a série existente com a importada; em datas repetidas vale a importada"""
+    if existentes is None or existentes.empty:
+        return normalizar_cotacoes(novas)
+    return normalizar_cotacoes(pd.concat([existentes, novas], ignore_index=True))
+
+
+def cotacao_em(cotacoes, datas):
+    """Cotação vigente em cada data (última cotação até a data), via searchsorted.
+
+    Datas anteriores ao início da série retornam NaN.
+    """
+    serie_datas = cotacoes['Data'].to_numpy(dtype='datetime64[ns]')
+    valores = cotacoes['Cotacao'].to_numpy(dtype=float)
+    alvo = pd.to_datetime(pd.Series(datas), errors='coerce').dt.normalize().to_numpy(dtype='datetime64[ns]')
+    pos = np.searchsorted(serie_datas, alvo, side='right') - 1
+    resultado = np.where(pos >= 0, valores[np.clip(pos, 0, None)] if len(valores) else np.nan, np.nan)
+    return np.where(np.isnat(alvo), np.nan, resultado)
+
+
+def _mascara_pendentes(df_horas):
+    return ~df_horas['Pago'].astype(str).str.lower().isin(['true', '1'])
+
+
+def reavaliar_pendentes(df_horas, cotacao=None, cotacoes=None):
+    """Recalcula Cotacao/Valor_BRL/Valor_Ajustado_BRL de todos os registros não pagos.
+
+    Usa `cotacao` fixa ou, se omitida, a cotação da série vigente na data de cada registro.
+    Retorna o novo DataFrame e a quantidade de registros alterados.
+    """
+    df = df_horas.copy()
+    pendentes = _mascara_pendentes(df).to_numpy()
+    if cotacao is not None:
+        novas = np.full(len(df), float(cotacao))
+    else:
+        novas = cotacao_em(cotacoes, df['Data'])
+    alterar = pendentes & ~np.isnan(novas)
+
+    usd = pd.to_numeric(df['Valor_USD'], errors='coerce').to_numpy(dtype=float)
+    usd_ajustado = pd.to_numeric(df['Valor_Ajustado_USD'], errors='coerce').to_numpy(dtype=float)
+    for coluna, valores in (('Cotacao', novas),
+                            ('Valor_BRL', np.round(usd * novas, 2)),
+                            ('Valor_Ajustado_BRL', np.round(usd_ajustado * novas, 2))):
+        atual = pd.to_numeric(df[coluna], errors='coerce').to_numpy(dtype=float)
+        df[coluna] = np.where(alterar, valores, atual)
+    return df, int(alterar.sum())
+
+
+def sensibilidade(df_horas, cotacoes_teste):
+    """Projeção em BRL dos pendentes para cada cotação de teste"""
+    pendentes = df_horas[_mascara_pendentes(df_horas)]
+    usd = pd.to_numeric(pendentes['Valor_Ajustado_USD'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    brl_atual = pd.to_numeric(pendentes['Valor_Ajustado_BRL'], errors='coerce').fillna(0).sum()
+    taxas = np.asarray(cotacoes_teste, dtype=float)
+    projecao = usd.sum() * taxas
+    return pd.DataFrame({
+        'Cotacao': taxas,
+        'Projecao_BRL': projecao,
+        'Diferenca_BRL': projecao - brl_atual,
+    })
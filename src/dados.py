@@ -0,0 +1,92 @@
+"""Carregamento dos conjuntos de dados sem dependência do Streamlit (app, CLI e serviços)."""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from particoes import ler_conjunto, particionado
+
+DATA_DIR = 'data'
+CONJUNTOS = ['horas', 'familia', 'despesas', 'investimentos', 'emprestimos']
+
+
+def caminho(nome, data_dir=DATA_DIR):
+    return str(Path(data_dir) / f"{nome}.csv")
+
+
+def get_default_columns(file_path):
+    """Retorna colunas padrão baseadas no nome do arquivo"""
+    if 'horas' in file_path:
+        return ['Data', 'Horas', 'Cotacao', 'Semana', 'Nota', 'Valor_USD', 'Valor_BRL', 'Valor_Ajustado_USD', 'Valor_Ajustado_BRL', 'Pago']
+    elif 'familia' in file_path:
+        return ['Membro', 'Tipo', 'Valor', 'Data']
+    elif 'despesas' in file_path:
+        return ['Membro', 'Categoria', 'Valor', 'Data']
+    elif 'investimentos' in file_path:
+        return ['Membro', 'Tipo', 'Valor', 'Data', 'Rendimento']
+    elif 'recorrencias' in file_path:
+        return ['Membro', 'Tipo', 'Valor', 'Dia', 'Inicio', 'Fim', 'Reajuste_Pct', 'Mes_Reajuste']
+    elif 'orcamentos' in file_path:
+        return ['Categoria', 'Membro', 'Limite']
+    elif 'cotacoes' in file_path:
+        return ['Data', 'Cotacao']
+    elif 'emprestimos' in file_path:
+        return ['Nome', 'Tipo', 'Valor_Liquido_Recebido', 'Parcelas_Total', 'Total_A_Pagar', 'Valor_Parcela_Mensal', 'Parcelas_Pagas', 'Taxa_Juros_Calculada', 'Custo_Total_Juros', 'Data_Emprestimo', 'Status', 'Observacoes']
+    else:
+        return []
+
+
+def processar_dados_emprestimos(df_emprestimos):
+    """Processa dados de empréstimos preservando valores personalizados do CSV"""
+    if df_emprestimos.empty:
+        return df_emprestimos
+    
+    df_processed = df_emprestimos.copy()
+    
+    # Garantir que colunas numéricas sejam do tipo correto
+    colunas_numericas = ['Valor_Liquido_Recebido', 'Taxa_Juros_Calculada', 'Parcelas_Total', 'Parcelas_Pagas', 
+                        'Total_A_Pagar', 'Valor_Parcela_Mensal', 'Custo_Total_Juros']
+    
+    for col in colunas_numericas:
+        if col in df_processed.columns:
+            df_processed[col] = pd.to_numeric(df_processed[col], errors='coerce').fillna(0)
+    
+    # Adicionar colunas calculadas para exibição (sem sobrescrever dados do CSV)
+    df_processed['Parcelas_Restantes'] = df_processed['Parcelas_Total'] - df_processed['Parcelas_Pagas']
+    
+    # Proteção contra valores None/NaN na multiplicação
+    df_processed['Valor_Parcela_Mensal'] = df_processed['Valor_Parcela_Mensal'].fillna(0)
+    df_processed['Valor_Restante'] = df_processed['Parcelas_Restantes'] * df_processed['Valor_Parcela_Mensal']
+    
+    # Proteção contra divisão por zero
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df_processed['Progresso'] = np.where(
+            df_processed['Parcelas_Total'] > 0,
+            (df_processed['Parcelas_Pagas'] / df_processed['Parcelas_Total'] * 100).round(1),
+            0
+        )
+    
+    return df_processed
+
+
+def carregar(file_path, meses=None, inicio=None, fim=None):
+    """Lê um conjunto do disco garantindo as colunas padrão (não cria nem corrige arquivos)"""
+    columns = get_default_columns(str(file_path))
+    if not (Path(file_path).exists() or particionado(file_path)):
+        return pd.DataFrame(columns=columns)
+    df = ler_conjunto(file_path, meses, inicio, fim)
+    for col in columns:
+        if col not in df.columns:
+            df[col] = None
+    return df
+
+
+def carregar_todos(data_dir=DATA_DIR, inicio=None, fim=None):
+    """Carrega os cinco conjuntos; o filtro de datas não se aplica a empréstimos (estado atual)"""
+    dados = {}
+    for nome in CONJUNTOS:
+        if nome == 'emprestimos':
+            dados[nome] = processar_dados_emprestimos(carregar(caminho(nome, data_dir)))
+        else:
+            dados[nome] = carregar(caminho(nome, data_dir), inicio=inicio, fim=fim)
+    return dados
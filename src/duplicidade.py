@@ -0,0 +1,253 @@
+"""Índice de impressões digitais (hash dos campos-chave normalizados) para detectar duplicados."""
+import atexit
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from particoes import assinatura_arquivo, converter_datas
+
+INDICES_DIR = 'data/indices'
+# Segundos entre a gravação de um conjunto e a regravação da cópia persistida do índice
+INTERVALO_PERSISTENCIA = 30.0
+
+# Campos que identificam um lançamento em cada conjunto
+CAMPOS_CHAVE = {
+    'horas': {'datas': ['Data'], 'valores': ['Horas'], 'textos': ['Semana']},
+    'familia': {'datas': ['Data'], 'valores': ['Valor'], 'textos': ['Membro', 'Tipo']},
+    'despesas': {'datas': ['Data'], 'valores': ['Valor'], 'textos': ['Membro', 'Categoria']},
+    'investimentos': {'datas': ['Data'], 'valores': ['Valor'], 'textos': ['Membro', 'Tipo']},
+    'emprestimos': {'datas': ['Data_Emprestimo'], 'valores': ['Valor_Liquido_Recebido'], 'textos': ['Nome', 'Tipo']},
+}
+
+
+def normalizar_texto(serie):
+    """Minúsculas, sem espaços nas pontas e sem acentos ('Empréstimo' == 'emprestimo')"""
+    return (serie.astype(str).str.strip().str.lower()
+            .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii'))
+
+
+def chaves_normalizadas(df, file_path):
+    """Campos-chave normalizados: textos sem acento, valores em centavos, datas como YYYYMMDD"""
+    campos = CAMPOS_CHAVE[Path(file_path).stem]
+    colunas = {}
+    for coluna in campos['textos']:
+        colunas[coluna] = normalizar_texto(df[coluna]) if coluna in df.columns else ''
+    for coluna in campos['valores']:
+        valores = pd.to_numeric(df[coluna], errors='coerce') if coluna in df.columns else pd.Series(np.nan, index=df.index)
+        colunas[coluna] = (valores * 100).round().fillna(-1).astype('int64')
+    for coluna in campos['datas']:
+        datas = converter_datas(df[coluna]) if coluna in df.columns else pd.Series(pd.NaT, index=df.index)
+        colunas[coluna] = (datas.dt.year * 10000 + datas.dt.month * 100 + datas.dt.day).fillna(-1).astype('int64')
+    return pd.DataFrame(colunas, index=df.index)
+
+
+def impressoes(df, file_path):
+    """Hash de 64 bits por linha, calculado de forma vetorizada"""
+    if df.empty:
+        return np.empty(0, dtype='uint64')
+    return pd.util.hash_pandas_object(chaves_normalizadas(df, file_path), index=False).to_numpy()
+
+
+def _brutos(df, file_path):
+    """Hash das colunas-chave sem normalizar: barato, serve só para achar as linhas que mudaram"""
+    campos = CAMPOS_CHAVE[Path(file_path).stem]
+    colunas = [c for c in campos['textos'] + campos['valores'] + campos['datas'] if c in df.columns]
+    if df.empty or not colunas:
+        return np.zeros(len(df), dtype='uint64')
+    return pd.util.hash_pandas_object(df[colunas], index=False).to_numpy()
+
+
+def _chaves(hashes):
+    """Hash de cada linha com o número da ocorrência: linhas repetidas continuam distinguíveis no diff"""
+    serie = pd.Series(hashes)
+    return pd.MultiIndex.from_arrays([serie, serie.groupby(serie).cumcount()])
+
+
+def relatorio_duplicados(df, file_path):
+    """Linhas cujo lançamento aparece mais de uma vez, agrupadas e com a contagem"""
+    if df.empty:
+        return df.assign(Grupo=pd.Series(dtype='int64'), Ocorrencias=pd.Series(dtype='int64'))
+    hashes = pd.Series(impressoes(df, file_path), index=df.index)
+    repetido = hashes.duplicated(keep=False)
+    grupos = hashes[repetido]
+    relatorio = df[repetido].copy()
+    relatorio['Grupo'] = pd.factorize(grupos)[0] + 1
+    relatorio['Ocorrencias'] = grupos.map(grupos.value_counts()).to_numpy()
+    return relatorio.sort_values(['Grupo']).reset_index().rename(columns={'index': 'Linha'})
+
+
+def remover_duplicados(df, file_path):
+    """Mantém apenas a primeira ocorrência de cada lançamento"""
+    if df.empty:
+        return df, 0
+    repetido = pd.Series(impressoes(df, file_path), index=df.index).duplicated(keep='first')
+    return df[~repetido].reset_index(drop=True), int(repetido.sum())
+
+
+class IndiceDuplicidade:
+    """Contagem de impressões por conjunto, mantida em memória e persistida em data/indices.
+
+    O índice em memória é atualizado quando a gravação é enfileirada (já cobre cliques duplos
+    antes de o arquivo chegar ao disco): só as linhas incluídas e removidas em relação à versão
+    anterior são normalizadas e contadas. A cópia persistida é regravada no máximo a cada
+    INTERVALO_PERSISTENCIA segundos e ao encerrar o processo, com a versão que está no disco.
+    """
+
+    def __init__(self, indices_dir=INDICES_DIR, intervalo=INTERVALO_PERSISTENCIA):
+        self.indices_dir = Path(indices_dir)
+        self.intervalo = intervalo
+        self._contagens = {}
+        self._linhas = {}  # caminho -> (DataFrame, hashes brutos, impressões) da última versão aplicada
+        self._gravados = {}  # caminho -> (assinatura, impressões) da versão gravada ainda não persistida
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def _arquivos(self, file_path):
+        nome = Path(file_path).stem
+        return self.indices_dir / f"{nome}.npz", self.indices_dir / f"{nome}.json"
+
+    def sincronizar(self, file_path, df):
+        impressoes_df = impressoes(df, file_path)
+        hashes, contagens = np.unique(impressoes_df, return_counts=True)
+        with self._lock:
+            self._contagens[str(Path(file_path))] = dict(zip(hashes.tolist(), contagens.tolist()))
+            self._linhas[str(Path(file_path))] = (df, _brutos(df, file_path), impressoes_df)
+
+    def aplicar(self, file_path, df):
+        """Nova versão enfileirada: conta as linhas incluídas e desconta as removidas"""
+        caminho = str(Path(file_path))
+        with self._lock:
+            anterior = self._linhas.get(caminho) if caminho in self._contagens else None
+            if anterior is None:
+                self.sincronizar(file_path, df)
+                return
+            _, brutos_antes, impressoes_antes = anterior
+            brutos = _brutos(df, file_path)
+            n = len(brutos_antes)
+            if len(brutos) >= n and np.array_equal(brutos[:n], brutos_antes):
+                # Caso comum: linhas acrescentadas ao fim
+                removidas = np.empty(0, dtype='uint64')
+                incluidas = impressoes(df.iloc[n:], file_path)
+                impressoes_df = np.concatenate([impressoes_antes, incluidas])
+            else:
+                posicoes = _chaves(brutos_antes).get_indexer(_chaves(brutos))
+                mantidas = np.zeros(n, dtype=bool)
+                mantidas[posicoes[posicoes >= 0]] = True
+                removidas = impressoes_antes[~mantidas]
+                impressoes_df = np.empty(len(brutos), dtype='uint64')
+                impressoes_df[posicoes >= 0] = impressoes_antes[posicoes[posicoes >= 0]]
+                incluidas = impressoes(df[posicoes < 0], file_path)
+                impressoes_df[posicoes < 0] = incluidas
+            contagens = self._contagens[caminho]
+            for hash_, quantidade in zip(*np.unique(incluidas, return_counts=True)):
+                contagens[int(hash_)] = contagens.get(int(hash_), 0) + int(quantidade)
+            for hash_, quantidade in zip(*np.unique(removidas, return_counts=True)):
+                restante = contagens.get(int(hash_), 0) - int(quantidade)
+                if restante > 0:
+                    contagens[int(hash_)] = restante
+                else:
+                    contagens.pop(int(hash_), None)
+            self._linhas[caminho] = (df, brutos, impressoes_df)
+
+    def persistir(self, file_path, df, impressoes_df=None, assinatura=None):
+        """Grava as contagens de `df` (ou das impressões já calculadas) com a assinatura do arquivo"""
+        arquivo_npz, arquivo_meta = self._arquivos(file_path)
+        self.indices_dir.mkdir(parents=True, exist_ok=True)
+        hashes, contagens = np.unique(impressoes(df, file_path) if impressoes_df is None else impressoes_df,
+                                      return_counts=True)
+        np.savez(arquivo_npz, hashes=hashes, contagens=contagens)
+        assinatura = assinatura_arquivo(file_path) if assinatura is None else assinatura
+        arquivo_meta.write_text(json.dumps({'assinatura': assinatura}))
+
+    def gravado(self, file_path, df):
+        """Versão no disco: a cópia persistida é regravada depois, sem recalcular as impressões"""
+        caminho = str(Path(file_path))
+        with self._lock:
+            linhas = self._linhas.get(caminho)
+            if linhas is None or linhas[0] is not df:
+                # Já há versão mais nova enfileirada: a gravação dela agenda a persistência
+                return
+            # Assinatura de agora: se o arquivo mudar de novo antes de persistir, a cópia fica
+            # desatualizada e é reconstruída na próxima consulta
+            self._gravados[caminho] = (assinatura_arquivo(caminho), linhas[2])
+            if self._timer is None:
+                self._timer = threading.Timer(self.intervalo, self.persistir_gravados)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def persistir_gravados(self):
+        """Regrava as cópias persistidas dos conjuntos gravados desde a última vez"""
+        with self._lock:
+            gravados, self._gravados, self._timer = self._gravados, {}, None
+        for caminho, (assinatura, impressoes_df) in gravados.items():
+            self.persistir(caminho, None, impressoes_df, assinatura)
+
+    def descartar(self, file_path):
+        """Esquece as contagens em memória; a próxima consulta confere a cópia persistida com o arquivo"""
+        with self._lock:
+            self._contagens.pop(str(Path(file_path)), None)
+            self._linhas.pop(str(Path(file_path)), None)
+            self._gravados.pop(str(Path(file_path)), None)
+
+    def _garantir(self, file_path, carregar_df):
+        caminho = str(Path(file_path))
+        with self._lock:
+            if caminho in self._contagens:
+                return
+        arquivo_npz, arquivo_meta = self._arquivos(file_path)
+        if arquivo_npz.exists() and arquivo_meta.exists():
+            meta = json.loads(arquivo_meta.read_text())
+            if meta.get('assinatura') == assinatura_arquivo(file_path):
+                dados = np.load(arquivo_npz)
+                with self._lock:
+                    self._contagens[caminho] = dict(zip(dados['hashes'].tolist(), dados['contagens'].tolist()))
+                return
+        # Índice ausente ou desatualizado (arquivo editado fora do app): reconstruir
+        df = carregar_df(file_path)
+        self.sincronizar(file_path, df)
+        self.persistir(file_path, df)
+
+    def contem(self, file_path, novos, carregar_df):
+        """Para cada linha de `novos`, indica se o lançamento já existe (consulta O(1) por linha)"""
+        self._garantir(file_path, carregar_df)
+        with self._lock:
+            contagens = self._contagens[str(Path(file_path))]
+            return np.array([h in contagens for h in impressoes(novos, file_path).tolist()], dtype=bool)
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def obter_indice(escritor, indices_dir=INDICES_DIR):
+    """Índice compartilhado pelo processo, ligado às gravações do escritor uma única vez"""
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            _indice = IndiceDuplicidade(indices_dir)
+            escritor.observar(_aplicar_se_indexado, _gravado_se_indexado)
+            atexit.register(_encerrar, escritor)
+        return _indice
+
+
+def _indexado(file_path):
+    return Path(file_path).stem in CAMPOS_CHAVE
+
+
+def _aplicar_se_indexado(file_path, df):
+    if _indexado(file_path):
+        _indice.aplicar(file_path, df)
+
+
+def _gravado_se_indexado(file_path, df):
+    if _indexado(file_path):
+        _indice.gravado(file_path, df)
+
+
+def _encerrar(escritor):
+    # Os handlers de saída rodam na ordem inversa: as últimas gravações vão para o disco antes
+    escritor.aguardar(timeout=10)
+    _indice.persistir_gravados()
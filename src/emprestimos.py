@@ -0,0 +1,79 @@
+"""Operações em lote sobre os empréstimos: parcelas vencidas no mês e pagamento de várias de uma vez."""
+import numpy as np
+import pandas as pd
+
+from particoes import converter_datas
+
+CATEGORIA_PAGAMENTO = 'Pagamento Empréstimo'
+
+
+def _numeros(df, coluna):
+    return pd.to_numeric(df[coluna], errors='coerce').fillna(0).to_numpy(dtype='float64')
+
+
+def _indice_mes(datas):
+    """Meses desde o ano 0 (ano * 12 + mês - 1), para somar parcelas sem laços"""
+    return (datas.dt.year * 12 + datas.dt.month - 1).to_numpy(dtype='float64')
+
+
+def pagaveis(df):
+    """Máscara dos empréstimos ativos com parcelas restantes"""
+    if df.empty:
+        return np.zeros(0, dtype=bool)
+    return (df['Status'] == 'Ativo').to_numpy() & (_numeros(df, 'Parcelas_Total') > _numeros(df, 'Parcelas_Pagas'))
+
+
+def vencendo_ate(df, referencia):
+    """Máscara dos pagáveis cuja próxima parcela vence até o mês de `referencia` (inclui atrasadas).
+
+    A parcela k vence k meses depois da data do empréstimo; sem data válida, conta como vencida.
+    """
+    if df.empty:
+        return np.zeros(0, dtype=bool)
+    referencia = pd.Timestamp(referencia)
+    proxima = _indice_mes(converter_datas(df['Data_Emprestimo'])) + _numeros(df, 'Parcelas_Pagas') + 1
+    vencida = np.isnan(proxima) | (proxima <= referencia.year * 12 + referencia.month - 1)
+    return pagaveis(df) & vencida
+
+
+def pagar_parcelas(df, indices, data, quitar=False):
+    """Paga a próxima parcela (ou o saldo inteiro, com `quitar`) dos empréstimos em `indices`.
+
+    Retorna (empréstimos atualizados, despesas a lançar, resumo por empréstimo). Os não pagáveis
+    são ignorados; quem chega ao total de parcelas passa a Quitado. Só os Recebidos viram despesa.
+    """
+    alvo = df.index.isin(indices) & pagaveis(df)
+    total, pagas = _numeros(df, 'Parcelas_Total'), _numeros(df, 'Parcelas_Pagas')
+    novas_pagas = np.where(alvo, total if quitar else pagas + 1, pagas)
+    valor = np.round((novas_pagas - pagas) * _numeros(df, 'Valor_Parcela_Mensal'), 2)
+
+    resultado = df.copy()
+    resultado['Parcelas_Pagas'] = novas_pagas.astype('int64')
+    quitados = alvo & (novas_pagas >= total)
+    resultado.loc[quitados, 'Status'] = 'Quitado'
+    # Colunas calculadas por processar_dados_emprestimos, quando presentes
+    with np.errstate(divide='ignore', invalid='ignore'):
+        calculadas = {
+            'Parcelas_Restantes': total - novas_pagas,
+            'Valor_Restante': (total - novas_pagas) * _numeros(df, 'Valor_Parcela_Mensal'),
+            'Progresso': np.where(total > 0, np.round(novas_pagas / total * 100, 1), 0),
+        }
+    for coluna, valores_coluna in calculadas.items():
+        if coluna in resultado.columns:
+            resultado[coluna] = valores_coluna
+
+    resumo = pd.DataFrame({
+        'Nome': df['Nome'].to_numpy()[alvo],
+        'Tipo': df['Tipo'].to_numpy()[alvo],
+        'Parcela': [f"{int(p)}/{int(t)}" for p, t in zip(novas_pagas[alvo], total[alvo])],
+        'Valor': valor[alvo],
+        'Quitado': quitados[alvo],
+    })
+    recebido = alvo & (df['Tipo'] == 'Recebido').to_numpy() & (valor > 0)
+    despesas = pd.DataFrame({
+        'Membro': df['Nome'].astype(object).to_numpy()[recebido],
+        'Categoria': CATEGORIA_PAGAMENTO,
+        'Valor': valor[recebido],
+        'Data': data,
+    })
+    return resultado, despesas, resumo
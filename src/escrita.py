@@ -0,0 +1,372 @@
+import atexit
+import contextlib
+import io
+import queue
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from compactacao import compactar
+from particoes import assinatura_arquivo, filtrar_por_mes, gravar_particionado, ler_conjunto, particionado
+
+# Tempo máximo (segundos) que uma alteração fica só em memória antes de ir para o disco
+JANELA_ESCRITA_PADRAO = 0.5
+TAMANHO_FILA_PADRAO = 64
+# imediata: grava assim que enfileira; adiada: agrupa dentro da janela; manual: só em gravar_pendentes/aguardar
+POLITICAS = ('imediata', 'adiada', 'manual')
+
+
+def gravar_csv_duravel(df, file_path):
+    """Grava o CSV com backup temporário e verificação, restaurando o backup em caso de falha"""
+    file_path = str(file_path)
+    if particionado(file_path):
+        # Layout particionado: partições alteradas vão para arquivos novos e o manifesto troca de
+        # versão de uma vez; a anterior continua íntegra até a troca
+        gravar_particionado(df, file_path)
+        return
+
+    backup_temp = file_path.replace('.csv', '_temp_backup.csv')
+    try:
+        # Criar backup do arquivo atual se existir
+        if Path(file_path).exists():
+            shutil.copy2(file_path, backup_temp)
+
+        # Salvar novos dados
+        df.to_csv(file_path, index=False)
+
+        # Verificar se foi salvo corretamente
+        verificacao = pd.read_csv(file_path)
+
+        # Verificação mais inteligente: comparar estrutura e conteúdo
+        colunas_ok = list(verificacao.columns) == list(df.columns)
+        conteudo_ok = len(verificacao) == len(df)
+
+        # Se DataFrame está vazio, verificar se arquivo também está vazio (apenas cabeçalho)
+        if df.empty:
+            arquivo_ok = verificacao.empty or len(verificacao) == 0
+        else:
+            # Para DataFrames não vazios, verificar se dados foram salvos corretamente
+            arquivo_ok = not verificacao.empty and len(verificacao) > 0
+
+        if not (colunas_ok and conteudo_ok and arquivo_ok):
+            raise Exception(f"Verificação falhou - Colunas: {colunas_ok}, Conteúdo: {conteudo_ok}, Arquivo: {arquivo_ok}")
+
+        # Remover backup temporário se salvamento foi bem-sucedido
+        if Path(backup_temp).exists():
+            Path(backup_temp).unlink()
+
+    except Exception:
+        # Restaurar backup se algo deu errado
+        if Path(backup_temp).exists():
+            shutil.copy2(backup_temp, file_path)
+            Path(backup_temp).unlink()
+        raise
+
+
+def gravar_lote_duravel(itens):
+    """Grava vários arquivos como uma transação: se qualquer um falhar, todos voltam ao estado anterior"""
+    anteriores = []
+    try:
+        for df, file_path in itens:
+            file_path = str(file_path)
+            if particionado(file_path):
+                anteriores.append((file_path, ler_conjunto(file_path)))
+            elif Path(file_path).exists():
+                backup_lote = file_path.replace('.csv', '_lote_backup.csv')
+                shutil.copy2(file_path, backup_lote)
+                anteriores.append((file_path, backup_lote))
+            else:
+                anteriores.append((file_path, None))
+            gravar_csv_duravel(df, file_path)
+    except Exception:
+        for file_path, anterior in anteriores:
+            if isinstance(anterior, pd.DataFrame):
+                gravar_particionado(anterior, file_path)
+            elif anterior is not None:
+                shutil.copy2(anterior, file_path)
+            elif Path(file_path).exists():
+                Path(file_path).unlink()
+        raise
+    finally:
+        for _, anterior in anteriores:
+            if isinstance(anterior, str) and Path(anterior).exists():
+                Path(anterior).unlink()
+
+
+class EscritorCSV:
+    """Grava os CSVs em uma thread de fundo, agrupando alterações seguidas do mesmo arquivo.
+
+    Cada arquivo guarda apenas a versão mais recente ainda não gravada; várias alterações
+    feitas dentro da janela viram uma única gravação durável. Enquanto a gravação não
+    acontece, `ler_csv` devolve o estado em memória, então a interface já enxerga a mudança.
+    As leituras ficam em memória até a versão (enfileirada ou no disco) mudar.
+    Uma gravação que falha continua pendente (a memória, e portanto os observadores, seguem
+    com a versão enfileirada) e é tentada de novo na próxima passada ou em `gravar_pendentes`.
+    """
+
+    def __init__(self, janela=JANELA_ESCRITA_PADRAO, tamanho_fila=TAMANHO_FILA_PADRAO, politica='adiada'):
+        self.janela = janela
+        self.politica = politica
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._cond = threading.Condition()
+        self._urgente = threading.Event()
+        self._liberar = threading.Event()
+        self._lidos = {}  # caminho -> (versão, DataFrame como a leitura do disco produziria)
+        self._pendentes = {}  # caminho -> (versão, DataFrame, lote: caminhos gravados juntos ou None)
+        self._versao_enfileirada = {}
+        self._versao_gravada = {}
+        self._falhas = {}  # caminho -> (versão, mensagem) da última tentativa que falhou
+        self._na_fila = set()  # cada caminho entra uma vez na fila; `_pendentes` guarda a versão
+        self._reservados = set()  # arquivos sendo gravados por fora (importação): não aceitam alterações
+        self._erros = []
+        self._ao_enfileirar = []
+        self._ao_gravar = []
+        self._thread = threading.Thread(target=self._executar, name="escritor-csv", daemon=True)
+        self._thread.start()
+
+    def observar(self, ao_enfileirar=None, ao_gravar=None):
+        """Registra funções `f(caminho, df)` chamadas ao enfileirar (nesta thread) e após cada gravação"""
+        if ao_enfileirar is not None:
+            self._ao_enfileirar.append(ao_enfileirar)
+        if ao_gravar is not None:
+            self._ao_gravar.append(ao_gravar)
+
+    def _notificar(self, observadores, caminho, df):
+        for observador in observadores:
+            try:
+                observador(caminho, df)
+            except Exception as e:
+                with self._cond:
+                    self._erros.append((caminho, f"{getattr(observador, '__name__', observador)}: {e}"))
+
+    def _agendar(self, caminhos):
+        """Põe na fila os caminhos que ainda não estão nela (a fila nunca passa do número de arquivos)"""
+        with self._cond:
+            novos = [c for c in dict.fromkeys(caminhos) if c not in self._na_fila]
+            self._na_fila.update(novos)
+        for caminho in novos:
+            self._fila.put(caminho)
+
+    def enfileirar(self, df, file_path):
+        """Agenda a gravação de uma cópia compacta de `df`; a fila guarda cada arquivo uma só vez"""
+        return self.enfileirar_lote([(df, file_path)])[0]
+
+    def enfileirar_lote(self, itens):
+        """Agenda vários arquivos `[(df, caminho)]` para serem gravados juntos, tudo ou nada"""
+        snapshots = [(compactar(df, str(Path(p))), str(Path(p))) for df, p in itens]
+        lote = tuple(c for _, c in snapshots) if len(snapshots) > 1 else None
+        versoes = []
+        with self._cond:
+            reservados = [c for _, c in snapshots if c in self._reservados]
+            if reservados:
+                # A alteração partiria de um estado sem as linhas que estão entrando agora
+                raise Exception(f"{', '.join(reservados)} está sendo importado; tente de novo ao terminar")
+            for snapshot, caminho in snapshots:
+                versao = self._versao_enfileirada.get(caminho, 0) + 1
+                self._versao_enfileirada[caminho] = versao
+                self._pendentes[caminho] = (versao, snapshot, lote)
+                versoes.append(versao)
+        for snapshot, caminho in snapshots:
+            self._notificar(self._ao_enfileirar, caminho, snapshot)
+        self._agendar([c for _, c in snapshots])
+        return versoes
+
+    @contextlib.contextmanager
+    def exclusivo(self, file_path, timeout=None):
+        """Reserva o arquivo para uma gravação feita por fora do escritor (importação em blocos).
+
+        O que estava pendente vai para o disco antes; enquanto durar, novas alterações do arquivo
+        são recusadas, e ao final a leitura guardada é descartada.
+        """
+        caminho = str(Path(file_path))
+        with self._cond:
+            if caminho in self._reservados:
+                raise Exception(f"{caminho} já está sendo importado")
+            self._reservados.add(caminho)
+        try:
+            if not self.aguardar(caminho, timeout=timeout):
+                raise Exception(self.falhas(caminho).get(caminho, "Tempo esgotado aguardando a gravação"))
+            yield
+        finally:
+            with self._cond:
+                self._reservados.discard(caminho)
+                self._lidos.pop(caminho, None)
+
+    def pendente(self, file_path):
+        with self._cond:
+            return str(Path(file_path)) in self._pendentes
+
+    def sujos(self):
+        """Arquivos com alterações ainda não gravadas: {caminho: versão enfileirada}"""
+        with self._cond:
+            return {c: item[0] for c, item in self._pendentes.items()}
+
+    def versao(self, file_path):
+        """Versão dos dados do arquivo: muda a cada alteração enfileirada ou edição externa no disco"""
+        caminho = str(Path(file_path))
+        with self._cond:
+            item = self._pendentes.get(caminho)
+        if item is not None:
+            return ('memoria', item[0])
+        return ('disco', str(assinatura_arquivo(caminho)))
+
+    def definir_politica(self, politica):
+        if politica not in POLITICAS:
+            raise ValueError(f"política de gravação desconhecida: {politica}")
+        self.politica = politica
+        if politica != 'manual':
+            # Libera o que estava retido pela política manual
+            self._liberar.set()
+            self._urgente.set()
+
+    def falhas(self, file_path=None):
+        """Arquivos cuja última tentativa de gravação falhou: {caminho: mensagem}"""
+        with self._cond:
+            falhas = {c: mensagem for c, (_, mensagem) in self._falhas.items()}
+        return falhas if file_path is None else {c: m for c, m in falhas.items() if c == str(Path(file_path))}
+
+    def gravar_pendentes(self):
+        """Pede a gravação imediata de todas as alterações pendentes (sem esperar)"""
+        with self._cond:
+            if not self._pendentes:
+                # Sem pendências, a liberação valeria para a próxima alteração na política manual
+                return
+            # Falhas anteriores voltam para a fila como uma nova tentativa
+            repetir = [c for c in self._falhas if c in self._pendentes]
+            self._falhas.clear()
+        self._agendar(repetir)
+        self._liberar.set()
+        self._urgente.set()
+
+    def existe(self, file_path):
+        return Path(file_path).exists() or particionado(file_path) or self.pendente(file_path)
+
+    def ler_csv(self, file_path, meses=None, inicio=None, fim=None):
+        """Lê o arquivo considerando alterações ainda não gravadas.
+
+        Com `meses` ('YYYY-MM') ou `inicio`/`fim`, conjuntos particionados abrem só as
+        partições correspondentes.
+        """
+        caminho = str(Path(file_path))
+        with self._cond:
+            item = self._pendentes.get(caminho)
+            lido = self._lidos.get(caminho)
+        if item is None and (meses is not None or inicio is not None or fim is not None):
+            # Leitura parcial de partições: não vale guardar
+            return ler_conjunto(file_path, meses, inicio, fim)
+        versao = self.versao(caminho)
+        if lido is not None and lido[0] == versao:
+            df = lido[1]
+        else:
+            if item is not None:
+                # Passar pelo CSV mantém os mesmos tipos que a leitura do disco produziria
+                df = pd.read_csv(io.StringIO(item[1].to_csv(index=False)))
+            else:
+                df = ler_conjunto(file_path)
+            with self._cond:
+                self._lidos[caminho] = (versao, df)
+        # Cópia rasa: com copy-on-write, alterações de quem chamou não chegam ao que está guardado
+        return filtrar_por_mes(df.copy(deep=False), file_path, meses, inicio, fim)
+
+    def aguardar(self, file_path=None, timeout=None):
+        """Espera até que as alterações enfileiradas (de um arquivo ou de todos) estejam no disco.
+
+        Retorna False se o tempo esgotar ou se alguma gravação falhar (detalhes em `falhas`).
+        """
+        caminhos = None if file_path is None else [str(Path(file_path))]
+        self.gravar_pendentes()
+
+        def alvo():
+            return [c for c in (caminhos or list(self._versao_enfileirada)) if c in self._versao_enfileirada]
+
+        def gravado(c):
+            return self._versao_gravada.get(c, 0) >= self._versao_enfileirada[c]
+
+        def resolvido():
+            return all(gravado(c) or self._falhas.get(c, (0,))[0] >= self._versao_enfileirada[c] for c in alvo())
+
+        with self._cond:
+            return self._cond.wait_for(resolvido, timeout=timeout) and all(gravado(c) for c in alvo())
+
+    def consumir_erros(self):
+        """Retorna e limpa os erros das gravações feitas em segundo plano"""
+        with self._cond:
+            erros, self._erros = self._erros, []
+        return erros
+
+    def _executar(self):
+        while True:
+            caminhos = {self._fila.get()}
+            if self.politica == 'manual':
+                self._liberar.wait()
+            elif self.politica == 'adiada':
+                # Janela de agrupamento: alterações que chegarem aqui viram uma só gravação
+                self._urgente.wait(self.janela)
+            self._liberar.clear()
+            self._urgente.clear()
+            while True:
+                try:
+                    caminhos.add(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            with self._cond:
+                # A partir daqui uma alteração nova volta para a fila e ganha outra passada
+                self._na_fila.difference_update(caminhos)
+                # Gravações que falharam antes são tentadas de novo junto com as novas
+                caminhos.update(c for c in self._falhas if c in self._pendentes)
+            for caminho in caminhos:
+                self._gravar(caminho)
+
+    def _gravar(self, caminho):
+        with self._cond:
+            item = self._pendentes.get(caminho)
+            if item is None:
+                return
+            lote = item[2]
+            # Arquivos do mesmo lote ainda pendentes vão juntos; os que já receberam versão mais
+            # nova (fora do lote) seguem sozinhos na próxima passada
+            itens = {c: self._pendentes[c] for c in (lote or (caminho,))
+                     if c in self._pendentes and self._pendentes[c][2] == lote}
+        erro = None
+        try:
+            if len(itens) > 1:
+                gravar_lote_duravel([(df, c) for c, (_, df, _) in itens.items()])
+            else:
+                gravar_csv_duravel(item[1], caminho)
+        except Exception as e:
+            erro = e
+        if erro is None:
+            for c, (_, df, _) in itens.items():
+                self._notificar(self._ao_gravar, c, df)
+        with self._cond:
+            for c, (versao, _, _) in itens.items():
+                if erro is not None:
+                    # Continua pendente: a leitura segue com a versão em memória, como os observadores
+                    self._falhas[c] = (versao, str(erro))
+                    self._erros.append((c, str(erro)))
+                    continue
+                self._falhas.pop(c, None)
+                if self._pendentes.get(c, (None,))[0] == versao:
+                    del self._pendentes[c]
+                    lido = self._lidos.get(c)
+                    if lido is not None and lido[0] == ('memoria', versao):
+                        # O que foi lido da memória é o que está no disco agora: não precisa reler
+                        self._lidos[c] = (('disco', str(assinatura_arquivo(c))), lido[1])
+                self._versao_gravada[c] = max(self._versao_gravada.get(c, 0), versao)
+            self._cond.notify_all()
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def obter_escritor(janela=JANELA_ESCRITA_PADRAO, tamanho_fila=TAMANHO_FILA_PADRAO):
+    """Retorna o escritor compartilhado pelo processo (todas as sessões usam a mesma fila)"""
+    global _escritor
+    with _escritor_lock:
+        if _escritor is None:
+            _escritor = EscritorCSV(janela, tamanho_fila)
+            atexit.register(_escritor.aguardar, None, 10)
+        return _escritor
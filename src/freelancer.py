@@ -0,0 +1,154 @@
+"""Análises dos ganhos freelancer (horas.csv): semanas, meses, R$/hora efetivo, qualidade, atraso de pagamento e previsão."""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import mascara_pago, valores
+from particoes import chave_mes, converter_datas
+
+# Janela (em semanas) da qualidade móvel e da previsão de ganhos
+JANELA_SEMANAS = 4
+SEMANAS_PREVISAO = 4
+
+
+def _base(df_horas):
+    """Colunas usadas pelas análises, convertidas uma única vez"""
+    datas = converter_datas(df_horas['Data'])
+    pagamento = (converter_datas(df_horas['Data_Pagamento']) if 'Data_Pagamento' in df_horas.columns
+                 else pd.Series(pd.NaT, index=df_horas.index, dtype='datetime64[ns]'))
+    horas = valores(df_horas, 'Horas')
+    return pd.DataFrame({
+        'Semana': df_horas['Semana'] if 'Semana' in df_horas.columns else '',
+        'Data': datas,
+        'MesAno': chave_mes(datas),
+        'Horas': horas,
+        'Valor_USD': valores(df_horas, 'Valor_USD'),
+        'Valor_Ajustado_USD': valores(df_horas, 'Valor_Ajustado_USD'),
+        'Valor_BRL': valores(df_horas, 'Valor_BRL'),
+        'Valor_Ajustado_BRL': valores(df_horas, 'Valor_Ajustado_BRL'),
+        # Nota ponderada pelas horas: semanas longas pesam mais na média de qualidade
+        'Nota_Horas': valores(df_horas, 'Nota') * horas,
+        'Pago': mascara_pago(df_horas),
+        'Atraso_Dias': (pagamento - datas).dt.days,
+    })
+
+
+def _por_hora(valor, horas):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(horas > 0, valor / horas, 0.0)
+
+
+def resumo_semanal(base):
+    """Totais por Semana, com período, nota média e R$/hora efetivo (já com o ajuste da nota)"""
+    semanal = base.groupby('Semana', observed=True, sort=True).agg(
+        Inicio=('Data', 'min'), Fim=('Data', 'max'),
+        Total_Horas=('Horas', 'sum'),
+        Total_USD=('Valor_USD', 'sum'),
+        Total_Ajustado_USD=('Valor_Ajustado_USD', 'sum'),
+        Total_BRL=('Valor_BRL', 'sum'),
+        Total_Ajustado_BRL=('Valor_Ajustado_BRL', 'sum'),
+        Nota_Horas=('Nota_Horas', 'sum'),
+    ).reset_index()
+    periodo = semanal['Inicio'].dt.strftime('%Y-%m-%d') + ' a ' + semanal['Fim'].dt.strftime('%Y-%m-%d')
+    semanal.insert(1, 'Periodo', periodo.fillna('sem data'))
+    semanal['Nota_Media'] = _por_hora(semanal['Nota_Horas'], semanal['Total_Horas'])
+    semanal['BRL_Hora'] = _por_hora(semanal['Total_Ajustado_BRL'], semanal['Total_Horas'])
+    # Qualidade móvel: nota média ponderada das últimas semanas, em ordem cronológica
+    cronologica = semanal.sort_values('Inicio', kind='stable')
+    janela = cronologica[['Nota_Horas', 'Total_Horas']].rolling(JANELA_SEMANAS, min_periods=1).sum()
+    semanal['Qualidade_Movel'] = pd.Series(_por_hora(janela['Nota_Horas'], janela['Total_Horas']),
+                                           index=cronologica.index)
+    return semanal.drop(columns=['Inicio', 'Fim', 'Nota_Horas'])
+
+
+def resumo_mensal(base):
+    """Horas, ganho ajustado, R$/hora efetivo e nota média por mês"""
+    mensal = base[base['MesAno'] != 'sem_data'].groupby('MesAno', sort=True).agg(
+        Horas=('Horas', 'sum'), Ajustado_BRL=('Valor_Ajustado_BRL', 'sum'),
+        Bruto_BRL=('Valor_BRL', 'sum'), Nota_Horas=('Nota_Horas', 'sum'),
+    ).reset_index()
+    mensal['BRL_Hora'] = _por_hora(mensal['Ajustado_BRL'], mensal['Horas'])
+    mensal['Nota_Media'] = _por_hora(mensal['Nota_Horas'], mensal['Horas'])
+    return mensal.drop(columns='Nota_Horas')
+
+
+def atraso_pagamento(base, hoje=None):
+    """Dias entre a data do trabalho e a marcação como recebido, e idade dos pendentes"""
+    hoje = pd.Timestamp(hoje if hoje is not None else pd.Timestamp.now()).normalize()
+    atrasos = base.loc[base['Pago'], 'Atraso_Dias'].dropna()
+    idades = (hoje - base.loc[~base['Pago'], 'Data']).dt.days.dropna()
+    return {
+        'pagos_com_data': int(len(atrasos)),
+        'atraso_medio': float(atrasos.mean()) if len(atrasos) else None,
+        'atraso_mediano': float(atrasos.median()) if len(atrasos) else None,
+        'pendentes': int(len(idades)),
+        'pendente_mais_antigo': int(idades.max()) if len(idades) else None,
+    }
+
+
+def _inicio_semana(datas):
+    return (datas - pd.to_timedelta(datas.dt.weekday, unit='D')).dt.normalize()
+
+
+def previsao(base, hoje=None, semanas=SEMANAS_PREVISAO, janela=JANELA_SEMANAS):
+    """Ganho ajustado das próximas semanas: média móvel das últimas `janela` semanas do calendário
+    até a semana atual (semanas sem registro contam como zero), com faixa de ± um desvio"""
+    if base['Data'].dropna().empty:
+        return pd.DataFrame(columns=['Semana_Inicio', 'Previsao_BRL', 'Minimo_BRL', 'Maximo_BRL'])
+    semanal = base['Valor_Ajustado_BRL'].groupby(_inicio_semana(base['Data'])).sum()
+    atual = _inicio_semana(pd.Series([pd.Timestamp(hoje if hoje is not None else pd.Timestamp.now())])).iloc[0]
+    semanal = semanal.reindex(pd.date_range(semanal.index.min(), max(semanal.index.max(), atual), freq='7D'),
+                              fill_value=0.0)
+    ultimas = semanal.iloc[-janela:]
+    media, desvio = float(ultimas.mean()), float(ultimas.std(ddof=0))
+    proximas = pd.date_range(semanal.index.max() + pd.Timedelta(days=7), periods=semanas, freq='7D')
+    return pd.DataFrame({'Semana_Inicio': proximas, 'Previsao_BRL': media,
+                         'Minimo_BRL': max(media - desvio, 0.0), 'Maximo_BRL': media + desvio})
+
+
+def analisar(df_horas, hoje=None):
+    """Todas as análises de uma vez, sobre as colunas convertidas uma única vez"""
+    base = _base(df_horas)
+    horas_total = float(base['Horas'].sum())
+    return {
+        'semanal': resumo_semanal(base),
+        'mensal': resumo_mensal(base),
+        'atraso': atraso_pagamento(base, hoje),
+        'previsao': previsao(base, hoje),
+        'brl_hora': float(_por_hora(base['Valor_Ajustado_BRL'].sum(), horas_total)),
+    }
+
+
+class AnalisesFreelancer:
+    """Resultados de `analisar` guardados pela versão do arquivo (a do escritor): só recalcula quando os dados mudam"""
+
+    def __init__(self, maximo=4):
+        self.maximo = maximo
+        self._resultados = {}
+        self._lock = threading.Lock()
+
+    def obter(self, versao, df_horas):
+        chave = (versao, pd.Timestamp.now().date())  # idade dos pendentes muda com o dia
+        with self._lock:
+            resultado = self._resultados.get(chave)
+        if resultado is None:
+            resultado = analisar(df_horas)
+            with self._lock:
+                self._resultados[chave] = resultado
+                while len(self._resultados) > self.maximo:
+                    self._resultados.pop(next(iter(self._resultados)))
+        return resultado
+
+
+_analises = None
+_analises_lock = threading.Lock()
+
+
+def obter_analises():
+    """Cache de análises compartilhado pelo processo"""
+    global _analises
+    with _analises_lock:
+        if _analises is None:
+            _analises = AnalisesFreelancer()
+        return _analises
@@ -0,0 +1,287 @@
+"""Histórico de alterações em deltas por linha, com desfazer/refazer e reconstrução de estados anteriores."""
+import io
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compactacao import INTEIROS, compactar
+
+HISTORICO_PATH = 'data/historico/operacoes.jsonl'
+
+# Separador de registros na serialização: quebras de linha dentro de campos entre aspas continuam válidas
+_SEPARADOR = '\x1e'
+
+
+def linhas_csv(df, file_path):
+    """Cabeçalho e linhas do CSV como o escritor gravaria o DataFrame, com números em forma canônica.
+
+    O tipo que a leitura infere depende das outras linhas do arquivo (10 vira 10.0 se alguma linha
+    tem centavos); fora os inteiros da compactação, todo número sai como float para que as mesmas
+    linhas tenham o mesmo texto, lidas sozinhas ou com o arquivo inteiro.
+    """
+    df = compactar(df, file_path)
+    inteiros = INTEIROS.get(Path(file_path).stem, [])
+    for coluna in df.columns:
+        serie = df[coluna]
+        if (coluna not in inteiros and pd.api.types.is_numeric_dtype(serie)
+                and not pd.api.types.is_bool_dtype(serie) and serie.dtype != 'float64'):
+            df[coluna] = serie.astype('float64')
+    texto = df.to_csv(index=False, lineterminator=_SEPARADOR)
+    partes = texto.split(_SEPARADOR)
+    return partes[0], partes[1:-1]
+
+
+def dataframe_csv(cabecalho, linhas):
+    if not cabecalho:
+        return pd.DataFrame()
+    return pd.read_csv(io.StringIO('\n'.join([cabecalho] + list(linhas))))
+
+
+def _chaves(linhas):
+    """Hash de cada linha + número da ocorrência, para comparar multiconjuntos de linhas"""
+    hashes = pd.util.hash_array(np.asarray(linhas, dtype=object))
+    ocorrencia = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    return pd.MultiIndex.from_arrays([hashes, ocorrencia])
+
+
+def diferenca(linhas_antes, linhas_depois):
+    """Posições removidas de `antes` e inseridas em `depois` (ordem das demais linhas é ignorada)"""
+    if not linhas_antes or not linhas_depois:
+        return np.arange(len(linhas_antes)), np.arange(len(linhas_depois))
+    antes, depois = _chaves(linhas_antes), _chaves(linhas_depois)
+    return np.flatnonzero(~antes.isin(depois)), np.flatnonzero(~depois.isin(antes))
+
+
+def _ocorrencias(hashes):
+    """Hash combinado com o número da ocorrência (linhas repetidas continuam distintas), só com NumPy"""
+    ordem = np.argsort(hashes, kind='stable')
+    ordenados = hashes[ordem]
+    inicio_grupo = np.r_[True, ordenados[1:] != ordenados[:-1]]
+    posicao = np.arange(len(ordenados))
+    ocorrencia = np.empty(len(hashes), dtype='uint64')
+    ocorrencia[ordem] = posicao - np.maximum.accumulate(np.where(inicio_grupo, posicao, 0))
+    return hashes ^ (ocorrencia * np.uint64(0x9E3779B97F4A7C15))
+
+
+def _candidatas(df_antes, df_depois):
+    """Posições que podem ter mudado, comparando hashes dos valores (sem serializar as linhas).
+
+    Linhas com o mesmo hash têm os mesmos valores e o mesmo texto; o contrário não vale (10 e
+    10.0, datas em texto e date), então as candidatas ainda passam pela comparação do texto.
+    """
+    antes = pd.util.hash_pandas_object(df_antes, index=False).to_numpy()
+    depois = pd.util.hash_pandas_object(df_depois, index=False).to_numpy()
+    if len(depois) >= len(antes) and np.array_equal(depois[:len(antes)], antes):
+        # Caso comum: linhas acrescentadas ao fim
+        return np.empty(0, dtype='int64'), np.arange(len(antes), len(depois))
+    chaves_antes, chaves_depois = _ocorrencias(antes), _ocorrencias(depois)
+    return np.flatnonzero(~np.isin(chaves_antes, chaves_depois)), np.flatnonzero(~np.isin(chaves_depois, chaves_antes))
+
+
+def aplicar(linhas, remover, inserir):
+    """Remove as linhas `remover` (por conteúdo) e insere `inserir` [(posição, linha)] em ordem crescente"""
+    linhas = list(linhas)
+    if remover:
+        atuais, alvo = _chaves(linhas), _chaves(remover)
+        encontrados = alvo.isin(atuais)
+        if not encontrados.all():
+            raise ValueError("os dados foram alterados depois desta operação")
+        manter = ~atuais.isin(alvo)
+        linhas = [linha for linha, fica in zip(linhas, manter) if fica]
+    for posicao, linha in sorted(inserir):
+        linhas.insert(posicao, linha)
+    return linhas
+
+
+class HistoricoOperacoes:
+    """Registro só de acréscimos (JSON Lines) das alterações em cada conjunto.
+
+    Cada operação guarda apenas as linhas removidas e inseridas, então o arquivo cresce com o
+    volume de alterações e não com o tamanho dos dados. Marcadores de desfeita/refeita no mesmo
+    arquivo permitem reconstruir as pilhas de desfazer e refazer ao reabrir o app.
+    """
+
+    def __init__(self, path=HISTORICO_PATH):
+        self.path = Path(path)
+        self._operacoes = {}
+        self._aplicadas = []
+        self._desfeitas = []
+        self._lock = threading.Lock()
+        if self.path.exists():
+            for linha in self.path.read_text(encoding='utf-8').splitlines():
+                if linha.strip():
+                    self._reproduzir(json.loads(linha))
+
+    def _reproduzir(self, entrada):
+        if entrada['tipo'] == 'operacao':
+            self._operacoes[entrada['id']] = entrada
+            self._aplicadas.append(entrada['id'])
+            self._desfeitas.clear()
+        elif entrada['tipo'] == 'desfeita':
+            self._desfeitas.append(self._aplicadas.pop())
+        elif entrada['tipo'] == 'refeita':
+            self._aplicadas.append(self._desfeitas.pop())
+
+    def _anexar(self, entrada):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open('a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+        self._reproduzir(entrada)
+
+    def registrar(self, file_path, df_antes, df_depois, descricao='', grupo=None):
+        """Grava o delta entre os dois estados; retorna o id da operação (None se nada mudou).
+
+        Operações com o mesmo `grupo` são desfeitas e refeitas juntas.
+        """
+        if list(df_antes.columns) != list(df_depois.columns):
+            # Colunas mudaram: as linhas não são comparáveis, guarda a troca completa
+            cab_antes, antes = linhas_csv(df_antes, file_path)
+            cab_depois, depois = linhas_csv(df_depois, file_path)
+            removidas, inseridas = np.arange(len(antes)), np.arange(len(depois))
+        else:
+            # Só as linhas candidatas são serializadas: uma inclusão não reescreve o arquivo inteiro em texto
+            pos_antes, pos_depois = _candidatas(df_antes, df_depois)
+            cab_antes, texto_antes = linhas_csv(df_antes.iloc[pos_antes], file_path)
+            cab_depois, texto_depois = linhas_csv(df_depois.iloc[pos_depois], file_path)
+            r, i = diferenca(texto_antes, texto_depois)
+            removidas, inseridas = pos_antes[r], pos_depois[i]
+            antes = dict(zip(pos_antes.tolist(), texto_antes))
+            depois = dict(zip(pos_depois.tolist(), texto_depois))
+        if len(removidas) == 0 and len(inseridas) == 0:
+            return None
+        with self._lock:
+            entrada = {
+                'tipo': 'operacao',
+                'id': max(self._operacoes, default=0) + 1,
+                'momento': pd.Timestamp.now().isoformat(timespec='seconds'),
+                'arquivo': str(Path(file_path)),
+                'descricao': descricao,
+                'cabecalho_antes': cab_antes,
+                'cabecalho_depois': cab_depois,
+                'removidas': [[int(p), antes[p]] for p in removidas],
+                'inseridas': [[int(p), depois[p]] for p in inseridas],
+            }
+            if grupo is not None:
+                entrada['grupo'] = grupo
+            self._anexar(entrada)
+            return entrada['id']
+
+    def registrar_anexo(self, file_path, posicao, linhas, cabecalho, descricao=''):
+        """Registra linhas acrescentadas a partir de `posicao` (importação) sem ler o conjunto inteiro"""
+        if not linhas:
+            return None
+        with self._lock:
+            entrada = {
+                'tipo': 'operacao',
+                'id': max(self._operacoes, default=0) + 1,
+                'momento': pd.Timestamp.now().isoformat(timespec='seconds'),
+                'arquivo': str(Path(file_path)),
+                'descricao': descricao,
+                'cabecalho_antes': cabecalho,
+                'cabecalho_depois': cabecalho,
+                'removidas': [],
+                'inseridas': [[posicao + i, linha] for i, linha in enumerate(linhas)],
+            }
+            self._anexar(entrada)
+            return entrada['id']
+
+    def registrar_lote(self, itens, descricao=''):
+        """Registra [(caminho, df_antes, df_depois)] como uma única transação; retorna os ids"""
+        grupo = max(self._operacoes, default=0) + 1
+        ids = [self.registrar(p, antes, depois, descricao, grupo) for p, antes, depois in itens]
+        return [id_ for id_ in ids if id_ is not None]
+
+    def _grupo_no_topo(self, pilha):
+        """Ids do topo da pilha que pertencem à mesma transação, do topo para baixo"""
+        topo = self._operacoes[pilha[-1]]
+        if 'grupo' not in topo:
+            return [topo['id']]
+        ids = []
+        for id_ in reversed(pilha):
+            if self._operacoes[id_].get('grupo') != topo['grupo']:
+                break
+            ids.append(id_)
+        return ids
+
+    def _inverter(self, operacao, linhas, cabecalho):
+        if cabecalho != operacao['cabecalho_depois']:
+            raise ValueError("as colunas do arquivo mudaram depois desta operação")
+        return aplicar(linhas, [l for _, l in operacao['inseridas']], operacao['removidas'])
+
+    def _refazer(self, operacao, linhas, cabecalho):
+        if cabecalho != operacao['cabecalho_antes']:
+            raise ValueError("as colunas do arquivo mudaram depois desta operação")
+        return aplicar(linhas, [l for _, l in operacao['removidas']], operacao['inseridas'])
+
+    def pode_desfazer(self):
+        return bool(self._aplicadas)
+
+    def pode_refazer(self):
+        return bool(self._desfeitas)
+
+    def _aplicar_topo(self, pilha, desfazendo, carregar_df):
+        """Calcula o novo estado de cada arquivo da transação do topo; só marca depois que todos deram certo"""
+        ids = self._grupo_no_topo(pilha)
+        estados = {}
+        for id_ in ids:
+            operacao = self._operacoes[id_]
+            arquivo = operacao['arquivo']
+            if arquivo in estados:
+                cabecalho, linhas = estados[arquivo][1]
+            else:
+                cabecalho, linhas = linhas_csv(carregar_df(arquivo), arquivo)
+            if desfazendo:
+                linhas, cabecalho = self._inverter(operacao, linhas, cabecalho), operacao['cabecalho_antes']
+            else:
+                linhas, cabecalho = self._refazer(operacao, linhas, cabecalho), operacao['cabecalho_depois']
+            estados[arquivo] = (operacao, (cabecalho, linhas))
+        for id_ in ids:
+            self._anexar({'tipo': 'desfeita' if desfazendo else 'refeita', 'id': id_})
+        return [(arquivo, dataframe_csv(*estado), operacao) for arquivo, (operacao, estado) in estados.items()]
+
+    def desfazer(self, carregar_df):
+        """Estado dos arquivos antes da última operação (ou transação): [(caminho, DataFrame, operação)]"""
+        with self._lock:
+            return self._aplicar_topo(self._aplicadas, True, carregar_df)
+
+    def refazer(self, carregar_df):
+        with self._lock:
+            return self._aplicar_topo(self._desfeitas, False, carregar_df)
+
+    def estado_antes(self, id_operacao, carregar_df):
+        """Conjunto da operação como estava antes dela, desfazendo em memória as posteriores do mesmo arquivo"""
+        with self._lock:
+            arquivo = self._operacoes[id_operacao]['arquivo']
+            cabecalho, linhas = linhas_csv(carregar_df(arquivo), arquivo)
+            for id_ in reversed(self._aplicadas):
+                operacao = self._operacoes[id_]
+                if id_ < id_operacao or operacao['arquivo'] != arquivo:
+                    continue
+                linhas = self._inverter(operacao, linhas, cabecalho)
+                cabecalho = operacao['cabecalho_antes']
+            return arquivo, dataframe_csv(cabecalho, linhas)
+
+    def recentes(self, limite=20):
+        """Operações aplicadas mais recentes primeiro (as desfeitas não aparecem)"""
+        linhas = []
+        for id_ in reversed(self._aplicadas[-limite:]):
+            operacao = self._operacoes[id_]
+            linhas.append({'Id': id_, 'Momento': operacao['momento'], 'Arquivo': operacao['arquivo'],
+                           'Descricao': operacao['descricao'], 'Inseridas': len(operacao['inseridas']),
+                           'Removidas': len(operacao['removidas'])})
+        return pd.DataFrame(linhas, columns=['Id', 'Momento', 'Arquivo', 'Descricao', 'Inseridas', 'Removidas'])
+
+
+_historico = None
+_historico_lock = threading.Lock()
+
+
+def obter_historico(path=HISTORICO_PATH):
+    global _historico
+    with _historico_lock:
+        if _historico is None:
+            _historico = HistoricoOperacoes(path)
+        return _historico
@@ -0,0 +1,278 @@
+"""Importação em blocos de históricos grandes (planilhas antigas, exportações de outros apps).
+
+Uso:
+    python src/importacao.py historico.csv --conjunto despesas --dados data --bloco 50000
+    python src/importacao.py gastos.csv --conjunto despesas --mapa "Quem=Membro" --mapa "Quanto=Valor"
+
+A origem é lida com chunksize: cada bloco tem as colunas mapeadas para o esquema do conjunto
+(get_default_columns), é validado e normalizado de forma vetorizada e é acrescentado ao fim do
+arquivo de destino (ou das partições do mês) sem reescrever o que já existe. A memória fica
+limitada ao tamanho do bloco. Se algo falhar, o destino volta ao tamanho original.
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compactacao import BOOLEANOS, DINHEIRO, INTEIROS
+from dados import CONJUNTOS, DATA_DIR, caminho, get_default_columns
+from duplicidade import impressoes, normalizar_texto
+from historico import linhas_csv
+from particoes import (COLUNA_DATA, anexar_particoes, confirmar_anexos, ler_conjunto, ler_manifesto,
+                       particionado, reverter_anexos)
+
+TAMANHO_BLOCO_PADRAO = 50_000
+
+# Colunas numéricas além do dinheiro e dos inteiros da compactação
+NUMEROS = {
+    'horas': ['Horas', 'Cotacao'],
+    'emprestimos': ['Taxa_Juros_Calculada'],
+}
+# Campos sem os quais a linha é rejeitada
+OBRIGATORIAS = {
+    'horas': ['Data', 'Horas'],
+    'familia': ['Membro', 'Tipo', 'Valor', 'Data'],
+    'despesas': ['Membro', 'Categoria', 'Valor', 'Data'],
+    'investimentos': ['Membro', 'Tipo', 'Valor', 'Data'],
+    'emprestimos': ['Nome', 'Tipo', 'Valor_Liquido_Recebido', 'Data_Emprestimo'],
+}
+
+
+class ErroImportacao(Exception):
+    """Origem ou mapeamento de colunas inválidos"""
+
+
+def _normalizar_nome(nome):
+    return re.sub(r'[^0-9a-z]', '', normalizar_texto(pd.Series([str(nome)])).iloc[0])
+
+
+def mapear_colunas(colunas_origem, nome, mapa=None):
+    """{coluna da origem: coluna do conjunto}: o `mapa` explícito primeiro, depois nomes iguais
+    ignorando maiúsculas, acentos, espaços e '_' ('data emprestimo' casa com 'Data_Emprestimo')"""
+    esquema = get_default_columns(f"{nome}.csv")
+    mapa = dict(mapa or {})
+    desconhecidas = set(mapa.values()) - set(esquema)
+    if desconhecidas:
+        raise ErroImportacao(f"colunas inexistentes em {nome}: {sorted(desconhecidas)}")
+    por_nome = {_normalizar_nome(c): c for c in esquema}
+    mapeamento = {}
+    for coluna in colunas_origem:
+        destino = mapa.get(coluna) or por_nome.get(_normalizar_nome(coluna))
+        if destino and destino not in mapeamento.values():
+            mapeamento[coluna] = destino
+    faltando = [c for c in OBRIGATORIAS[nome] if c not in mapeamento.values()]
+    if faltando:
+        raise ErroImportacao(f"a origem não tem as colunas obrigatórias de {nome}: {faltando} (use o mapa)")
+    return mapeamento
+
+
+def _numeros(serie):
+    """Números de planilha: aceita 'R$ 1.234,56' e '1234.56'"""
+    texto = serie.astype(str).str.replace(r'[R$\s]', '', regex=True)
+    brasileiro = texto.str.contains(',', regex=False)
+    texto = texto.where(~brasileiro, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return pd.to_numeric(texto, errors='coerce')
+
+
+def _datas(serie):
+    """Datas ISO ou no formato brasileiro (dia primeiro)"""
+    datas = pd.to_datetime(serie, errors='coerce', format='ISO8601')
+    falhas = datas.isna() & serie.notna()
+    if falhas.any():
+        datas[falhas] = pd.to_datetime(serie[falhas], errors='coerce', format='mixed', dayfirst=True)
+    return datas
+
+
+def normalizar_bloco(bloco, nome, mapeamento, colunas):
+    """(linhas válidas nas `colunas` do destino, rejeitadas com o Motivo), tudo vetorizado"""
+    df = bloco[list(mapeamento)].rename(columns=mapeamento)
+    df = df.apply(lambda coluna: coluna.str.strip()).replace('', None)
+    vazio = df.isna()
+    motivo = pd.Series('', index=df.index, dtype=object)
+
+    for coluna in DINHEIRO.get(nome, []) + INTEIROS.get(nome, []) + NUMEROS.get(nome, []):
+        if coluna in df.columns:
+            numeros = _numeros(df[coluna])
+            motivo[numeros.isna() & df[coluna].notna()] += f"{coluna} não numérico; "
+            df[coluna] = numeros.round(2) if coluna in DINHEIRO.get(nome, []) else numeros
+    for coluna in BOOLEANOS.get(nome, []):
+        if coluna in df.columns:
+            df[coluna] = normalizar_texto(df[coluna].fillna('')).isin(['true', '1', 'sim', 's', 'pago'])
+    coluna_data = COLUNA_DATA[nome]
+    datas = _datas(df[coluna_data])
+    motivo[datas.isna() & df[coluna_data].notna()] += f"{coluna_data} inválida; "
+    df[coluna_data] = datas.dt.strftime('%Y-%m-%d')
+    for coluna in OBRIGATORIAS[nome]:
+        motivo[vazio[coluna]] += f"{coluna} vazio; "
+
+    valido = (motivo == '').to_numpy()
+    rejeitadas = bloco[~valido].assign(Motivo=motivo[~valido].str.rstrip('; '))
+    return df[valido].reindex(columns=colunas), rejeitadas
+
+
+def _colunas_destino(destino, nome):
+    """Cabeçalho atual do destino (com colunas extras do app) ou o esquema padrão"""
+    if particionado(destino):
+        return ler_manifesto(destino)['colunas']
+    if Path(destino).exists() and Path(destino).stat().st_size > 0:
+        return list(pd.read_csv(destino, nrows=0).columns)
+    return get_default_columns(f"{nome}.csv")
+
+
+def _impressoes_existentes(destino, tamanho_bloco):
+    if particionado(destino):
+        return set(impressoes(ler_conjunto(destino), destino).tolist())
+    if not Path(destino).exists() or Path(destino).stat().st_size == 0:
+        return set()
+    existentes = set()
+    for bloco in pd.read_csv(destino, chunksize=tamanho_bloco):
+        existentes.update(impressoes(bloco, destino).tolist())
+    return existentes
+
+
+def _contar_linhas(destino, tamanho_bloco):
+    if particionado(destino):
+        return sum(p['linhas'] for p in ler_manifesto(destino)['particoes'].values())
+    if not Path(destino).exists() or Path(destino).stat().st_size == 0:
+        return 0
+    return sum(len(bloco) for bloco in pd.read_csv(destino, chunksize=tamanho_bloco, usecols=[0]))
+
+
+def importar(origem, nome, data_dir=DATA_DIR, tamanho_bloco=TAMANHO_BLOCO_PADRAO, mapa=None, sep=',',
+             encoding='utf-8', pular_duplicados=False, rejeitados=None, progresso=None, historico=None):
+    """Importa `origem` (caminho ou arquivo binário aberto) para o conjunto `nome`, bloco a bloco;
+    retorna o resumo da importação.
+
+    `progresso(bytes_lidos, bytes_total, linhas_importadas)` é chamado a cada bloco. Com
+    `pular_duplicados`, linhas cujos campos-chave já existem no destino (ou na própria origem)
+    são ignoradas; isso guarda 8 bytes por linha do destino em memória. Linhas inválidas vão
+    para o CSV `rejeitados`, com o motivo, quando informado. Com `historico`, as linhas
+    importadas viram uma operação (desfazer remove a importação inteira).
+    """
+    if nome not in CONJUNTOS:
+        raise ErroImportacao(f"conjunto desconhecido: {nome}")
+    destino = caminho(nome, data_dir)
+    colunas = _colunas_destino(destino, nome)
+    vistos = _impressoes_existentes(destino, tamanho_bloco) if pular_duplicados else None
+    if hasattr(origem, 'read'):
+        # Arquivo já aberto (upload do app): lido desde o início, sem fechar
+        origem.seek(0)
+        abrir, total_bytes = contextlib.nullcontext(origem), getattr(origem, 'size', 0)
+    else:
+        abrir, total_bytes = open(origem, 'rb'), os.path.getsize(origem)
+    resumo = {'lidas': 0, 'importadas': 0, 'rejeitadas': 0, 'duplicadas': 0, 'blocos': 0, 'ignoradas': []}
+    posicao = _contar_linhas(destino, tamanho_bloco) if historico is not None else 0
+    cabecalho, importadas = None, []
+
+    plano = not particionado(destino)
+    tamanho_original = Path(destino).stat().st_size if plano and Path(destino).exists() else None
+    anexos = {}
+    try:
+        with abrir as arquivo:
+            leitor = pd.read_csv(arquivo, chunksize=tamanho_bloco, dtype=str, sep=sep, encoding=encoding,
+                                 keep_default_na=False)
+            mapeamento = None
+            for bloco in leitor:
+                if mapeamento is None:
+                    mapeamento = mapear_colunas(bloco.columns, nome, mapa)
+                    resumo['ignoradas'] = [c for c in bloco.columns if c not in mapeamento]
+                validas, invalidas = normalizar_bloco(bloco, nome, mapeamento, colunas)
+                if vistos is not None and not validas.empty:
+                    repetida = np.zeros(len(validas), dtype=bool)
+                    for linha, impressao in enumerate(impressoes(validas, destino).tolist()):
+                        if impressao in vistos:
+                            repetida[linha] = True
+                        else:
+                            vistos.add(impressao)
+                    resumo['duplicadas'] += int(repetida.sum())
+                    validas = validas[~repetida]
+                if not validas.empty:
+                    if plano:
+                        novo = not Path(destino).exists() or Path(destino).stat().st_size == 0
+                        Path(destino).parent.mkdir(parents=True, exist_ok=True)
+                        with open(destino, 'a', encoding='utf-8', newline='') as f:
+                            validas.to_csv(f, index=False, header=novo)
+                    else:
+                        anexar_particoes(validas, destino, anexos)
+                    if historico is not None:
+                        # Passar pelo CSV dá às linhas os tipos de uma leitura do disco; linhas_csv
+                        # escreve os números em forma canônica, como faz para o arquivo inteiro
+                        cabecalho, linhas = linhas_csv(pd.read_csv(io.StringIO(validas.to_csv(index=False))), destino)
+                        importadas.extend(linhas)
+                if rejeitados is not None and not invalidas.empty:
+                    invalidas.to_csv(rejeitados, mode='a', index=False,
+                                     header=not Path(rejeitados).exists() or Path(rejeitados).stat().st_size == 0)
+                resumo['lidas'] += len(bloco)
+                resumo['importadas'] += len(validas)
+                resumo['rejeitadas'] += len(invalidas)
+                resumo['blocos'] += 1
+                if progresso is not None:
+                    progresso(min(arquivo.tell(), total_bytes), total_bytes, resumo['importadas'])
+        if not plano and anexos:
+            confirmar_anexos(destino, anexos)
+    except Exception:
+        if plano:
+            if tamanho_original is None:
+                Path(destino).unlink(missing_ok=True)
+            elif Path(destino).exists():
+                os.truncate(destino, tamanho_original)
+        else:
+            reverter_anexos(destino, anexos)
+        raise
+    if historico is not None:
+        try:
+            historico.registrar_anexo(destino, posicao, importadas, cabecalho,
+                                      f"Importação de {resumo['importadas']} linhas em {nome}")
+        except Exception as e:
+            resumo['aviso'] = f"importação não registrada no histórico: {e}"
+    return resumo
+
+
+def _mapa(itens):
+    mapa = {}
+    for item in itens or []:
+        origem, sep, destino = item.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"mapa inválido (use Origem=Destino): {item}")
+        mapa[origem.strip()] = destino.strip()
+    return mapa
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importação em blocos de históricos CSV grandes")
+    parser.add_argument('origem', help="CSV a importar")
+    parser.add_argument('--conjunto', required=True, choices=CONJUNTOS)
+    parser.add_argument('--dados', default=DATA_DIR, help="Pasta dos arquivos de dados")
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO_PADRAO, help="Linhas por bloco")
+    parser.add_argument('--mapa', action='append', help="Coluna da origem para coluna do conjunto (Origem=Destino)")
+    parser.add_argument('--sep', default=',')
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--sem-duplicados', action='store_true', help="Ignora lançamentos que já existem")
+    parser.add_argument('--rejeitados', help="CSV para as linhas inválidas, com o motivo")
+    args = parser.parse_args(argv)
+
+    def mostrar(lidos, total, importadas):
+        pct = lidos / total * 100 if total else 100.0
+        barra = '#' * int(pct // 5)
+        print(f"\r[{barra:<20}] {pct:5.1f}% - {importadas} linhas importadas", end='', file=sys.stderr, flush=True)
+
+    try:
+        resumo = importar(args.origem, args.conjunto, args.dados, args.bloco, _mapa(args.mapa), args.sep,
+                          args.encoding, args.sem_duplicados, args.rejeitados, mostrar)
+    except ErroImportacao as e:
+        parser.error(str(e))
+    print(file=sys.stderr)
+    print(f"{resumo['importadas']} de {resumo['lidas']} linhas importadas em {resumo['blocos']} blocos "
+          f"({resumo['rejeitadas']} rejeitadas, {resumo['duplicadas']} duplicadas)")
+    if resumo['ignoradas']:
+        print(f"Colunas ignoradas: {', '.join(resumo['ignoradas'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Resumo anual para a declaração do IRPF: rendimentos por membro, freelancer do exterior, bens e dívidas em 31/12.
+
+Uso:
+    python src/irpf.py --ano 2025 [--dados data] [--saida relatorios/irpf] [--formatos csv json html]
+
+Todos os anos saem de uma única passada vetorizada sobre familia, horas, investimentos e
+empréstimos; o resultado fica guardado pela versão dos dados e consultar um ano é só uma
+busca no dicionário já montado.
+"""
+import argparse
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import mascara_pago, valores
+from dados import DATA_DIR, carregar_todos
+from duplicidade import normalizar_texto
+from particoes import converter_datas
+from relatorios import FORMATOS, gravar_relatorio
+
+# horas.csv não tem coluna de membro: os ganhos freelancer vão para este nome
+MEMBRO_FREELANCER = 'Freelancer'
+
+TRIBUTAVEIS = 'Rendimentos Tributáveis'
+ISENTOS = 'Rendimentos Isentos'
+EXTERIOR = 'Rendimentos do Exterior (Carnê-Leão)'
+INVESTIMENTOS = 'Rendimentos de Investimentos'
+BENS = 'Bens e Direitos em 31/12'
+CREDITOS = 'Créditos a Receber em 31/12'
+DIVIDAS = 'Dívidas e Ônus em 31/12'
+SECOES = [TRIBUTAVEIS, ISENTOS, EXTERIOR, INVESTIMENTOS, BENS, CREDITOS, DIVIDAS]
+
+# Tipos da renda familiar (sem acento, minúsculos) que não são tributáveis; os demais são
+_TIPOS_FAMILIA = {
+    'salario': (TRIBUTAVEIS, 'Salário (CLT)'),
+    'vale': (ISENTOS, 'Vale'),
+    'investimento': (INVESTIMENTOS, 'Lançado na renda'),
+    # Entrada do empréstimo e parcelas não são rendimento: aparecem no saldo da dívida
+    'emprestimo recebido': (None, None),
+    'pagamento emprestimo': (None, None),
+}
+
+COLUNAS = ['Ano', 'Secao', 'Membro', 'Item', 'Valor']
+COLUNAS_EXTERIOR = ['Ano', 'Mes', 'Valor_USD', 'Valor_BRL', 'Cotacao_Media']
+
+
+def _linhas(anos, secao, membros, itens, valor):
+    return pd.DataFrame({'Ano': np.asarray(anos, dtype='int64'), 'Secao': secao,
+                         'Membro': np.asarray(membros, dtype=object), 'Item': np.asarray(itens, dtype=object),
+                         'Valor': np.asarray(valor, dtype='float64')})
+
+
+def _rendimentos_familia(df):
+    datas = converter_datas(df['Data'])
+    # Classificação feita só sobre os tipos distintos e levada às linhas pelos códigos
+    codigos, tipos = pd.factorize(df['Tipo'].astype(object).fillna('').astype(str))
+    classificados = [_TIPOS_FAMILIA.get(t, (TRIBUTAVEIS, None)) for t in normalizar_texto(pd.Series(tipos))]
+    secoes = np.array([secao for secao, _ in classificados] + [None], dtype=object)
+    itens = np.array([item or tipo for (_, item), tipo in zip(classificados, tipos)] + [None], dtype=object)
+    secao, item = secoes[codigos], itens[codigos]
+    valido = pd.notna(secao) & datas.notna().to_numpy()
+    return _linhas(datas.dt.year.to_numpy()[valido], secao[valido], df['Membro'].astype(str).to_numpy()[valido],
+                   item[valido], valores(df, 'Valor').to_numpy()[valido])
+
+
+def _exterior(df):
+    """Freelancer recebido, pelo ano do recebimento (Data_Pagamento, ou a data do trabalho se não houver)"""
+    datas = converter_datas(df['Data'])
+    if 'Data_Pagamento' in df.columns:
+        datas = converter_datas(df['Data_Pagamento']).fillna(datas)
+    pago = mascara_pago(df) & datas.notna()
+    mensal = pd.DataFrame({
+        'Ano': datas.dt.year[pago], 'Mes': datas.dt.month[pago],
+        'Valor_USD': valores(df, 'Valor_Ajustado_USD')[pago], 'Valor_BRL': valores(df, 'Valor_Ajustado_BRL')[pago],
+    }).groupby(['Ano', 'Mes'], as_index=False).sum()
+    mensal[['Ano', 'Mes']] = mensal[['Ano', 'Mes']].astype('int64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mensal['Cotacao_Media'] = np.where(mensal['Valor_USD'] > 0, mensal['Valor_BRL'] / mensal['Valor_USD'], 0.0)
+    anual = mensal.groupby('Ano', as_index=False)[['Valor_BRL']].sum()
+    return _linhas(anual['Ano'], EXTERIOR, MEMBRO_FREELANCER, 'Freelancer (convertido em R$ no recebimento)',
+                   anual['Valor_BRL']), mensal[COLUNAS_EXTERIOR]
+
+
+def _investimentos(df, anos):
+    """Rendimento de cada ano e posição acumulada (aplicado + rendimento) em 31/12 de cada ano"""
+    datas = converter_datas(df['Data'])
+    base = pd.DataFrame({'Ano': datas.dt.year, 'Membro': df['Membro'].astype(str), 'Item': df['Tipo'].astype(str),
+                         'Valor': valores(df, 'Valor'), 'Rendimento': valores(df, 'Rendimento')})[datas.notna()]
+    if base.empty:
+        return _linhas([], INVESTIMENTOS, [], [], [])
+    base['Ano'] = base['Ano'].astype('int64')
+    rendimentos = base.groupby(['Ano', 'Membro', 'Item'], as_index=False)['Rendimento'].sum()
+    # Posição: soma por ano, estendida a todos os anos e acumulada (anos sem lançamento herdam o saldo)
+    por_ano = (base.assign(Posicao=base['Valor'] + base['Rendimento'])
+               .pivot_table(index=['Membro', 'Item'], columns='Ano', values='Posicao', aggfunc='sum', fill_value=0)
+               .reindex(columns=anos, fill_value=0).cumsum(axis=1))
+    posicoes = por_ano.stack().rename('Valor').reset_index()
+    posicoes = posicoes[posicoes['Valor'] != 0]
+    return pd.concat([
+        _linhas(rendimentos['Ano'], INVESTIMENTOS, rendimentos['Membro'], rendimentos['Item'], rendimentos['Rendimento']),
+        _linhas(posicoes['Ano'], BENS, posicoes['Membro'], posicoes['Item'], posicoes['Valor']),
+    ], ignore_index=True)
+
+
+def _emprestimos(df, anos):
+    """Saldo (parcelas restantes x parcela) de cada empréstimo em 31/12 de cada ano, empréstimos x anos de uma vez.
+
+    A parcela k vence k meses depois da data do empréstimo; as pagas são consideradas em dia.
+    """
+    datas = converter_datas(df['Data_Emprestimo'])
+    valido = datas.notna().to_numpy()
+    mes_inicio = (datas.dt.year * 12 + datas.dt.month - 1).to_numpy(dtype='float64')[valido]
+    total = valores(df, 'Parcelas_Total').to_numpy()[valido]
+    pagas = valores(df, 'Parcelas_Pagas').to_numpy()[valido]
+    parcela = valores(df, 'Valor_Parcela_Mensal').to_numpy()[valido]
+    anos = np.asarray(anos, dtype='int64')
+    # (empréstimos, anos): parcelas vencidas até dezembro, limitadas às pagas de fato
+    vencidas = np.clip(anos[None, :] * 12 + 11 - mes_inicio[:, None], 0, total[:, None])
+    saldo = (total[:, None] - np.minimum(vencidas, pagas[:, None])) * parcela[:, None]
+    contratado = anos[None, :] * 12 + 11 >= mes_inicio[:, None]
+    linha, coluna = np.nonzero(contratado & (saldo > 0))
+    emprestado = (df['Tipo'] == 'Emprestado').to_numpy()[valido]
+    descricao = (df['Observacoes'].astype(object).fillna('').astype(str) if 'Observacoes' in df.columns
+                 else pd.Series('', index=df.index))[valido].to_numpy()
+    itens = np.array([f"{d or 'Empréstimo'} ({data:%d/%m/%Y})" for d, data in zip(descricao, datas[valido])],
+                     dtype=object)
+    return _linhas(anos[coluna], np.where(emprestado[linha], CREDITOS, DIVIDAS),
+                   df['Nome'].astype(str).to_numpy()[valido][linha], itens[linha], saldo[linha, coluna])
+
+
+def _anos(dados):
+    anos = set()
+    for nome, coluna in (('familia', 'Data'), ('horas', 'Data'), ('investimentos', 'Data'),
+                         ('emprestimos', 'Data_Emprestimo')):
+        df = dados.get(nome)
+        if df is not None and not df.empty:
+            anos.update(converter_datas(df[coluna]).dt.year.dropna().astype(int).tolist())
+    if not anos:
+        return []
+    # Saldos seguem até o ano corrente, mesmo sem lançamentos nos últimos anos
+    return list(range(min(anos), max(max(anos), pd.Timestamp.now().year) + 1))
+
+
+def calcular(dados):
+    """{ano: {'linhas': DataFrame (Secao, Membro, Item, Valor), 'exterior_mensal': DataFrame}} de todos os anos"""
+    anos = _anos(dados)
+    partes, exterior_mensal = [], pd.DataFrame(columns=COLUNAS_EXTERIOR)
+    if not dados['familia'].empty:
+        partes.append(_rendimentos_familia(dados['familia']))
+    if not dados['horas'].empty:
+        linhas_exterior, exterior_mensal = _exterior(dados['horas'])
+        partes.append(linhas_exterior)
+    if not dados['investimentos'].empty:
+        partes.append(_investimentos(dados['investimentos'], anos))
+    if not dados['emprestimos'].empty:
+        partes.append(_emprestimos(dados['emprestimos'], anos))
+    linhas = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUNAS)
+    linhas = (linhas.groupby(['Ano', 'Secao', 'Membro', 'Item'], as_index=False, sort=False)['Valor'].sum()
+              .assign(Valor=lambda t: t['Valor'].round(2)))
+    linhas['Secao'] = pd.Categorical(linhas['Secao'], categories=SECOES, ordered=True)
+    linhas = linhas.sort_values(['Ano', 'Secao', 'Membro', 'Item'], kind='stable')
+    por_ano = dict(tuple(linhas.groupby('Ano', observed=True)))
+    meses_por_ano = dict(tuple(exterior_mensal.groupby('Ano')))
+    return {ano: {'linhas': por_ano.get(ano, linhas.iloc[:0]).drop(columns='Ano').reset_index(drop=True),
+                  'exterior_mensal': meses_por_ano.get(ano, exterior_mensal.iloc[:0]).drop(columns='Ano')
+                  .reset_index(drop=True)}
+            for ano in anos}
+
+
+def totais(resumo_ano):
+    """Total de cada seção por membro (colunas: seções)"""
+    linhas = resumo_ano['linhas']
+    return (linhas.pivot_table(index='Membro', columns='Secao', values='Valor', aggfunc='sum', observed=True,
+                               fill_value=0.0).reindex(columns=SECOES, fill_value=0.0).astype('float64')
+            .rename_axis(columns=None).reset_index())
+
+
+def exportar(resumo_ano, ano, destino, formatos=FORMATOS):
+    """Grava o resumo do ano (totais, detalhamento e carnê-leão mês a mês) no formato dos relatórios"""
+    tabelas = {'totais_por_membro': totais(resumo_ano), 'detalhamento': resumo_ano['linhas'],
+               'carne_leao_mensal': resumo_ano['exterior_mensal']}
+    gravar_relatorio(Path(destino), f"Resumo IRPF {ano} (ano-calendário)", None, tabelas, formatos)
+
+
+class ResumosIRPF:
+    """Resultado de `calcular` guardado pela versão dos dados (a do escritor): só recalcula quando algo muda"""
+
+    def __init__(self, maximo=4):
+        self.maximo = maximo
+        self._resultados = {}
+        self._lock = threading.Lock()
+
+    def obter(self, versao, dados):
+        with self._lock:
+            resultado = self._resultados.get(versao)
+        if resultado is None:
+            resultado = calcular(dados)
+            with self._lock:
+                self._resultados[versao] = resultado
+                while len(self._resultados) > self.maximo:
+                    self._resultados.pop(next(iter(self._resultados)))
+        return resultado
+
+
+_resumos = None
+_resumos_lock = threading.Lock()
+
+
+def obter_resumos():
+    """Cache de resumos compartilhado pelo processo"""
+    global _resumos
+    with _resumos_lock:
+        if _resumos is None:
+            _resumos = ResumosIRPF()
+        return _resumos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumo anual para a declaração do IRPF")
+    parser.add_argument('--ano', type=int, default=pd.Timestamp.now().year - 1,
+                        help="Ano-calendário; padrão: o ano anterior")
+    parser.add_argument('--dados', default=DATA_DIR, help="Pasta dos arquivos de dados")
+    parser.add_argument('--saida', default='relatorios/irpf', help="Pasta de saída (o ano vira subpasta)")
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=FORMATOS)
+    args = parser.parse_args(argv)
+    resumo = calcular(carregar_todos(args.dados))
+    if args.ano not in resumo:
+        parser.exit(1, f"Sem dados para {args.ano}\n")
+    exportar(resumo[args.ano], args.ano, Path(args.saida) / str(args.ano), args.formatos)
+    print(totais(resumo[args.ano]).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
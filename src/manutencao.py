@@ -0,0 +1,151 @@
+"""Manutenção dos arquivos de dados: ordena por data, dobra segmentos anexados, poda restos e reconstrói índices.
+
+Uso:
+    python src/manutencao.py --dados data [--idade-minima 600]
+
+Lançamentos entram na ordem de digitação e importações acrescentam blocos ao fim do arquivo (ou
+das partições); a manutenção regrava cada conjunto ordenado pela coluna de data, com as linhas
+sem data no fim. Com os arquivos ordenados, filtros por intervalo (filtrar_por_mes, a API) viram
+busca binária em vez de máscara sobre todas as linhas. Conjuntos já ordenados não são regravados.
+"""
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from dados import CONJUNTOS, DATA_DIR, caminho
+from duplicidade import CAMPOS_CHAVE, IndiceDuplicidade
+from escrita import gravar_csv_duravel
+from particoes import (ARQUIVO_MANIFESTO, COLUNA_DATA, converter_datas, datas_ordenadas, diretorio_particoes,
+                       ler_conjunto, ler_manifesto, particionado)
+
+# Restos de gravação mais novos que isso (segundos) podem ser de uma gravação em andamento
+IDADE_MINIMA_PADRAO = 600
+_RESTOS_GRAVACAO = ('_temp_backup.csv', '_lote_backup.csv')
+
+
+def ordenar_por_data(df, file_path):
+    """Ordem estável pela coluna de data do conjunto, linhas sem data no fim"""
+    datas = converter_datas(df[COLUNA_DATA[Path(file_path).stem]]).reset_index(drop=True)
+    ordem = datas.sort_values(kind='stable', na_position='last').index
+    return df.reset_index(drop=True).iloc[ordem].reset_index(drop=True)
+
+
+def _antigo(arquivo, idade_minima):
+    return time.time() - arquivo.stat().st_mtime >= idade_minima
+
+
+def _comparar(original, backup):
+    """Estado do arquivo de dados frente ao backup temporário: 'ilegivel', 'truncado', 'igual' ou 'diferente'"""
+    try:
+        df = pd.read_csv(original)
+    except Exception:
+        return 'ilegivel'
+    try:
+        df_backup = pd.read_csv(backup)
+    except Exception:
+        # Backup inaproveitável: o arquivo de dados fica como está
+        return 'igual'
+    if list(df.columns) != list(df_backup.columns) or len(df) < len(df_backup):
+        # Uma gravação cortada no meio ainda pode ser lida, só que com menos linhas
+        return 'truncado'
+    return 'igual' if df.equals(df_backup) else 'diferente'
+
+
+def podar_restos(data_dir=DATA_DIR, idade_minima=IDADE_MINIMA_PADRAO):
+    """Remove backups temporários de gravações interrompidas, .tmp e partições fora do manifesto.
+
+    Se o arquivo de dados não puder ser lido, tiver menos linhas ou outras colunas que o backup
+    temporário, o backup volta para o lugar dele (o que a gravação teria feito se não tivesse sido
+    interrompida). Um backup com conteúdo diferente que não dá para julgar fica para conferência.
+    """
+    data_dir = Path(data_dir)
+    mensagens = []
+    for sufixo in _RESTOS_GRAVACAO:
+        for resto in data_dir.glob(f"*{sufixo}"):
+            if not _antigo(resto, idade_minima):
+                continue
+            original = data_dir / resto.name.replace(sufixo, '.csv')
+            estado = _comparar(original, resto) if original.exists() else 'igual'
+            if estado in ('ilegivel', 'truncado'):
+                shutil.copy2(resto, original)
+                mensagens.append(f"{original.name}: {'ilegível' if estado == 'ilegivel' else 'incompleto'}, "
+                                 f"restaurado de {resto.name}")
+            elif estado == 'diferente':
+                mensagens.append(f"{resto.name}: difere de {original.name}, mantido para conferência")
+                continue
+            resto.unlink()
+            mensagens.append(f"{resto.name}: removido")
+    for nome in CONJUNTOS:
+        file_path = caminho(nome, data_dir)
+        if not particionado(file_path):
+            continue
+        base = diretorio_particoes(file_path)
+        validos = {base / p['arquivo'] for p in ler_manifesto(file_path)['particoes'].values()}
+        for arquivo in base.rglob('*'):
+            if not arquivo.is_file() or arquivo.name == ARQUIVO_MANIFESTO or arquivo in validos:
+                continue
+            if (arquivo.suffix in ('.tmp', '.csv')) and _antigo(arquivo, idade_minima):
+                arquivo.unlink()
+                mensagens.append(f"{arquivo.relative_to(data_dir)}: fora do manifesto, removido")
+    return mensagens
+
+
+def ordenar_conjunto(file_path, escritor=None):
+    """Regrava o conjunto ordenado por data, se preciso; retorna (DataFrame gravado, regravou?).
+
+    Com `escritor`, a leitura enxerga as alterações pendentes e a regravação entra na mesma fila
+    das sessões, em vez de disputar o arquivo com ela.
+    """
+    df = escritor.ler_csv(file_path) if escritor is not None else ler_conjunto(file_path)
+    if df.empty or datas_ordenadas(converter_datas(df[COLUNA_DATA[Path(file_path).stem]])):
+        return df, False
+    ordenado = ordenar_por_data(df, file_path)
+    # Particionado: só as partições cuja ordem mudou são regravadas (hash do conteúdo)
+    if escritor is not None:
+        escritor.enfileirar(ordenado, file_path)
+    else:
+        gravar_csv_duravel(ordenado, file_path)
+    return ordenado, True
+
+
+def executar(data_dir=DATA_DIR, idade_minima=IDADE_MINIMA_PADRAO, escritor=None):
+    """Poda os restos, ordena cada conjunto e reconstrói os índices de duplicados persistidos.
+
+    Dentro do app, passe o escritor do processo: as regravações passam por ele.
+    """
+    if escritor is not None and not escritor.aguardar(timeout=30):
+        raise Exception("Há gravações pendentes que não foram concluídas")
+    mensagens = podar_restos(data_dir, idade_minima)
+    indexados = []
+    for nome in CONJUNTOS:
+        file_path = caminho(nome, data_dir)
+        if not (Path(file_path).exists() or particionado(file_path)):
+            continue
+        df, regravou = ordenar_conjunto(file_path, escritor)
+        mensagens.append(f"{nome}: {len(df)} linhas {'ordenadas por data' if regravou else 'já em ordem'}")
+        if nome in CAMPOS_CHAVE:
+            indexados.append((file_path, df))
+    if escritor is not None and not escritor.aguardar(timeout=30):
+        raise Exception("; ".join(f"{c}: {e}" for c, e in escritor.falhas().items())
+                        or "Tempo esgotado aguardando a gravação")
+    # Só depois da gravação: o índice persistido leva a assinatura do arquivo já ordenado
+    indice = IndiceDuplicidade(Path(data_dir) / 'indices')
+    for file_path, df in indexados:
+        indice.persistir(file_path, df)
+    return mensagens
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção dos arquivos de dados (ordenação, limpeza e índices)")
+    parser.add_argument('--dados', default=DATA_DIR, help="Pasta dos arquivos de dados")
+    parser.add_argument('--idade-minima', type=int, default=IDADE_MINIMA_PADRAO,
+                        help="Só remove restos de gravação mais antigos que isso (segundos)")
+    args = parser.parse_args(argv)
+    print("\n".join(executar(args.dados, args.idade_minima)))
+
+
+if __name__ == '__main__':
+    main()
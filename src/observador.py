@@ -0,0 +1,121 @@
+"""Observa os arquivos de dados e o catálogo de backups: alterações feitas por fora do app ou por outra sessão."""
+import threading
+import time
+from pathlib import Path
+
+from dados import CONJUNTOS, caminho
+from particoes import assinatura_arquivo
+from restauracao import BACKUP_DIR
+
+# Segundos entre duas verificações (um stat por arquivo; nada é lido enquanto não muda)
+INTERVALO_PADRAO = 1.0
+
+
+def _assinatura_pasta(pasta):
+    """mtime da pasta: muda quando um arquivo é criado, removido ou renomeado nela"""
+    pasta = Path(pasta)
+    return pasta.stat().st_mtime_ns if pasta.exists() else None
+
+
+class ObservadorArquivos:
+    """Detecta mudanças por tamanho/mtime (polling) e numera cada uma com uma geração crescente.
+
+    Gravações do próprio escritor contam ao serem enfileiradas (outras sessões precisam
+    redesenhar) e a assinatura que elas deixam no disco é registrada após a gravação, para não
+    voltar como alteração externa. Cada sessão guarda a última geração que desenhou e pergunta
+    só quais arquivos mudaram desde então.
+    """
+
+    def __init__(self, escritor, data_dir='data', backup_dir=BACKUP_DIR, intervalo=INTERVALO_PADRAO):
+        self.escritor = escritor
+        self.intervalo = intervalo
+        self._arquivos = [caminho(nome, data_dir) for nome in CONJUNTOS]
+        self._backup_dir = str(Path(backup_dir))
+        self._assinaturas = {c: str(assinatura_arquivo(c)) for c in self._arquivos}
+        self._assinaturas[self._backup_dir] = _assinatura_pasta(self._backup_dir)
+        self._geracao = 0
+        self._ultima = {}  # caminho -> geração da última mudança
+        self._ao_alterar = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._executar, name="observador-arquivos", daemon=True)
+        self._thread.start()
+
+    def observar(self, ao_alterar):
+        """Registra `f(caminho)`, chamada quando um arquivo muda por fora do escritor"""
+        self._ao_alterar.append(ao_alterar)
+
+    def _marcar(self, caminhos):
+        with self._lock:
+            self._geracao += 1
+            for c in caminhos:
+                self._ultima[c] = self._geracao
+
+    def enfileirado(self, file_path, df):
+        self._marcar([str(Path(file_path))])
+
+    def gravado(self, file_path, df):
+        caminho_arquivo = str(Path(file_path))
+        with self._lock:
+            self._assinaturas[caminho_arquivo] = str(assinatura_arquivo(caminho_arquivo))
+
+    def verificar(self):
+        """Compara as assinaturas atuais com as conhecidas; retorna os caminhos alterados por fora"""
+        alterados = []
+        for c in self._arquivos:
+            if self.escritor.pendente(c):
+                # Gravação própria em andamento: a assinatura nova chega por `gravado`
+                continue
+            assinatura = str(assinatura_arquivo(c))
+            with self._lock:
+                if self._assinaturas.get(c) != assinatura:
+                    self._assinaturas[c] = assinatura
+                    alterados.append(c)
+        assinatura = _assinatura_pasta(self._backup_dir)
+        with self._lock:
+            if self._assinaturas.get(self._backup_dir) != assinatura:
+                self._assinaturas[self._backup_dir] = assinatura
+                alterados.append(self._backup_dir)
+        if alterados:
+            self._marcar(alterados)
+            for c in alterados:
+                for observador in self._ao_alterar:
+                    try:
+                        observador(c)
+                    except Exception:
+                        # Um índice que falhou ao descartar é reconstruído na próxima leitura
+                        pass
+        return alterados
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.verificar()
+            except OSError:
+                # Arquivo trocado no meio do stat: a próxima volta pega o estado final
+                pass
+
+    def geracao(self):
+        with self._lock:
+            return self._geracao
+
+    def alterados_desde(self, geracao):
+        """Caminhos que mudaram depois da geração informada"""
+        with self._lock:
+            return [c for c, g in self._ultima.items() if g > geracao]
+
+
+_observador = None
+_observador_lock = threading.Lock()
+
+
+def obter_observador(escritor, ao_alterar=()):
+    """Observador do processo, ligado ao escritor e aos `ao_alterar` uma única vez"""
+    global _observador
+    with _observador_lock:
+        if _observador is None:
+            _observador = ObservadorArquivos(escritor)
+            escritor.observar(ao_enfileirar=_observador.enfileirado, ao_gravar=_observador.gravado)
+            for funcao in ao_alterar:
+                _observador.observar(funcao)
+        return _observador
@@ -0,0 +1,140 @@
+"""Orçamentos mensais por categoria (e opcionalmente por membro) com totais acumulados incrementais."""
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from agregacoes import assinatura_despesas, centavos, somar_assinatura, texto
+from particoes import chave_mes
+
+ORCAMENTOS_PATH = 'data/orcamentos.csv'
+COLUNAS_ORCAMENTOS = ['Categoria', 'Membro', 'Limite']
+
+# Chave de membro usada para o total da categoria inteira
+TODOS = None
+
+
+def limites(df_orcamentos):
+    """{(categoria, membro ou TODOS): limite em centavos}; membro vazio vale para a categoria inteira"""
+    if df_orcamentos.empty:
+        return {}
+    membros = [m or TODOS for m in texto(df_orcamentos['Membro'])]
+    return dict(zip(zip(texto(df_orcamentos['Categoria']), membros), centavos(df_orcamentos['Limite'])))
+
+
+def _agrupar(df_despesas):
+    """Soma em centavos por (mês, categoria, membro) e por (mês, categoria, TODOS)"""
+    if df_despesas.empty:
+        return {}
+    base = pd.DataFrame({
+        'Mes': chave_mes(df_despesas['Data']),
+        'Categoria': texto(df_despesas['Categoria']),
+        'Membro': texto(df_despesas['Membro']),
+        'Valor': centavos(df_despesas['Valor']),
+    })
+    por_membro = base.groupby(['Mes', 'Categoria', 'Membro'])['Valor'].sum()
+    por_categoria = base.groupby(['Mes', 'Categoria'])['Valor'].sum()
+    somas = dict(zip(por_membro.index, por_membro.tolist()))
+    somas.update(((mes, cat, TODOS), v) for (mes, cat), v in zip(por_categoria.index, por_categoria.tolist()))
+    return somas
+
+
+class TotaisOrcamento:
+    """Gasto acumulado por mês/categoria/membro, em centavos.
+
+    Inserções e exclusões aplicam só a diferença das linhas afetadas. Com a versão do arquivo (a do
+    escritor) repetida, nada é conferido; quando ela muda, a assinatura de conteúdo decide se o
+    arquivo mudou por fora e só então o histórico é reagregado.
+    """
+
+    def __init__(self):
+        self._totais = defaultdict(int)
+        self._assinatura = None
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def sincronizar(self, df_despesas, versao=None):
+        """Reagrega tudo somente se o estado em memória não corresponde ao DataFrame da `versao`"""
+        with self._lock:
+            if versao is not None and versao == self._versao:
+                return
+        assinatura = assinatura_despesas(df_despesas)
+        with self._lock:
+            if assinatura == self._assinatura:
+                self._versao = versao
+                return
+        somas = _agrupar(df_despesas)
+        with self._lock:
+            self._totais = defaultdict(int, somas)
+            self._assinatura = assinatura
+            self._versao = versao
+
+    def _aplicar(self, linhas, sinal):
+        somas = _agrupar(linhas)
+        with self._lock:
+            for chave, valor in somas.items():
+                self._totais[chave] += sinal * valor
+            self._assinatura = somar_assinatura(self._assinatura, linhas, sinal)
+            # Os totais já não são os da versão lida: a próxima versão é conferida pela assinatura
+            self._versao = None
+        return somas
+
+    def registrar(self, df_antes, novas, versao=None):
+        """Soma as despesas novas a `df_antes` (dados da `versao`); retorna as chaves afetadas"""
+        self.sincronizar(df_antes, versao)
+        return self._aplicar(novas, 1)
+
+    def estornar(self, df_antes, removidas, versao=None):
+        self.sincronizar(df_antes, versao)
+        return self._aplicar(removidas, -1)
+
+    def gasto(self, mes, categoria, membro=TODOS):
+        with self._lock:
+            return self._totais.get((mes, categoria, membro), 0)
+
+    def estouros(self, afetadas, tabela_limites):
+        """Orçamentos excedidos entre as chaves afetadas por uma inserção"""
+        resultado = []
+        for mes, categoria, membro in afetadas:
+            limite = tabela_limites.get((categoria, membro))
+            if limite is None:
+                continue
+            gasto = self.gasto(mes, categoria, membro)
+            if gasto > limite:
+                resultado.append({'Mes': mes, 'Categoria': categoria, 'Membro': membro or 'Todos',
+                                  'Limite': limite / 100, 'Gasto': gasto / 100})
+        return resultado
+
+    def burndown(self, tabela_limites, hoje=None):
+        """Consumo do mês corrente de cada orçamento, comparado ao ritmo linear esperado"""
+        hoje = pd.Timestamp(hoje) if hoje is not None else pd.Timestamp.today()
+        mes = hoje.strftime('%Y-%m')
+        ritmo = hoje.day / hoje.days_in_month
+        linhas = []
+        for (categoria, membro), limite in tabela_limites.items():
+            gasto = self.gasto(mes, categoria, membro)
+            linhas.append({
+                'Categoria': categoria,
+                'Membro': membro or 'Todos',
+                'Limite': limite / 100,
+                'Gasto': gasto / 100,
+                'Restante': (limite - gasto) / 100,
+                'Uso_Pct': gasto / limite * 100 if limite else 0.0,
+                'Ritmo_Esperado_Pct': ritmo * 100,
+                'Projecao_Mes': gasto / ritmo / 100,
+            })
+        colunas = ['Categoria', 'Membro', 'Limite', 'Gasto', 'Restante', 'Uso_Pct', 'Ritmo_Esperado_Pct', 'Projecao_Mes']
+        return pd.DataFrame(linhas, columns=colunas)
+
+
+_totais = None
+_totais_lock = threading.Lock()
+
+
+def obter_totais():
+    """Totais compartilhados pelo processo (sobrevivem aos reruns do Streamlit)"""
+    global _totais
+    with _totais_lock:
+        if _totais is None:
+            _totais = TotaisOrcamento()
+        return _totais
@@ -0,0 +1,299 @@
+"""Layout opcional particionado por mês: data/despesas/2025/09.<hash>.csv + data/despesas/_manifesto.json.
+
+Uso da migração (divide os CSVs planos existentes):
+    python src/particoes.py migrar [--dir data]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Coluna de data usada como chave de partição em cada conjunto de dados
+COLUNA_DATA = {
+    'horas': 'Data',
+    'familia': 'Data',
+    'despesas': 'Data',
+    'investimentos': 'Data',
+    'emprestimos': 'Data_Emprestimo',
+}
+ARQUIVO_MANIFESTO = '_manifesto.json'
+SEM_DATA = 'sem_data'
+
+
+def diretorio_particoes(file_path):
+    """data/despesas.csv -> data/despesas/"""
+    return Path(file_path).with_suffix('')
+
+
+def particionado(file_path):
+    return (diretorio_particoes(file_path) / ARQUIVO_MANIFESTO).exists()
+
+
+def ler_manifesto(file_path):
+    with open(diretorio_particoes(file_path) / ARQUIVO_MANIFESTO, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gravar_atomico(destino, conteudo):
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temp = destino.with_name(destino.name + '.tmp')
+    with open(temp, 'w', encoding='utf-8', newline='') as f:
+        f.write(conteudo)
+    os.replace(temp, destino)
+
+
+def _arquivo_particao(mes, assinatura=None):
+    """Caminho relativo da partição; com `assinatura` o nome é único para aquele conteúdo"""
+    sufixo = f".{assinatura[:12]}" if assinatura else ""
+    if mes == SEM_DATA:
+        return f"{SEM_DATA}{sufixo}.csv"
+    ano, mes_num = mes.split('-')
+    return f"{ano}/{mes_num}{sufixo}.csv"
+
+
+def converter_datas(serie_data):
+    """to_datetime rápido para datas ISO, com fallback para outros formatos só onde falhar"""
+    datas = pd.to_datetime(serie_data, errors='coerce', format='ISO8601')
+    falhas = datas.isna() & pd.Series(serie_data, index=datas.index).notna()
+    if falhas.any():
+        datas[falhas] = pd.to_datetime(pd.Series(serie_data, index=datas.index)[falhas], errors='coerce', format='mixed')
+    return datas
+
+
+def chave_mes(serie_data):
+    """Converte a coluna de data em chaves 'YYYY-MM' (datas inválidas vão para 'sem_data')"""
+    datas = converter_datas(serie_data)
+    # strftime por linha é lento; formata só os meses distintos
+    codigos = (datas.dt.year * 100 + datas.dt.month).fillna(-1).astype('int64').to_numpy()
+    unicos, posicoes = np.unique(codigos, return_inverse=True)
+    rotulos = np.array([f"{c // 100:04d}-{c % 100:02d}" if c >= 0 else SEM_DATA for c in unicos], dtype=object)
+    return pd.Series(rotulos[posicoes], index=datas.index)
+
+
+def assinatura_arquivo(file_path):
+    """Tamanho e mtime do arquivo de dados (ou do manifesto, se particionado); None se não existe"""
+    alvo = diretorio_particoes(file_path) / ARQUIVO_MANIFESTO if particionado(file_path) else Path(file_path)
+    if not alvo.exists():
+        return None
+    estado = alvo.stat()
+    return [estado.st_size, estado.st_mtime_ns]
+
+
+def meses_no_intervalo(meses, inicio=None, fim=None):
+    """Filtra chaves 'YYYY-MM' pelo intervalo de datas [inicio, fim]"""
+    ini = pd.Timestamp(inicio).strftime('%Y-%m') if inicio is not None else None
+    fim_mes = pd.Timestamp(fim).strftime('%Y-%m') if fim is not None else None
+    return [m for m in meses if m != SEM_DATA
+            and (ini is None or m >= ini) and (fim_mes is None or m <= fim_mes)]
+
+
+def meses_disponiveis(file_path):
+    """Lista os meses com dados consultando apenas o manifesto"""
+    return sorted(m for m in ler_manifesto(file_path)['particoes'] if m != SEM_DATA)
+
+
+def datas_ordenadas(datas):
+    """Datas em ordem crescente com as vazias no fim (como a manutenção grava os conjuntos)"""
+    validas = int(datas.notna().sum())
+    return bool(datas.iloc[validas:].isna().all() and datas.iloc[:validas].is_monotonic_increasing)
+
+
+def fatia_intervalo(datas, inicio=None, fim=None):
+    """slice das linhas com data em [inicio, fim] por busca binária; None se as datas não estão ordenadas"""
+    if not datas_ordenadas(datas):
+        return None
+    valores = datas.to_numpy()[:int(datas.notna().sum())]
+    ini = 0 if inicio is None else int(np.searchsorted(valores, pd.Timestamp(inicio).to_datetime64(), side='left'))
+    fim_pos = len(valores) if fim is None else int(np.searchsorted(valores, pd.Timestamp(fim).to_datetime64(), side='right'))
+    return slice(ini, max(fim_pos, ini))
+
+
+def filtrar_por_mes(df, file_path, meses=None, inicio=None, fim=None):
+    """Aplica em memória o mesmo filtro de meses/intervalo usado na poda de partições"""
+    if meses is None and inicio is None and fim is None:
+        return df
+    coluna = COLUNA_DATA[Path(file_path).stem]
+    if meses is None:
+        # Conjunto ordenado por data: o intervalo de meses vira uma fatia por busca binária
+        fatia = fatia_intervalo(converter_datas(df[coluna]),
+                                pd.Timestamp(inicio).to_period('M').start_time if inicio is not None else None,
+                                pd.Timestamp(fim).to_period('M').end_time if fim is not None else None)
+        if fatia is not None:
+            return df.iloc[fatia].reset_index(drop=True)
+    chaves = chave_mes(df[coluna])
+    selecionados = sorted(set(chaves))
+    if meses is not None:
+        selecionados = [m for m in selecionados if m in set(meses)]
+    if inicio is not None or fim is not None:
+        selecionados = meses_no_intervalo(selecionados, inicio, fim)
+    return df[chaves.isin(selecionados)].reset_index(drop=True)
+
+
+def ler_particoes(file_path, meses=None, inicio=None, fim=None):
+    """Lê só as partições necessárias; sem filtros lê todas (incluindo linhas sem data)"""
+    manifesto = ler_manifesto(file_path)
+    base = diretorio_particoes(file_path)
+    particoes = manifesto['particoes']
+
+    selecionados = list(particoes)
+    if meses is not None:
+        selecionados = [m for m in selecionados if m in set(meses)]
+    if inicio is not None or fim is not None:
+        selecionados = meses_no_intervalo(selecionados, inicio, fim)
+
+    frames = [pd.read_csv(base / particoes[m]['arquivo']) for m in sorted(selecionados)]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=manifesto['colunas'])
+    df = pd.concat(frames, ignore_index=True)
+    return df[[c for c in manifesto['colunas'] if c in df.columns]
+              + [c for c in df.columns if c not in manifesto['colunas']]]
+
+
+def ler_conjunto(file_path, meses=None, inicio=None, fim=None):
+    """Lê um conjunto de dados do disco, particionado ou plano, com o mesmo filtro de meses"""
+    if particionado(file_path):
+        return ler_particoes(file_path, meses, inicio, fim)
+    return filtrar_por_mes(pd.read_csv(file_path), file_path, meses, inicio, fim)
+
+
+def gravar_particionado(df, file_path):
+    """Grava as partições cujo conteúdo mudou em arquivos novos e troca o manifesto.
+
+    Nenhum arquivo referenciado pelo manifesto atual é sobrescrito: até a troca do manifesto
+    (atômica) a versão anterior continua inteira no disco, e uma falha só apaga os arquivos
+    novos. Os arquivos que a versão nova deixou de usar são removidos depois da troca.
+    """
+    base = diretorio_particoes(file_path)
+    coluna = COLUNA_DATA[Path(file_path).stem]
+    manifesto = ler_manifesto(file_path) if particionado(file_path) else {'particoes': {}}
+    antigas = manifesto['particoes']
+
+    novas, criados = {}, []
+    try:
+        if not df.empty:
+            chaves = chave_mes(df[coluna]) if coluna in df.columns else pd.Series(SEM_DATA, index=df.index)
+            for mes, grupo in df.groupby(chaves.to_numpy(), sort=True):
+                conteudo = grupo.to_csv(index=False)
+                assinatura = hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+                arquivo = antigas.get(mes, {}).get('arquivo')
+                if antigas.get(mes, {}).get('hash') != assinatura or not (base / arquivo).exists():
+                    arquivo = _arquivo_particao(mes, assinatura)
+                    criados.append(base / arquivo)
+                    _gravar_atomico(base / arquivo, conteudo)
+                    verificacao = pd.read_csv(base / arquivo)
+                    if len(verificacao) != len(grupo):
+                        raise Exception(f"Verificação falhou na partição {arquivo}")
+                novas[mes] = {'arquivo': arquivo, 'linhas': int(len(grupo)), 'hash': assinatura}
+
+        # Manifesto por último: só então a nova versão passa a valer
+        _gravar_atomico(base / ARQUIVO_MANIFESTO, json.dumps(
+            {'coluna': coluna, 'colunas': list(df.columns), 'particoes': novas}, indent=1))
+    except Exception:
+        em_uso = {base / p['arquivo'] for p in antigas.values()}
+        for criado in criados:
+            if criado not in em_uso:
+                criado.unlink(missing_ok=True)
+        raise
+
+    em_uso = {p['arquivo'] for p in novas.values()}
+    for particao in antigas.values():
+        if particao['arquivo'] not in em_uso:
+            (base / particao['arquivo']).unlink(missing_ok=True)
+
+
+def _sha1_arquivo(caminho_arquivo, bloco=1 << 20):
+    """Mesmo hash do manifesto (sha1 do conteúdo), lendo o arquivo em blocos"""
+    resumo = hashlib.sha1()
+    with open(caminho_arquivo, 'rb') as f:
+        for parte in iter(lambda: f.read(bloco), b''):
+            resumo.update(parte)
+    return resumo.hexdigest()
+
+
+def anexar_particoes(df, file_path, anexos):
+    """Acrescenta as linhas ao fim das partições do mês, sem reescrever as existentes.
+
+    `anexos` acumula {mês: [arquivo, tamanho original (None se a partição é nova), linhas]} entre as
+    chamadas; o manifesto só muda em confirmar_anexos, e reverter_anexos desfaz tudo.
+    """
+    base = diretorio_particoes(file_path)
+    manifesto = ler_manifesto(file_path)
+    coluna = manifesto['coluna']
+    df = df.reindex(columns=manifesto['colunas'])
+    for mes, grupo in df.groupby(chave_mes(df[coluna]).to_numpy(), sort=True):
+        if mes not in anexos:
+            arquivo = manifesto['particoes'].get(mes, {}).get('arquivo', _arquivo_particao(mes))
+            anexos[mes] = [arquivo, (base / arquivo).stat().st_size if (base / arquivo).exists() else None, 0]
+        destino = base / anexos[mes][0]
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        novo = not destino.exists()
+        with open(destino, 'a', encoding='utf-8', newline='') as f:
+            grupo.to_csv(f, index=False, header=novo)
+        anexos[mes][2] += len(grupo)
+
+
+def confirmar_anexos(file_path, anexos):
+    """Atualiza linhas e hash das partições anexadas e grava o manifesto (a nova versão passa a valer)"""
+    base = diretorio_particoes(file_path)
+    manifesto = ler_manifesto(file_path)
+    for mes, (arquivo, _, linhas) in anexos.items():
+        anterior = manifesto['particoes'].get(mes, {}).get('linhas', 0)
+        manifesto['particoes'][mes] = {'arquivo': arquivo, 'linhas': int(anterior + linhas),
+                                       'hash': _sha1_arquivo(base / arquivo)}
+    _gravar_atomico(base / ARQUIVO_MANIFESTO, json.dumps(manifesto, indent=1))
+
+
+def reverter_anexos(file_path, anexos):
+    """Volta as partições anexadas ao tamanho original (ou apaga as criadas)"""
+    base = diretorio_particoes(file_path)
+    for arquivo, tamanho, _ in anexos.values():
+        destino = base / arquivo
+        if tamanho is None:
+            destino.unlink(missing_ok=True)
+        elif destino.exists():
+            os.truncate(destino, tamanho)
+
+
+def migrar(data_dir='data'):
+    """Divide os CSVs planos em partições mensais, movendo o original para data/backups"""
+    data_dir = Path(data_dir)
+    backup_dir = data_dir / 'backups'
+    backup_dir.mkdir(exist_ok=True)
+    timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
+    migrados = []
+    for nome in COLUNA_DATA:
+        plano = data_dir / f"{nome}.csv"
+        if not plano.exists() or particionado(plano):
+            continue
+        df = pd.read_csv(plano)
+        gravar_particionado(df, plano)
+        if len(ler_particoes(plano)) != len(df):
+            raise Exception(f"Migração de {plano} não conferiu")
+        shutil.move(plano, backup_dir / f"{nome}_pre_particao_{timestamp}.csv")
+        migrados.append(f"{nome}: {len(df)} linhas em {len(ler_manifesto(plano)['particoes'])} partições")
+    return migrados
+
+
+def csv_texto(file_path):
+    """Conteúdo concatenado de um conjunto particionado, no formato de um CSV plano"""
+    buffer = io.StringIO()
+    ler_particoes(file_path).to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Particionamento mensal dos arquivos de dados")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    cmd_migrar = sub.add_parser('migrar', help="Divide os CSVs planos em partições mensais")
+    cmd_migrar.add_argument('--dir', default='data')
+    args = parser.parse_args()
+    if args.comando == 'migrar':
+        resultado = migrar(args.dir)
+        print("\n".join(resultado) if resultado else "Nada para migrar.")
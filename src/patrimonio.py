@@ -0,0 +1,156 @@
+"""Patrimônio líquido ao longo do tempo: deltas diários por componente mantidos incrementalmente e somados em série acumulada."""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dados import CONJUNTOS, caminho
+from particoes import assinatura_arquivo, converter_datas
+from razao import CLASSES, _centavos, _lancamentos
+
+COMPONENTES = ['Renda', 'Despesas', 'Rendimentos', 'Emprestimos']
+
+# Componente e sinal de cada classe do razão. Patrimônio = caixa + investimentos + a receber - a pagar:
+# o valor aplicado sai do caixa e entra nos investimentos (não muda o total), só o rendimento soma;
+# dinheiro emprestado sai do caixa e volta como saldo a receber. O valor líquido de empréstimos
+# tomados entra pela renda ("Empréstimo Recebido") e as parcelas pagas pelas despesas, por isso
+# a classe 'recebido' não conta. Freelancer pendente fica fora, como na renda efetiva.
+_SINAL = {
+    'clt': ('Renda', 1), 'outros': ('Renda', 1), 'freela_pago': ('Renda', 1),
+    'despesa': ('Despesas', -1), 'rendimento': ('Rendimentos', 1),
+    'emprestado': ('Emprestimos', -1), 'a_receber': ('Emprestimos', 1), 'a_pagar': ('Emprestimos', -1),
+}
+_COMPONENTE = np.array([COMPONENTES.index(_SINAL[c][0]) if c in _SINAL else -1 for c in CLASSES], dtype='int8')
+_FATOR = np.array([_SINAL[c][1] if c in _SINAL else 0 for c in CLASSES], dtype='int64')
+
+
+def _contribuicoes(nome, df):
+    """Deltas (dia, componente, centavos com sinal) das linhas de um conjunto; linhas sem data ficam fora"""
+    partes = []
+    for classe, _, _, valor, data, _ in _lancamentos(nome, df.reset_index(drop=True)):
+        classe = np.asarray(classe, dtype='int8')
+        dias = converter_datas(data).reset_index(drop=True)
+        partes.append(pd.DataFrame({
+            'dia': dias.dt.normalize().to_numpy(dtype='datetime64[ns]'),
+            'componente': _COMPONENTE[classe],
+            'centavos': _centavos(valor) * _FATOR[classe],
+        }))
+    if not partes:
+        return pd.DataFrame({'dia': np.empty(0, 'datetime64[ns]'), 'componente': np.empty(0, 'int8'),
+                             'centavos': np.empty(0, 'int64')})
+    deltas = pd.concat(partes, ignore_index=True)
+    return deltas[(deltas['componente'] >= 0) & deltas['dia'].notna() & (deltas['centavos'] != 0)]
+
+
+def _hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _chaves(hashes):
+    """Hash de cada linha com o número da ocorrência: linhas repetidas continuam distinguíveis no diff"""
+    serie = pd.Series(hashes)
+    return pd.MultiIndex.from_arrays([serie, serie.groupby(serie).cumcount()])
+
+
+class Patrimonio:
+    """Série do patrimônio líquido a partir dos cinco conjuntos.
+
+    Guarda, por componente, a soma dos lançamentos de cada dia (centavos). Uma alteração
+    enfileirada é comparada linha a linha (hash) com a versão anterior do conjunto: só as linhas
+    incluídas somam e só as removidas estornam, sem reconverter o histórico. A série acumulada
+    é um cumsum sobre os dias com movimento, refeito apenas quando algum delta muda.
+    """
+
+    def __init__(self, carregar_df, data_dir='data'):
+        self._carregar_df = carregar_df
+        self._caminhos = {caminho(nome, data_dir): nome for nome in CONJUNTOS}
+        self._dfs = {}
+        self._hashes = {}
+        self._chaves_arquivo = {}
+        self._deltas = pd.DataFrame(0, index=pd.DatetimeIndex([], name='Data'), columns=COMPONENTES, dtype='int64')
+        self._serie = None
+        self._lock = threading.RLock()
+
+    def _somar(self, deltas, sinal):
+        if deltas.empty:
+            return
+        tabela = (deltas.pivot_table(index='dia', columns='componente', values='centavos', aggfunc='sum', fill_value=0)
+                  .rename(columns=dict(enumerate(COMPONENTES))).reindex(columns=COMPONENTES, fill_value=0))
+        tabela.index.name = 'Data'
+        self._deltas = self._deltas.add(tabela * sinal, fill_value=0).astype('int64')
+        self._serie = None
+
+    def aplicar(self, file_path, df):
+        """Incorpora a nova versão de um conjunto (observador do escritor): soma incluídas, estorna removidas"""
+        nome = self._caminhos.get(str(file_path))
+        if nome is None:
+            return
+        hashes = _hashes(df)
+        with self._lock:
+            anterior, hashes_antes = self._dfs.get(nome), self._hashes.get(nome)
+            if anterior is None:
+                self._somar(_contribuicoes(nome, df), 1)
+            elif len(hashes) >= len(hashes_antes) and np.array_equal(hashes[:len(hashes_antes)], hashes_antes):
+                # Caso comum: linhas acrescentadas ao fim
+                self._somar(_contribuicoes(nome, df.iloc[len(hashes_antes):]), 1)
+            else:
+                chaves_antes, chaves_depois = _chaves(hashes_antes), _chaves(hashes)
+                removidas = ~chaves_antes.isin(chaves_depois)
+                incluidas = ~chaves_depois.isin(chaves_antes)
+                if removidas.any():
+                    self._somar(_contribuicoes(nome, anterior[removidas]), -1)
+                if incluidas.any():
+                    self._somar(_contribuicoes(nome, df[incluidas]), 1)
+            self._dfs[nome], self._hashes[nome] = df, hashes
+            # Dias sem nenhum movimento restante saem da tabela
+            if (self._deltas == 0).all(axis=1).any():
+                self._deltas = self._deltas[(self._deltas != 0).any(axis=1)]
+
+    def gravado(self, file_path, df):
+        """Após a gravação do escritor o arquivo no disco já é a versão aplicada: não precisa ser relido"""
+        nome = self._caminhos.get(str(file_path))
+        with self._lock:
+            if nome is not None and self._dfs.get(nome) is df:
+                self._chaves_arquivo[nome] = str(assinatura_arquivo(file_path))
+
+    def _sincronizar(self):
+        """Conjuntos alterados por fora do escritor (ou ainda não lidos) entram pelo mesmo diff"""
+        for file_path, nome in self._caminhos.items():
+            chave = str(assinatura_arquivo(file_path))
+            if nome in self._dfs and self._chaves_arquivo.get(nome) == chave:
+                continue
+            self.aplicar(file_path, self._carregar_df(file_path))
+            self._chaves_arquivo[nome] = chave
+
+    def serie(self, frequencia='D'):
+        """Componentes acumulados e o patrimônio líquido em reais, por dia ('D') ou fim de mês ('M')"""
+        with self._lock:
+            self._sincronizar()
+            if self._serie is None:
+                acumulado = self._deltas.sort_index().cumsum()
+                acumulado['Patrimonio'] = acumulado.sum(axis=1)
+                self._serie = acumulado / 100
+            serie = self._serie
+        if frequencia == 'M' and not serie.empty:
+            serie = serie.groupby(serie.index.to_period('M')).last()
+            serie.index = serie.index.to_timestamp(how='end').normalize()
+        return serie
+
+    def atual(self):
+        """Patrimônio líquido na data do último lançamento, em reais"""
+        serie = self.serie()
+        return float(serie['Patrimonio'].iloc[-1]) if not serie.empty else 0.0
+
+
+_patrimonio = None
+_patrimonio_lock = threading.Lock()
+
+
+def obter_patrimonio(escritor, carregar_df):
+    """Série do processo, atualizada a cada gravação enfileirada no escritor"""
+    global _patrimonio
+    with _patrimonio_lock:
+        if _patrimonio is None:
+            _patrimonio = Patrimonio(carregar_df)
+            escritor.observar(ao_enfileirar=_patrimonio.aplicar, ao_gravar=_patrimonio.gravado)
+        return _patrimonio
@@ -0,0 +1,152 @@
+"""Livro razão compacto: todos os conjuntos em uma tabela de códigos inteiros, centavos e datetime64."""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import mascara_clt, mascara_pago, valores
+from dados import CONJUNTOS, caminho
+from particoes import assinatura_arquivo, converter_datas
+
+# Conta de origem (arquivo) e classe contábil de cada lançamento
+CONTAS = CONJUNTOS
+CLASSES = ['clt', 'outros', 'freela_pago', 'freela_pendente', 'despesa', 'investido', 'rendimento',
+           'emprestado', 'recebido', 'a_receber', 'a_pagar']
+_CLASSE = {nome: codigo for codigo, nome in enumerate(CLASSES)}
+
+
+def _centavos(serie):
+    return (serie * 100).round().to_numpy(dtype='int64')
+
+
+def _lancamentos(nome, df):
+    """Blocos (classe, membro, categoria, valor, data, linha) gerados por um conjunto"""
+    linhas = np.arange(len(df), dtype='int32')
+    vazio = pd.Series('', index=df.index)
+    if nome == 'horas':
+        pago = mascara_pago(df).to_numpy()
+        yield (np.where(pago, _CLASSE['freela_pago'], _CLASSE['freela_pendente']), vazio, vazio,
+               valores(df, 'Valor_Ajustado_BRL'), df['Data'], linhas)
+    elif nome == 'familia':
+        clt = mascara_clt(df).to_numpy()
+        yield (np.where(clt, _CLASSE['clt'], _CLASSE['outros']), df['Membro'], df['Tipo'],
+               valores(df, 'Valor'), df['Data'], linhas)
+    elif nome == 'despesas':
+        yield (np.full(len(df), _CLASSE['despesa']), df['Membro'], df['Categoria'],
+               valores(df, 'Valor'), df['Data'], linhas)
+    elif nome == 'investimentos':
+        for coluna, classe in (('Valor', 'investido'), ('Rendimento', 'rendimento')):
+            yield (np.full(len(df), _CLASSE[classe]), df['Membro'], df['Tipo'],
+                   valores(df, coluna), df['Data'], linhas)
+    elif nome == 'emprestimos':
+        emprestado = (df['Tipo'] == 'Emprestado').to_numpy()
+        yield (np.where(emprestado, _CLASSE['emprestado'], _CLASSE['recebido']), df['Nome'], df['Tipo'],
+               valores(df, 'Valor_Liquido_Recebido'), df['Data_Emprestimo'], linhas)
+        # Saldo em aberto dos ativos: parcelas restantes x parcela
+        ativo = (df['Status'] == 'Ativo').to_numpy()
+        restante = ((valores(df, 'Parcelas_Total') - valores(df, 'Parcelas_Pagas'))
+                    * valores(df, 'Valor_Parcela_Mensal'))
+        yield (np.where(emprestado, _CLASSE['a_receber'], _CLASSE['a_pagar'])[ativo], df['Nome'][ativo],
+               df['Tipo'][ativo], restante[ativo], df['Data_Emprestimo'][ativo], linhas[ativo])
+
+
+class Razao:
+    """Lançamentos de todos os conjuntos em arrays numéricos.
+
+    Colunas: conta, classe (int8), membro, categoria (int32, índices em `membros`/`categorias`),
+    valor (int64, centavos), data (datetime64) e linha (posição no arquivo de origem).
+    """
+
+    def __init__(self, tabela, membros, categorias):
+        self.tabela = tabela
+        self.membros = membros
+        self.categorias = categorias
+
+    @classmethod
+    def construir(cls, dados):
+        partes = []
+        for conta, nome in enumerate(CONTAS):
+            df = dados.get(nome)
+            if df is None or df.empty:
+                continue
+            df = df.reset_index(drop=True)
+            for classe, membro, categoria, valor, data, linhas in _lancamentos(nome, df):
+                partes.append(pd.DataFrame({
+                    'conta': np.full(len(linhas), conta, dtype='int8'),
+                    'classe': np.asarray(classe, dtype='int8'),
+                    'membro': membro.astype(object).fillna('').astype(str).to_numpy(dtype=object),
+                    'categoria': categoria.astype(object).fillna('').astype(str).to_numpy(dtype=object),
+                    'valor': _centavos(valor),
+                    'data': converter_datas(data).to_numpy(dtype='datetime64[ns]'),
+                    'linha': linhas,
+                }))
+        if not partes:
+            tabela = pd.DataFrame({'conta': np.empty(0, 'int8'), 'classe': np.empty(0, 'int8'),
+                                   'membro': np.empty(0, 'int32'), 'categoria': np.empty(0, 'int32'),
+                                   'valor': np.empty(0, 'int64'), 'data': np.empty(0, 'datetime64[ns]'),
+                                   'linha': np.empty(0, 'int32')})
+            return cls(tabela, np.empty(0, dtype=object), np.empty(0, dtype=object))
+        tabela = pd.concat(partes, ignore_index=True)
+        codigos_membro, membros = pd.factorize(tabela['membro'])
+        codigos_categoria, categorias = pd.factorize(tabela['categoria'])
+        tabela['membro'] = codigos_membro.astype('int32')
+        tabela['categoria'] = codigos_categoria.astype('int32')
+        return cls(tabela, np.asarray(membros, dtype=object), np.asarray(categorias, dtype=object))
+
+    def totais(self):
+        """Soma em centavos de cada classe, numa única passada"""
+        return np.bincount(self.tabela['classe'].to_numpy(), weights=self.tabela['valor'].to_numpy(),
+                           minlength=len(CLASSES)).round().astype('int64')
+
+    def metricas(self):
+        """Métricas de destaque de todas as abas, em reais"""
+        t = dict(zip(CLASSES, self.totais().tolist()))
+        t['efetiva'] = t['clt'] + t['outros'] + t['freela_pago']
+        t['projetada'] = t['efetiva'] + t['freela_pendente']
+        t['saldo_investimentos'] = t['investido'] + t['rendimento']
+        t['saldo_emprestimos'] = t['a_receber'] - t['a_pagar']
+        # Somas feitas em centavos: sem resíduos de ponto flutuante
+        return {nome: centavos / 100 for nome, centavos in t.items()}
+
+    def memoria(self):
+        return int(self.tabela.memory_usage(deep=True).sum())
+
+
+class RazaoCompartilhado:
+    """Razão reconstruído apenas quando algum conjunto muda (gravação enfileirada ou arquivo alterado)"""
+
+    def __init__(self, carregar_df, data_dir='data'):
+        self._carregar_df = carregar_df
+        self._caminhos = [caminho(nome, data_dir) for nome in CONTAS]
+        self._razao = None
+        self._versao = 0
+        self._chave = None
+        self._lock = threading.Lock()
+
+    def invalidar(self, file_path=None, df=None):
+        with self._lock:
+            self._versao += 1
+
+    def atual(self):
+        with self._lock:
+            chave = (self._versao, tuple(str(assinatura_arquivo(p)) for p in self._caminhos))
+            if self._razao is not None and chave == self._chave:
+                return self._razao
+        razao = Razao.construir({nome: self._carregar_df(p) for nome, p in zip(CONTAS, self._caminhos)})
+        with self._lock:
+            self._razao, self._chave = razao, chave
+        return razao
+
+
+_compartilhado = None
+_compartilhado_lock = threading.Lock()
+
+
+def obter_razao(escritor, carregar_df):
+    """Razão do processo, invalidado a cada gravação enfileirada no escritor"""
+    global _compartilhado
+    with _compartilhado_lock:
+        if _compartilhado is None:
+            _compartilhado = RazaoCompartilhado(carregar_df)
+            escritor.observar(ao_enfileirar=_compartilhado.invalidar)
+        return _compartilhado
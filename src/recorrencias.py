@@ -0,0 +1,85 @@
+"""Regras de lançamentos recorrentes (salário, vale...) materializadas em lote na renda familiar."""
+import numpy as np
+import pandas as pd
+
+from particoes import converter_datas
+
+RECORRENCIAS_PATH = 'data/recorrencias.csv'
+COLUNAS_RECORRENCIAS = ['Membro', 'Tipo', 'Valor', 'Dia', 'Inicio', 'Fim', 'Reajuste_Pct', 'Mes_Reajuste']
+
+
+def _ordinal_mes(serie):
+    """'YYYY-MM' (ou data) -> meses desde 1970-01; vazio/inválido -> NaN"""
+    datas = converter_datas(pd.Series(serie, dtype=object))
+    return (datas.dt.year - 1970) * 12 + datas.dt.month - 1
+
+
+def materializar(regras, inicio, fim):
+    """Gera os lançamentos de todas as regras para os meses de `inicio` a `fim` (inclusive).
+
+    Tudo é calculado de uma vez sobre a grade regras x meses: vigência (Inicio/Fim), dia
+    limitado ao tamanho do mês e reajuste anual composto a cada `Mes_Reajuste` após o início.
+    """
+    colunas = ['Membro', 'Tipo', 'Valor', 'Data']
+    if regras.empty:
+        return pd.DataFrame(columns=colunas)
+    primeiro = int(_ordinal_mes([pd.Timestamp(inicio)]).iloc[0])
+    ultimo = int(_ordinal_mes([pd.Timestamp(fim)]).iloc[0])
+    meses = np.arange(primeiro, ultimo + 1)
+    if len(meses) == 0:
+        return pd.DataFrame(columns=colunas)
+
+    n_regras, n_meses = len(regras), len(meses)
+    idx_regra = np.repeat(np.arange(n_regras), n_meses)
+    mes = np.tile(meses, n_regras)
+
+    inicio_regra = _ordinal_mes(regras['Inicio'])
+    sem_inicio = inicio_regra.isna().to_numpy()[idx_regra]
+    ini_regra = inicio_regra.fillna(-10**6).to_numpy(dtype='int64')[idx_regra]
+    fim_regra = _ordinal_mes(regras['Fim']).fillna(10**6).to_numpy(dtype='int64')[idx_regra]
+    vigente = (mes >= ini_regra) & (mes <= fim_regra)
+
+    valor = pd.to_numeric(regras['Valor'], errors='coerce').fillna(0).to_numpy(dtype=float)[idx_regra]
+    pct = pd.to_numeric(regras['Reajuste_Pct'], errors='coerce').fillna(0).to_numpy(dtype=float)[idx_regra]
+    mes_reajuste = pd.to_numeric(regras['Mes_Reajuste'], errors='coerce').fillna(1).clip(1, 12).to_numpy(dtype='int64')[idx_regra] - 1
+    # Quantidade de meses k em (inicio, mes] com k % 12 == mes_reajuste (sem início, sem reajuste)
+    reajustes = np.where(sem_inicio, 0, np.maximum((mes - mes_reajuste) // 12 - (ini_regra - mes_reajuste) // 12, 0))
+    valor = np.round(valor * (1 + pct / 100) ** reajustes, 2)
+
+    ano = 1970 + mes // 12
+    mes_do_ano = mes % 12 + 1
+    dias_no_mes = pd.to_datetime(pd.DataFrame({'year': ano, 'month': mes_do_ano, 'day': 1})).dt.days_in_month.to_numpy()
+    dia = np.minimum(pd.to_numeric(regras['Dia'], errors='coerce').fillna(1).clip(1, 31)
+                     .to_numpy(dtype='int64')[idx_regra], dias_no_mes)
+
+    gerados = pd.DataFrame({
+        'Membro': regras['Membro'].to_numpy()[idx_regra],
+        'Tipo': regras['Tipo'].to_numpy()[idx_regra],
+        'Valor': valor,
+        'Data': pd.to_datetime(pd.DataFrame({'year': ano, 'month': mes_do_ano, 'day': dia})).dt.strftime('%Y-%m-%d'),
+    })
+    return gerados[vigente].reset_index(drop=True)
+
+
+def _chaves(df):
+    datas = converter_datas(df['Data'])
+    yyyymm = (datas.dt.year * 100 + datas.dt.month).fillna(-1).astype('int64')
+    return zip(df['Membro'].astype(str), df['Tipo'].astype(str).str.lower(), yyyymm)
+
+
+def chaves_lancamentos(df):
+    """Conjunto de (membro, tipo, YYYYMM) dos lançamentos, com tipo sem maiúsculas"""
+    return set() if df.empty else set(_chaves(df))
+
+
+def separar_duplicados(df_familia, gerados):
+    """Divide os lançamentos gerados entre novos e já existentes (consulta O(1) por lançamento)"""
+    if gerados.empty:
+        return gerados, gerados
+    vistos = chaves_lancamentos(df_familia)
+    duplicado = np.zeros(len(gerados), dtype=bool)
+    for i, chave in enumerate(_chaves(gerados)):
+        # Repetições dentro do próprio lote também contam como duplicadas
+        duplicado[i] = chave in vistos
+        vistos.add(chave)
+    return gerados[~duplicado].reset_index(drop=True), gerados[duplicado].reset_index(drop=True)
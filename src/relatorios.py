@@ -0,0 +1,256 @@
+"""Relatórios mensais e por membro gerados em lote, sem o Streamlit.
+
+Uso:
+    python src/relatorios.py --inicio 2015-01 --fim 2025-12 --formatos csv json html --saida relatorios
+
+Os meses são distribuídos entre processos. Cada mês guarda a versão (hash) dos dados
+que o geraram; meses cujos dados não mudaram desde a última execução não são refeitos.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import (mascara_clt, mascara_pago, resumo_despesas, resumo_investimentos, resumo_por_membro,
+                        resumo_renda, valores)
+from dados import CONJUNTOS, DATA_DIR, carregar_todos
+from particoes import COLUNA_DATA, chave_mes
+
+# Mudar quando o conteúdo dos relatórios mudar: invalida todo o cache
+VERSAO_FORMATO = 1
+FORMATOS = ['csv', 'json', 'html']
+ARQUIVO_CACHE = '.cache.json'
+
+_ESTILO_HTML = """
+<style>
+body { background: #181C2F; color: #E0F7FA; font-family: 'Segoe UI', 'Roboto', 'Arial', sans-serif; margin: 2rem; }
+h1, h2 { color: #1DE9B6; }
+table { border-collapse: collapse; margin-bottom: 1.5rem; }
+th, td { border: 1px solid #1DE9B6; padding: 4px 10px; text-align: right; }
+th { background: #23272F; }
+a { color: #1DE9B6; }
+</style>
+"""
+
+# Fatias por mês carregadas uma vez por processo: {conjunto: {mes: DataFrame}}
+_FATIAS = None
+
+
+def agrupar_por_mes(dados):
+    """Separa cada conjunto datado em fatias mensais"""
+    fatias = {}
+    for nome in CONJUNTOS:
+        df = dados[nome]
+        if df.empty:
+            fatias[nome] = {}
+            continue
+        chaves = chave_mes(df[COLUNA_DATA[nome]]).to_numpy()
+        fatias[nome] = {mes: grupo for mes, grupo in df.groupby(chaves)}
+    return fatias
+
+
+def versoes_por_mes(dados, meses):
+    """Hash do conteúdo de cada mês em todos os conjuntos (independe da ordem das linhas)"""
+    partes = {mes: [f"v{VERSAO_FORMATO}"] for mes in meses}
+    for nome in CONJUNTOS:
+        df = dados[nome]
+        if df.empty:
+            continue
+        hashes = pd.Series(pd.util.hash_pandas_object(df, index=False).to_numpy())
+        agrupado = hashes.groupby(chave_mes(df[COLUNA_DATA[nome]]).to_numpy()).agg(['sum', 'count'])
+        for mes, soma, quantidade in zip(agrupado.index, agrupado['sum'], agrupado['count']):
+            if mes in partes:
+                partes[mes].append(f"{nome}:{soma}:{quantidade}")
+    return {mes: hashlib.sha1("|".join(p).encode()).hexdigest() for mes, p in partes.items()}
+
+
+def relatorio_mes(fatias, mes):
+    """Métricas e tabelas de um mês a partir das fatias mensais de cada conjunto"""
+    dados = {nome: fatias[nome].get(mes, pd.DataFrame(columns=['Membro', 'Tipo', 'Categoria', 'Valor', 'Data']))
+             for nome in CONJUNTOS}
+    renda = resumo_renda(dados['familia'], dados['horas'])
+    total_despesas, por_categoria = resumo_despesas(dados['despesas'])
+    invest = resumo_investimentos(dados['investimentos'])
+    por_membro = resumo_por_membro(dados).drop(columns='Mes')
+    emprestimos = dados['emprestimos']
+    colunas_emp = [c for c in ['Nome', 'Tipo', 'Valor_Liquido_Recebido', 'Total_A_Pagar', 'Parcelas_Total', 'Status']
+                   if c in emprestimos.columns]
+
+    metricas = {
+        'Mes': mes,
+        'Renda_CLT': renda['clt'],
+        'Renda_Outros': renda['outros'],
+        'Freelancer_Pago': renda['freela_pago'],
+        'Freelancer_Pendente': renda['freela_pendente'],
+        'Renda_Efetiva': renda['efetiva'],
+        'Renda_Projetada': renda['projetada'],
+        'Despesas': total_despesas,
+        'Saldo': renda['efetiva'] - total_despesas,
+        'Investido': invest['investido'],
+        'Rendimento': invest['rendimento'],
+        'Emprestimos_Contratados': int(len(emprestimos)),
+    }
+    tabelas = {
+        'despesas_por_categoria': por_categoria,
+        'por_membro': por_membro,
+        'emprestimos': emprestimos[colunas_emp],
+    }
+    return metricas, tabelas
+
+
+def metricas_por_mes(dados, meses):
+    """Mesmas métricas de relatorio_mes para todos os meses de uma vez (um groupby por conjunto)"""
+    partes = []
+    familia, horas = dados['familia'], dados['horas']
+    if not familia.empty:
+        partes.append(pd.DataFrame({'Mes': chave_mes(familia['Data']), 'Valor': valores(familia, 'Valor'),
+                                    'Metrica': np.where(mascara_clt(familia), 'Renda_CLT', 'Renda_Outros')}))
+    if not horas.empty:
+        partes.append(pd.DataFrame({'Mes': chave_mes(horas['Data']), 'Valor': valores(horas, 'Valor_Ajustado_BRL'),
+                                    'Metrica': np.where(mascara_pago(horas), 'Freelancer_Pago', 'Freelancer_Pendente')}))
+    for nome, coluna, metrica in (('despesas', 'Valor', 'Despesas'), ('investimentos', 'Valor', 'Investido'),
+                                  ('investimentos', 'Rendimento', 'Rendimento')):
+        df = dados[nome]
+        if not df.empty:
+            partes.append(pd.DataFrame({'Mes': chave_mes(df['Data']), 'Valor': valores(df, coluna), 'Metrica': metrica}))
+    emprestimos = dados['emprestimos']
+    if not emprestimos.empty:
+        partes.append(pd.DataFrame({'Mes': chave_mes(emprestimos['Data_Emprestimo']), 'Valor': 1.0,
+                                    'Metrica': 'Emprestimos_Contratados'}))
+
+    colunas = ['Renda_CLT', 'Renda_Outros', 'Freelancer_Pago', 'Freelancer_Pendente', 'Despesas',
+               'Investido', 'Rendimento', 'Emprestimos_Contratados']
+    if partes:
+        longo = pd.concat(partes, ignore_index=True)
+        tabela = longo.pivot_table(index='Mes', columns='Metrica', values='Valor', aggfunc='sum', fill_value=0)
+    else:
+        tabela = pd.DataFrame()
+    tabela = tabela.reindex(index=meses, columns=colunas, fill_value=0).fillna(0)
+    tabela['Renda_Efetiva'] = tabela['Renda_CLT'] + tabela['Renda_Outros'] + tabela['Freelancer_Pago']
+    tabela['Renda_Projetada'] = tabela['Renda_Efetiva'] + tabela['Freelancer_Pendente']
+    tabela['Saldo'] = tabela['Renda_Efetiva'] - tabela['Despesas']
+    tabela['Emprestimos_Contratados'] = tabela['Emprestimos_Contratados'].astype(int)
+    ordem = ['Renda_CLT', 'Renda_Outros', 'Freelancer_Pago', 'Freelancer_Pendente', 'Renda_Efetiva',
+             'Renda_Projetada', 'Despesas', 'Saldo', 'Investido', 'Rendimento', 'Emprestimos_Contratados']
+    return tabela[ordem].rename_axis('Mes').reset_index()
+
+
+def _html(titulo, metricas, tabelas):
+    corpo = [f"<h1>{titulo}</h1>"]
+    if metricas is not None:
+        corpo.append(pd.DataFrame([metricas]).T.rename(columns={0: 'Valor'}).to_html(float_format=lambda v: f"{v:,.2f}"))
+    for nome, tabela in tabelas.items():
+        corpo.append(f"<h2>{nome.replace('_', ' ').capitalize()}</h2>")
+        corpo.append(tabela.to_html(index=False, float_format=lambda v: f"{v:,.2f}") if not tabela.empty
+                     else "<p>Sem registros.</p>")
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{titulo}</title>{_ESTILO_HTML}</head><body>{''.join(corpo)}</body></html>"
+
+
+def gravar_relatorio(destino, titulo, metricas, tabelas, formatos):
+    destino.mkdir(parents=True, exist_ok=True)
+    if 'csv' in formatos:
+        if metricas is not None:
+            pd.DataFrame([metricas]).to_csv(destino / 'metricas.csv', index=False)
+        for nome, tabela in tabelas.items():
+            tabela.to_csv(destino / f"{nome}.csv", index=False)
+    if 'json' in formatos:
+        conteudo = {'titulo': titulo, 'metricas': metricas,
+                    'tabelas': {nome: tabela.to_dict(orient='records') for nome, tabela in tabelas.items()}}
+        (destino / 'relatorio.json').write_text(json.dumps(conteudo, ensure_ascii=False, indent=1, default=str),
+                                                encoding='utf-8')
+    if 'html' in formatos:
+        (destino / 'relatorio.html').write_text(_html(titulo, metricas, tabelas), encoding='utf-8')
+
+
+def _iniciar_processo(data_dir, inicio, fim):
+    # Com fork as fatias já vêm do processo principal; com spawn cada processo carrega uma vez
+    global _FATIAS
+    if _FATIAS is None:
+        _FATIAS = agrupar_por_mes(carregar_todos(data_dir, inicio, fim))
+
+
+def _gerar_mes(tarefa):
+    mes, saida, formatos = tarefa
+    metricas, tabelas = relatorio_mes(_FATIAS, mes)
+    gravar_relatorio(Path(saida) / 'mensal' / mes, f"Relatório {mes}", metricas, tabelas, formatos)
+    return metricas
+
+
+def gerar_relatorios(inicio=None, fim=None, saida='relatorios', formatos=FORMATOS, processos=None,
+                     data_dir=DATA_DIR, forcar=False):
+    """Gera os relatórios mensais e por membro do intervalo; retorna estatísticas da execução"""
+    global _FATIAS
+    dados = carregar_todos(data_dir, inicio, fim)
+
+    if inicio is None or fim is None:
+        meses_dados = sorted(set().union(*[set(chave_mes(dados[n][COLUNA_DATA[n]])) for n in CONJUNTOS
+                                           if not dados[n].empty]) - {'sem_data'})
+        if not meses_dados:
+            return {'meses': 0, 'gerados': 0, 'em_cache': 0}
+        inicio = inicio or meses_dados[0]
+        fim = fim or meses_dados[-1]
+    meses = list(pd.period_range(pd.Period(inicio, 'M'), pd.Period(fim, 'M'), freq='M').strftime('%Y-%m'))
+    if not meses:
+        # Início depois do fim: intervalo vazio
+        return {'meses': 0, 'gerados': 0, 'em_cache': 0}
+
+    saida = Path(saida)
+    saida.mkdir(parents=True, exist_ok=True)
+    arquivo_cache = saida / ARQUIVO_CACHE
+    cache = json.loads(arquivo_cache.read_text()) if arquivo_cache.exists() and not forcar else {}
+    chave_formatos = ",".join(sorted(formatos))
+    versoes = {mes: f"{v}:{chave_formatos}" for mes, v in versoes_por_mes(dados, meses).items()}
+    pendentes = [mes for mes in meses if cache.get(mes) != versoes[mes] or not (saida / 'mensal' / mes).exists()]
+
+    _FATIAS = agrupar_por_mes(dados)
+    tarefas = [(mes, str(saida), list(formatos)) for mes in pendentes]
+    processos = processos or os.cpu_count() or 1
+    if processos > 1 and len(tarefas) > 1:
+        tamanho_lote = max(1, math.ceil(len(tarefas) / (processos * 4)))
+        with ProcessPoolExecutor(max_workers=min(processos, len(tarefas)), initializer=_iniciar_processo,
+                                 initargs=(data_dir, inicio, fim)) as pool:
+            list(pool.map(_gerar_mes, tarefas, chunksize=tamanho_lote))
+    else:
+        for tarefa in tarefas:
+            _gerar_mes(tarefa)
+
+    # Consolidado de todos os meses (inclusive os que vieram do cache)
+    resumo_meses = metricas_por_mes(dados, meses)
+    por_membro = resumo_por_membro(dados)
+    por_membro = por_membro[por_membro['Mes'].isin(meses)]
+    gravar_relatorio(saida, f"Resumo {meses[0]} a {meses[-1]}", None,
+                     {'resumo_mensal': resumo_meses, 'por_membro': por_membro}, formatos)
+    for membro, tabela in por_membro.groupby('Membro'):
+        gravar_relatorio(saida / 'membros' / str(membro), f"{membro} - {meses[0]} a {meses[-1]}", None,
+                         {'mensal': tabela.drop(columns='Membro')}, formatos)
+
+    cache.update({mes: versoes[mes] for mes in pendentes})
+    arquivo_cache.write_text(json.dumps(cache, indent=1))
+    return {'meses': len(meses), 'gerados': len(pendentes), 'em_cache': len(meses) - len(pendentes)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Relatórios financeiros mensais e por membro")
+    parser.add_argument('--inicio', help="Primeiro mês (YYYY-MM); padrão: primeiro mês com dados")
+    parser.add_argument('--fim', help="Último mês (YYYY-MM); padrão: último mês com dados")
+    parser.add_argument('--saida', default='relatorios', help="Pasta de saída")
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=FORMATOS)
+    parser.add_argument('--processos', type=int, default=None, help="Padrão: número de núcleos")
+    parser.add_argument('--dados', default=DATA_DIR, help="Pasta dos arquivos de dados")
+    parser.add_argument('--forcar', action='store_true', help="Ignora o cache e refaz todos os meses")
+    args = parser.parse_args()
+    if args.inicio and args.fim and pd.Period(args.inicio, 'M') > pd.Period(args.fim, 'M'):
+        parser.error(f"--inicio {args.inicio} é posterior a --fim {args.fim}")
+
+    inicio_exec = time.perf_counter()
+    resultado = gerar_relatorios(args.inicio, args.fim, args.saida, args.formatos, args.processos,
+                                 args.dados, args.forcar)
+    print(f"{resultado['meses']} meses: {resultado['gerados']} gerados, {resultado['em_cache']} do cache "
+          f"({time.perf_counter() - inicio_exec:.2f}s)")
@@ -0,0 +1,123 @@
+"""Restauração a partir de data/backups com diff por linha (hash vetorizado) e restauração seletiva."""
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dados import CONJUNTOS
+from duplicidade import CAMPOS_CHAVE
+
+BACKUP_DIR = 'data/backups'
+
+_PADRAO_BACKUP = re.compile(rf"^({'|'.join(CONJUNTOS)})_(.+)\.csv$")
+
+
+def listar_backups(backup_dir=BACKUP_DIR):
+    """Snapshots dos conjuntos na pasta de backups, mais recentes primeiro"""
+    linhas = []
+    for arquivo in Path(backup_dir).glob('*.csv'):
+        encontrado = _PADRAO_BACKUP.match(arquivo.name)
+        if encontrado:
+            # copy2 preserva o mtime do original: o momento do backup vem do nome, quando possível
+            momento = pd.to_datetime(encontrado.group(2)[-15:], format='%Y%m%d_%H%M%S', errors='coerce')
+            if pd.isna(momento):
+                momento = pd.Timestamp.fromtimestamp(arquivo.stat().st_mtime)
+            linhas.append({'Arquivo': arquivo.name, 'Conjunto': encontrado.group(1), 'Momento': momento,
+                           'Caminho': str(arquivo)})
+    colunas = ['Arquivo', 'Conjunto', 'Momento', 'Caminho']
+    return pd.DataFrame(linhas, columns=colunas).sort_values('Momento', ascending=False, ignore_index=True)
+
+
+def _hashes(atual, backup, colunas):
+    """Hash de 64 bits por linha dos dois DataFrames, em uma base comum.
+
+    Textos são fatorados juntos (os códigos inteiros entram no hash, bem mais rápido que hashear
+    strings) e números são comparados como float (3 == 3.0).
+    """
+    n = len(atual)
+    codigos = {}
+    for coluna in colunas:
+        serie = pd.concat([atual.reindex(columns=[coluna])[coluna], backup.reindex(columns=[coluna])[coluna]],
+                          ignore_index=True)
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            codigos[coluna] = serie.astype('float64').to_numpy()
+        else:
+            codigos[coluna] = pd.factorize(serie.astype(object) if isinstance(serie.dtype, pd.CategoricalDtype) else serie)[0]
+    if not codigos:
+        return np.zeros(n, dtype='uint64'), np.zeros(len(backup), dtype='uint64')
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(codigos), index=False).to_numpy()
+    return hashes[:n], hashes[n:]
+
+
+def _excedentes(codigos, contagem_propria, contagem_outro):
+    """Posições cujas linhas sobram em relação ao outro lado (a k-ésima cópia só casa com a k-ésima)"""
+    candidatas = np.flatnonzero((contagem_propria - contagem_outro)[codigos] > 0)
+    if len(candidatas) == 0:
+        return candidatas
+    ocorrencia = pd.Series(codigos[candidatas]).groupby(codigos[candidatas]).cumcount().to_numpy()
+    return candidatas[ocorrencia >= contagem_outro[codigos[candidatas]]]
+
+
+def _so_em_cada(h_atual, h_backup):
+    """Multiconjuntos de linhas comparados por contagem: uma fatoração e dois bincount"""
+    codigos, unicos = pd.factorize(np.concatenate([h_atual, h_backup]))
+    c_atual, c_backup = codigos[:len(h_atual)], codigos[len(h_atual):]
+    n_atual = np.bincount(c_atual, minlength=len(unicos))
+    n_backup = np.bincount(c_backup, minlength=len(unicos))
+    return _excedentes(c_atual, n_atual, n_backup), _excedentes(c_backup, n_backup, n_atual)
+
+
+def diferenca(atual, backup, conjunto):
+    """Linhas adicionadas (só no atual), removidas (só no backup) e alteradas desde o backup.
+
+    Alteradas são pares que diferem em algum campo mas têm a mesma identidade (campos-chave sem
+    os valores, ex.: membro/categoria/data). As linhas são comparadas nas colunas em comum; as
+    demais aparecem em colunas_adicionadas/colunas_removidas. Retorna posições (iloc).
+    """
+    colunas = [c for c in atual.columns if c in backup.columns]
+    so_atual, so_backup = _so_em_cada(*_hashes(atual, backup, colunas))
+
+    campos = CAMPOS_CHAVE.get(conjunto, {})
+    identidade = [c for c in campos.get('textos', []) + campos.get('datas', []) if c in colunas]
+    alteradas_atual = alteradas_backup = np.empty(0, dtype='int64')
+    if identidade and len(so_atual) and len(so_backup):
+        # Pareia a k-ésima sobra de cada identidade no atual com a k-ésima no backup
+        id_atual, id_backup = _hashes(atual.iloc[so_atual], backup.iloc[so_backup], identidade)
+        chave_atual = pd.MultiIndex.from_arrays([id_atual, pd.Series(id_atual).groupby(id_atual).cumcount()])
+        chave_backup = pd.MultiIndex.from_arrays([id_backup, pd.Series(id_backup).groupby(id_backup).cumcount()])
+        pos_backup = chave_backup.get_indexer(chave_atual)
+        pareadas = pos_backup >= 0
+        alteradas_atual, alteradas_backup = so_atual[pareadas], so_backup[pos_backup[pareadas]]
+        so_atual = np.setdiff1d(so_atual, alteradas_atual)
+        so_backup = np.setdiff1d(so_backup, alteradas_backup)
+    return {
+        'adicionadas': so_atual,
+        'removidas': so_backup,
+        'alteradas_atual': alteradas_atual,
+        'alteradas_backup': alteradas_backup,
+        'colunas_adicionadas': [c for c in atual.columns if c not in backup.columns],
+        'colunas_removidas': [c for c in backup.columns if c not in atual.columns],
+    }
+
+
+PARTES = ('adicionadas', 'removidas', 'alteradas')
+
+
+def restaurar(atual, backup, diff, partes=PARTES):
+    """Aplica ao estado atual só as partes escolhidas do diff; com todas, volta ao backup inteiro"""
+    if set(partes) >= set(PARTES):
+        return backup.copy()
+    resultado = atual.copy()
+    if 'alteradas' in partes and len(diff['alteradas_atual']):
+        valores = backup.iloc[diff['alteradas_backup']].reindex(columns=resultado.columns)
+        resultado = resultado.astype(object)
+        resultado.iloc[diff['alteradas_atual']] = valores.astype(object).to_numpy()
+    manter = np.ones(len(resultado), dtype=bool)
+    if 'adicionadas' in partes:
+        manter[diff['adicionadas']] = False
+    resultado = resultado[manter]
+    if 'removidas' in partes and len(diff['removidas']):
+        resultado = pd.concat([resultado, backup.iloc[diff['removidas']].reindex(columns=resultado.columns)],
+                              ignore_index=True)
+    return resultado.reset_index(drop=True)
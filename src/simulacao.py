@@ -0,0 +1,121 @@
+"""Simulação de cenários para os empréstimos ativos: antecipar, pagar a mais por mês ou refinanciar.
+
+Todos os cenários (empréstimos x antecipações x extras mensais x taxas) são avaliados de uma vez
+com broadcasting do NumPy, em tabela Price: o saldo devedor é o valor presente das parcelas
+restantes e cada cenário paga parcela + extra até zerar o saldo (o prazo encurta).
+"""
+import numpy as np
+import pandas as pd
+
+from agregacoes import valores
+from emprestimos import pagaveis
+from particoes import converter_datas
+
+ITERACOES_TAXA = 60
+
+
+def taxa_implicita(valor_presente, parcela, prazo, inicial=None):
+    """Taxa mensal da tabela Price que leva `prazo` parcelas de `parcela` ao `valor_presente` (Newton, vetorizado)"""
+    valor_presente, parcela, prazo = (np.asarray(a, dtype='float64') for a in (valor_presente, parcela, prazo))
+    taxa = np.full(valor_presente.shape, 0.02) if inicial is None else np.maximum(np.asarray(inicial, 'float64'), 1e-4)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(ITERACOES_TAXA):
+            fator = (1 + taxa) ** -prazo
+            f = parcela * (1 - fator) / taxa - valor_presente
+            derivada = parcela * (prazo * fator / (1 + taxa) - (1 - fator) / taxa) / taxa
+            taxa = np.clip(taxa - f / derivada, 1e-9, 10.0)
+    # Sem juros (parcelas somam o valor recebido) ou dados inconsistentes: taxa zero
+    sem_juros = ~np.isfinite(taxa) | (parcela * prazo <= valor_presente * (1 + 1e-9))
+    return np.where(sem_juros, 0.0, taxa)
+
+
+def _valor_presente(parcela, taxa, prazo):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(taxa > 0, parcela * (1 - (1 + taxa) ** -prazo) / np.where(taxa > 0, taxa, 1), parcela * prazo)
+
+
+def _meses_para_quitar(saldo, pagamento, taxa):
+    """Prazo (fracionário) para zerar `saldo` pagando `pagamento` por mês; inf se o pagamento não cobre os juros"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        razao = taxa * saldo / pagamento
+        com_juros = -np.log1p(-razao) / np.log1p(taxa)
+        meses = np.where(taxa > 0, np.where(razao < 1, com_juros, np.inf), saldo / pagamento)
+    return np.where(saldo <= 0, 0.0, meses)
+
+
+def _numeros(df, coluna):
+    return valores(df, coluna).to_numpy(dtype='float64')
+
+
+def situacao(df):
+    """Empréstimos ativos com parcelas restantes: parcela, prazo restante, taxa implícita e saldo devedor"""
+    ativos = df[pagaveis(df)].reset_index()
+    total, pagas = _numeros(ativos, 'Parcelas_Total'), _numeros(ativos, 'Parcelas_Pagas')
+    parcela = _numeros(ativos, 'Valor_Parcela_Mensal')
+    # Taxa implícita pelo contrato (valor recebido x parcelas), partindo da taxa gravada
+    taxa = taxa_implicita(_numeros(ativos, 'Valor_Liquido_Recebido'), parcela, total,
+                          _numeros(ativos, 'Taxa_Juros_Calculada') / 100)
+    restantes = total - pagas
+    saldo = _valor_presente(parcela, taxa, restantes)
+    return pd.DataFrame({
+        'Indice': ativos['index'], 'Nome': ativos['Nome'].astype(str), 'Tipo': ativos['Tipo'].astype(str),
+        'Parcela': parcela, 'Restantes': restantes, 'Taxa_Mensal': taxa, 'Saldo_Devedor': saldo,
+        'Juros_Restantes': parcela * restantes - saldo,
+        'Data_Emprestimo': converter_datas(ativos['Data_Emprestimo']),
+    })
+
+
+def simular(df, antecipacoes, extras, taxas=None, hoje=None):
+    """Avalia a grade antecipações x extras mensais x taxas para cada empréstimo ativo.
+
+    `taxas` são taxas mensais (fração) de refinanciamento; NaN (ou `taxas=None`) mantém a taxa do
+    contrato. Retorna uma linha por cenário com prazo, data de quitação, juros e juros economizados
+    em relação a seguir o contrato como está. Cenários cujo pagamento não cobre os juros ficam
+    com prazo infinito e sem data.
+    """
+    base = situacao(df)
+    antecipacoes = np.asarray(antecipacoes, dtype='float64')
+    extras = np.asarray(extras, dtype='float64')
+    taxas = np.array([np.nan] if taxas is None else taxas, dtype='float64')
+
+    # Eixos: (empréstimo, antecipação, extra, taxa)
+    saldo = base['Saldo_Devedor'].to_numpy()[:, None, None, None]
+    parcela = base['Parcela'].to_numpy()[:, None, None, None]
+    taxa = np.where(np.isnan(taxas)[None, None, None, :], base['Taxa_Mensal'].to_numpy()[:, None, None, None],
+                    taxas[None, None, None, :])
+    antecipado = np.minimum(antecipacoes[None, :, None, None], saldo)
+    restante = saldo - antecipado
+    pagamento = parcela + extras[None, None, :, None]
+    meses = _meses_para_quitar(restante, pagamento, taxa)
+    juros = np.where(np.isfinite(meses), pagamento * meses - restante, np.inf)
+    economia = base['Juros_Restantes'].to_numpy()[:, None, None, None] - juros
+
+    forma = meses.shape
+    emprestimo = np.broadcast_to(np.arange(len(base))[:, None, None, None], forma).ravel()
+    # Tolerância evita que 4.0000000001 meses vire uma parcela a mais
+    meses_inteiros = np.ceil(meses - 1e-9).ravel()
+    # Quitação no último dia do mês da última parcela (aritmética de meses do datetime64)
+    mes_atual = np.datetime64(pd.Timestamp(hoje if hoje is not None else pd.Timestamp.now()).strftime('%Y-%m'), 'M')
+    finitos = np.isfinite(meses_inteiros)
+    quitacao = np.full(meses_inteiros.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+    quitacao[finitos] = ((mes_atual + meses_inteiros[finitos].astype('int64') + 1).astype('datetime64[D]')
+                         - np.timedelta64(1, 'D'))
+    return pd.DataFrame({
+        'Nome': base['Nome'].to_numpy()[emprestimo],
+        'Tipo': base['Tipo'].to_numpy()[emprestimo],
+        'Indice': base['Indice'].to_numpy()[emprestimo],
+        'Antecipacao': np.broadcast_to(antecipado, forma).ravel(),
+        'Extra_Mensal': np.broadcast_to(extras[None, None, :, None], forma).ravel(),
+        'Taxa_Mensal': np.broadcast_to(taxa, forma).ravel() * 100,
+        'Meses': meses_inteiros,
+        'Quitacao': quitacao.astype('datetime64[ns]'),
+        'Juros': np.round(juros.ravel(), 2),
+        'Juros_Economizados': np.round(economia.ravel(), 2),
+    })
+
+
+def melhores(cenarios, por='Juros_Economizados'):
+    """Cenário de maior economia de cada empréstimo"""
+    if cenarios.empty:
+        return cenarios
+    return cenarios.loc[cenarios.groupby('Indice')[por].idxmax()].reset_index(drop=True)
@@ -0,0 +1,40 @@
+"""Área de trabalho da sessão: conjuntos já carregados e compactados, reaproveitados entre execuções."""
+
+
+class AreaTrabalho:
+    """Quadros prontos (como load_csv_data devolve) guardados junto com a versão dos dados.
+
+    Cada execução do script consulta a versão no escritor (alteração enfileirada ou assinatura
+    do arquivo); enquanto ela não muda, o quadro em memória é reaproveitado sem ler nem
+    converter nada. As alterações em si ficam no escritor até a política de gravação liberar.
+    """
+
+    def __init__(self):
+        self._quadros = {}
+
+    def obter(self, file_path, versao):
+        """Cópia rasa do quadro guardado para esta versão, ou None"""
+        guardado = self._quadros.get(str(file_path))
+        if guardado is None or guardado[0] != versao:
+            return None
+        return guardado[1].copy(deep=False)
+
+    def guardar(self, file_path, versao, df):
+        self._quadros[str(file_path)] = (versao, df.copy(deep=False))
+
+    def descartar(self, file_path=None):
+        """Esquece um conjunto (ou todos), forçando a próxima leitura"""
+        if file_path is None:
+            self._quadros.clear()
+        else:
+            self._quadros.pop(str(file_path), None)
+
+    def conjuntos(self):
+        return sorted(self._quadros)
+
+
+def area_trabalho(estado):
+    """Área de trabalho guardada no estado da sessão (st.session_state), criada na primeira execução"""
+    if 'area_trabalho' not in estado:
+        estado['area_trabalho'] = AreaTrabalho()
+    return estado['area_trabalho']